@@ -1,4 +1,14 @@
-from crewai import Agent
+import threading
+
+_Agent = None
+
+def Agent(**kwargs):
+    """Builds a crewai Agent, importing crewai on first use so importing this module stays cheap."""
+    global _Agent
+    if _Agent is None:
+        from crewai import Agent as crewai_agent
+        _Agent = crewai_agent
+    return _Agent(**kwargs)
 
 class OrchestratorAgent:
     def __init__(self):
@@ -29,3 +39,43 @@ class CriticAgent:
             verbose=True,
             allow_delegation=False
         )
+
+AGENT_CLASSES = {
+    'orchestrator': OrchestratorAgent,
+    'coder': CoderAgent,
+    'critic': CriticAgent,
+}
+
+class AgentPool:
+    """
+    Builds each agent wrapper once, on first request, and hands out the same instance afterwards,
+    so kickoffs after the first one skip the crewai import and the Agent construction.
+    """
+    def __init__(self, classes=None):
+        self.classes = dict(AGENT_CLASSES if classes is None else classes)
+        self.lock = threading.Lock()
+        self.agents = {}
+
+    def get(self, role):
+        agent = self.agents.get(role)
+        if agent is None:
+            with self.lock:
+                agent = self.agents.get(role)
+                if agent is None:
+                    agent = self.agents[role] = self.classes[role]()
+        return agent
+
+    def warm(self):
+        """Builds every agent now instead of on first use."""
+        for role in self.classes:
+            self.get(role)
+        return self
+
+_pool = None
+
+def get_agent_pool():
+    """Returns the process-wide agent pool."""
+    global _pool
+    if _pool is None:
+        _pool = AgentPool()
+    return _pool
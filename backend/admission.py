@@ -0,0 +1,162 @@
+import math
+import time
+import threading
+import contextvars
+from collections import OrderedDict
+from log_writer import _native_threading
+
+# Seconds a coalesced request sleeps between checks of the call it waits for.
+POLL_INTERVAL = 0.005
+
+
+class Overloaded(Exception):
+    """A request refused to keep the server responsive; the client should retry after `retry_after` seconds."""
+
+    def __init__(self, message, retry_after=1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class IdempotencyKeyReused(ValueError):
+    """An idempotency key sent again with a different request."""
+
+
+class Flight:
+    """One call of SingleFlight.run(), shared by the requests with its key."""
+
+    __slots__ = ('fingerprint', 'done', 'result', 'error', 'finished_at')
+
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.done = False
+        self.result = None
+        self.error = None
+        self.finished_at = None
+
+
+class SingleFlight:
+    """
+    Runs one call per key at a time: run(key, fn) while a call with that key is in progress
+    waits for it and returns its result (or raises its error), so duplicate requests do the
+    work once. With `remember`, for requests carrying an idempotency key, a result for which
+    remember(result) is true (True: any result; errors raised never are) is also kept for
+    `keep_seconds` (at most `max_results` of them) and replayed to later requests with the key;
+    one sent again with a different `fingerprint` (the request body) raises IdempotencyKeyReused. Waiting polls with `sleep` (socketio.sleep under
+    gevent), so it never blocks other requests.
+    """
+
+    def __init__(self, keep_seconds=600.0, max_results=10000):
+        self.keep_seconds = keep_seconds
+        self.max_results = max_results
+        self.lock = threading.Lock()
+        self.flights = {} # key -> Flight in progress
+        self.results = OrderedDict() # key -> finished Flight, oldest first
+        self.stats = {'executed': 0, 'coalesced': 0, 'replayed': 0}
+
+    def _expire(self, now):
+        while self.results:
+            key, flight = next(iter(self.results.items()))
+            if now - flight.finished_at < self.keep_seconds and len(self.results) <= self.max_results:
+                break
+            del self.results[key]
+
+    def run(self, key, fn, fingerprint=None, remember=False, admit=None, sleep=time.sleep):
+        """
+        Returns (result, shared): shared is True when another request's call produced it.
+        admit(), if given, is called before a new call starts (not for requests that join one)
+        and may raise Overloaded to refuse it.
+        """
+        with self.lock:
+            self._expire(time.monotonic())
+            flight = self.flights.get(key) or self.results.get(key)
+            joined = flight is not None
+            if joined:
+                if fingerprint != flight.fingerprint:
+                    raise IdempotencyKeyReused(f"Idempotency key {key[-1]!r} was used for a different request")
+                self.stats['replayed' if flight.done else 'coalesced'] += 1
+            else:
+                if admit is not None:
+                    admit()
+                flight = self.flights[key] = Flight(fingerprint)
+                self.stats['executed'] += 1
+        if joined:
+            while not flight.done:
+                sleep(POLL_INTERVAL)
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+        try:
+            flight.result = fn()
+            return flight.result, False
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+                if flight.error is None and (remember(flight.result) if callable(remember) else remember):
+                    flight.finished_at = time.monotonic()
+                    self.results[key] = flight
+                flight.done = True
+
+
+def run_in_thread(fn, sleep=time.sleep):
+    """
+    Returns fn() (or raises its error) run on an OS thread, waiting for it with `sleep`. Under
+    the gevent server, which does not monkey-patch, a handler doing blocking file work holds
+    the hub until it returns, so no other request gets to join its SingleFlight call or to be
+    counted by AdmissionControl meanwhile; waiting with socketio.sleep lets them run.
+    """
+    Thread = _native_threading()[0]
+    context = contextvars.copy_context() # Keeps the request's lock timing (see lock_timing.py).
+    flight = Flight(None)
+
+    def target():
+        try:
+            flight.result = context.run(fn)
+        except BaseException as e:
+            flight.error = e
+        flight.done = True
+
+    Thread(target=target, name='team-ready-handler', daemon=True).start()
+    while not flight.done:
+        sleep(POLL_INTERVAL)
+    if flight.error is not None:
+        raise flight.error
+    return flight.result
+
+
+class AdmissionControl:
+    """
+    Bounds the requests a project has in progress. admit(project_id) raises Overloaded once
+    `max_pending` of them are (0 is no bound), so a storm of requests for one project is
+    answered with 429 right away instead of piling up greenlets waiting on its files, and other
+    projects are not slowed down. Retry-After is how long the pending ones should take, from a
+    moving average of how long requests took. Every admitted request must be release()d.
+    """
+
+    def __init__(self, max_pending=4):
+        self.max_pending = max_pending
+        self.lock = threading.Lock()
+        self.pending = {} # project_id -> requests in progress
+        self.average_seconds = 0.0
+        self.stats = {'admitted': 0, 'shed': 0}
+
+    def admit(self, project_id):
+        with self.lock:
+            pending = self.pending.get(project_id, 0)
+            if self.max_pending and pending >= self.max_pending:
+                self.stats['shed'] += 1
+                raise Overloaded(f"{pending} requests for project {project_id} are in progress already",
+                                 retry_after=max(math.ceil(pending * self.average_seconds), 1))
+            self.pending[project_id] = pending + 1
+            self.stats['admitted'] += 1
+
+    def release(self, project_id, seconds):
+        with self.lock:
+            pending = self.pending.get(project_id, 0) - 1
+            if pending > 0:
+                self.pending[project_id] = pending
+            else:
+                self.pending.pop(project_id, None)
+            self.average_seconds += 0.2 * (seconds - self.average_seconds)
@@ -0,0 +1,211 @@
+import os
+import json
+import threading
+import contextlib
+
+_llm_hooks_installed = False
+_critic_hooks_installed = False
+_critic_hooks_lock = threading.Lock()
+_critics = threading.local()
+
+
+def metered_llm(completion, cost_fn=None, usage_cost_fn=None):
+    """
+    Wraps a completion function so every call the shared LLM response cache (see llm_cache.py)
+    does not answer, streamed ones included, has its cost sent to the backend, which charges
+    it to the job's project; prompts the agents repeat across iterations are answered from
+    disk instead of the network. The cache and its limits come from the backend through the
+    environment (see worker_env() in app.py); without one, every call is metered.
+    """
+    from llm_cache import get_cache, cached_completion, metered_completion
+    from agent_worker import notify_backend
+
+    cache_dir = os.getenv('TEAM_READY_LLM_CACHE_DIR')
+    cache_options = json.loads(os.getenv('TEAM_READY_LLM_CACHE_OPTIONS', '{}'))
+    costs = {name: fn for name, fn in (('cost_fn', cost_fn), ('usage_cost_fn', usage_cost_fn)) if fn is not None}
+
+    def charge(cost):
+        notify_backend({"charge": cost})
+
+    def metered(model, messages, **params):
+        if cache_dir:
+            return cached_completion(get_cache(cache_dir, **cache_options), completion, model, messages,
+                                     charge=charge, **costs, **params)[0]
+        return metered_completion(completion, model, messages, charge=charge, **costs, **params)[0]
+
+    return metered
+
+
+def governed_llm(completion):
+    """
+    Wraps a completion function so every call first gets a slot from the backend's LLM governor
+    (see llm_governor.py and agent_job_message() in app.py): the backend keeps one governor for
+    its own calls and every worker's, so its rate limits, the project's limits and its budget
+    apply to agent work as configured. The slot is given back with the tokens the response
+    reports, after the last chunk for a streamed call.
+    """
+    from agent_worker import ask_backend, notify_backend
+    from llm_governor import CallRejected, estimate_tokens, response_tokens, released_stream
+
+    def governed(model, messages, **params):
+        prompt_tokens, completion_tokens = estimate_tokens(messages, params)
+        answer = ask_backend({"llm_call": "acquire", "model": model, "prompt_tokens": prompt_tokens,
+                              "completion_tokens": completion_tokens})
+        if not answer or 'rejected' in answer:
+            if answer:
+                raise CallRejected(answer['rejected'], answer.get('message', ''), answer.get('retry_after'))
+            return completion(model=model, messages=messages, **params) # No governor to ask.
+
+        def release(tokens_used):
+            notify_backend({"llm_call": "release", "call": answer['call'], "tokens_used": tokens_used})
+
+        try:
+            response = completion(model=model, messages=messages, **params)
+        except BaseException:
+            release(None)
+            raise
+        if params.get('stream'):
+            return released_stream(response, release)
+        release(response_tokens(response))
+        return response
+
+    return governed
+
+
+def install_llm_hooks():
+    """Installs, once per worker, the backend's governor, the LLM cache and the metering of litellm.completion."""
+    global _llm_hooks_installed
+    if _llm_hooks_installed:
+        return
+    import litellm
+    # The governor goes first, so cache hits skip it.
+    completion = metered_llm(governed_llm(litellm.completion))
+
+    def hooked(model, messages, **params):
+        response = completion(model, messages, **params)
+        # The cache stores plain dicts; crewai expects litellm's response object.
+        return litellm.ModelResponse(**response) if isinstance(response, dict) else response
+
+    litellm.completion = hooked
+    _llm_hooks_installed = True
+
+
+def run_crew(task, context):
+    """
+    Default agent runner: plans, implements and reviews a task with the Orchestrator,
+    Coder and Critic agents from agents.py. Runs inside an agent worker process.
+    """
+    from crewai import Crew, Task
+    from agents import get_agent_pool
+
+    install_llm_hooks()
+
+    # Workers serve many jobs; the agents are built by the first one and reused after that.
+    pool = get_agent_pool()
+    orchestrator, coder, critic = pool.get('orchestrator'), pool.get('coder'), pool.get('critic')
+    plan = Task(
+        description=f"Break this task down into concrete steps:\n{task}\n\n{context}",
+        expected_output="A numbered implementation plan.",
+        agent=orchestrator.agent,
+    )
+    implementation = Task(
+        description=f"Implement the plan for: {task}",
+        expected_output="The code changes that implement the plan.",
+        agent=coder.agent,
+        context=[plan],
+    )
+    review = Task(
+        description=f"Review the implementation of: {task}",
+        expected_output="A review listing problems and required fixes, or an approval.",
+        agent=critic.agent,
+        context=[implementation],
+    )
+    crew = Crew(agents=[orchestrator.agent, coder.agent, critic.agent], tasks=[plan, implementation, review])
+    return str(crew.kickoff())
+
+
+def run_coder(task, context):
+    """
+    Runner of the tasks the DAG scheduler (see task_scheduler.py) dispatches: the task was
+    planned already, so only the Coder agent works on it.
+    """
+    from crewai import Crew, Task
+    from agents import get_agent_pool
+
+    install_llm_hooks()
+
+    coder = get_agent_pool().get('coder')
+    implementation = Task(
+        description=f"Implement this task:\n{task}\n\n{context}",
+        expected_output="The code changes that implement the task.",
+        agent=coder.agent,
+    )
+    return str(Crew(agents=[coder.agent], tasks=[implementation]).kickoff())
+
+
+def simulated_critique(agent_id, output, llm=None):
+    """Default critic of the review pipeline (see reviews.py): a fixed critique, no LLM."""
+    return f"Critique from Agent X for {agent_id}'s output: This output lacks detail and does not address edge cases. Needs refinement."
+
+
+def install_critic_llm_hooks():
+    """
+    Installs, once per backend process, the hook that sends the litellm.completion calls made
+    on a critic thread inside critic_llm_calls() through the LLM path it was given; calls made
+    elsewhere go straight to litellm.
+    """
+    global _critic_hooks_installed
+    with _critic_hooks_lock:
+        if _critic_hooks_installed:
+            return
+        import litellm
+        completion = litellm.completion
+
+        def hooked(model, messages, **params):
+            llm = getattr(_critics, 'llm', None)
+            if llm is None:
+                return completion(model=model, messages=messages, **params)
+            response = llm(model, messages, completion=completion, **params)[0]
+            # The cache stores plain dicts; crewai expects litellm's response object.
+            return litellm.ModelResponse(**response) if isinstance(response, dict) else response
+
+        litellm.completion = hooked
+        _critic_hooks_installed = True
+
+
+@contextlib.contextmanager
+def critic_llm_calls(llm):
+    """
+    Runs the block with this thread's LLM calls going through `llm`, the backend's
+    llm_completion() for the project under review (see run_critic() in app.py), so the
+    critic's calls are cached, admitted by the governor and charged to that project.
+    """
+    if llm is None:
+        yield
+        return
+    install_critic_llm_hooks()
+    _critics.llm = llm
+    try:
+        yield
+    finally:
+        _critics.llm = None
+
+
+def critic_review(agent_id, output, llm=None):
+    """
+    Reviews a submitted output with the CriticAgent from agents.py. Runs on a critic thread of
+    the backend's review pipeline; each thread builds its own agent, so reviews never share one.
+    """
+    from crewai import Crew, Task
+    from agents import CriticAgent
+
+    critic = getattr(_critics, 'agent', None)
+    if critic is None:
+        critic = _critics.agent = CriticAgent()
+    review = Task(
+        description=f"Review this output submitted by agent {agent_id}:\n{output}",
+        expected_output="A review listing problems and required fixes, or an approval.",
+        agent=critic.agent,
+    )
+    with critic_llm_calls(llm):
+        return str(Crew(agents=[critic.agent], tasks=[review]).kickoff())
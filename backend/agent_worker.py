@@ -0,0 +1,88 @@
+"""
+Entry point of an agent worker process started by jobs.JobManager.
+
+Usage: python agent_worker.py <module:function>
+Serves jobs until stdin is closed: reads one {"project_id", "task", "context"} JSON object per line,
+calls function(task, context) and writes one {"result": ...} or {"error": ...} JSON line on stdout.
+While a job runs, the runner may write other JSON lines about it with notify_backend(), such
+as {"charge": cost} for an LLM call it paid for, or ask_backend() a question and read the
+answer from stdin, such as a slot for an LLM call (see JobManager's on_message).
+The worker stays alive between jobs, so imports and agents built by the first job are reused.
+"""
+import sys
+import json
+import importlib
+import threading
+import traceback
+
+# Where the worker's JSON lines go (its real stdout) and its jobs and answers come from, set by main(); None outside a worker.
+_replies = None
+_requests = None
+# Agents may call the LLM from several threads; their lines must not interleave.
+_replies_lock = threading.Lock()
+# One question at a time, so each answer read belongs to the question asked.
+_ask_lock = threading.Lock()
+
+
+def send_line(message):
+    with _replies_lock:
+        _replies.write(json.dumps(message, default=str) + '\n')
+        _replies.flush()
+
+
+def notify_backend(message):
+    """Sends a message about the job being run to the backend; outside a worker there is no backend to tell."""
+    if _replies is not None:
+        send_line(message)
+
+
+def ask_backend(message):
+    """
+    Sends a question about the job being run to the backend and waits for its answer (a dict).
+    Other threads can still notify the backend meanwhile. Returns None outside a worker.
+    """
+    if _replies is None:
+        return None
+    with _ask_lock:
+        send_line(dict(message, reply=True))
+        answer = _requests.readline()
+    return json.loads(answer) if answer else {}
+
+
+def load_runner(spec):
+    module_name, _, function_name = spec.partition(':')
+    return getattr(importlib.import_module(module_name), function_name or 'run')
+
+
+def run_job(runner, request):
+    try:
+        return {"result": runner(request['task'], request.get('context', ''))}
+    except Exception as e:
+        traceback.print_exc()
+        return {"error": f"{type(e).__name__}: {e}"}
+
+
+def main(spec):
+    global _replies, _requests
+    # Anything the agent prints must not end up in our JSON replies.
+    _replies, _requests, sys.stdout = sys.stdout, sys.stdin, sys.stderr
+    runner = None
+    for line in iter(_requests.readline, ''):
+        request = json.loads(line) if line.strip() else None
+        if not isinstance(request, dict) or 'task' not in request:
+            continue # Blank, or an answer that came after its job was over.
+        if runner is None:
+            try:
+                runner = load_runner(spec)
+            except Exception as e:
+                traceback.print_exc()
+                send_line({"error": f"Could not load agent runner {spec}: {e}"})
+                return 1
+        send_line(run_job(runner, request))
+    return 0
+
+
+if __name__ == '__main__':
+    # Run as the importable module, so the runners' notify_backend() finds the worker's stdout.
+    import agent_worker
+    sys.exit(agent_worker.main(sys.argv[1]))
@@ -1,20 +1,111 @@
 import os
+import re
+import sys
 import json
+import math
+import codecs
+import time
+import zlib
+import atexit
 import logging
-from flask import Flask, request, jsonify
+import threading
+import functools
+from flask import Flask, request, jsonify, make_response
 from flask_socketio import SocketIO, emit
 from dotenv import load_dotenv
-from filelock import FileLock # Import FileLock
+from lock_timing import FileLock # filelock.FileLock that reports lock waits for Server-Timing
+import lock_timing
+import metrics
+from log_tail import get_recent_lines
+from storage import get_storage as open_storage, json_cache_stats
+import serialization
+import spend_ledger
+from todo_versions import TODO_FILE, get_todo_versions, item_keys
+from log_writer import LogWriter
+import log_segments
+from redaction import load_redactor
+from broadcast import Broadcaster, project_room
+import llm_cache
+import llm_governor
+from agent_worker import load_runner
+from output_streams import OutputStreams
+import dashboard
+from reviews import ReviewPipeline
+import reviews
+import admission
+# search_index, context_builder, file_index, task_scheduler and jobs are imported where they are
+# used: only the features (and background services) that need them pay for them.
 
 load_dotenv() # Load environment variables from .env file
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'a_very_secret_key')
-socketio = SocketIO(app, async_mode='gevent', cors_allowed_origins="*")
+app.config['STORAGE_BACKEND'] = os.getenv('TEAM_READY_STORAGE', 'json') # 'json' or 'sqlite'
+app.config['STATE_CODEC'] = os.getenv('TEAM_READY_STATE_CODEC', 'json') # 'json', 'json-pretty' or 'msgpack', see serialization.py
+app.config['SPEND_CHECKPOINT_EVERY'] = int(os.getenv('TEAM_READY_SPEND_CHECKPOINT_EVERY', '50'))
+app.config['SPEND_CHECKPOINT_INTERVAL'] = float(os.getenv('TEAM_READY_SPEND_CHECKPOINT_INTERVAL', '5.0'))
+app.config['SPEND_JOURNAL_FSYNC'] = os.getenv('TEAM_READY_SPEND_JOURNAL_FSYNC', '0') == '1'
+app.config['LOG_FLUSH_INTERVAL'] = float(os.getenv('TEAM_READY_LOG_FLUSH_INTERVAL', '0.05'))
+app.config['LOG_FSYNC_POLICY'] = os.getenv('TEAM_READY_LOG_FSYNC_POLICY', 'batch') # 'none', 'batch' or 'always'
+app.config['LOG_ROTATE_BYTES'] = int(os.getenv('TEAM_READY_LOG_ROTATE_BYTES', str(10 * 1024 * 1024)))
+app.config['LOG_ROTATE_SECONDS'] = float(os.getenv('TEAM_READY_LOG_ROTATE_SECONDS', str(24 * 3600)))
+app.config['LOG_MAX_SEGMENTS'] = int(os.getenv('TEAM_READY_LOG_MAX_SEGMENTS', '0')) # 0 keeps all rotated segments
+app.config['REDACTION_CONFIG'] = os.getenv('TEAM_READY_REDACTION_CONFIG') # Optional JSON file, see redaction.py
+app.config['SOCKET_COALESCE_WINDOW'] = float(os.getenv('TEAM_READY_SOCKET_COALESCE_WINDOW', '0.05'))
+app.config['SOCKET_QUEUE_LIMIT'] = int(os.getenv('TEAM_READY_SOCKET_QUEUE_LIMIT', '100'))
+app.config['SOCKET_OVERFLOW_POLICY'] = os.getenv('TEAM_READY_SOCKET_OVERFLOW_POLICY', 'summarize') # or 'drop_oldest'
+app.config['SOCKET_MAX_IN_FLIGHT'] = int(os.getenv('TEAM_READY_SOCKET_MAX_IN_FLIGHT', '0')) # Unacked frames per client; 0: no window (clients need not send chat_ack)
+app.config['SOCKET_ACK_TIMEOUT'] = float(os.getenv('TEAM_READY_SOCKET_ACK_TIMEOUT', '5.0'))
+app.config['SOCKET_MAX_BACKLOG'] = int(os.getenv('TEAM_READY_SOCKET_MAX_BACKLOG', '16')) # Without acks: unwritten transport packets per client; 0: unbounded
+app.config['AGENT_RUNNER'] = os.getenv('TEAM_READY_AGENT_RUNNER', 'agent_runner:run_crew') # module:function, see agent_worker.py
+app.config['AGENT_MAX_WORKERS'] = int(os.getenv('TEAM_READY_AGENT_MAX_WORKERS', '2'))
+app.config['CODER_RUNNER'] = os.getenv('TEAM_READY_CODER_RUNNER', 'agent_runner:run_coder') # Runs scheduled todos
+app.config['SCHEDULER_PARALLELISM'] = int(os.getenv('TEAM_READY_SCHEDULER_PARALLELISM', '4'))
+app.config['CRITIC'] = os.getenv('TEAM_READY_CRITIC', 'agent_runner:simulated_critique') # or agent_runner:critic_review
+app.config['CRITIC_WORKERS'] = int(os.getenv('TEAM_READY_CRITIC_WORKERS', '4'))
+app.config['LLM_COMPLETION'] = os.getenv('TEAM_READY_LLM_COMPLETION', 'litellm:completion')
+app.config['LLM_CACHE'] = os.getenv('TEAM_READY_LLM_CACHE', '1') == '1'
+app.config['LLM_CACHE_MAX_ENTRIES'] = int(os.getenv('TEAM_READY_LLM_CACHE_MAX_ENTRIES', '512'))
+app.config['LLM_CACHE_MAX_BYTES'] = int(os.getenv('TEAM_READY_LLM_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+app.config['LLM_CACHE_TTL'] = float(os.getenv('TEAM_READY_LLM_CACHE_TTL', str(7 * 24 * 3600)))
+# LLM call governor (see llm_governor.py); rate limits of 0 are off.
+app.config['LLM_REQUESTS_PER_MINUTE'] = float(os.getenv('TEAM_READY_LLM_REQUESTS_PER_MINUTE', '0')) # Per model
+app.config['LLM_TOKENS_PER_MINUTE'] = float(os.getenv('TEAM_READY_LLM_TOKENS_PER_MINUTE', '0')) # Per model
+app.config['LLM_MODEL_LIMITS'] = json.loads(os.getenv('TEAM_READY_LLM_MODEL_LIMITS', '{}')) # {"model": {"requests_per_minute": n, "tokens_per_minute": n}}
+app.config['LLM_PROJECT_REQUESTS_PER_MINUTE'] = float(os.getenv('TEAM_READY_LLM_PROJECT_REQUESTS_PER_MINUTE', '0'))
+app.config['LLM_PROJECT_TOKENS_PER_MINUTE'] = float(os.getenv('TEAM_READY_LLM_PROJECT_TOKENS_PER_MINUTE', '0'))
+app.config['LLM_MAX_IN_FLIGHT'] = int(os.getenv('TEAM_READY_LLM_MAX_IN_FLIGHT', '8'))
+app.config['LLM_MAX_QUEUED'] = int(os.getenv('TEAM_READY_LLM_MAX_QUEUED', '256'))
+app.config['LLM_MAX_WAIT'] = float(os.getenv('TEAM_READY_LLM_MAX_WAIT', '30'))
+# Duplicate /init and /kickoff requests (see admission.py)
+app.config['IDEMPOTENCY_KEY_TTL'] = float(os.getenv('TEAM_READY_IDEMPOTENCY_KEY_TTL', '600')) # Seconds a result is replayed
+app.config['PROJECT_MAX_PENDING'] = int(os.getenv('TEAM_READY_PROJECT_MAX_PENDING', '4')) # /init and /kickoff in progress; 0: no bound
+app.config['KICKOFF_MAX_QUEUED_JOBS'] = int(os.getenv('TEAM_READY_KICKOFF_MAX_QUEUED_JOBS', '8')) # Per project; 0: no bound
+app.config['METRICS'] = os.getenv('TEAM_READY_METRICS', '1') == '1'
+app.config['METRICS_LOCK_HOLDS'] = os.getenv('TEAM_READY_METRICS_LOCK_HOLDS', '0') == '1' # A timer per file lock acquire
+app.config['SERVER_TIMING'] = os.getenv('TEAM_READY_SERVER_TIMING', '1') == '1'
+app.config['SEARCH_INDEX'] = os.getenv('TEAM_READY_SEARCH_INDEX', '1') == '1'
+app.config['SEARCH_CHECKPOINT_EVERY'] = int(os.getenv('TEAM_READY_SEARCH_CHECKPOINT_EVERY', '50000'))
+app.config['CONTEXT_BUILDER'] = os.getenv('TEAM_READY_CONTEXT_BUILDER', '1') == '1' # '0' falls back to the 10-line precis
+app.config['CONTEXT_TOKEN_BUDGET'] = int(os.getenv('TEAM_READY_CONTEXT_TOKEN_BUDGET', '1000'))
+app.config['DASHBOARD_MAX_WAIT'] = float(os.getenv('TEAM_READY_DASHBOARD_MAX_WAIT', '60'))
+app.config['FILE_INDEX_WATCH'] = os.getenv('TEAM_READY_FILE_INDEX_WATCH', '1') == '1' # inotify, where available
+app.config['FILE_INDEX_HASH'] = os.getenv('TEAM_READY_FILE_INDEX_HASH', '1') == '1'
+app.config['FILE_INDEX_MAX_AGE'] = float(os.getenv('TEAM_READY_FILE_INDEX_MAX_AGE', '2.0')) # Seconds a refresh is reused
+serialization.get_codec(app.config['STATE_CODEC']) # Fail at startup for an unknown or unavailable codec.
+socketio = SocketIO(app, async_mode='gevent', cors_allowed_origins="*", json=serialization.SocketJSON)
+# Moved by every change the dashboard panels show; /dashboard long polls wait on it (see dashboard.py).
+dashboard_changes = dashboard.ChangeFeed()
 
 # Directory for storing project data
 TEAM_READY_DIR = '.team-ready'
 DATA_DIR = os.path.join(os.getcwd(), TEAM_READY_DIR)
+# Projects initialized with a project_id get their own namespace under DATA_DIR/projects/<project_id>
+PROJECTS_DIR = 'projects'
+PROJECT_ID_PATTERN = re.compile(r'[A-Za-z0-9][A-Za-z0-9_.-]{0,127}')
+
+class InvalidProjectId(ValueError):
+    """Raised for project ids that cannot be used as a directory name."""
 
 # Setup basic logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -24,96 +115,659 @@ def ensure_data_dir():
     if not os.path.exists(DATA_DIR):
         os.makedirs(DATA_DIR)
 
-def get_file_path(filename):
+def validate_project_id(project_id):
+    """Raises InvalidProjectId unless the id is safe to use as a directory name."""
+    if not isinstance(project_id, str) or not PROJECT_ID_PATTERN.fullmatch(project_id) or '..' in project_id:
+        raise InvalidProjectId(f"Invalid project id: {project_id!r}")
+    return project_id
+
+def get_project_dir(project_id):
+    """Returns the namespace directory of a project (whether or not it exists yet)."""
+    root = app.config.get('DATA_DIR', DATA_DIR)
+    return os.path.join(root, PROJECTS_DIR, validate_project_id(project_id))
+
+def ensure_project_dir(project_id):
+    """Creates a project's namespace directory."""
+    project_dir = get_project_dir(project_id)
+    if not os.path.isdir(project_dir):
+        os.makedirs(project_dir, exist_ok=True)
+        dashboard_changes.changed()
+    return project_dir
+
+def get_data_dir(project_id=None):
+    """
+    Returns the data directory, respecting app.config['DATA_DIR'] if set.
+    Projects that were initialized with their project_id use their own namespace; any other
+    project_id falls back to the shared directory.
+    """
+    if project_id:
+        project_dir = get_project_dir(project_id)
+        if os.path.isdir(project_dir):
+            return project_dir
+    return app.config.get('DATA_DIR', DATA_DIR)
+
+def get_file_path(filename, project_id=None):
     """Returns the full path for a file within the DATA_DIR, respecting app.config['DATA_DIR'] if set."""
-    if 'DATA_DIR' in app.config:
-        return os.path.join(app.config['DATA_DIR'], filename)
-    return os.path.join(DATA_DIR, filename)
+    return os.path.join(get_data_dir(project_id), filename)
 
-def read_json_file(filename, default_value=None):
-    """Reads a JSON file with a file lock."""
-    filepath = get_file_path(filename)
-    lockpath = filepath + ".lock"
-    lock = FileLock(lockpath)
-    with lock:
-        if os.path.exists(filepath):
-            with open(filepath, 'r') as f:
-                return json.load(f)
-        return default_value
-
-def write_json_file(filename, data):
-    """Writes data to a JSON file with a file lock."""
-    filepath = get_file_path(filename)
-    lockpath = filepath + ".lock"
-    lock = FileLock(lockpath)
-    with lock:
-        with open(filepath, 'w') as f:
-            json.dump(data, f, indent=4)
+def get_storage(project_id=None):
+    """
+    Returns the storage backend (see storage.py) selected by app.config['STORAGE_BACKEND'] for the data dir,
+    writing documents with app.config['STATE_CODEC'].
+    """
+    return open_storage(app.config['STORAGE_BACKEND'], get_data_dir(project_id), app.config['STATE_CODEC'])
+
+def read_json_file(filename, default_value=None, project_id=None):
+    """
+    Reads a JSON document from the configured storage backend; the caller gets a document of its own.
+    """
+    if filename == spend_ledger.CONFIG_FILE:
+        # The spend ledger checkpoints lazily; make sure readers see the exact spend.
+        get_spend_ledger(project_id).checkpoint()
+    return get_storage(project_id).read(filename, default_value)
+
+def write_json_file(filename, data, project_id=None):
+    """Writes a JSON document to the configured storage backend."""
+    get_storage(project_id).write(filename, data)
+    dashboard_changes.changed()
+    if filename == spend_ledger.CONFIG_FILE:
+        get_spend_ledger(project_id).adopt(data)
+    elif filename == TODO_FILE:
+        get_todo_versions(get_storage(project_id)).adopt(data)
+        if app.config['SEARCH_INDEX']:
+            get_search_index(project_id).update_todos(data if isinstance(data, list) else [])
+        scheduler = schedulers.get(project_id)
+        if scheduler is not None:
+            scheduler.sync(data if isinstance(data, list) else [])
+
+def get_search_index(project_id=None):
+    """Returns the full-text index (see search_index.py) of the project's data dir."""
+    import search_index
+    return search_index.get_index(get_data_dir(project_id), checkpoint_every=app.config['SEARCH_CHECKPOINT_EVERY'])
+
+def get_spend_ledger(project_id=None):
+    """Returns the spend ledger (see spend_ledger.py) of the project's data dir."""
+    return spend_ledger.get_ledger(
+        get_storage(project_id),
+        get_file_path(spend_ledger.JOURNAL_FILENAME, project_id),
+        checkpoint_every=app.config['SPEND_CHECKPOINT_EVERY'],
+        checkpoint_interval=app.config['SPEND_CHECKPOINT_INTERVAL'],
+        fsync=app.config['SPEND_JOURNAL_FSYNC'],
+    )
+
+# Sensitive data redaction, compiled once at startup.
+redactor = load_redactor(app.config['REDACTION_CONFIG'])
 
-def append_to_log_file(filename, message):
-    """Appends a message to a log file with a file lock, redacting sensitive information."""
-    filepath = get_file_path(filename)
+# Log the kickoff context is built from
+CONTEXT_LOG = 'agents_internal.log'
+
+# Logs that can be queried through /logs
+LOG_FILES = ('agents_internal.log', 'decisions.log')
+
+# Background log writer, set up by start_background_services(). Without it logs are written inline.
+log_writer = None
+
+def get_log_rotation():
+    """Rotation policy for the logs (see log_segments.py)."""
+    return log_segments.RotationPolicy(
+        max_bytes=app.config['LOG_ROTATE_BYTES'],
+        max_age=app.config['LOG_ROTATE_SECONDS'],
+        max_segments=app.config['LOG_MAX_SEGMENTS'],
+    )
+
+def append_to_log_file(filename, message, project_id=None, agent=None, redacted=False):
+    """
+    Appends a message to a log file with a file lock, redacting sensitive information
+    (unless the caller already did, as streamed outputs are redacted across chunk boundaries).
+    Every message is indexed by time (and agent, if given) and added to the full-text search
+    index, and the log is rotated into compressed segments when it grows too large or too old.
+    When the background log writer is running, the message is only queued for it, and it is
+    indexed for search on the writer thread once written (see index_log_entries()).
+    """
+    filepath = get_file_path(filename, project_id)
     lockpath = filepath + ".lock"
     lock = FileLock(lockpath) # Instantiate FileLock here
     
-    # Basic sensitive data redaction
-    sensitive_keywords = ["API_KEY", "SECRET", "PASSWORD", "TOKEN"]
-    for keyword in sensitive_keywords:
-        message = message.replace(keyword, "[REDACTED]")
+    if not redacted:
+        message = redactor.redact(message)
+    timestamp = time.time()
+    if filename == CONTEXT_LOG and app.config['CONTEXT_BUILDER']:
+        get_context_builder(project_id).add(message, agent)
 
+    if log_writer is not None:
+        log_writer.submit(filepath, message, timestamp, agent)
+        return
+
+    recent_lines = get_recent_lines(filepath)
     with lock:
-        with open(filepath, 'a') as f:
-            f.write(message + '\n')
+        recent_lines.before_write(filepath)
+        size = log_segments.append_entries(filepath, [(message, timestamp, agent)])
+        log_segments.rotate_if_needed(filepath, get_log_rotation(), size)
+        recent_lines.after_write(filepath, message)
+    index_log_entries(filepath, [(message, timestamp, agent)])
 
-def get_precis():
+def index_log_entries(filepath, entries):
+    """Adds written log entries [(message, timestamp, agent)] to the full-text index of the log's data dir."""
+    if not app.config['SEARCH_INDEX']:
+        return
+    import search_index
+    index = search_index.get_index(os.path.dirname(filepath), checkpoint_every=app.config['SEARCH_CHECKPOINT_EVERY'])
+    filename = os.path.basename(filepath)
+    for message, timestamp, agent in entries:
+        index.add(filename, message, ref=agent, timestamp=timestamp)
+
+def get_precis(project_id=None):
     """
-    Reads the last 10 lines from agents_internal.log and returns them as a formatted string (The Precis).
+    Returns the last 10 lines of agents_internal.log as a formatted string (The Precis).
+    Lines come from the in-process ring buffer kept current by append_to_log_file; when the
+    buffer is stale, only the tail of the log is read, so the cost does not depend on log size.
     """
-    filepath = get_file_path('agents_internal.log')
+    filepath = get_file_path('agents_internal.log', project_id)
     lockpath = filepath + ".lock"
     lock = FileLock(lockpath)
     precis = "No internal agent logs yet."
     with lock:
-        if os.path.exists(filepath):
-            with open(filepath, 'r') as f:
-                lines = f.readlines()
-                last_10_lines = [line.strip() for line in lines[-10:]]
-                if last_10_lines:
-                    precis = "Previous internal agent thoughts:\n" + "\n".join(last_10_lines)
+        last_10_lines = [line.strip() for line in get_recent_lines(filepath).last(filepath, 10)]
+    if last_10_lines:
+        precis = "Previous internal agent thoughts:\n" + "\n".join(last_10_lines)
     return precis
 
-def emit_internal_chat(message):
-    """Emits a message to the internal_chat Socket.io channel."""
+def get_context_builder(project_id=None):
+    """Returns the kickoff context builder (see context_builder.py) of the project's agents_internal.log."""
+    import context_builder
+    return context_builder.get_builder(get_file_path(CONTEXT_LOG, project_id), budget=app.config['CONTEXT_TOKEN_BUDGET'])
+
+def build_kickoff_context(task, project_id=None):
+    """
+    Returns the context handed to an agent with its task: the token-budgeted context, or the
+    precis when the builder is disabled. Both sizes are recorded, so /metrics shows the savings.
+    """
+    from context_builder import estimate_tokens
+    precis = get_precis(project_id)
+    precis_tokens = estimate_tokens(precis)
+    kickoff_context_tokens.observe(precis_tokens, 'precis')
+    if not app.config['CONTEXT_BUILDER']:
+        return precis
+    context = get_context_builder(project_id).build(task or '', app.config['CONTEXT_TOKEN_BUDGET'])
+    kickoff_context_tokens.observe(context.tokens, 'built')
+    logging.info(f"Kickoff context: {context.tokens} tokens ({context.entries} recent entries, "
+                 f"{context.summarized} summarized), the precis would take {precis_tokens}")
+    return context.text
+
+# Room-scoped, coalescing fan-out for the chat channels (see broadcast.py).
+broadcaster = Broadcaster(
+    socketio,
+    window=app.config['SOCKET_COALESCE_WINDOW'],
+    queue_limit=app.config['SOCKET_QUEUE_LIMIT'],
+    overflow_policy=app.config['SOCKET_OVERFLOW_POLICY'],
+    max_in_flight=app.config['SOCKET_MAX_IN_FLIGHT'],
+    ack_timeout=app.config['SOCKET_ACK_TIMEOUT'],
+    max_backlog=app.config['SOCKET_MAX_BACKLOG'],
+)
+
+def emit_internal_chat(message, project_id=None):
+    """Emits a message to the internal_chat Socket.io channel, scoped to the project's room if given."""
     logging.info(f"Internal Chat: {message}")
-    socketio.emit('internal_chat', {'data': message})
+    broadcaster.publish('internal_chat', message, project_room(project_id) if project_id else None)
 
-def emit_client_chat(message):
-    """Emits a message to the client_chat Socket.io channel."""
+def emit_client_chat(message, project_id=None):
+    """Emits a message to the client_chat Socket.io channel, scoped to the project's room if given."""
     logging.info(f"Client Chat: {message}")
-    socketio.emit('client_chat', {'data': message})
+    broadcaster.publish('client_chat', message, project_room(project_id) if project_id else None)
 
-def update_project_spend(cost):
+def update_project_spend(cost, project_id=None):
     """
     Updates the project spend and checks against the hard limit.
     If the limit is reached, emits a BUDGET_EXHAUSTED event.
+    The charge goes through the spend ledger, so concurrent calls never lose an increment.
     """
-    config = read_json_file('config.json')
-    if config is None:
+    result = get_spend_ledger(project_id).charge(cost)
+    if result is None:
         logging.error("config.json not found or empty.")
         return
 
-    config['project_spend'] += cost
-    write_json_file('config.json', config)
-
-    if config['project_spend'] >= config['hard_limit']:
-        emit_client_chat("BUDGET_EXHAUSTED: Project spend limit reached! Agent process will be terminated.")
-        # Placeholder for actual SIGKILL. This would involve tracking the agent process PID.
-        logging.warning("Hard spending limit reached. Agent process would be terminated here.")
+    project_spend, limit_reached = result
+    dashboard_changes.changed()
+    spend_charges.inc()
+    spend_charged.inc(amount=cost)
+    if limit_reached:
+        budget_exhaustions.inc()
+        emit_client_chat("BUDGET_EXHAUSTED: Project spend limit reached! Agent process will be terminated.", project_id)
+        killed = kill_agent_jobs(project_id)
+        logging.warning(f"Hard spending limit reached (spend: {project_spend}). Killed agent jobs: {killed}")
         return True
     return False
 
-# Global state for agent pausing
+def llm_cache_options():
+    """Limits of the LLM response cache, for the backend's and the agent workers' (see worker_env())."""
+    return {
+        'max_entries': app.config['LLM_CACHE_MAX_ENTRIES'],
+        'max_disk_bytes': app.config['LLM_CACHE_MAX_BYTES'],
+        'ttl': app.config['LLM_CACHE_TTL'],
+    }
+
+def get_llm_cache():
+    """Returns the LLM response cache (see llm_cache.py); it lives in the root data dir and is shared by all projects."""
+    return llm_cache.get_cache(os.path.join(app.config.get('DATA_DIR', DATA_DIR), llm_cache.CACHE_DIRNAME),
+                               **llm_cache_options())
+
+def record_llm_admission(call):
+    llm_queue_seconds.observe(call.queued_seconds, call.lane)
+
+def create_llm_governor():
+    return llm_governor.LLMGovernor(
+        requests_per_minute=app.config['LLM_REQUESTS_PER_MINUTE'],
+        tokens_per_minute=app.config['LLM_TOKENS_PER_MINUTE'],
+        project_requests_per_minute=app.config['LLM_PROJECT_REQUESTS_PER_MINUTE'],
+        project_tokens_per_minute=app.config['LLM_PROJECT_TOKENS_PER_MINUTE'],
+        model_limits=app.config['LLM_MODEL_LIMITS'],
+        max_in_flight=app.config['LLM_MAX_IN_FLIGHT'],
+        max_queued=app.config['LLM_MAX_QUEUED'],
+        max_wait=app.config['LLM_MAX_WAIT'],
+        on_admit=record_llm_admission,
+    )
+
+# Admits the LLM calls made by the backend itself and, asked by the agent workers, theirs (see agent_job_message()).
+governor = create_llm_governor()
+# Slots agent jobs hold: job id -> {call id: llm_governor.Call}; given back for them if the job ends first.
+job_llm_calls = {}
+job_llm_calls_lock = threading.Lock()
+
+def llm_completion(model, messages, project_id=None, completion=None, cost_fn=llm_cache.litellm_completion_cost,
+                   priority=llm_governor.BACKGROUND, estimate_cost=llm_governor.litellm_cost_estimate, **params):
+    """
+    Calls the LLM through the response cache. Only cache misses reach the model, once the
+    governor admits them (client prompts pass priority='interactive' to go ahead of agent
+    work), and are charged to the project's spend. Returns (response, cached, budget_exhausted);
+    raises llm_governor.CallRejected for a call that would overrun the budget or found no slot.
+    """
+    completion = completion or load_runner(app.config['LLM_COMPLETION'])
+    outcome = {'budget_exhausted': False}
+
+    def charge(cost):
+        outcome['budget_exhausted'] = bool(update_project_spend(cost, project_id))
+
+    def governed(model, messages, **params):
+        return governor.complete(completion, model, messages, project_id, estimate_cost=estimate_cost,
+                                 remaining=get_spend_ledger(project_id).remaining(), lane=priority,
+                                 sleep=socketio.sleep, **params)
+
+    if app.config['LLM_CACHE']:
+        response, cached = llm_cache.cached_completion(
+            get_llm_cache(), governed, model, messages, charge=charge, cost_fn=cost_fn, **params)
+    else:
+        response, cached = llm_cache.metered_completion(
+            governed, model, messages, charge=charge, cost_fn=cost_fn, **params)[0], False
+    return response, cached, outcome['budget_exhausted']
+
+# Agent job engine (see jobs.py), set up by start_background_services(). Without it /kickoff only logs.
+job_manager = None
+# Coder agents running the todos dispatched by the DAG schedulers, also set up by start_background_services().
+coder_jobs = None
+# DAG schedulers of the projects whose todo lists are being run (see /schedule), by project_id
+schedulers = {}
+
+# Agent outputs being streamed in (see output_streams.py)
+output_streams = OutputStreams()
+# Most bytes of a streamed body read (and relayed) at once; a line ends a read earlier.
+STREAM_READ_BYTES = 1024
+
+def write_output_stream(stream, chunk, final=False):
+    """
+    Relays a chunk of a streamed agent output to the project's clients as an `agent_output`
+    event and logs the lines it completes. The final chunk also ends the stream the way
+    /submit_agent_output ends a whole output.
+    """
+    room = project_room(stream.project_id) if stream.project_id else None
+    with stream.lock:
+        if stream.closed:
+            return
+        text, entries = stream.write(chunk, final)
+        for entry in entries:
+            append_to_log_file('agents_internal.log', entry, stream.project_id, agent=stream.agent_id, redacted=True)
+        if text or final:
+            broadcaster.publish('agent_output', {'stream_id': stream.id, 'agent_id': stream.agent_id,
+                                                 'seq': stream.seq, 'text': text, 'done': final}, room)
+    if final:
+        output_streams.discard(stream.id)
+        emit_internal_chat(f"Agent {stream.agent_id} finished streaming its output ({stream.chars} characters).", stream.project_id)
+        emit_client_chat(f"Agent {stream.agent_id} has submitted output. Reviewing...", stream.project_id)
+        stream.review = request_critique(stream.agent_id, stream.excerpt, stream.project_id, digest=stream.digest.hexdigest())
+
+def run_critic(agent_id, output, project_id=None):
+    """
+    Critiques an output with the critic named by app.config['CRITIC'] (module:function). The
+    critic makes its LLM calls through `llm`: llm_completion() for the project under review.
+    """
+    return load_runner(app.config['CRITIC'])(agent_id, output, llm=functools.partial(llm_completion, project_id=project_id))
+
+def critique_finished(review):
+    """Called as each review ends (from a critic thread once the pipeline runs): logs the critique and streams it to the chats."""
+    project_id = review.project_id
+    if review.state == reviews.DONE:
+        append_to_log_file('agents_internal.log', review.critique, project_id)
+        emit_internal_chat(review.critique, project_id)
+        emit_client_chat(f"Critique for {review.agent_id}'s output has been generated.", project_id)
+    else:
+        append_to_log_file('agents_internal.log', f"Review {review.id} of {review.agent_id}'s output failed: {review.error}", project_id)
+        emit_client_chat(f"Review of {review.agent_id}'s output failed.", project_id)
+
+# Critiques of submitted outputs (see reviews.py); reviewed inline until start_background_services() starts its critic threads.
+review_pipeline = ReviewPipeline(run_critic, workers=app.config['CRITIC_WORKERS'], on_finish=critique_finished)
+
+def request_critique(agent_id, output, project_id=None, digest=None):
+    """Hands a (redacted) output to the review pipeline; returns its Review, which identical outputs share."""
+    review, deduplicated = review_pipeline.submit(project_id, agent_id, output, digest)
+    if deduplicated:
+        logging.info(f"Output of {agent_id} is identical to the one of review {review.id}; not reviewed again.")
+    return review
+
+def worker_env():
+    """
+    Environment of the agent workers: the LLM cache and its limits. Workers ask the backend's
+    governor for their LLM calls and report what they spend (see agent_job_message()).
+    """
+    env = {}
+    if app.config['LLM_CACHE']:
+        env['TEAM_READY_LLM_CACHE_DIR'] = get_llm_cache().cache_dir
+        env['TEAM_READY_LLM_CACHE_OPTIONS'] = json.dumps(llm_cache_options())
+    return env or None
+
+def create_job_manager():
+    from jobs import JobManager
+    return JobManager(
+        app.config['AGENT_RUNNER'],
+        max_workers=app.config['AGENT_MAX_WORKERS'],
+        on_finish=agent_job_finished,
+        on_message=agent_job_message,
+        env=worker_env(),
+    )
+
+def create_coder_jobs():
+    from jobs import JobManager
+    return JobManager(
+        app.config['CODER_RUNNER'],
+        max_workers=app.config['SCHEDULER_PARALLELISM'],
+        on_finish=coder_job_finished,
+        on_message=agent_job_message,
+        env=worker_env(),
+    )
+
+def job_managers():
+    return [manager for manager in (job_manager, coder_jobs) if manager is not None]
+
+def jobs_version():
+    """Moves with every agent job state change, in either job engine."""
+    return sum(manager.version for manager in job_managers())
+
+def coder_job_finished(job):
+    """Called when a job dispatched by a DAG scheduler ends: reports it, then lets the scheduler unblock its dependents."""
+    agent_job_finished(job)
+    scheduler = schedulers.get(job.project_id)
+    if scheduler is not None:
+        scheduler.finish_job(job.id, job.state == 'succeeded', job.error)
+
+def dispatch_task(task, project_id=None):
+    """Starts a Coder agent job on a scheduled todo; returns the job id."""
+    if coder_jobs is None:
+        raise RuntimeError("Agent jobs are not running")
+    context = build_kickoff_context(task.text, project_id)
+    job = coder_jobs.submit(project_id, task.text, context, data_dir=get_data_dir(project_id))
+    append_to_log_file('decisions.log', f"Task {task.id} dispatched to a Coder agent (job {job.id}): {task.text}", project_id)
+    emit_internal_chat(f"Coder agent started on task {task.id}: {task.text}", project_id)
+    return job.id
+
+# Serializes the status write-backs to todo.json, so an older status never overwrites a newer one.
+# Reentrant: the write calls scheduler.sync(), which may dispatch tasks and save again.
+task_status_lock = threading.RLock()
+
+def save_task_statuses(project_id=None):
+    """Writes the status (and job id) of every scheduled task back into todo.json, so /status shows them."""
+    with task_status_lock:
+        scheduler = schedulers.get(project_id)
+        if scheduler is None:
+            return
+        tasks = scheduler.snapshot()
+        items = list(read_json_file(TODO_FILE, [], project_id) or [])
+        changed = False
+        for index, key in enumerate(item_keys(items)):
+            if key not in tasks:
+                continue
+            status, job_id = tasks[key]
+            item = items[index] if isinstance(items[index], dict) else {"task": items[index]}
+            if item.get('status') != status or (job_id is not None and item.get('job_id') != job_id):
+                item = dict(item, status=status, **({'job_id': job_id} if job_id is not None else {}))
+                items[index] = item
+                changed = True
+        if changed:
+            write_json_file(TODO_FILE, items, project_id)
+
+def stop_schedulers(predicate):
+    """Stops (and forgets) the DAG schedulers of the projects matching predicate(project_id)."""
+    for project_id in [project_id for project_id in schedulers if predicate(project_id)]:
+        schedulers.pop(project_id).stop()
+
+def agent_job_finished(job):
+    """Called from the job engine's waiting thread when a job succeeds, fails or is killed."""
+    project_id = job.project_id
+    release_job_llm_calls(job)
+    if job.state == 'succeeded':
+        message = f"Agent job {job.id} for project {project_id} finished: {job.result}"
+    elif job.state == 'failed':
+        message = f"Agent job {job.id} for project {project_id} failed: {job.error}"
+    else:
+        message = f"Agent job {job.id} for project {project_id} was killed."
+    append_to_log_file('agents_internal.log', message, project_id)
+    append_to_log_file('decisions.log', f"Agent job {job.id} for project {project_id}: {job.state}", project_id)
+    emit_internal_chat(message, project_id)
+    emit_client_chat(f"Agent {project_id} job {job.state}.", project_id)
+
+def agent_job_message(job, message):
+    """
+    Called from the job engine's threads for each message a running job sends. The cost of
+    every LLM call its agents made ({"charge": cost}) is charged to the job's project, so the
+    hard limit stops real agent work too. Its LLM calls wait for a slot of the backend's
+    governor like the backend's own, in the background lane and against the project's budget
+    ({"llm_call": "acquire"}, answered with the call id or why it was rejected), and give it
+    back when done ({"llm_call": "release"}).
+    """
+    if message.get('llm_call') == 'acquire':
+        return acquire_job_llm_call(job, message)
+    if message.get('llm_call') == 'release':
+        with job_llm_calls_lock:
+            call = job_llm_calls.get(job.id, {}).pop(message.get('call'), None)
+        tokens_used = message.get('tokens_used')
+        if call is not None:
+            governor.release(call, tokens_used if isinstance(tokens_used, int) else None)
+        return None
+    cost = message.get('charge')
+    if cost is None:
+        return None
+    if not isinstance(cost, (int, float)) or isinstance(cost, bool) or cost < 0:
+        logging.error(f"Agent job {job.id} reported an invalid charge: {cost!r}")
+        return None
+    update_project_spend(cost, job.project_id)
+    return None
+
+def acquire_job_llm_call(job, message):
+    from jobs import FINISHED_STATES
+    model = message.get('model')
+    prompt_tokens, completion_tokens = message.get('prompt_tokens'), message.get('completion_tokens')
+    if not isinstance(model, str) or not isinstance(prompt_tokens, int) or not isinstance(completion_tokens, int):
+        return {"rejected": "invalid", "message": f"Invalid LLM call: {message!r}"}
+    try:
+        call = governor.acquire(model, job.project_id, prompt_tokens + completion_tokens,
+                                llm_governor.litellm_cost_estimate(model, prompt_tokens, completion_tokens),
+                                get_spend_ledger(job.project_id).remaining(), llm_governor.BACKGROUND)
+    except llm_governor.CallRejected as e:
+        return {"rejected": e.reason, "message": str(e), "retry_after": e.retry_after}
+    call_id = str(call.order[1])
+    with job_llm_calls_lock:
+        job_llm_calls.setdefault(job.id, {})[call_id] = call
+    if job.state in FINISHED_STATES:
+        release_job_llm_calls(job) # Ended while the call waited.
+    return {"call": call_id}
+
+def release_job_llm_calls(job):
+    """Gives back the governor slots a job still held (it was killed or crashed mid-call)."""
+    with job_llm_calls_lock:
+        calls = job_llm_calls.pop(job.id, {})
+    for call in calls.values():
+        governor.release(call)
+
+def kill_agent_jobs(project_id=None):
+    """
+    SIGKILLs the agent jobs that spend from the same budget as project_id (its data dir).
+    Returns the ids of the killed jobs.
+    """
+    data_dir = get_data_dir(project_id)
+    stop_schedulers(lambda pid: get_data_dir(pid) == data_dir)
+    return [job.id for manager in job_managers() for job in manager.kill_where(lambda job: job.data_dir == data_dir)]
+
+def agent_jobs(project_id=None):
+    return [job.to_dict() for manager in job_managers() for job in manager.jobs_for(project_id)]
+
+# Global state for agent pausing; pausing without a project_id pauses every project
 agent_paused = False
+# Projects paused individually
+paused_projects = set()
+
+def is_paused(project_id=None):
+    return agent_paused or (project_id is not None and project_id in paused_projects)
+
+@app.errorhandler(InvalidProjectId)
+def invalid_project_id(error):
+    return jsonify({"status": "error", "message": str(error)}), 400
+
+# Where /init was told the project's repository is checked out
+PROJECT_FILE = 'project.json'
+
+def normalize_repository_path(path):
+    """The absolute, symlink-free form of a repository path given to /init; raises ValueError when it is not a usable path."""
+    if not isinstance(path, str) or not path.strip() or '\0' in path:
+        raise ValueError("`path` must be a non-empty path string")
+    return os.path.realpath(os.path.expanduser(path.strip()))
+
+def get_project_root(project_id=None):
+    """
+    The local checkout of the project's repository: the `path` given to /init, or a `repo_url`
+    that is a local directory. The filesystem root is never taken for a checkout.
+    """
+    project = read_json_file(PROJECT_FILE, {}, project_id)
+    for candidate in (project.get('path'), project.get('repo_url')):
+        try:
+            root = normalize_repository_path(candidate)
+        except ValueError:
+            continue
+        if os.path.isdir(root) and os.path.dirname(root) != root:
+            return root
+    return None
+
+def get_file_index(project_id=None):
+    """Returns the file index (see file_index.py) of the project's repository, or None when it has no local checkout."""
+    root = get_project_root(project_id)
+    if root is None:
+        return None
+    import file_index
+    return file_index.get_index(get_data_dir(project_id), root,
+                                watch=app.config['FILE_INDEX_WATCH'], hash_files=app.config['FILE_INDEX_HASH'])
+
+# Instrumentation (see metrics.py), served by /metrics.
+metrics.REGISTRY.enabled = app.config['METRICS']
+metrics.REGISTRY.lock_holds = app.config['METRICS_LOCK_HOLDS']
+request_seconds = metrics.REGISTRY.histogram(
+    'team_ready_request_duration_seconds', "Time spent handling a request, by route.", ['method', 'route', 'status'])
+request_series = {} # (method, route, status) -> its series of request_seconds
+spend_charges = metrics.REGISTRY.counter('team_ready_spend_charges_total', "Charges recorded in the spend ledgers.")
+spend_charged = metrics.REGISTRY.counter('team_ready_spend_charged_dollars_total', "Sum of all charges recorded in the spend ledgers.")
+kickoff_context_tokens = metrics.REGISTRY.histogram(
+    'team_ready_kickoff_context_tokens', "Estimated tokens of the context handed to agents at kickoff: "
+    "the one built for them, and the 10-line precis for comparison.", ['context'],
+    buckets=(50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000))
+budget_exhaustions = metrics.REGISTRY.counter('team_ready_budget_exhausted_total', "Charges that reached a project's hard limit.")
+llm_queue_seconds = metrics.REGISTRY.histogram(
+    'team_ready_llm_queue_seconds', "Time LLM calls waited for the governor to admit them, by priority lane.", ['lane'])
+
+SOCKET_STATS = {
+    'messages': "Chat messages published.",
+    'frames': "Coalesced chat frames built.",
+    'deliveries': "Socket.IO emits of chat frames to clients.",
+    'bytes': "Bytes of chat text emitted to clients.",
+    'dropped': "Chat frames dropped for clients that fell behind.",
+}
+
+@metrics.REGISTRY.add_collector
+def collect_component_stats():
+    """Stats the broadcaster, storages, LLM cache and governor, review pipeline and job managers keep anyway, read at scrape time."""
+    families = [(f"team_ready_socket_{key}_total", 'counter', SOCKET_STATS[key], [({}, value)])
+                for key, value in broadcaster.stats.items() if key in SOCKET_STATS]
+    if app.config['STORAGE_BACKEND'] == 'json':
+        json_stats = json_cache_stats()
+        families.append(('team_ready_json_cache_hits_total', 'counter', "JSON document reads answered from memory.",
+                         [({}, json_stats['hits'])]))
+        families.append(('team_ready_json_parses_total', 'counter', "JSON document reads that loaded the file from disk.",
+                         [({}, json_stats['parses'])]))
+    if app.config['LLM_CACHE']:
+        cache_stats = get_llm_cache().stats
+        families.extend((f"team_ready_llm_cache_{key}_total", 'counter', f"LLM cache {key} (see llm_cache.py).", [({}, value)])
+                        for key, value in cache_stats.items())
+    families.extend((f"team_ready_reviews_{key}_total", 'counter', f"Agent output reviews {key} (see reviews.py).", [({}, value)])
+                    for key, value in review_pipeline.stats.items())
+    families.append(('team_ready_reviews_pending', 'gauge', "Agent output reviews queued or running.",
+                     [({}, review_pipeline.pending())]))
+    families.extend((f"team_ready_llm_calls_{key}_total", 'counter', f"LLM calls {key.replace('_', ' ')} by the governor (see llm_governor.py).",
+                     [({}, value)]) for key, value in governor.stats.items())
+    families.extend((f"team_ready_requests_{key}_total", 'counter', f"/init and /kickoff requests {key} (see admission.py).",
+                     [({}, value)]) for key, value in list(request_flights.stats.items()) + list(project_admission.stats.items()))
+    families.append(('team_ready_llm_calls_in_flight', 'gauge', "LLM calls running.", [({}, governor.in_flight)]))
+    families.append(('team_ready_llm_calls_waiting', 'gauge', "LLM calls waiting for the governor.", [({}, governor.waiting_count())]))
+    pools = [(pool, manager.stats()) for pool, manager in (('crew', job_manager), ('coder', coder_jobs)) if manager is not None]
+    if pools:
+        families.append(('team_ready_agent_jobs', 'gauge', "Agent jobs by pool and state.",
+                         [({'pool': pool, 'state': state}, count) for pool, stats in pools for state, count in sorted(stats['jobs'].items())]))
+        families.append(('team_ready_agent_workers', 'gauge', "Agent worker processes.",
+                         [({'pool': pool, 'state': state}, stats[f'{state}_workers']) for pool, stats in pools for state in ('busy', 'idle')]))
+    return families
+
+def timed_wsgi_app(wsgi_app):
+    """Stamps every request's environ with its start, before Flask's own work, for record_request_timing."""
+    def timed(environ, start_response):
+        if metrics.REGISTRY.enabled or app.config['SERVER_TIMING']:
+            environ['team_ready.started'] = time.perf_counter()
+        return wsgi_app(environ, start_response)
+    return timed
+
+app.wsgi_app = timed_wsgi_app(app.wsgi_app)
+
+@app.before_request
+def start_request_timing():
+    if app.config['SERVER_TIMING']:
+        request.environ['team_ready.lock_timing'] = lock_timing.start()
+
+@app.after_request
+def record_request_timing(response):
+    """
+    Records the request in the route latency histogram and reports its time in the app and
+    waiting for file locks as Server-Timing, for load tests (see benchmarks/bench_load.py).
+    """
+    # Through the request object itself: each attribute read through the proxy costs ~2 us.
+    current = request._get_current_object()
+    started = current.environ.get('team_ready.started')
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    if metrics.REGISTRY.enabled:
+        rule = current.url_rule
+        key = (current.method, rule.rule if rule is not None else 'unmatched', response.status_code)
+        series = request_series.get(key)
+        if series is None:
+            series = request_series[key] = request_seconds.labels(*key)
+        series.observe(elapsed)
+    token = current.environ.pop('team_ready.lock_timing', None)
+    if token is not None:
+        lock_wait = lock_timing.stop(token)
+        response.headers['Server-Timing'] = f"app;dur={elapsed * 1000:.3f}, lock;dur={lock_wait * 1000:.3f}"
+    return response
 
 @app.route('/')
 def index():
@@ -122,128 +776,590 @@ def index():
 @app.route('/approve', methods=['POST'])
 def approve_agent():
     global agent_paused
-    agent_paused = False
-    emit_client_chat("Agent action approved. Resuming operations.")
+    project_id = (request.get_json(silent=True) or {}).get('project_id')
+    if project_id:
+        paused_projects.discard(validate_project_id(project_id))
+    else:
+        agent_paused = False
+    dashboard_changes.changed()
+    for pid, scheduler in list(schedulers.items()):
+        scheduler.set_paused(is_paused(pid))
+    emit_client_chat("Agent action approved. Resuming operations.", project_id)
     return jsonify({"status": "success", "message": "Agent resumed."})
 
 @app.route('/pause_agent', methods=['POST'])
 def pause_agent():
     global agent_paused
-    agent_paused = True
-    emit_client_chat("Agent paused for approval.")
+    project_id = (request.get_json(silent=True) or {}).get('project_id')
+    if project_id:
+        paused_projects.add(validate_project_id(project_id))
+    else:
+        agent_paused = True
+    dashboard_changes.changed()
+    for pid, scheduler in list(schedulers.items()):
+        scheduler.set_paused(is_paused(pid))
+    emit_client_chat("Agent paused for approval.", project_id)
     return jsonify({"status": "success", "message": "Agent paused."})
 
+# /init and /kickoff run once for duplicate requests, and a bounded number at a time per project.
+request_flights = admission.SingleFlight(keep_seconds=app.config['IDEMPOTENCY_KEY_TTL'])
+project_admission = admission.AdmissionControl(max_pending=app.config['PROJECT_MAX_PENDING'])
+
+def shed_load(error):
+    response = make_response(jsonify({"status": "error", "message": str(error), "retry_after": error.retry_after}), 429)
+    response.headers['Retry-After'] = str(math.ceil(error.retry_after))
+    return response
+
+def succeeded(result):
+    """Only successes are replayed for an idempotency key: a retry after an error (say, a paused agent) runs again."""
+    return 200 <= result[1] < 300
+
+def single_flight(endpoint, project_id, identity, data, handler):
+    """
+    Answers a POST with handler() -> (body, status), run once for duplicate requests: those
+    with the same Idempotency-Key header (or "idempotency_key"), whose successful result is
+    replayed for IDEMPOTENCY_KEY_TTL seconds, and identical requests (same `identity`) while one is in
+    progress. Shared results say "deduplicated": true. A new call is refused with 429 when the
+    project has PROJECT_MAX_PENDING of them in progress. handler() runs on an OS thread (see
+    admission.run_in_thread), so under gevent the requests arriving meanwhile are served.
+    """
+    idempotency_key = request.headers.get('Idempotency-Key') or data.get('idempotency_key')
+    if idempotency_key:
+        key = (endpoint, project_id, 'idempotency_key', str(idempotency_key))
+        fingerprint = json.dumps({k: v for k, v in data.items() if k != 'idempotency_key'}, sort_keys=True, default=str)
+    else:
+        key, fingerprint = (endpoint, project_id) + identity, None
+
+    def admitted():
+        started = time.monotonic()
+        try:
+            return admission.run_in_thread(handler, sleep=socketio.sleep)
+        finally:
+            project_admission.release(project_id, time.monotonic() - started)
+
+    try:
+        (body, status), shared = request_flights.run(
+            key, admitted, fingerprint, remember=succeeded if idempotency_key else False,
+            admit=lambda: project_admission.admit(project_id), sleep=socketio.sleep)
+    except admission.Overloaded as e:
+        return shed_load(e)
+    except admission.IdempotencyKeyReused as e:
+        return jsonify({"status": "error", "message": str(e)}), 422
+    return jsonify(dict(body, deduplicated=shared or body.get('deduplicated', False))), status
+
 @app.route('/init', methods=['POST'])
 def init_project():
     data = request.get_json()
-    repo_url = data.get('repo_url')
-    path = data.get('path')
+    project_id = data.get('project_id')
+    repo_url, path = data.get('repo_url'), data.get('path')
+    if path is not None:
+        try:
+            path = normalize_repository_path(path)
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+    return single_flight('init', project_id, (repo_url, path), data, lambda: initialize_project(project_id, repo_url, path))
+
+def initialize_project(project_id, repo_url, path):
     print(f"Init project: {repo_url} at {path}")
     
     ensure_data_dir()
+    if project_id:
+        ensure_project_dir(project_id)
     
     # Initialize config.json if it doesn't exist
-    config = read_json_file('config.json', {})
+    config = read_json_file('config.json', {}, project_id)
     if not config:
         config = {
             "hard_limit": 10.0, # Example hard spending limit
             "project_spend": 0.0,
             "approval_level": "strict"
         }
-        write_json_file('config.json', config)
+        write_json_file('config.json', config, project_id)
 
     # Initialize todo.json if it doesn't exist
-    todo_list = read_json_file('todo.json', [])
+    todo_list = read_json_file('todo.json', [], project_id)
     if not todo_list:
-        write_json_file('todo.json', [])
+        write_json_file('todo.json', [], project_id)
+
+    # Remember the checkout, so /files can list it.
+    if read_json_file(PROJECT_FILE, {}, project_id) != {"repo_url": repo_url, "path": path}:
+        write_json_file(PROJECT_FILE, {"repo_url": repo_url, "path": path}, project_id)
 
-    append_to_log_file('agents_internal.log', 'Project initialized.')
-    append_to_log_file('decisions.log', 'Project initialized.')
-    emit_client_chat("Project initialized successfully.")
+    append_to_log_file('agents_internal.log', 'Project initialized.', project_id)
+    append_to_log_file('decisions.log', 'Project initialized.', project_id)
+    emit_client_chat("Project initialized successfully.", project_id)
 
-    return jsonify({"status": "success", "message": "Project initialization request received and data dir ensured."})
+    return {"status": "success", "message": "Project initialization request received and data dir ensured."}, 200
 
 @app.route('/kickoff', methods=['POST'])
 def kickoff_agent():
-    global agent_paused
-    if agent_paused:
-        emit_client_chat("Agent is paused. Approval required to resume operations.")
-        return jsonify({"status": "error", "message": "Agent is paused. Approval pending."}), 403
-
     data = request.get_json()
     project_id = data.get('project_id')
     task = data.get('task')
-    
-    precis = get_precis()
+    return single_flight('kickoff', project_id, (task,), data, lambda: start_kickoff(project_id, task))
+
+def start_kickoff(project_id, task):
+    if is_paused(project_id):
+        emit_client_chat("Agent is paused. Approval required to resume operations.", project_id)
+        return {"status": "error", "message": "Agent is paused. Approval pending."}, 403
+    if job_manager is not None:
+        from jobs import QUEUED, FINISHED_STATES
+        jobs = job_manager.jobs_for(project_id)
+        # The same task queued or running already is a duplicate kickoff too: it gets that job.
+        running = next((job for job in jobs if job.task == task and job.state not in FINISHED_STATES), None)
+        if running is not None:
+            return {"status": "success", "message": "Agent kickoff request received.",
+                    "job_id": running.id, "job_state": running.state, "deduplicated": True}, 200
+        queued = sum(1 for job in jobs if job.state == QUEUED)
+        if app.config['KICKOFF_MAX_QUEUED_JOBS'] and queued >= app.config['KICKOFF_MAX_QUEUED_JOBS']:
+            raise admission.Overloaded(f"{queued} agent jobs of project {project_id} are waiting for a worker already",
+                                       retry_after=5.0) # Agent runs take minutes; check back soon anyway.
+
+    precis = build_kickoff_context(task, project_id)
     
     logging.info(f"Kickoff agent for project {project_id} with task: {task}. Context: {precis}")
-    append_to_log_file('agents_internal.log', f"Agent kickoff for project {project_id}: {task}\nContext:\n{precis}")
-    append_to_log_file('decisions.log', f"Agent kickoff for project {project_id}: {task}")
-    emit_internal_chat(f"Agent {project_id} kicked off with task: {task}\nContext:\n{precis}")
-    emit_client_chat(f"Agent {project_id} started on task: {task}")
-    # Placeholder for starting CrewAI async background process
-    return jsonify({"status": "success", "message": "Agent kickoff request received."})
+    append_to_log_file('agents_internal.log', f"Agent kickoff for project {project_id}: {task}\nContext:\n{precis}", project_id)
+    append_to_log_file('decisions.log', f"Agent kickoff for project {project_id}: {task}", project_id)
+    emit_internal_chat(f"Agent {project_id} kicked off with task: {task}\nContext:\n{precis}", project_id)
+    emit_client_chat(f"Agent {project_id} started on task: {task}", project_id)
+    response = {"status": "success", "message": "Agent kickoff request received."}
+    if job_manager is not None:
+        job = job_manager.submit(project_id, task, precis, data_dir=get_data_dir(project_id))
+        response.update(job_id=job.id, job_state=job.state)
+    return response, 200
 
 @app.route('/stop', methods=['POST'])
 def stop_agent():
     data = request.get_json()
     project_id = data.get('project_id')
     logging.info(f"Stop agent for project: {project_id}")
-    append_to_log_file('agents_internal.log', f"Agent stop requested for project: {project_id}")
-    append_to_log_file('decisions.log', f"Agent stop requested for project: {project_id}")
-    emit_internal_chat(f"Agent {project_id} stop request received.")
-    emit_client_chat(f"Agent {project_id} has been stopped.")
-    # Placeholder for immediate process termination
-    return jsonify({"status": "success", "message": "Agent stop request received."})
+    append_to_log_file('agents_internal.log', f"Agent stop requested for project: {project_id}", project_id)
+    append_to_log_file('decisions.log', f"Agent stop requested for project: {project_id}", project_id)
+    emit_internal_chat(f"Agent {project_id} stop request received.", project_id)
+    stop_schedulers(lambda pid: pid == project_id)
+    killed = [job for manager in job_managers() for job in manager.kill_project(project_id)]
+    emit_client_chat(f"Agent {project_id} has been stopped.", project_id)
+    return jsonify({"status": "success", "message": "Agent stop request received.",
+                    "killed_jobs": [job.id for job in killed]})
 
 @app.route('/status', methods=['GET'])
 def get_status():
+    """
+    Returns the project's todo list and agent jobs, with a version that grows with every todo change.
+    Supports If-None-Match (304 when nothing changed), pagination (?limit=&cursor=, where the
+    cursor is the sequence number of the last change a page held; see TodoVersions.page) and
+    deltas (?since=<version>: only the todos changed or removed after that version).
+    """
     project_id = request.args.get('id')
     print(f"Get status for project: {project_id}")
-    
-    todo_list = read_json_file('todo.json', [])
-    return jsonify({"status": "success", "project_id": project_id, "todo_list": todo_list})
+
+    todos = get_todo_versions(get_storage(project_id))
+    version = todos.sync()
+    etag = f"{version}.{jobs_version()}.{zlib.crc32(request.query_string):08x}"
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+        response.set_etag(etag)
+        return response
+
+    body = {"status": "success", "project_id": project_id, "version": version, "jobs": agent_jobs(project_id)}
+    since = request.args.get('since', type=int)
+    changes = todos.changes_since(since) if since is not None else None
+    if changes is not None:
+        changed, removed = changes
+        body.update(delta=True, since=since, changed=changed, removed=removed, total=len(todos))
+    else:
+        # Full (or paginated) list; also the answer to a delta request that is too old to serve.
+        cursor = request.args.get('cursor', 0, type=int)
+        limit = request.args.get('limit', type=int)
+        todo_list, next_cursor = todos.page(max(cursor, 0), limit if limit is None else max(limit, 1))
+        body.update(delta=False, todo_list=todo_list, next_cursor=next_cursor, total=len(todos))
+    response = jsonify(body)
+    response.set_etag(etag)
+    return response
+
+@app.route('/schedule', methods=['POST'])
+def schedule_todos():
+    """
+    Runs the project's todo list as a dependency graph (see task_scheduler.py): {"project_id",
+    "parallelism"}. Todos whose dependencies are done go to Coder agents, up to `parallelism`
+    at once, and finishing one starts the todos it unblocked. Replaces a running schedule.
+    """
+    data = request.get_json(silent=True) or {}
+    project_id = data.get('project_id')
+    get_data_dir(project_id)
+    if coder_jobs is None:
+        return jsonify({"status": "error", "message": "Agent jobs are not running."}), 503
+    parallelism = data.get('parallelism', app.config['SCHEDULER_PARALLELISM'])
+    if not isinstance(parallelism, int) or isinstance(parallelism, bool) or parallelism < 1:
+        return jsonify({"status": "error", "message": f"Invalid parallelism: {parallelism!r}"}), 400
+    previous = schedulers.pop(project_id, None)
+    if previous is not None:
+        previous.stop()
+    items = read_json_file(TODO_FILE, [], project_id)
+    from task_scheduler import TaskScheduler
+    scheduler = TaskScheduler(items if isinstance(items, list) else [], lambda task: dispatch_task(task, project_id),
+                              parallelism=parallelism, on_change=lambda tasks: save_task_statuses(project_id))
+    scheduler.paused = is_paused(project_id)
+    schedulers[project_id] = scheduler
+    started = scheduler.start()
+    status = scheduler.status()
+    append_to_log_file('decisions.log', f"Scheduled {len(scheduler.tasks)} todos for project {project_id}: "
+                       f"critical path {status['critical_path_length']:g}, parallelism {parallelism}", project_id)
+    emit_client_chat(f"Started {len(started)} of {len(scheduler.tasks)} tasks; the critical path is "
+                     f"{len(status['critical_path'])} tasks long.", project_id)
+    return jsonify({"status": "success", "project_id": project_id, "schedule": status})
+
+@app.route('/schedule', methods=['GET'])
+def get_schedule():
+    """Progress of the project's schedule: counts by status, ready and running tasks, the critical path."""
+    project_id = request.args.get('id')
+    scheduler = schedulers.get(project_id)
+    if scheduler is None:
+        return jsonify({"status": "error", "message": "No schedule is running for this project."}), 404
+    return jsonify({"status": "success", "project_id": project_id, "schedule": scheduler.status()})
+
+@app.route('/logs', methods=['GET'])
+def get_logs():
+    """
+    Returns entries of agents_internal.log or decisions.log, rotated segments included:
+    ?file=&id=&start=&end= (epoch seconds) &agent=&limit= (newest entries, default 100).
+    """
+    filename = request.args.get('file', 'decisions.log')
+    if filename not in LOG_FILES:
+        return jsonify({"status": "error", "message": f"Unknown log: {filename}"}), 400
+    project_id = request.args.get('id')
+    filepath = get_file_path(filename, project_id)
+    with FileLock(filepath + ".lock"):
+        entries = log_segments.query(
+            filepath,
+            start=request.args.get('start', type=float),
+            end=request.args.get('end', type=float),
+            agent=request.args.get('agent'),
+            limit=request.args.get('limit', 100, type=int),
+        )
+    return jsonify({"status": "success", "project_id": project_id, "file": filename, "entries": entries})
+
+@app.route('/search', methods=['GET'])
+def search():
+    """
+    Full-text search over todos and logs: ?q=&id=&limit= (default 20) &source= (todo or a log name).
+    Quoted words match as a phrase, a trailing * as a prefix; the last word is always matched as a prefix.
+    """
+    query = request.args.get('q', '')
+    project_id = request.args.get('id')
+    started = time.perf_counter()
+    hits = get_search_index(project_id).search(
+        query,
+        limit=max(request.args.get('limit', 20, type=int), 1),
+        source=request.args.get('source'),
+        prefix_last=True,
+    )
+    return jsonify({"status": "success", "project_id": project_id, "query": query, "hits": hits,
+                    "took_ms": round((time.perf_counter() - started) * 1000, 3)})
+
+@app.route('/files', methods=['GET'])
+def list_files():
+    """
+    Files of the project's repository from its incremental index: ?id=&limit= (default 200)
+    &cursor= (the next_cursor of the previous page) &dir= &glob= &ext= (comma-separated)
+    &refresh=1 (rescan now instead of reusing a refresh younger than FILE_INDEX_MAX_AGE).
+    Refreshes run in the background: while one does, "building" is true and the files are
+    those of the previous refresh (none before the first), so poll until it is false.
+    """
+    project_id = request.args.get('id')
+    index = get_file_index(project_id)
+    if index is None:
+        return jsonify({"status": "error", "message": "No local repository path for this project; pass `path` to /init."}), 404
+    building = index.start_refresh(0 if request.args.get('refresh') == '1' else app.config['FILE_INDEX_MAX_AGE'])
+    extensions = [ext for ext in request.args.get('ext', '').split(',') if ext]
+    files, next_cursor, total = index.list(
+        cursor=request.args.get('cursor'),
+        limit=max(request.args.get('limit', 200, type=int), 1),
+        directory=request.args.get('dir'),
+        pattern=request.args.get('glob'),
+        extensions=extensions,
+    )
+    return jsonify({"status": "success", "project_id": project_id, "root": index.root, "files": files,
+                    "next_cursor": next_cursor, "total": total, "building": building, "refresh": index.last_stats})
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Route latencies, file lock waits and holds, Socket.IO emits, spend and cache counters in the Prometheus text format."""
+    response = make_response(metrics.REGISTRY.render())
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    return response
+
+# Roles of the crew agent_runner.run_crew runs for every job (see agents.py).
+AGENT_ROLES = ('Orchestrator', 'Coder', 'Critic')
+
+def list_project_ids():
+    """Ids of the projects initialized with a project_id; the unnamed project (None) is not included."""
+    projects_dir = os.path.join(app.config.get('DATA_DIR', DATA_DIR), PROJECTS_DIR)
+    try:
+        names = os.listdir(projects_dir)
+    except FileNotFoundError:
+        return []
+    return sorted(name for name in names if PROJECT_ID_PATTERN.fullmatch(name) and os.path.isdir(os.path.join(projects_dir, name)))
+
+def employees_panel(project_id=None):
+    jobs = agent_jobs(project_id)
+    running = [job for job in jobs if job['state'] == 'running']
+    if is_paused(project_id):
+        status = 'paused'
+    elif running:
+        status = 'working'
+    elif any(job['state'] == 'queued' for job in jobs):
+        status = 'queued'
+    else:
+        status = 'idle'
+    task = running[0]['task'] if running else None
+    return [{"role": role, "status": status, "task": task} for role in AGENT_ROLES]
+
+def projects_panel(project_id=None):
+    projects = []
+    for pid in [None] + list_project_ids():
+        ledger = get_spend_ledger(pid)
+        projects.append({"project_id": pid, "spend": ledger.spend(), "remaining": ledger.remaining(),
+                         "paused": is_paused(pid), "selected": pid == project_id})
+    return projects
+
+# Repository files the dashboard shows; /files pages through the rest.
+FILES_PANEL_LIMIT = 200
+
+def files_panel(project_id=None):
+    """
+    The first repository files when the project has a local checkout (as of the last index
+    refresh; a stale one is redone in the background), otherwise the files of its data dir.
+    """
+    index = get_file_index(project_id)
+    if index is not None:
+        index.start_refresh(app.config['FILE_INDEX_MAX_AGE'])
+        return [item['path'] for item in index.list(limit=FILES_PANEL_LIMIT)[0]]
+    data_dir = get_data_dir(project_id)
+    try:
+        names = os.listdir(data_dir)
+    except FileNotFoundError:
+        return []
+    return sorted(name for name in names if os.path.isfile(os.path.join(data_dir, name)) and not name.endswith('.lock'))
+
+def system_panel(project_id=None):
+    return {
+        "paused": agent_paused,
+        "paused_projects": sorted(paused_projects),
+        "storage": app.config['STORAGE_BACKEND'],
+        "jobs": job_manager.stats() if job_manager is not None else None,
+        "coder_jobs": coder_jobs.stats() if coder_jobs is not None else None,
+        "scheduled_projects": sorted(schedulers, key=str),
+        "log_writer": log_writer is not None,
+    }
+
+DASHBOARD_PANELS = {'employees': employees_panel, 'projects': projects_panel, 'files': files_panel, 'system': system_panel}
+
+def dashboard_version():
+    """Moves whenever a panel may have changed: state written here, or an agent job changing state."""
+    return (dashboard_changes.version, jobs_version())
+
+@app.route('/dashboard', methods=['GET'])
+def get_dashboard():
+    """
+    Every dashboard panel of a project in one call, for the desktop bridge (main.py).
+    Each panel carries a version (a hash of its content); panels the caller already has
+    (?versions=name:version,...) are left out. With ?wait=<seconds> an answer without changes
+    is held back until something changes (a long poll), so an idle dashboard makes one
+    request per wait period and the page none at all. Log growth alone does not count as a change.
+    """
+    project_id = request.args.get('id')
+    get_data_dir(project_id)
+    known = dashboard.parse_versions(request.args.get('versions'))
+    wait = min(max(request.args.get('wait', 0.0, type=float), 0.0), app.config['DASHBOARD_MAX_WAIT'])
+    deadline = time.monotonic() + wait
+    panels = {name: (lambda build=build: build(project_id)) for name, build in DASHBOARD_PANELS.items()}
+    while True:
+        seen = dashboard_version()
+        result = dashboard.snapshot(panels, known)
+        remaining = deadline - time.monotonic()
+        if result['panels'] or remaining <= 0:
+            break
+        dashboard_changes.wait(seen, remaining, current=dashboard_version, sleep=socketio.sleep)
+    return jsonify({"status": "success", "project_id": project_id, **result})
 
 @app.route('/simulate_llm_call', methods=['POST'])
 def simulate_llm_call():
     data = request.get_json()
     cost = data.get('cost', 0.0)
-    
-    budget_exhausted = update_project_spend(cost)
-    
+    project_id = data.get('project_id')
+    messages = data.get('messages')
+    priority = data.get('priority', llm_governor.BACKGROUND) # 'interactive' for prompts of the client
+
+    if priority not in llm_governor.LANES:
+        return jsonify({"status": "error", "message": f"priority must be one of {', '.join(llm_governor.LANES)}"}), 400
+    if messages is None:
+        budget_exhausted = update_project_spend(cost, project_id)
+        cached = False
+    else:
+        # Goes through the LLM cache with a stub model: repeated prompts are neither answered nor charged again.
+        def stub_completion(model, messages, **params):
+            return {"model": model, "choices": [{"message": {"role": "assistant", "content": "Simulated completion."}}]}
+
+        try:
+            _, cached, budget_exhausted = llm_completion(
+                data.get('model', 'simulated'), messages, project_id,
+                completion=stub_completion, cost_fn=lambda response: cost,
+                priority=priority,
+                estimate_cost=lambda model, prompt_tokens, completion_tokens: cost, **data.get('params', {}))
+        except llm_governor.CallRejected as e:
+            if e.reason == 'budget':
+                return jsonify({"status": "error", "message": f"LLM call rejected: {e}"}), 403
+            response = make_response(jsonify({"status": "error", "message": f"LLM call rejected: {e}"}), 429)
+            response.headers['Retry-After'] = str(math.ceil(e.retry_after or 1))
+            return response
+
     if budget_exhausted:
         return jsonify({"status": "error", "message": "Budget exhausted, agent process terminated."}), 403
-    return jsonify({"status": "success", "message": f"LLM call simulated, cost {cost} added."})
+    if cached:
+        return jsonify({"status": "success", "cached": True, "message": "LLM call served from cache, no cost added."})
+    return jsonify({"status": "success", "cached": False, "message": f"LLM call simulated, cost {cost} added."})
 
 @app.route('/submit_agent_output', methods=['POST'])
 def submit_agent_output():
     data = request.get_json()
     agent_id = data.get('agent_id', 'UnknownAgent')
     output = data.get('output', 'No output provided.')
+    project_id = data.get('project_id')
 
+    output = redactor.redact(output)
     message_to_log = f"Agent {agent_id} submitted output: {output}"
-    append_to_log_file('agents_internal.log', message_to_log)
-    emit_internal_chat(message_to_log)
-    emit_client_chat(f"Agent {agent_id} has submitted output. Reviewing...")
+    append_to_log_file('agents_internal.log', message_to_log, project_id, agent=agent_id, redacted=True)
+    emit_internal_chat(message_to_log, project_id)
+    emit_client_chat(f"Agent {agent_id} has submitted output. Reviewing...", project_id)
+    review = request_critique(agent_id, output, project_id)
 
-    # Simulate criticism from another agent
-    criticism = f"Critique from Agent X for {agent_id}'s output: This output lacks detail and does not address edge cases. Needs refinement."
-    append_to_log_file('agents_internal.log', criticism)
-    emit_internal_chat(criticism)
-    emit_client_chat(f"Critique for {agent_id}'s output has been generated.")
+    # Returns before the critique is written once the critic threads run; it follows on the chats (and /reviews).
+    message = "Agent output submitted and criticism simulated." if review.finished_at else "Agent output submitted for review."
+    return jsonify({"status": "success", "message": message, "review_id": review.id, "review_state": review.state})
 
-    return jsonify({"status": "success", "message": "Agent output submitted and criticism simulated."})
+@app.route('/reviews/<review_id>', methods=['GET'])
+def get_review(review_id):
+    """State and critique of a review started by /submit_agent_output."""
+    review = review_pipeline.get(review_id)
+    if review is None:
+        return jsonify({"status": "error", "message": f"Unknown review: {review_id}"}), 404
+    return jsonify({"status": "success", **review.to_dict()})
 
+@app.route('/submit_agent_output/stream', methods=['POST'])
+def submit_agent_output_stream():
+    """
+    Streaming variant of /submit_agent_output: the body is the raw output, typically sent with
+    chunked transfer encoding, and agent_id, project_id and stream_id are query parameters.
+    The body is relayed and logged at every line (or STREAM_READ_BYTES) as it is read, so
+    clients see the output while the agent still writes it and it is never held whole.
+    """
+    project_id = request.args.get('project_id')
+    get_data_dir(project_id) # Rejects invalid project ids before anything is read.
+    stream = output_streams.open(request.args.get('stream_id'), agent_id=request.args.get('agent_id', 'UnknownAgent'),
+                                 project_id=project_id, redactor=redactor)
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    try:
+        while True:
+            data = request.stream.readline(STREAM_READ_BYTES)
+            if not data:
+                break
+            write_output_stream(stream, decoder.decode(data))
+    finally:
+        # An agent that disconnects mid-output still gets what it sent logged.
+        write_output_stream(stream, decoder.decode(b'', final=True), final=True)
+    return jsonify({"status": "success", "message": "Agent output streamed and criticism simulated.", **stream.to_dict()})
+
+
+@socketio.on('agent_output_chunk')
+def agent_output_chunk(data):
+    """
+    Streaming agent output over Socket.IO: {"stream_id", "agent_id", "project_id", "chunk", "done"}.
+    The first chunk of a stream id opens the stream and done=True ends it; chunks of one stream
+    must be sent in order (wait for each ack). The ack carries the stream's state.
+    """
+    project_id = data.get('project_id')
+    try:
+        get_data_dir(project_id)
+    except InvalidProjectId as e:
+        return {"status": "error", "message": str(e)}
+    stream = output_streams.open(data.get('stream_id'), agent_id=data.get('agent_id', 'UnknownAgent'),
+                                 project_id=project_id, redactor=redactor, owner=request.sid)
+    write_output_stream(stream, data.get('chunk') or '', bool(data.get('done')))
+    return {"status": "success", **stream.to_dict()}
 
 @socketio.on('connect')
 def test_connect():
     print('Client connected')
+    project_id = request.args.get('project_id')
+    broadcaster.connect(request.sid, [project_room(project_id)] if project_id else [])
     emit('my response', {'data': 'Connected'})
 
 @socketio.on('disconnect')
 def test_disconnect():
     print('Client disconnected')
+    broadcaster.disconnect(request.sid)
+    for stream in output_streams.owned_by(request.sid):
+        write_output_stream(stream, '', final=True)
+
+@socketio.on('join_project')
+def join_project(data):
+    """Subscribes the client to another (existing) project's room; the ack says whether it did."""
+    project_id = data.get('project_id') if isinstance(data, dict) else None
+    try:
+        validate_project_id(project_id)
+    except InvalidProjectId as e:
+        logging.warning(f"Ignoring malformed join_project from {request.sid}: {data!r}")
+        return {"status": "error", "message": str(e)}
+    if project_id not in list_project_ids():
+        return {"status": "error", "message": f"Unknown project: {project_id}"}
+    broadcaster.join(request.sid, project_room(project_id))
+    return {"status": "success", "room": project_room(project_id)}
+
+@socketio.on('chat_ack')
+def chat_ack(data):
+    """Acknowledges chat frames up to data['seq'], freeing room for more in the client's window."""
+    seq = data.get('seq') if isinstance(data, dict) else None
+    if not isinstance(seq, int) or isinstance(seq, bool):
+        logging.warning(f"Ignoring malformed chat_ack from {request.sid}: {data!r}")
+        return {"status": "error", "message": "chat_ack needs an integer seq"}
+    broadcaster.ack(request.sid, seq)
+
+def start_background_services():
+    """Starts the background workers used when serving requests (not needed by the test client)."""
+    global log_writer, job_manager, coder_jobs
+    if log_writer is None:
+        log_writer = LogWriter(app.config['LOG_FLUSH_INTERVAL'], app.config['LOG_FSYNC_POLICY'], get_log_rotation(),
+                               on_written=index_log_entries)
+        log_writer.start()
+        atexit.register(stop_background_services)
+    if job_manager is None and app.config['AGENT_RUNNER']:
+        job_manager = create_job_manager()
+    if coder_jobs is None and app.config['CODER_RUNNER']:
+        coder_jobs = create_coder_jobs()
+    review_pipeline.start()
+    broadcaster.start()
+
+def stop_background_services():
+    """Flushes and stops the background workers."""
+    global log_writer, job_manager, coder_jobs
+    stop_schedulers(lambda project_id: True)
+    if job_manager is not None:
+        job_manager.shutdown()
+        job_manager = None
+    if coder_jobs is not None:
+        coder_jobs.shutdown()
+        coder_jobs = None
+    review_pipeline.stop()
+    broadcaster.stop()
+    if log_writer is not None:
+        log_writer.stop()
+        log_writer = None
+    for name in ('search_index', 'file_index'): # Nothing to close if they were never imported.
+        if name in sys.modules:
+            sys.modules[name].close_all()
 
 if __name__ == '__main__':
     ensure_data_dir()
+    start_background_services()
     socketio.run(app, debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,76 @@
+"""
+Tokens per kickoff with the context builder against the 10-line precis, and the time both take.
+The log mixes short thoughts, large agent outputs and the repeated critique boilerplate that
+/submit_agent_output writes, with a kickoff (which echoes its context into the log) every few entries.
+
+Usage: python benchmarks/bench_context.py [entries] [budget]   (default: 2000 1000)
+"""
+import io
+import os
+import sys
+import time
+import random
+import shutil
+import logging
+import tempfile
+import statistics
+import contextlib
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import app, append_to_log_file, get_precis, get_context_builder
+from context_builder import estimate_tokens
+
+logging.disable(logging.WARNING)
+
+TOPICS = ['login form', 'billing migration', 'search index', 'socket reconnect', 'budget alerts', 'todo sync']
+KICKOFF_EVERY = 25
+
+
+def entry(rng, i):
+    agent = rng.choice(['Coder', 'Tester', 'Planner'])
+    topic = rng.choice(TOPICS)
+    if i % 3 == 0:
+        return "Critique from Agent X: This output lacks detail and does not address edge cases. Needs refinement.", None
+    if i % 7 == 0:
+        return f"Agent {agent} submitted output: {topic} " + "{'file': 'module.py', 'changed': True} " * 200, agent
+    return f"Agent {agent} submitted output: worked on the {topic}, step {i}", agent
+
+
+def main(entries, budget):
+    rng = random.Random(7)
+    app.config['DATA_DIR'] = tempfile.mkdtemp(prefix='team-ready-bench-')
+    app.config['CONTEXT_TOKEN_BUDGET'] = budget
+    precis_tokens, built_tokens, precis_times, build_times, cached_times = [], [], [], [], []
+    try:
+        with contextlib.redirect_stdout(io.StringIO()), app.test_client() as client:
+            for i in range(entries):
+                message, agent = entry(rng, i)
+                append_to_log_file('agents_internal.log', message, agent=agent)
+                if i % KICKOFF_EVERY == KICKOFF_EVERY - 1:
+                    task = f"Continue with the {rng.choice(TOPICS)}"
+                    start = time.perf_counter()
+                    precis = get_precis()
+                    precis_times.append(time.perf_counter() - start)
+                    start = time.perf_counter()
+                    context = get_context_builder().build(task, budget)
+                    build_times.append(time.perf_counter() - start)
+                    start = time.perf_counter()
+                    get_context_builder().build(task, budget)
+                    cached_times.append(time.perf_counter() - start)
+                    precis_tokens.append(estimate_tokens(precis))
+                    built_tokens.append(context.tokens)
+                    client.post('/kickoff', json={'task': task})
+    finally:
+        shutil.rmtree(app.config['DATA_DIR'])
+
+    print(f"{entries} log entries, {len(built_tokens)} kickoffs, budget {budget} tokens")
+    print(f"{'':>8} {'mean tokens':>12} {'max tokens':>11} {'median ms':>10}")
+    print(f"{'precis':>8} {statistics.mean(precis_tokens):12.0f} {max(precis_tokens):11} {statistics.median(precis_times) * 1000:10.3f}")
+    print(f"{'built':>8} {statistics.mean(built_tokens):12.0f} {max(built_tokens):11} {statistics.median(build_times) * 1000:10.3f}")
+    print(f"{'cached':>8} {'':>12} {'':>11} {statistics.median(cached_times) * 1000:10.3f}")
+    saved = 1 - sum(built_tokens) / sum(precis_tokens)
+    print(f"tokens saved per kickoff: {statistics.mean(precis_tokens) - statistics.mean(built_tokens):.0f} ({saved:.0%})")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000, int(sys.argv[2]) if len(sys.argv) > 2 else 1000)
@@ -0,0 +1,57 @@
+"""
+Cost of a dashboard refresh through /dashboard: the full snapshot, a refresh that carries only
+the changed panels, and one that finds nothing changed, with a growing number of projects.
+
+Usage: python benchmarks/bench_dashboard.py [projects ...]   (default: 1 10 100)
+"""
+import io
+import os
+import sys
+import time
+import shutil
+import logging
+import tempfile
+import statistics
+import contextlib
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import app
+
+logging.disable(logging.WARNING)
+REPEAT = 50
+
+
+def timed(client, url):
+    times, size = [], 0
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        rv = client.get(url)
+        times.append(time.perf_counter() - start)
+        size = len(rv.data)
+    return statistics.median(times) * 1000, size, rv.json
+
+
+def main(counts):
+    app.config['DATA_DIR'] = tempfile.mkdtemp(prefix='team-ready-bench-')
+    try:
+        print(f"{'projects':>8} {'refresh':>10} {'median ms':>10} {'bytes':>8}")
+        created = 0
+        with contextlib.redirect_stdout(io.StringIO()) as out, app.test_client() as client:
+            for count in counts:
+                while created < count:
+                    client.post('/init', json={'project_id': f"project-{created}"})
+                    created += 1
+                full_ms, full_bytes, snapshot = timed(client, '/dashboard?id=project-0')
+                versions = ','.join(f"{name}:{version}" for name, version in snapshot['versions'].items())
+                same_ms, same_bytes, _ = timed(client, f'/dashboard?id=project-0&versions={versions}')
+                client.post('/pause_agent', json={'project_id': 'project-0'})
+                diff_ms, diff_bytes, _ = timed(client, f'/dashboard?id=project-0&versions={versions}')
+                client.post('/approve', json={'project_id': 'project-0'})
+                for name, ms, size in (('full', full_ms, full_bytes), ('changed', diff_ms, diff_bytes), ('unchanged', same_ms, same_bytes)):
+                    sys.__stdout__.write(f"{count:>8} {name:>10} {ms:10.3f} {size:8}\n")
+    finally:
+        shutil.rmtree(app.config['DATA_DIR'])
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [1, 10, 100])
@@ -0,0 +1,107 @@
+"""
+Cold and warm listings of a synthetic repository with the incremental file index, against
+walking the tree (os.walk + stat) on every listing as a plain implementation would.
+Warm refreshes are measured polling (directory mtimes + file stats) and with inotify watches,
+after touching a handful of files; the restart case reloads the manifest snapshot.
+
+Usage: python benchmarks/bench_file_index.py [files] [files per dir]   (default: 100000 50)
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from file_index import FileIndex, InotifyWatcher
+
+CHANGED_FILES = 10
+
+
+def make_tree(root, files, per_dir):
+    for i in range(files):
+        directory = os.path.join(root, f"pkg{i // (per_dir * 20):03}", f"mod{i // per_dir:05}")
+        if i % per_dir == 0:
+            os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"file{i:06}.py"), 'w') as f:
+            f.write(f"# module {i}\n" * (1 + i % 7))
+        if i % 1000 == 0:
+            os.makedirs(os.path.join(directory, '__pycache__'), exist_ok=True)
+            with open(os.path.join(directory, '__pycache__', f"file{i:06}.pyc"), 'wb') as f:
+                f.write(b'\0' * 64)
+    with open(os.path.join(root, '.gitignore'), 'w') as f:
+        f.write("__pycache__/\n*.pyc\n")
+    # Everything is older than the racy window, as in a checkout that is not being written to.
+    then = time.time() - 60
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in dirnames + filenames:
+            os.utime(os.path.join(dirpath, name), (then, then))
+    os.utime(root, (then, then))
+
+
+def walk_listing(root):
+    listing = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in filenames:
+            st = os.stat(os.path.join(dirpath, name))
+            listing.append((os.path.relpath(os.path.join(dirpath, name), root), st.st_size, st.st_mtime_ns))
+    listing.sort()
+    return listing[:200]
+
+
+def timed(label, fn):
+    started = time.perf_counter()
+    result = fn()
+    print(f"{label:<40} {(time.perf_counter() - started) * 1000:9.1f} ms")
+    return result
+
+
+def touch_some(root, files, per_dir):
+    for i in range(0, files, max(files // CHANGED_FILES, 1)):
+        path = os.path.join(root, f"pkg{i // (per_dir * 20):03}", f"mod{i // per_dir:05}", f"file{i:06}.py")
+        with open(path, 'a') as f:
+            f.write("# changed\n")
+
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    per_dir = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    work_dir = tempfile.mkdtemp(prefix='team-ready-bench-')
+    try:
+        root = os.path.join(work_dir, 'repo')
+        started = time.perf_counter()
+        make_tree(root, files, per_dir)
+        print(f"Created {files} files in {files // per_dir} dirs in {time.perf_counter() - started:.1f}s")
+
+        timed("os.walk + stat, first page", lambda: walk_listing(root))
+        index_dir = os.path.join(work_dir, 'index')
+        index = FileIndex(root, index_dir)
+        timed("cold: scan + hash + manifest", index.refresh)
+        timed("first page (sort)", lambda: index.list(limit=200))
+        timed("warm poll: nothing changed", index.refresh)
+        touch_some(root, files, per_dir)
+        stats = timed(f"warm poll: {CHANGED_FILES} files changed", index.refresh)
+        print(f"    {stats}")
+        timed("filtered page (dir + glob)", lambda: index.list(limit=200, directory='pkg001', pattern='*/file0*5.py'))
+
+        restarted = FileIndex(root, index_dir)
+        timed("restart: load manifest + warm poll", restarted.refresh)
+
+        watcher = InotifyWatcher.create()
+        if watcher is None:
+            print("inotify is not available, skipping watched refreshes")
+            return
+        watcher.close()
+        watched = FileIndex(root, os.path.join(work_dir, 'index-watched'), watch=True)
+        timed("watched: cold scan + watches", watched.refresh)
+        timed("watched: nothing changed", watched.refresh)
+        touch_some(root, files, per_dir)
+        stats = timed(f"watched: {CHANGED_FILES} files changed", watched.refresh)
+        print(f"    {stats}")
+        watched.close()
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+    main()
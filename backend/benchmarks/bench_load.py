@@ -0,0 +1,366 @@
+"""
+Load test: many concurrent virtual managers replaying simulate_manager_flow.py (or a weighted
+mix of its requests) against a local server, without the sleeps between steps.
+
+Reports throughput, p50/p95/p99 latency, time spent waiting for file locks (from the server's
+Server-Timing header) and error rates per endpoint, and can save the results as JSON and
+compare them with an earlier run.
+
+Without --url a server is started on a free port with a temporary data dir (and no agent
+runner, so /kickoff does not spawn agent processes); --server-env sets TEAM_READY_* options
+for it. --duplicates N makes a request storm of double clicks and retries: managers go in
+groups of N that send the same requests at the same moment, with the same Idempotency-Key
+header given --idempotency-keys, and with kickoff tasks of their own per group given
+--distinct-tasks. The server's counts of requests deduplicated and shed are printed at the end.
+
+Duplicates are only coalesced, and a project's requests only shed, while others are still in
+progress. The /init and /kickoff handlers run on OS threads (see admission.run_in_thread), so
+they overlap on the bundled gevent server (--server-mode gevent) as well as with
+--server-mode threaded, which serves a request per thread as a threaded WSGI deployment would;
+distinct tasks pile up past TEAM_READY_PROJECT_MAX_PENDING in both.
+
+Usage: python benchmarks/bench_load.py [--url URL] [--managers 20] [--duration 20]
+           [--mix flow | --mix status=60,submit_agent_output=20,simulate_llm_call=10,kickoff=5,init=5]
+           [--projects 0] [--duplicates 1] [--idempotency-keys] [--server-env NAME=VALUE ...]
+           [--distinct-tasks] [--server-mode gevent|threaded] [--out results.json] [--compare baseline.json]
+
+A storm, with and without shedding load per project:
+    python benchmarks/bench_load.py --managers 60 --duplicates 3 --projects 2 --mix kickoff=6,init=1,status=3
+    python benchmarks/bench_load.py ... --idempotency-keys
+    python benchmarks/bench_load.py ... --server-env TEAM_READY_PROJECT_MAX_PENDING=0
+One where shedding takes effect:
+    python benchmarks/bench_load.py --managers 90 --duplicates 3 --projects 1 --mix kickoff=6,init=1,status=3 \
+        --distinct-tasks [--server-mode threaded] [--server-env TEAM_READY_PROJECT_MAX_PENDING=0]
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+import urllib.parse
+
+BENCH_DIR = os.path.abspath(os.path.dirname(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BACKEND_DIR)
+from simulate_manager_flow import MANAGER_FLOW
+
+SERVER = """
+import sys, logging
+import app
+logging.disable(logging.WARNING)
+app.app.config['DATA_DIR'] = sys.argv[1]
+app.app.config['AGENT_RUNNER'] = ''
+app.start_background_services()
+if sys.argv[3] == 'threaded':
+    app.app.run(host='127.0.0.1', port=int(sys.argv[2]), threaded=True)
+else:
+    app.socketio.run(app.app, host='127.0.0.1', port=int(sys.argv[2]), log_output=False)
+"""
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(data_dir, env=None, mode='gevent'):
+    port = free_port()
+    process = subprocess.Popen([sys.executable, '-c', SERVER, data_dir, str(port), mode], cwd=BACKEND_DIR,
+                               stdout=subprocess.DEVNULL, env=dict(os.environ, **(env or {})))
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/status')
+            connection.getresponse().read()
+            return process, url
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError("Server exited during startup")
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Server did not start within 30s")
+
+
+def parse_mix(spec):
+    """'flow', or endpoint=weight pairs picking the first flow step of each endpoint."""
+    if spec == 'flow':
+        return None
+    steps, weights = [], []
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        endpoint = '/' + name.strip().lstrip('/')
+        step = next((step for step in MANAGER_FLOW if step[2] == endpoint), None)
+        if step is None:
+            raise SystemExit(f"No step for {endpoint} in the manager flow")
+        steps.append(step)
+        weights.append(float(weight or 1))
+    return steps, weights
+
+
+def for_project(method, endpoint, payload, project_id):
+    """The step's request rewritten for a manager's own project (None keeps the flow's shared data dir)."""
+    if project_id is None:
+        return payload
+    payload = dict(payload or {})
+    payload['id' if method == 'GET' else 'project_id'] = project_id
+    return payload
+
+
+def server_timing(header):
+    timings = {}
+    for metric in (header or '').split(','):
+        name, _, params = metric.strip().partition(';')
+        if params.startswith('dur='):
+            timings[name] = float(params[4:])
+    return timings
+
+
+class Manager(threading.Thread):
+    """One virtual manager sending its requests back to back over a keep-alive connection."""
+
+    def __init__(self, number, url, mix, project_id, deadline, seed, barrier=None, key_prefix=None, task_suffix=None):
+        super().__init__(daemon=True)
+        self.number = number
+        self.parsed = urllib.parse.urlsplit(url)
+        self.mix = mix
+        self.project_id = project_id
+        self.deadline = deadline
+        self.rng = random.Random(seed)
+        self.barrier = barrier # Shared by the managers sending duplicates of each request
+        self.key_prefix = key_prefix # Of the Idempotency-Key sent with each POST, if any
+        self.task_suffix = task_suffix # Added to the kickoff tasks, so groups ask for different work
+        self.samples = [] # (endpoint, status, latency ms, lock wait ms or None)
+
+    def steps(self):
+        while True:
+            if self.mix is None:
+                yield from MANAGER_FLOW
+            else:
+                steps, weights = self.mix
+                yield self.rng.choices(steps, weights)[0]
+
+    def run(self):
+        connection = None
+        for step, (_, method, endpoint, payload) in enumerate(self.steps()):
+            if time.perf_counter() >= self.deadline:
+                if self.barrier is not None:
+                    self.barrier.abort() # Lets the rest of the group stop too.
+                break
+            if self.barrier is not None:
+                try:
+                    self.barrier.wait(timeout=30)
+                except threading.BrokenBarrierError:
+                    break
+            if connection is None:
+                connection = http.client.HTTPConnection(self.parsed.hostname, self.parsed.port, timeout=30)
+                connection.connect()
+                # Requests go out as headers and body; without this, Nagle and delayed ACKs add ~40ms to each.
+                connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            payload = for_project(method, endpoint, payload, self.project_id)
+            if self.task_suffix is not None and payload and 'task' in payload:
+                payload = dict(payload, task=f"{payload['task']} {self.task_suffix}")
+            path, body, headers = endpoint, None, {}
+            if method == 'GET':
+                if payload:
+                    path += '?' + urllib.parse.urlencode(payload)
+            else:
+                body = json.dumps(payload or {}).encode('utf-8')
+                headers['Content-Type'] = 'application/json'
+                if self.key_prefix is not None:
+                    headers['Idempotency-Key'] = f"{self.key_prefix}-{step}"
+            start = time.perf_counter()
+            try:
+                connection.request(method, path, body, headers)
+                response = connection.getresponse()
+                response.read()
+                status, timing = response.status, server_timing(response.getheader('Server-Timing'))
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = None
+                status, timing = 0, {}
+            self.samples.append((f"{method} {endpoint}", status, (time.perf_counter() - start) * 1000, timing.get('lock')))
+        if connection is not None:
+            connection.close()
+
+
+def server_counters(url, prefix):
+    """Counters starting with `prefix` from the server's /metrics, by the rest of their name."""
+    parsed = urllib.parse.urlsplit(url)
+    try:
+        connection = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=30)
+        connection.request('GET', '/metrics')
+        body = connection.getresponse().read().decode('utf-8')
+        connection.close()
+    except (OSError, http.client.HTTPException):
+        return {}
+    counters = {}
+    for line in body.splitlines():
+        if line.startswith(prefix):
+            name, _, value = line.partition(' ')
+            counters[name[len(prefix):].replace('_total', '')] = float(value)
+    return counters
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def summarize(samples, elapsed):
+    endpoints = {}
+    for endpoint in sorted({sample[0] for sample in samples}):
+        rows = [sample for sample in samples if sample[0] == endpoint]
+        latencies = [row[2] for row in rows]
+        lock_waits = [row[3] for row in rows if row[3] is not None]
+        statuses = {}
+        for row in rows:
+            statuses[str(row[1])] = statuses.get(str(row[1]), 0) + 1
+        errors = sum(1 for row in rows if row[1] == 0 or row[1] >= 500)
+        endpoints[endpoint] = {
+            "requests": len(rows),
+            "throughput": len(rows) / elapsed,
+            "latency_ms": {"p50": percentile(latencies, 0.5), "p95": percentile(latencies, 0.95),
+                           "p99": percentile(latencies, 0.99), "max": max(latencies)},
+            "lock_wait_ms": {"p50": percentile(lock_waits, 0.5), "p95": percentile(lock_waits, 0.95),
+                             "p99": percentile(lock_waits, 0.99),
+                             "mean": sum(lock_waits) / len(lock_waits) if lock_waits else None},
+            "statuses": statuses,
+            "errors": errors,
+            "error_rate": errors / len(rows),
+        }
+    return endpoints
+
+
+def fmt(value):
+    return f"{value:8.2f}" if value is not None else f"{'-':>8}"
+
+
+def report(results):
+    print(f"{results['requests']} requests in {results['elapsed']:.1f}s from {results['config']['managers']} managers: "
+          f"{results['throughput']:.1f} req/s, error rate {results['error_rate']:.2%}")
+    print(f"{'endpoint':<26}{'req/s':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'lock p50':>9}{'lock p95':>9}{'errors':>8}  statuses")
+    for endpoint, stats in results['endpoints'].items():
+        latency, lock = stats['latency_ms'], stats['lock_wait_ms']
+        print(f"{endpoint:<26}{stats['throughput']:8.1f} {fmt(latency['p50'])} {fmt(latency['p95'])} {fmt(latency['p99'])}"
+              f" {fmt(lock['p50'])} {fmt(lock['p95'])}{stats['error_rate']:8.1%}  {stats['statuses']}")
+
+
+def compare(results, baseline):
+    """Prints the change of throughput and latency percentiles against an earlier run."""
+    print(f"\nAgainst baseline ({baseline['config']}):")
+    for endpoint, stats in results['endpoints'].items():
+        before = baseline['endpoints'].get(endpoint)
+        if before is None:
+            continue
+        changes = [f"req/s {(stats['throughput'] / before['throughput'] - 1):+.1%}"]
+        for key in ('p50', 'p95', 'p99'):
+            now, then = stats['latency_ms'][key], before['latency_ms'][key]
+            if now is not None and then:
+                changes.append(f"{key} {(now / then - 1):+.1%}")
+        print(f"{endpoint:<26}" + "  ".join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', help="server to test (default: start one)")
+    parser.add_argument('--managers', type=int, default=20, help="concurrent virtual managers")
+    parser.add_argument('--duration', type=float, default=20.0, help="seconds to run")
+    parser.add_argument('--mix', default='flow', help="'flow' or endpoint=weight pairs")
+    parser.add_argument('--projects', type=int, default=0,
+                        help="spread managers over this many projects (0: everyone shares the data dir, like the flow)")
+    parser.add_argument('--duplicates', type=int, default=1,
+                        help="managers per group sending the same requests at once (a storm of double clicks and retries)")
+    parser.add_argument('--idempotency-keys', action='store_true',
+                        help="send an Idempotency-Key with each POST, the same for the duplicates of a request")
+    parser.add_argument('--server-env', action='append', default=[], metavar='NAME=VALUE',
+                        help="environment of the started server, e.g. TEAM_READY_PROJECT_MAX_PENDING=0")
+    parser.add_argument('--distinct-tasks', action='store_true',
+                        help="give each group of managers kickoff tasks of its own, so they are not duplicates of each other")
+    parser.add_argument('--server-mode', choices=('gevent', 'threaded'), default='gevent',
+                        help="how the started server handles requests: the bundled gevent server, or a thread per request")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', help="write the results as JSON to this file")
+    parser.add_argument('--compare', help="JSON results of an earlier run to compare with")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    server, data_dir, url = None, None, args.url
+    if url is None:
+        data_dir = tempfile.mkdtemp(prefix='team-ready-load-')
+        server, url = start_server(data_dir, dict(option.split('=', 1) for option in args.server_env), args.server_mode)
+    try:
+        projects = [f"load-{i}" for i in range(args.projects)]
+        parsed = urllib.parse.urlsplit(url)
+        for project_id in projects:
+            # Namespaced projects need /init before the other endpoints use their directory.
+            connection = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=30)
+            connection.request('POST', '/init', json.dumps({"project_id": project_id}), {'Content-Type': 'application/json'})
+            connection.getresponse().read()
+            connection.close()
+
+        started = time.perf_counter()
+        deadline = started + args.duration
+        duplicates = max(args.duplicates, 1)
+        barriers = [threading.Barrier(duplicates) if duplicates > 1 else None
+                    for _ in range((args.managers + duplicates - 1) // duplicates)]
+        managers = []
+        for i in range(args.managers):
+            group = i // duplicates
+            # A group shares its project, seed and barrier, so its managers send identical requests together.
+            managers.append(Manager(i, url, mix, projects[group % len(projects)] if projects else None, deadline,
+                                    args.seed + group, barriers[group],
+                                    f"load-{args.seed}-{group}" if args.idempotency_keys else None,
+                                    f"(group {group})" if args.distinct_tasks else None))
+        for manager in managers:
+            manager.start()
+        for manager in managers:
+            manager.join()
+        elapsed = time.perf_counter() - started
+        admission = server_counters(url, 'team_ready_requests_')
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    samples = [sample for manager in managers for sample in manager.samples]
+    errors = sum(1 for sample in samples if sample[1] == 0 or sample[1] >= 500)
+    results = {
+        "config": {"url": args.url or "local", "managers": args.managers, "duration": args.duration,
+                   "mix": args.mix, "projects": args.projects, "duplicates": args.duplicates,
+                   "idempotency_keys": args.idempotency_keys, "server_env": args.server_env,
+                   "distinct_tasks": args.distinct_tasks, "server_mode": args.server_mode},
+        "admission": admission,
+        "started": time.time() - elapsed,
+        "elapsed": elapsed,
+        "requests": len(samples),
+        "throughput": len(samples) / elapsed,
+        "error_rate": errors / len(samples) if samples else 0.0,
+        "endpoints": summarize(samples, elapsed),
+    }
+    report(results)
+    if admission:
+        print("/init and /kickoff on the server: " + ", ".join(f"{name} {value:g}" for name, value in admission.items()))
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Time-range and per-agent queries on a rotated, indexed log vs scanning one flat log file.
+
+Usage: python benchmarks/bench_log_query.py [entries] [queries]   (default: 200000 50)
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import log_segments
+
+AGENTS = ['Orchestrator', 'Coder', 'Critic']
+
+
+def build(data_dir, entries):
+    flat = os.path.join(data_dir, 'flat.log')
+    indexed = os.path.join(data_dir, 'decisions.log')
+    policy = log_segments.RotationPolicy(max_bytes=4 * 1024 * 1024, max_age=0)
+    batch = []
+    with open(flat, 'w') as f:
+        for i in range(entries):
+            timestamp, agent = 1_700_000_000.0 + i, AGENTS[i % len(AGENTS)]
+            message = f"Decision {i}: {agent} chose option {i % 7} after reviewing the plan"
+            f.write(f"{timestamp:.6f}\t{agent}\t{message}\n")
+            batch.append((message, timestamp, agent))
+            if len(batch) == 1000:
+                log_segments.rotate_if_needed(indexed, policy, log_segments.append_entries(indexed, batch))
+                batch = []
+    if batch:
+        log_segments.append_entries(indexed, batch)
+    return flat, indexed
+
+
+def scan(flat, start, end, agent=None, limit=None):
+    matches = []
+    with open(flat) as f:
+        for line in f:
+            timestamp, line_agent, message = line.rstrip('\n').split('\t', 2)
+            if start <= float(timestamp) <= end and (agent is None or agent == line_agent):
+                matches.append(message)
+    return matches[-limit:] if limit else matches
+
+
+def timed(label, queries, run):
+    start = time.perf_counter()
+    for query in queries:
+        run(*query)
+    print(f"{label:<28} {(time.perf_counter() - start) / len(queries) * 1000:9.2f} ms/query")
+
+
+def main():
+    entries = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    data_dir = tempfile.mkdtemp(prefix='team-ready-bench-')
+    try:
+        flat, indexed = build(data_dir, entries)
+        print(f"{entries} entries, {len(log_segments.segment_paths(indexed))} segments")
+        random.seed(1)
+        ranges = []
+        for _ in range(count):
+            first = 1_700_000_000.0 + random.randrange(entries - 100)
+            ranges.append((first, first + 100))
+        timed("range, flat scan", ranges, lambda s, e: scan(flat, s, e))
+        timed("range, indexed segments", ranges, lambda s, e: log_segments.query(indexed, start=s, end=e))
+        last = [(0.0, float('inf'), 'Critic', 20)] * count
+        timed("last 20 of agent, flat scan", last, lambda s, e, a, n: scan(flat, s, e, a, n))
+        timed("last 20 of agent, indexed", last, lambda s, e, a, n: log_segments.query(indexed, agent=a, limit=n))
+    finally:
+        shutil.rmtree(data_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Compares log append throughput of the inline per-line path and the background group-commit writer.
+
+Usage: python benchmarks/bench_log_writer.py [record_count]   (default: 5000)
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import app as backend_app
+from app import app, append_to_log_file
+from log_writer import LogWriter
+
+MESSAGE = "Agent CoderAgent submitted output: refactored module and updated tests for edge cases"
+
+
+def run(count, writer):
+    backend_app.log_writer = writer
+    start = time.perf_counter()
+    for i in range(count):
+        append_to_log_file('agents_internal.log', f"{MESSAGE} #{i}")
+    submitted = time.perf_counter() - start
+    if writer is not None:
+        writer.stop()
+    backend_app.log_writer = None
+    return submitted, time.perf_counter() - start
+
+
+def main(count):
+    data_dir = tempfile.mkdtemp(prefix='team-ready-bench-')
+    app.config['DATA_DIR'] = data_dir
+    try:
+        print(f"{count} records")
+        print(f"{'path':>16} {'caller us/record':>17} {'records/s (durable)':>20}")
+        submitted, total = run(count, None)
+        print(f"{'inline':>16} {submitted / count * 1e6:17.1f} {count / total:20.0f}")
+        for policy in ('none', 'batch', 'always'):
+            writer = LogWriter(flush_interval=0.05, fsync_policy=policy)
+            writer.start()
+            submitted, total = run(count, writer)
+            print(f"{'writer/' + policy:>16} {submitted / count * 1e6:17.1f} {count / total:20.0f}")
+    finally:
+        shutil.rmtree(data_dir)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
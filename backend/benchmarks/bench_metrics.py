@@ -0,0 +1,78 @@
+"""
+Overhead of the /metrics instrumentation: the same request mix with metrics enabled and
+disabled. Requests run in pairs of the same kind, one with metrics on and one off (which
+goes first alternates), each timed in CPU time of the request thread, so work left to critic
+threads and drift over the run land on both alike. The overhead is the median of the pairs'
+differences over the median request time; medians keep garbage collections and scheduler
+hiccups, which hit one request in hundreds, from deciding the result. A second pass with
+metrics off on both sides of every pair gives the noise floor of the measurement.
+Server-Timing is off, as it is a separate, per-request measuring feature.
+
+Usage: python benchmarks/bench_metrics.py [pairs]   (default: 20000)
+"""
+import io
+import os
+import sys
+import time
+import shutil
+import logging
+import tempfile
+import statistics
+import contextlib
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import app
+import metrics
+
+logging.disable(logging.WARNING)
+
+
+def run_request(client, kind, i):
+    start = time.thread_time()
+    if kind == 0:
+        client.post('/submit_agent_output', json={"agent_id": "Coder", "output": f"step {i}"})
+    elif kind == 1:
+        client.post('/simulate_llm_call', json={"cost": 0.0})
+    else:
+        client.get('/status')
+    return time.thread_time() - start
+
+
+def run_pairs(client, pairs, enabled):
+    """Returns the pairs' (first arm - second arm) differences and the second arm's times."""
+    differences, times = [], []
+    for i in range(pairs):
+        kind, first = i % 4, (i // 4) % 2 == 0
+        timing = {}
+        for arm in ((True, False) if first else (False, True)):
+            metrics.REGISTRY.enabled = enabled and arm
+            timing[arm] = run_request(client, kind, i)
+        differences.append(timing[True] - timing[False])
+        times.append(timing[False])
+    metrics.REGISTRY.enabled = True
+    return differences, times
+
+
+def main():
+    pairs = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    app.config['DATA_DIR'] = tempfile.mkdtemp(prefix='team-ready-bench-')
+    app.config['SERVER_TIMING'] = False
+    try:
+        with contextlib.redirect_stdout(io.StringIO()), app.test_client() as client:
+            client.post('/init', json={})
+            for i in range(300): # Warm up.
+                run_request(client, i % 4, i)
+            differences, times = run_pairs(client, pairs, True)
+            control, _ = run_pairs(client, pairs, False)
+    finally:
+        shutil.rmtree(app.config['DATA_DIR'])
+
+    off = statistics.median(times)
+    print(f"{pairs} pairs of requests")
+    print(f"metrics off {off * 1e6:8.1f} us/request (median CPU time)")
+    print(f"overhead {statistics.median(differences) / off:+.2%} ({statistics.median(differences) * 1e6:+.2f} us)"
+          f"   noise floor (off vs off) {statistics.median(control) / off:+.2%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Benchmarks get_precis against logs of growing size, next to the old readlines() approach.
+
+Usage: python benchmarks/bench_precis.py [size_mb ...]   (default: 1 100 1024)
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import app, get_precis, get_file_path
+
+LINE = "Agent CoderAgent submitted output: refactored module and updated tests for edge cases\n"
+READLINES_LIMIT_MB = 100  # Past this the old approach takes too long to be worth timing.
+
+
+def build_log(filepath, size_mb):
+    chunk = (LINE * 10000).encode()
+    target = size_mb * 1024 * 1024
+    with open(filepath, 'wb') as f:
+        written = 0
+        while written < target:
+            f.write(chunk)
+            written += len(chunk)
+
+
+def readlines_precis(filepath):
+    with open(filepath, 'r') as f:
+        lines = f.readlines()
+    return [line.strip() for line in lines[-10:]]
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main(sizes_mb):
+    data_dir = tempfile.mkdtemp(prefix='team-ready-bench-')
+    app.config['DATA_DIR'] = data_dir
+    filepath = get_file_path('agents_internal.log')
+    try:
+        print(f"{'log size':>10} {'cold tail (ms)':>15} {'warm precis (ms)':>17} {'readlines (ms)':>15}")
+        for size_mb in sizes_mb:
+            build_log(filepath, size_mb)
+            cold = timed(lambda: (os.utime(filepath), get_precis()), 20)
+            warm = timed(get_precis, 1000)
+            if size_mb <= READLINES_LIMIT_MB:
+                old = f"{timed(lambda: readlines_precis(filepath), 3):15.3f}"
+            else:
+                old = f"{'skipped':>15}"
+            print(f"{size_mb:>8}MB {cold:15.3f} {warm:17.4f} {old}")
+    finally:
+        shutil.rmtree(data_dir)
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [1, 100, 1024])
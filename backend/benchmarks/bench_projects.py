@@ -0,0 +1,72 @@
+"""
+Runs many projects concurrently against one backend, with and without per-project namespaces.
+
+Each worker thread drives one project through kickoff / submit_agent_output / simulate_llm_call /
+status rounds. In "shared" mode the projects were never initialized with their project_id, so
+they all use the root data dir and its locks, as before per-project namespaces existed.
+
+Usage: python benchmarks/bench_projects.py [projects] [rounds]   (default: 16 50)
+"""
+import io
+import os
+import sys
+import time
+import shutil
+import logging
+import tempfile
+import threading
+import contextlib
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import app
+
+logging.disable(logging.INFO)
+
+
+def drive_project(project_id, rounds, latencies):
+    with app.test_client() as client:
+        for i in range(rounds):
+            start = time.perf_counter()
+            client.post('/kickoff', json={'project_id': project_id, 'task': f"task {i}"})
+            client.post('/submit_agent_output', json={'project_id': project_id, 'agent_id': 'Coder', 'output': f"output {i}"})
+            client.post('/simulate_llm_call', json={'project_id': project_id, 'cost': 0.001})
+            client.get(f'/status?id={project_id}')
+            latencies.append(time.perf_counter() - start)
+
+
+def run(projects, rounds, isolated):
+    data_dir = tempfile.mkdtemp(prefix='team-ready-bench-')
+    app.config['DATA_DIR'] = data_dir
+    try:
+        with app.test_client() as client:
+            client.post('/init', json={'repo_url': 'a', 'path': 'b'})
+            if isolated:
+                for p in range(projects):
+                    client.post('/init', json={'repo_url': 'a', 'path': 'b', 'project_id': f"project-{p}"})
+        latencies = []
+        threads = [threading.Thread(target=drive_project, args=(f"project-{p}", rounds, latencies))
+                   for p in range(projects)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        latencies.sort()
+        return projects * rounds * 4 / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+    finally:
+        shutil.rmtree(data_dir)
+
+
+def main(projects, rounds):
+    print(f"{projects} projects x {rounds} rounds (4 requests per round)")
+    print(f"{'mode':>10} {'requests/s':>11} {'p50 round (ms)':>15} {'p99 round (ms)':>15}")
+    for name, isolated in (("shared", False), ("isolated", True)):
+        with contextlib.redirect_stdout(io.StringIO()): # The routes print() each request.
+            rate, p50, p99 = run(projects, rounds, isolated)
+        print(f"{name:>10} {rate:11.0f} {p50 * 1000:15.2f} {p99 * 1000:15.2f}")
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [16, 50][len(args):]))
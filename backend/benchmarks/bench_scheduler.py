@@ -0,0 +1,73 @@
+"""
+Wall-clock time of a todo graph run by the DAG task scheduler at several parallelism limits,
+against handing the todos out one at a time as the flat todo list did. Each task "runs" on a
+thread that sleeps for its estimated cost, so the time is the scheduler's doing alone; the
+graph is `width` independent chains of `depth` tasks. Also times finish() on a wide graph, to
+show unblocking costs the finished task's out-degree rather than a pass over the whole graph.
+
+Usage: python benchmarks/bench_scheduler.py [width] [depth] [seconds per task]   (default: 8 6 0.02)
+"""
+import os
+import sys
+import time
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from task_scheduler import TaskScheduler
+
+
+def chains(width, depth, seconds):
+    return [{"id": f"c{chain}-{step}", "task": f"step {step} of chain {chain}", "estimated_cost": seconds,
+             "depends_on": [f"c{chain}-{step - 1}"] if step else []}
+            for chain in range(width) for step in range(depth)]
+
+
+def run(items, parallelism, seconds):
+    done = threading.Event()
+    scheduler = None
+
+    def dispatch(task):
+        def work():
+            time.sleep(seconds)
+            scheduler.finish(task.id, True)
+            if scheduler.is_finished():
+                done.set()
+        threading.Thread(target=work, daemon=True).start()
+        return None
+
+    scheduler = TaskScheduler(items, dispatch, parallelism=parallelism)
+    started = time.perf_counter()
+    scheduler.start()
+    done.wait()
+    return time.perf_counter() - started, scheduler.critical_path()
+
+
+def finish_cost(tasks):
+    """Mean time of finish() over a fan-out graph: one root, `tasks` leaves, each leaf finished in turn."""
+    items = [{"id": "root"}] + [{"id": f"leaf{i}", "depends_on": ["root"]} for i in range(tasks)]
+    scheduler = TaskScheduler(items, lambda task: None, parallelism=tasks + 1)
+    scheduler.start()
+    scheduler.finish('root', True)
+    started = time.perf_counter()
+    for i in range(tasks):
+        scheduler.finish(f"leaf{i}", True)
+    return (time.perf_counter() - started) / tasks
+
+
+def main():
+    width = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    depth = int(sys.argv[2]) if len(sys.argv) > 2 else 6
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 0.02
+    items = chains(width, depth, seconds)
+    print(f"{len(items)} tasks: {width} chains of {depth}, {seconds * 1000:.0f} ms each "
+          f"(critical path {depth * seconds * 1000:.0f} ms)")
+    for parallelism in sorted({1, 2, width // 2 or 1, width, width * 2}):
+        elapsed, _ = run(items, parallelism, seconds)
+        label = "one at a time (flat todo list)" if parallelism == 1 else f"parallelism {parallelism}"
+        print(f"{label:<40} {elapsed * 1000:9.1f} ms")
+    for tasks in (1000, 10000, 100000):
+        print(f"finish() with {tasks:>6} running leaves       {finish_cost(tasks) * 1e6:9.1f} us")
+
+
+if __name__ == '__main__':
+    main()
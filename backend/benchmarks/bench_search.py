@@ -0,0 +1,89 @@
+"""
+Indexing throughput and query latency of the full-text search index on synthetic agent logs,
+against a linear scan of the same lines. Also measures reopening the index from its snapshot.
+
+Usage: python benchmarks/bench_search.py [lines] [queries]   (default: 1000000 200)
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from search_index import SearchIndex
+
+AGENTS = ['Orchestrator', 'Coder', 'Critic']
+VERBS = ['reviewed', 'implemented', 'refactored', 'tested', 'rejected', 'approved', 'planned', 'deployed']
+NOUNS = ['parser', 'login page', 'token cache', 'scheduler', 'websocket', 'budget check', 'log rotation',
+         'status endpoint', 'search box', 'agent pool', 'job queue', 'redaction rules']
+
+
+def synthetic_line(rng, i):
+    agent = AGENTS[i % len(AGENTS)]
+    return agent, f"{agent} {rng.choice(VERBS)} the {rng.choice(NOUNS)} in module m{rng.randrange(5000)} (step {i})"
+
+
+def percentile(values, fraction):
+    return sorted(values)[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    rng = random.Random(7)
+    data_dir = tempfile.mkdtemp(prefix='team-ready-bench-')
+    try:
+        index_dir = os.path.join(data_dir, 'search')
+        index = SearchIndex(index_dir)
+        corpus = []
+        started = time.perf_counter()
+        for i in range(lines):
+            agent, text = synthetic_line(rng, i)
+            corpus.append(text)
+            index.add('agents_internal.log', text, ref=agent, timestamp=1_700_000_000.0 + i)
+        index.checkpoint()
+        elapsed = time.perf_counter() - started
+        print(f"Indexed {lines} lines in {elapsed:.1f}s ({lines / elapsed:,.0f} lines/s), "
+              f"{len(index.postings):,} terms")
+
+        workload = []
+        for _ in range(queries):
+            kind = rng.randrange(3)
+            if kind == 0:
+                workload.append((f"{rng.choice(VERBS)} m{rng.randrange(5000)}", False))
+            elif kind == 1:
+                workload.append((f'"{rng.choice(NOUNS)}"', False))
+            else:
+                workload.append((f"{rng.choice(AGENTS).lower()} {rng.choice(NOUNS).split()[0][:3]}", True))
+
+        latencies = []
+        for query, prefix_last in workload:
+            started = time.perf_counter()
+            index.search(query, limit=20, prefix_last=prefix_last)
+            latencies.append((time.perf_counter() - started) * 1000)
+        print(f"index: median {statistics.median(latencies):7.2f} ms   p95 {percentile(latencies, 0.95):7.2f} ms"
+              f"   max {max(latencies):7.2f} ms")
+
+        scans = []
+        for query, _ in workload[:max(queries // 20, 1)]:
+            words = query.strip('"').lower().split()
+            started = time.perf_counter()
+            [text for text in corpus if all(word in text.lower() for word in words)][-20:]
+            scans.append((time.perf_counter() - started) * 1000)
+        print(f"scan:  median {statistics.median(scans):7.2f} ms   ({len(scans)} queries)")
+
+        index.close()
+        started = time.perf_counter()
+        reopened = SearchIndex(index_dir)
+        reopened.search("parser")
+        print(f"reopen from snapshot: {(time.perf_counter() - started) * 1000:.0f} ms")
+        reopened.close()
+    finally:
+        shutil.rmtree(data_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Encode and decode time and size of realistic todo lists, config.json and chat frames with
+each codec of serialization.py, against the original json.dump(indent=4) / json.load.
+
+Usage: python benchmarks/bench_serialization.py [todos] [repeats]   (default: 5000 20)
+"""
+import os
+import sys
+import json
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import serialization
+
+
+def todos(count):
+    return [{
+        "id": f"task-{i}",
+        "title": f"Implement part {i} of the dashboard feature",
+        "description": "Wire the endpoint, add tests and update the docs. " * 3,
+        "status": ("open", "in_progress", "review", "done")[i % 4],
+        "assignee": ("Coder", "Critic", "Orchestrator")[i % 3],
+        "estimate_hours": 1.5 + i % 8,
+        "tags": ["backend", "api"] if i % 2 else ["frontend"],
+        "subtasks": [{"title": f"Step {j}", "done": j < i % 4} for j in range(3)],
+    } for i in range(count)]
+
+
+def config():
+    return {"hard_limit": 10.0, "project_spend": 3.25, "approval_level": "strict"}
+
+
+def chat_frame():
+    messages = [f"Agent Coder submitted output: implemented step {i} of the login flow." for i in range(20)]
+    return {"data": "\n".join(messages), "messages": messages, "seq": 1234, "room": "project:new-app"}
+
+
+def timed(function, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def codecs():
+    available = [('original (json, indent=4)', lambda data: json.dumps(data, indent=4).encode('utf-8'), json.loads)]
+    for name in serialization.CODECS:
+        try:
+            available.append((name, serialization.get_codec(name).encode, serialization.decode))
+        except ValueError as e:
+            print(f"Skipping: {e}")
+    return available
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    print(f"orjson: {'yes' if serialization.orjson is not None else 'no (stdlib json)'}")
+    available = codecs()
+    for label, payload, scale in ((f"todo.json ({count} todos)", todos(count), 1),
+                                  ("config.json", config(), 1000), ("chat frame", chat_frame(), 1000)):
+        print(f"\n{label}" + (f", times per {scale}" if scale > 1 else ""))
+        print(f"{'codec':<28}{'encode ms':>10}{'decode ms':>10}{'bytes':>12}")
+        for name, encode, decode in available:
+            encoded = encode(payload)
+            assert decode(encoded) == payload
+            encode_ms = timed(lambda: [encode(payload) for _ in range(scale)], repeats)
+            decode_ms = timed(lambda: [decode(encoded) for _ in range(scale)], repeats)
+            print(f"{name:<28}{encode_ms:10.2f}{decode_ms:10.2f}{len(encoded):12,}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Load test for chat fan-out with N simulated Socket.IO clients spread over P projects.
+
+Compares the old broadcast-to-everyone emit with the room-scoped, coalescing broadcaster.
+Each "window" publishes a burst of messages per project and then flushes once.
+
+Usage: python benchmarks/bench_socket_fanout.py [clients] [projects] [bursts] [burst_size]
+       (default: 200 20 20 10)
+"""
+import os
+import sys
+import time
+import logging
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import app, socketio, broadcaster, emit_internal_chat
+
+logging.disable(logging.INFO)
+
+
+def connect_clients(count, projects):
+    clients = []
+    for i in range(count):
+        client = socketio.test_client(app, query_string=f"project_id=p{i % projects}")
+        client.get_received()
+        clients.append(client)
+    return clients
+
+
+def drain(clients):
+    return sum(len(client.get_received()) for client in clients)
+
+
+def run_legacy(clients, projects, bursts, burst_size):
+    start = time.perf_counter()
+    for _ in range(bursts):
+        for p in range(projects):
+            for i in range(burst_size):
+                socketio.emit('internal_chat', {'data': f"p{p} message {i}"})
+    elapsed = time.perf_counter() - start
+    return elapsed, drain(clients)
+
+
+def run_broadcaster(clients, projects, bursts, burst_size):
+    broadcaster.running = True # Flush by hand at the end of each window.
+    start = time.perf_counter()
+    for _ in range(bursts):
+        for p in range(projects):
+            for i in range(burst_size):
+                emit_internal_chat(f"p{p} message {i}", f"p{p}")
+        broadcaster.flush()
+    elapsed = time.perf_counter() - start
+    broadcaster.running = False
+    return elapsed, drain(clients)
+
+
+def main(client_count, projects, bursts, burst_size):
+    clients = connect_clients(client_count, projects)
+    messages = projects * bursts * burst_size
+    print(f"{client_count} clients, {projects} projects, {messages} messages")
+    print(f"{'mode':>12} {'seconds':>9} {'frames delivered':>17} {'frames/client':>14}")
+    for name, run in (("broadcast", run_legacy), ("rooms", run_broadcaster)):
+        elapsed, delivered = run(clients, projects, bursts, burst_size)
+        print(f"{name:>12} {elapsed:9.3f} {delivered:17d} {delivered / client_count:14.1f}")
+    for client in clients:
+        client.disconnect()
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [200, 20, 20, 10][len(args):]))
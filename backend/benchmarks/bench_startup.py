@@ -0,0 +1,100 @@
+"""
+Measures cold start: import time of the backend and of agents.py, time to the first request,
+and the latency of the first and of later agent jobs (cold vs warm worker).
+
+Every measurement runs in a fresh interpreter, so nothing is already imported.
+
+Usage: python benchmarks/bench_startup.py [runs]   (default: 5)
+"""
+import os
+import sys
+import json
+import time
+import statistics
+import subprocess
+
+BENCH_DIR = os.path.abspath(os.path.dirname(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+REPO_DIR = os.path.dirname(BACKEND_DIR)
+
+BACKEND_PROBE = """
+import io, sys, json, time, shutil, logging, tempfile, contextlib
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+modules = len(sys.modules)
+logging.disable(logging.INFO)
+app.app.config['DATA_DIR'] = tempfile.mkdtemp(prefix='team-ready-bench-')
+with contextlib.redirect_stdout(io.StringIO()), app.app.test_client() as client:
+    client.get('/status?id=bench')
+first_request = time.perf_counter() - start
+shutil.rmtree(app.app.config['DATA_DIR'])
+print(json.dumps({'import': imported - start, 'first_request': first_request, 'modules_imported': modules}))
+"""
+
+AGENTS_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import agents
+imported = time.perf_counter()
+result = {'import': imported - start, 'crewai_loaded': 'crewai' in sys.modules}
+try:
+    pool = agents.get_agent_pool()
+    pool.get('coder')
+    built = time.perf_counter()
+    pool.get('coder')
+    result.update(first_agent=built - imported, reused_agent=time.perf_counter() - built)
+except ImportError as e:
+    result['skipped'] = str(e)
+print(json.dumps(result))
+"""
+
+JOBS_PROBE = """
+import json, sys, time
+sys.path.insert(0, %r)
+from jobs import JobManager
+manager = JobManager('bench_startup:echo', max_workers=1, python_path=[%r])
+timings = []
+for i in range(3):
+    start = time.perf_counter()
+    job = manager.submit('bench', 'task %%d' %% i)
+    while job.state in ('queued', 'running'):
+        time.sleep(0.001)
+    timings.append(time.perf_counter() - start)
+manager.shutdown()
+print(json.dumps({'cold_job': timings[0], 'warm_job': min(timings[1:])}))
+""" % (BACKEND_DIR, BENCH_DIR)
+
+
+def echo(task, context):
+    """Trivial agent runner for the job probe."""
+    return task
+
+
+def probe(code, cwd):
+    out = subprocess.run([sys.executable, '-c', code], cwd=cwd, capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def report(name, samples):
+    keys = [key for key, value in samples[0].items() if isinstance(value, float)]
+    for key in keys:
+        values = [sample[key] * 1000 for sample in samples]
+        print(f"{name:>8} {key:<15} median {statistics.median(values):8.1f} ms   min {min(values):8.1f} ms")
+    for key, value in samples[0].items():
+        if not isinstance(value, float):
+            print(f"{name:>8} {key:<15} {value}")
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(f"Cold start over {runs} fresh interpreters")
+    started = time.perf_counter()
+    report('backend', [probe(BACKEND_PROBE, BACKEND_DIR) for _ in range(runs)])
+    report('agents', [probe(AGENTS_PROBE, REPO_DIR) for _ in range(runs)])
+    report('jobs', [probe(JOBS_PROBE, BACKEND_DIR) for _ in range(runs)])
+    print(f"(total {time.perf_counter() - started:.1f}s)")
+
+
+if __name__ == '__main__':
+    main()
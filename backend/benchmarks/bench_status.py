@@ -0,0 +1,70 @@
+"""
+Compares dashboard polls of GET /status on a large todo list: full responses, conditional
+requests answered with 304, and deltas after a single todo changed.
+
+Usage: python benchmarks/bench_status.py [todos] [polls]   (default: 20000 50)
+"""
+import io
+import os
+import sys
+import time
+import shutil
+import logging
+import tempfile
+import contextlib
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import app, write_json_file
+
+logging.disable(logging.INFO)
+
+
+def todos(count, done=-1):
+    return [{"id": f"t{i}", "title": f"Implement part {i} of the feature", "done": i == done} for i in range(count)]
+
+
+def measure(label, polls, poll, before_poll=None):
+    total_bytes = 0
+    elapsed = 0.0
+    for i in range(polls):
+        if before_poll is not None:
+            before_poll(i)
+        start = time.perf_counter()
+        total_bytes += len(poll())
+        elapsed += time.perf_counter() - start
+    print(f"{label:<6} {elapsed / polls * 1000:8.2f} ms/poll {total_bytes / polls / 1024:10.1f} KiB/poll")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    polls = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    data_dir = tempfile.mkdtemp(prefix='team-ready-bench-')
+    app.config['DATA_DIR'] = data_dir
+    quiet = contextlib.redirect_stdout(io.StringIO()) # The route prints every request.
+    try:
+        with app.test_client() as client:
+            write_json_file('todo.json', todos(count))
+            with quiet:
+                first = client.get('/status?id=bench')
+            etag, state = first.headers['ETag'], {'version': first.json['version']}
+
+            def get(url, **kwargs):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    return client.get(url, **kwargs)
+
+            def delta():
+                rv = get(f"/status?id=bench&since={state['version']}")
+                state['version'] = rv.json['version']
+                return rv.data
+
+            print(f"{count} todos, {polls} polls")
+            measure('full', polls, lambda: get('/status?id=bench').data)
+            measure('304', polls, lambda: get('/status?id=bench', headers={'If-None-Match': etag}).data)
+            # One todo changes between polls; the write itself is not timed.
+            measure('delta', polls, delta, lambda i: write_json_file('todo.json', todos(count, done=i)))
+    finally:
+        shutil.rmtree(data_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Compares todo insert, update and read throughput of the JSON file and SQLite (WAL) storage backends.
+Reads poll an unchanged todo list, as dashboards do; the JSON backend answers them from its cache.
+
+Usage: python benchmarks/bench_storage.py [todo_count]   (default: 2000)
+"""
+import os
+import sys
+import time
+import shutil
+import random
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from storage import STORAGE_BACKENDS
+
+
+def make_todo(i):
+    return {"id": i, "task": f"Implement feature #{i} with tests and docs", "status": "open", "assignee": "CoderAgent"}
+
+
+def run(backend_name, count):
+    data_dir = tempfile.mkdtemp(prefix=f'team-ready-bench-{backend_name}-')
+    try:
+        storage = STORAGE_BACKENDS[backend_name](data_dir)
+        storage.write('todo.json', [])
+
+        start = time.perf_counter()
+        for i in range(count):
+            storage.append_item('todo.json', make_todo(i))
+        insert_rate = count / (time.perf_counter() - start)
+
+        updates = min(count, 500)
+        indexes = random.Random(0).sample(range(count), updates)
+        start = time.perf_counter()
+        for i in indexes:
+            todo = make_todo(i)
+            todo['status'] = 'done'
+            storage.update_item('todo.json', i, todo)
+        update_rate = updates / (time.perf_counter() - start)
+
+        # The generic read-modify-write path that read_json_file/write_json_file callers use.
+        start = time.perf_counter()
+        for i in indexes[:50]:
+            todos = storage.read('todo.json')
+            todos[i]['status'] = 'in_progress'
+            storage.write('todo.json', todos)
+        rewrite_rate = 50 / (time.perf_counter() - start)
+
+        polls = 200
+        start = time.perf_counter()
+        for _ in range(polls):
+            storage.read('todo.json')
+        read_rate = polls / (time.perf_counter() - start)
+
+        if hasattr(storage, 'close'):
+            storage.close()
+        return insert_rate, update_rate, rewrite_rate, read_rate
+    finally:
+        shutil.rmtree(data_dir)
+
+
+def main(count):
+    print(f"{count} todos")
+    print(f"{'backend':>8} {'inserts/s':>12} {'updates/s':>12} {'read+write/s':>13} {'reads/s':>12}")
+    for backend_name in STORAGE_BACKENDS:
+        insert_rate, update_rate, rewrite_rate, read_rate = run(backend_name, count)
+        print(f"{backend_name:>8} {insert_rate:12.1f} {update_rate:12.1f} {rewrite_rate:13.1f} {read_rate:12.1f}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
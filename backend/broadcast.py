@@ -0,0 +1,207 @@
+import time
+import logging
+import threading
+from collections import deque
+
+OVERFLOW_POLICIES = ('drop_oldest', 'summarize')
+ALL_CLIENTS = None
+
+
+def project_room(project_id):
+    """Socket.IO room name for a project's dashboards."""
+    return f"project:{project_id}"
+
+
+def frame_text(messages):
+    """
+    Display text of a frame: chat messages one per line; structured messages (dicts, e.g. the
+    chunks of a streamed agent output) carry a 'text' fragment each, which are concatenated.
+    """
+    if messages and isinstance(messages[0], dict):
+        return ''.join(message.get('text', '') for message in messages)
+    return '\n'.join(str(message) for message in messages)
+
+
+class ClientChannel:
+    """Bounded outbound queue and flow-control state of one connected socket."""
+
+    def __init__(self, sid, queue_limit):
+        self.sid = sid
+        self.queue = deque()
+        self.queue_limit = queue_limit
+        self.in_flight = {} # seq -> time sent
+        self.skipped = 0
+        self.rooms = set()
+
+
+class Broadcaster:
+    """
+    Room-scoped, coalescing Socket.IO fan-out with per-client backpressure.
+
+    publish() only buffers the message for its room. Every `window` seconds the buffered
+    messages of each (room, event) are coalesced into one frame and queued for every member.
+    With a `max_in_flight` window (0, the default, is off: for clients that do not ack), a
+    client gets at most that many frames it has not acknowledged (with a `chat_ack` event
+    carrying the frame's seq); unacknowledged frames are written off after `ack_timeout`.
+    Without it a client gets frames while the Engine.IO transport holds fewer than
+    `max_backlog` packets not yet written to it (0 sends unconditionally); the rest wait in
+    its queue and go out as the transport drains, on the next flushes.
+    When a client's queue is full its oldest frames are dropped ('drop_oldest'), or dropped and
+    reported to it in a summary frame ('summarize'). One slow socket therefore never holds back
+    the others and never grows the server's memory without bound.
+    """
+
+    def __init__(self, socketio, window=0.05, queue_limit=100, overflow_policy='summarize',
+                 max_in_flight=0, ack_timeout=5.0, max_backlog=16):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow_policy}")
+        self.socketio = socketio
+        self.window = window
+        self.queue_limit = queue_limit
+        self.overflow_policy = overflow_policy
+        self.max_in_flight = max_in_flight
+        self.ack_timeout = ack_timeout
+        self.max_backlog = max_backlog
+        self.lock = threading.RLock()
+        self.clients = {}
+        self.rooms = {}
+        self.pending = {}
+        self.seq = 0
+        self.running = False
+        self.stats = {'messages': 0, 'frames': 0, 'deliveries': 0, 'bytes': 0, 'dropped': 0}
+
+    def connect(self, sid, rooms=()):
+        with self.lock:
+            client = self.clients.get(sid)
+            if client is None:
+                client = self.clients[sid] = ClientChannel(sid, self.queue_limit)
+            for room in rooms:
+                self.join(sid, room)
+            return client
+
+    def join(self, sid, room):
+        with self.lock:
+            client = self.clients.get(sid) or self.connect(sid)
+            client.rooms.add(room)
+            self.rooms.setdefault(room, set()).add(sid)
+
+    def disconnect(self, sid):
+        with self.lock:
+            client = self.clients.pop(sid, None)
+            if client is None:
+                return
+            for room in client.rooms:
+                members = self.rooms.get(room)
+                if members is not None:
+                    members.discard(sid)
+                    if not members:
+                        del self.rooms[room]
+
+    def publish(self, event, message, room=ALL_CLIENTS):
+        """Buffers a message for a room (or for every client when room is None)."""
+        with self.lock:
+            self.pending.setdefault((room, event), []).append(message)
+            self.stats['messages'] += 1
+        if not self.running:
+            # No flusher: deliver right away, without coalescing.
+            self.flush()
+
+    def ack(self, sid, seq):
+        """Handles a client's acknowledgement; acks are cumulative."""
+        with self.lock:
+            client = self.clients.get(sid)
+            if client is None:
+                return
+            for sent_seq in [s for s in client.in_flight if s <= seq]:
+                del client.in_flight[sent_seq]
+            self._pump(client)
+
+    def flush(self):
+        """Turns buffered messages into frames and sends what each client's credit allows."""
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            for (room, event), messages in pending.items():
+                self.seq += 1
+                frame = {
+                    'data': frame_text(messages),
+                    'messages': messages,
+                    'seq': self.seq,
+                    'room': room,
+                }
+                self.stats['frames'] += 1
+                members = self.clients.keys() if room is ALL_CLIENTS else self.rooms.get(room, ())
+                for sid in members:
+                    self._enqueue(self.clients[sid], event, frame)
+            now = time.monotonic()
+            for client in self.clients.values():
+                for sent_seq, sent_at in list(client.in_flight.items()):
+                    if now - sent_at >= self.ack_timeout:
+                        del client.in_flight[sent_seq]
+                self._pump(client)
+
+    def _enqueue(self, client, event, frame):
+        client.queue.append((event, frame))
+        while len(client.queue) > client.queue_limit:
+            client.queue.popleft()
+            self.stats['dropped'] += 1
+            if self.overflow_policy == 'summarize':
+                client.skipped += 1
+
+    def _has_credit(self, client):
+        if self.max_in_flight:
+            return len(client.in_flight) < self.max_in_flight
+        return not self.max_backlog or self.transport_backlog(client.sid) < self.max_backlog
+
+    def transport_backlog(self, sid):
+        """Packets Engine.IO has queued for a client and not written to it yet (0 if unknown)."""
+        server = getattr(self.socketio, 'server', None)
+        try:
+            eio_sid = server.manager.eio_sid_from_sid(sid, '/')
+            socket = server.eio.sockets.get(eio_sid)
+        except AttributeError:
+            return 0
+        return socket.queue.qsize() if socket is not None else 0
+
+    def _pump(self, client):
+        while client.queue and self._has_credit(client):
+            if client.skipped and self.overflow_policy == 'summarize':
+                event, frame = client.queue[0]
+                self.seq += 1
+                summary = {
+                    'data': f"{client.skipped} earlier updates were skipped because this client fell behind.",
+                    'messages': [],
+                    'skipped': client.skipped,
+                    'seq': self.seq,
+                    'room': frame['room'],
+                }
+                client.skipped = 0
+                self._send(client, event, summary)
+                continue
+            event, frame = client.queue.popleft()
+            self._send(client, event, frame)
+
+    def _send(self, client, event, frame):
+        if self.max_in_flight:
+            client.in_flight[frame['seq']] = time.monotonic()
+        self.stats['deliveries'] += 1
+        self.stats['bytes'] += len(frame['data'])
+        try:
+            self.socketio.emit(event, frame, to=client.sid)
+        except Exception as e:
+            logging.error(f"Could not emit {event} to {client.sid}: {e}")
+
+    def start(self):
+        """Starts the coalescing flusher as a Socket.IO background task (a greenlet under gevent)."""
+        if self.running:
+            return
+        self.running = True
+        self.socketio.start_background_task(self._run)
+
+    def stop(self):
+        self.running = False
+        self.flush()
+
+    def _run(self):
+        while self.running:
+            self.socketio.sleep(self.window)
+            self.flush()
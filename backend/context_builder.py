@@ -0,0 +1,202 @@
+import os
+import math
+import threading
+from collections import deque, OrderedDict
+from log_tail import history_tail_lines
+from search_index import tokenize
+
+# Rough size of a token for English text and code; good enough to keep prompts within a budget.
+CHARS_PER_TOKEN = 4
+RECENT_ENTRIES = 64
+HIGHLIGHT_CHARS = 160
+CACHED_CONTEXTS = 32
+# A relevant entry is worth this many recent ones; recency halves every RECENCY_HALF_LIFE entries.
+RECENCY_HALF_LIFE = 8
+# Entries scoring less (older than two half-lives and unrelated to the task) are left out.
+MIN_SCORE = 0.25
+EMPTY_CONTEXT = "No internal agent logs yet."
+# Lines of the kickoff message that repeat an earlier context rather than saying anything new.
+ECHO_LINES = frozenset(['Context:', 'Previous internal agent thoughts:', 'Relevant recent agent thoughts:', EMPTY_CONTEXT])
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate(text, tokens):
+    """Cuts text to about `tokens` tokens, marking the cut."""
+    limit = tokens * CHARS_PER_TOKEN
+    return text if len(text) <= limit else text[:max(limit - 3, 0)].rstrip() + '...'
+
+
+def strip_echo(message):
+    """Drops the context a kickoff message carries: it is an older rendering of this same log."""
+    head, _, _ = message.partition('\nContext:\n')
+    return head.strip()
+
+
+class Entry:
+    __slots__ = ('text', 'agent', 'terms', 'tokens')
+
+    def __init__(self, text, agent):
+        self.text = text
+        self.agent = agent
+        self.terms = frozenset(tokenize(text))
+        self.tokens = estimate_tokens(text)
+
+
+class Context:
+    __slots__ = ('text', 'tokens', 'entries', 'summarized')
+
+    def __init__(self, text, entries, summarized):
+        self.text = text
+        self.tokens = estimate_tokens(text)
+        self.entries = entries # Recent entries included.
+        self.summarized = summarized # Older entries represented by the summary.
+
+
+class ContextBuilder:
+    """
+    Kickoff context for one agents_internal.log, built within a token budget.
+
+    The newest `recent_entries` messages are kept whole; a message pushed out of that window is
+    folded into a rolling summary (entries per agent and a highlight line each, oldest highlights
+    dropped first), so updating it costs the same however long the log gets. build() spends the
+    budget on the summary (a quarter at most) and then on recent entries ranked by the idf of the
+    words they share with the task plus a recency bonus, skipping old unrelated ones; each entry
+    gets at most a quarter of the budget. Chosen entries are rendered oldest first.
+
+    Empty and repeated messages, and the context echoed by kickoff messages, are not kept.
+    Messages arrive through add() as they are logged; a new builder starts from the log tail.
+    Built contexts are cached per (task, budget) until the next message arrives.
+    """
+
+    def __init__(self, filepath, budget=1000, recent_entries=RECENT_ENTRIES):
+        self.filepath = filepath
+        self.budget = budget
+        self.lock = threading.Lock()
+        self.entries = deque()
+        self.recent_entries = recent_entries
+        self.highlights = deque()
+        self.highlight_tokens = 0
+        self.agents = {} # agent -> messages folded into the summary
+        self.summarized = 0
+        self.version = 0
+        self.cache = OrderedDict()
+        self.stats = {'builds': 0, 'hits': 0}
+        for line in history_tail_lines(filepath, recent_entries * 4):
+            if line.strip() not in ECHO_LINES:
+                self._add(line.strip(), None)
+
+    def is_valid(self):
+        """False once the log was removed from under a builder that has seen messages."""
+        return self.version == 0 or os.path.exists(self.filepath)
+
+    def add(self, message, agent=None):
+        with self.lock:
+            self._add(strip_echo(message), agent)
+
+    def _add(self, text, agent):
+        if not text or any(entry.text == text for entry in self.entries):
+            return
+        self.entries.append(Entry(text, agent))
+        if len(self.entries) > self.recent_entries:
+            self._summarize(self.entries.popleft())
+        self.version += 1
+        self.cache.clear()
+
+    def _summarize(self, entry):
+        agent = entry.agent or 'unattributed'
+        self.agents[agent] = self.agents.get(agent, 0) + 1
+        self.summarized += 1
+        highlight = truncate(entry.text.splitlines()[0], HIGHLIGHT_CHARS // CHARS_PER_TOKEN)
+        self.highlights.append(highlight)
+        self.highlight_tokens += estimate_tokens(highlight)
+        while self.highlight_tokens > self.budget and len(self.highlights) > 1:
+            self.highlight_tokens -= estimate_tokens(self.highlights.popleft())
+
+    def build(self, task='', budget=None):
+        """Returns the Context for a task, at most `budget` (default: the builder's) tokens long."""
+        budget = self.budget if budget is None else budget
+        key = (task, budget)
+        with self.lock:
+            self.stats['builds'] += 1
+            context = self.cache.get(key)
+            if context is not None:
+                self.stats['hits'] += 1
+                self.cache.move_to_end(key)
+                return context
+            context = self._build(task, budget)
+            self.cache[key] = context
+            if len(self.cache) > CACHED_CONTEXTS:
+                self.cache.popitem(last=False)
+            return context
+
+    def _build(self, task, budget):
+        if not self.entries:
+            return Context(EMPTY_CONTEXT, 0, 0)
+        sections = []
+        remaining = budget
+        summary = self._render_summary(budget // 4)
+        if summary:
+            sections.append(summary)
+            remaining -= estimate_tokens(summary)
+
+        entry_cap = max(budget // 4, 1)
+        chosen = []
+        for i in self._ranked(task):
+            entry = self.entries[i]
+            cost = min(entry.tokens, entry_cap) + 1
+            if cost <= remaining:
+                chosen.append(i)
+                remaining -= cost
+        if chosen:
+            lines = [truncate(self.entries[i].text, entry_cap) for i in sorted(chosen)]
+            sections.append("Relevant recent agent thoughts:\n" + "\n".join(lines))
+        return Context("\n\n".join(sections) or EMPTY_CONTEXT, len(chosen), self.summarized)
+
+    def _ranked(self, task):
+        """Indexes of the recent entries worth including, best first."""
+        count = len(self.entries)
+        task_terms = set(tokenize(task))
+        df = {}
+        if task_terms:
+            for entry in self.entries:
+                for term in task_terms & entry.terms:
+                    df[term] = df.get(term, 0) + 1
+        scores = []
+        for i, entry in enumerate(self.entries):
+            relevance = sum(math.log(1 + count / df[term]) for term in task_terms & entry.terms)
+            recency = 0.5 ** ((count - 1 - i) / RECENCY_HALF_LIFE)
+            if relevance + recency >= MIN_SCORE:
+                scores.append((relevance + recency, i))
+        scores.sort(reverse=True)
+        return [i for _, i in scores]
+
+    def _render_summary(self, tokens):
+        if not self.summarized:
+            return ''
+        agents = ', '.join(f"{agent}: {n}" for agent, n in sorted(self.agents.items(), key=lambda item: -item[1]))
+        header = f"Summary of {self.summarized} earlier agent thoughts ({agents}):"
+        remaining = tokens - estimate_tokens(header)
+        lines = []
+        for highlight in reversed(self.highlights):
+            cost = estimate_tokens(highlight) + 1
+            if cost > remaining:
+                break
+            lines.append(highlight)
+            remaining -= cost
+        return "\n".join([header] + lines[::-1]) if remaining >= 0 else ''
+
+
+_builders = {}
+_builders_guard = threading.Lock()
+
+
+def get_builder(filepath, **options):
+    """Returns the shared builder of a log, replacing it if the log was removed."""
+    with _builders_guard:
+        builder = _builders.get(filepath)
+        if builder is None or not builder.is_valid():
+            builder = _builders[filepath] = ContextBuilder(filepath, **options)
+        return builder
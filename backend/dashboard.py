@@ -0,0 +1,64 @@
+import time
+import zlib
+import threading
+import serialization
+
+# How often a waiting long poll looks at the change counter; the check is in memory only.
+POLL_INTERVAL = 0.1
+
+
+def panel_version(data):
+    """Version stamp of a panel: a hash of its content, so it only moves when the panel changes."""
+    return f"{zlib.crc32(serialization.dump_bytes(data)):08x}"
+
+
+def parse_versions(text):
+    """Parses the `name:version,name:version` form clients send their known versions in."""
+    versions = {}
+    for item in (text or '').split(','):
+        name, _, version = item.partition(':')
+        if name and version:
+            versions[name] = version
+    return versions
+
+
+def snapshot(panels, known=None):
+    """
+    Builds {"versions": {panel: version}, "panels": {panel: data}} from `panels` (name -> function).
+    Panels whose version is in `known` are left out of "panels", so a client holding the
+    previous versions receives only what changed.
+    """
+    known = known or {}
+    versions, changed = {}, {}
+    for name, build in panels.items():
+        data = build()
+        versions[name] = panel_version(data)
+        if known.get(name) != versions[name]:
+            changed[name] = data
+    return {"versions": versions, "panels": changed}
+
+
+class ChangeFeed:
+    """
+    Counter moved by every state change a dashboard shows. wait() lets a long poll sleep
+    until it moves; `sleep` is the caller's (socketio.sleep under gevent), so waiting never
+    blocks other requests.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self.lock = threading.Lock()
+
+    def changed(self):
+        with self.lock:
+            self.version += 1
+
+    def wait(self, since, timeout, current=None, sleep=time.sleep):
+        """Returns the current version once it differs from `since`, or when `timeout` runs out."""
+        current = current or (lambda: self.version)
+        deadline = time.monotonic() + timeout
+        version = current()
+        while version == since and time.monotonic() < deadline:
+            sleep(POLL_INTERVAL)
+            version = current()
+        return version
@@ -0,0 +1,580 @@
+import os
+import re
+import sys
+import time
+import errno
+import struct
+import bisect
+import pickle
+import fnmatch
+import hashlib
+import logging
+import threading
+
+from log_writer import _native_threading
+
+FILES_DIRNAME = 'files'
+MANIFEST_FILENAME = 'manifest.snapshot'
+MANIFEST_VERSION = 1
+
+# Never indexed, whatever the .gitignore files say.
+ALWAYS_IGNORED = ('.git', '.team-ready')
+HASH_CHUNK_BYTES = 1024 * 1024
+# Entries whose mtime is this close to (or after) the start of the scan that recorded them may
+# change again within the same mtime tick ("racy git"), so the next refresh checks them again.
+RACY_NS = 2 * 1000 * 1000 * 1000
+
+
+def _translate(pattern):
+    """Regex for a .gitignore glob: `*` and `?` stay within a path segment, `**` spans segments."""
+    parts, i, n = [], 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith('**/', i):
+            parts.append('(?:.*/)?')
+            i += 3
+        elif pattern.startswith('**', i):
+            parts.append('.*')
+            i += 2
+        elif c == '*':
+            parts.append('[^/]*')
+            i += 1
+        elif c == '?':
+            parts.append('[^/]')
+            i += 1
+        elif c == '[':
+            end = pattern.find(']', i + 2 if pattern[i + 1:i + 2] in ('!', ']') else i + 1)
+            if end < 0:
+                parts.append(re.escape(c))
+                i += 1
+                continue
+            body = pattern[i + 1:end]
+            if body.startswith('!'):
+                body = '^' + body[1:]
+            parts.append('[' + body.replace('\\', '\\\\') + ']')
+            i = end + 1
+        elif c == '\\' and i + 1 < n:
+            parts.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            parts.append(re.escape(c))
+            i += 1
+    return ''.join(parts)
+
+
+def parse_gitignore(text):
+    """
+    Rules of one .gitignore file as (regex, negated, dir_only) in file order. Patterns without
+    a slash (other than a trailing one) match a name at any depth below the file's directory.
+    """
+    rules = []
+    for line in text.splitlines():
+        if not line.strip() or line.startswith('#'):
+            continue
+        line = re.sub(r'(?<!\\)\s+$', '', line)
+        negated = line.startswith('!')
+        if negated:
+            line = line[1:]
+        elif line.startswith('\\#') or line.startswith('\\!'):
+            line = line[1:]
+        dir_only = line.endswith('/')
+        line = line.rstrip('/')
+        if not line:
+            continue
+        if '/' in line:
+            line = line.lstrip('/')
+        else:
+            line = '**/' + line
+        rules.append((re.compile(_translate(line) + r'\Z', re.DOTALL), negated, dir_only))
+    return rules
+
+
+def is_ignored(rule_sets, relpath, is_dir):
+    """
+    Whether relpath is ignored by the rule sets [(base dir, rules)] that apply to it, parents
+    first. As in git, the last matching rule wins, so deeper files can re-include names.
+    """
+    ignored = False
+    for base, rules in rule_sets:
+        path = relpath[len(base) + 1:] if base else relpath
+        for regex, negated, dir_only in rules:
+            if (is_dir or not dir_only) and regex.match(path):
+                ignored = not negated
+    return ignored
+
+
+def hash_file(path):
+    """sha1 of a file's content, or None if it cannot be read."""
+    digest = hashlib.sha1()
+    try:
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(HASH_CHUNK_BYTES)
+                if not chunk:
+                    break
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def _join(reldir, name):
+    return f"{reldir}/{name}" if reldir else name
+
+
+class InotifyWatcher:
+    """
+    Linux inotify watches on the indexed directories, read without blocking: refresh() drains
+    the pending events to learn which directories changed since the last refresh, instead of
+    stat-ing the whole tree. Not available elsewhere (create() returns None).
+    """
+
+    IN_MODIFY = 0x2
+    IN_ATTRIB = 0x4
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_DELETE_SELF = 0x400
+    IN_MOVE_SELF = 0x800
+    IN_Q_OVERFLOW = 0x4000
+    IN_IGNORED = 0x8000
+    IN_ONLYDIR = 0x1000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+            | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+    EVENT = struct.Struct('iIII')
+
+    def __init__(self, libc, fd):
+        self.libc = libc
+        self.fd = fd
+        self.dirs = {} # watch descriptor -> relative dir
+        self.watches = {} # relative dir -> watch descriptor
+
+    @classmethod
+    def create(cls):
+        if not sys.platform.startswith('linux'):
+            return None
+        try:
+            import ctypes
+            libc = ctypes.CDLL(None, use_errno=True)
+            fd = libc.inotify_init1(cls.IN_NONBLOCK | cls.IN_CLOEXEC)
+        except (OSError, AttributeError) as e:
+            logging.info(f"inotify is not available, file index refreshes will poll: {e}")
+            return None
+        if fd < 0:
+            logging.info(f"inotify is not available, file index refreshes will poll: {os.strerror(ctypes.get_errno())}")
+            return None
+        return cls(libc, fd)
+
+    def add(self, path, reldir):
+        """Watches a directory; False when the watch limit is reached (fs.inotify.max_user_watches)."""
+        import ctypes
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), self.MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error in (errno.ENOENT, errno.ENOTDIR):
+                return True # Gone already; its parent's events cover that.
+            logging.warning(f"Cannot watch {path} ({os.strerror(error)}), file index refreshes will poll.")
+            return False
+        self.dirs[wd] = reldir
+        self.watches[reldir] = wd
+        return True
+
+    def remove(self, reldir):
+        wd = self.watches.pop(reldir, None)
+        if wd is not None:
+            self.dirs.pop(wd, None)
+            self.libc.inotify_rm_watch(self.fd, wd)
+
+    def changes(self):
+        """Relative dirs with events since the last call, or None if events were lost (a full scan is due)."""
+        changed, overflow = set(), False
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = self.EVENT.unpack_from(data, offset)
+                offset += self.EVENT.size + length
+                if mask & self.IN_Q_OVERFLOW:
+                    overflow = True
+                elif mask & self.IN_IGNORED:
+                    reldir = self.dirs.pop(wd, None)
+                    if reldir is not None and self.watches.get(reldir) == wd:
+                        del self.watches[reldir]
+                elif wd in self.dirs:
+                    changed.add(self.dirs[wd])
+        return None if overflow else changed
+
+    def close(self):
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+        self.dirs.clear()
+        self.watches.clear()
+
+
+class FileIndex:
+    """
+    Incremental index of the files under a project's repository checkout.
+
+    The manifest maps every file (relative path) to its size, mtime and sha1, and every directory
+    to its mtime, its .gitignore signature and the names it held. A refresh re-lists only the
+    directories whose mtime moved (adding or removing a name moves it) and otherwise stats the
+    known files, hashing only those whose size or mtime changed. With `watch`, inotify tells
+    which directories changed, so a refresh touches those alone. Files and directories ignored
+    by .gitignore files (and .git itself) are never entered.
+
+    The manifest is kept in memory and snapshotted to `index_dir` after every refresh that
+    changed it, so a restart starts warm. Entries recorded too close to their scan are not
+    trusted by the next one (see RACY_NS).
+
+    list() pages through the file list the last refresh published, without waiting for one in
+    progress, so a request can start_refresh() on a background thread and serve what is known
+    meanwhile (the manifest loaded from disk, or nothing on a cold start).
+    """
+
+    def __init__(self, root, index_dir, watch=False, hash_files=True):
+        self.root = os.path.abspath(root)
+        self.index_dir = index_dir
+        self.hash_files = hash_files
+        self.lock = threading.Lock() # Held by a refresh throughout.
+        self.guard = threading.Lock() # Guards refresh_thread.
+        self.files = {} # relative path -> (size, mtime_ns, sha1)
+        self.dirs = {} # relative dir ('' is the root) -> (mtime_ns, gitignore signature, file names, dir names)
+        self.rules = {} # relative dir -> parsed .gitignore rules
+        self.view = ([], {}) # Published (sorted relative paths, files) that list() reads.
+        self.view_dirty = True
+        self.refreshed = None
+        self.last_stats = None # What the last refresh did.
+        self._thread_class = _native_threading()[0]
+        self.refresh_thread = None
+        self.scanned_ns = 0 # Start of the last refresh, for the racy check.
+        self.want_watch = watch
+        self.watcher = None
+        self.loaded = False
+
+    def path(self, filename):
+        return os.path.join(self.index_dir, filename)
+
+    def _load(self):
+        if self.loaded:
+            return
+        self.loaded = True
+        try:
+            with open(self.path(MANIFEST_FILENAME), 'rb') as f:
+                manifest = pickle.load(f)
+            if manifest['version'] != MANIFEST_VERSION or manifest['root'] != self.root:
+                return
+            self.files, self.dirs, self.scanned_ns = manifest['files'], manifest['dirs'], manifest['scanned_ns']
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, pickle.UnpicklingError, EOFError) as e:
+            logging.error(f"Could not load file manifest, rescanning {self.root}: {e}")
+            self.files, self.dirs = {}, {}
+
+    def _save(self):
+        os.makedirs(self.index_dir, exist_ok=True)
+        manifest = {'version': MANIFEST_VERSION, 'root': self.root, 'files': self.files, 'dirs': self.dirs,
+                    'scanned_ns': self.scanned_ns}
+        tmp_path = self.path(MANIFEST_FILENAME) + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(manifest, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path(MANIFEST_FILENAME))
+
+    def _publish(self):
+        if self.view_dirty:
+            self.view = (sorted(self.files), dict(self.files))
+            self.view_dirty = False
+
+    def fresh(self, max_age):
+        return self.refreshed is not None and time.monotonic() - self.refreshed < max_age
+
+    def start_refresh(self, max_age=0):
+        """
+        Starts refresh(max_age) on a background thread unless one is running already, or the
+        manifest is younger than `max_age`. Returns whether a refresh is in progress.
+        """
+        if self.fresh(max_age):
+            return self.building()
+        with self.guard:
+            if self.refresh_thread is None:
+                self.refresh_thread = self._thread_class(target=self._refresh_in_background, args=(max_age,),
+                                                         name='team-ready-file-index', daemon=True)
+                self.refresh_thread.start()
+            return True
+
+    def _refresh_in_background(self, max_age):
+        try:
+            self.refresh(max_age)
+        except Exception as e:
+            logging.error(f"Could not refresh the file index of {self.root}: {e}")
+        finally:
+            with self.guard:
+                self.refresh_thread = None
+
+    def building(self):
+        """Whether a background refresh is running."""
+        return self.refresh_thread is not None
+
+    def refresh(self, max_age=0):
+        """
+        Brings the manifest up to date, unless it was refreshed less than `max_age` seconds ago.
+        Returns counts of what the refresh did.
+        """
+        with self.lock:
+            if not self.loaded:
+                self._load()
+                self.view_dirty = True
+                self._publish() # A warm start lists the snapshot while the scan runs.
+            if self.refreshed is not None and time.monotonic() - self.refreshed < max_age:
+                return None
+            started = time.time_ns()
+            stats = {'dirs_listed': 0, 'dirs_pruned': 0, 'files_stated': 0, 'files_hashed': 0,
+                     'added': 0, 'changed': 0, 'removed': 0, 'watched': False}
+            if self.want_watch and self.watcher is None and self.refreshed is None:
+                self.watcher = InotifyWatcher.create()
+            changed_dirs = self.watcher.changes() if self.watcher is not None and self.refreshed is not None else None
+            trusted_before = self.scanned_ns - RACY_NS
+            if changed_dirs is None:
+                self._scan([''], trusted_before, stats, full=True)
+            else:
+                stats['watched'] = True
+                self._scan(sorted(d for d in changed_dirs if d in self.dirs), trusted_before, stats, full=False)
+            self.scanned_ns = started
+            if stats['added'] or stats['changed'] or stats['removed']:
+                self.view_dirty = True
+            self._publish()
+            if stats['added'] or stats['changed'] or stats['removed'] or stats['dirs_listed']:
+                try:
+                    self._save()
+                except OSError as e:
+                    logging.error(f"Could not save the file manifest of {self.root}: {e}")
+            self.refreshed = time.monotonic()
+            self.last_stats = stats
+            return stats
+
+    def _rule_sets(self, reldir):
+        """The parsed .gitignore files that apply inside reldir, root first."""
+        sets, base = [], ''
+        parts = reldir.split('/') if reldir else []
+        for i in range(len(parts) + 1):
+            base = '/'.join(parts[:i])
+            rules = self._rules(base)
+            if rules:
+                sets.append((base, rules))
+        return sets
+
+    def _rules(self, reldir):
+        rules = self.rules.get(reldir)
+        if rules is None:
+            try:
+                with open(os.path.join(self.root, reldir, '.gitignore'), 'r', encoding='utf-8', errors='replace') as f:
+                    rules = parse_gitignore(f.read())
+            except OSError:
+                rules = []
+            self.rules[reldir] = rules
+        return rules
+
+    def _scan(self, start, trusted_before, stats, full):
+        """
+        Walks from the `start` dirs. In a full scan every known dir is visited (listed only if
+        its mtime moved); otherwise only the start dirs are listed, plus dirs that appeared.
+        Recorded mtimes from `trusted_before` on are not relied upon.
+        """
+        stack = [(reldir, False) for reldir in reversed(start)]
+        while stack:
+            reldir, forced = stack.pop()
+            abspath = os.path.join(self.root, reldir)
+            if self.watcher is not None and reldir not in self.watcher.watches:
+                # Watched before it is read, so no change falls between the two.
+                if not self.watcher.add(abspath, reldir):
+                    self.watcher.close()
+                    self.watcher = None
+            try:
+                st = os.stat(abspath)
+            except OSError:
+                self._drop_dir(reldir, stats)
+                continue
+            if reldir == '' and not os.path.isdir(abspath):
+                self._drop_dir(reldir, stats)
+                continue
+            gitignore_sig = self._signature(os.path.join(abspath, '.gitignore'))
+            previous = self.dirs.get(reldir)
+            if previous is not None and previous[1] != gitignore_sig:
+                self.rules.pop(reldir, None)
+                forced = True # New rules: every name below has to be matched again.
+            list_dir = (forced or not full or previous is None or previous[0] != st.st_mtime_ns
+                        or previous[0] >= trusted_before)
+            if list_dir:
+                names = self._list(reldir, abspath, stats)
+                if names is None:
+                    self._drop_dir(reldir, stats)
+                    continue
+                file_names, dir_names, entries = names
+            else:
+                stats['dirs_pruned'] += 1
+                _, _, file_names, dir_names = previous
+                entries = None
+            if previous is not None:
+                for name in set(previous[2]) - set(file_names):
+                    self._drop_file(_join(reldir, name), stats)
+                for name in set(previous[3]) - set(dir_names):
+                    self._drop_dir(_join(reldir, name), stats)
+            for name in file_names:
+                self._update_file(_join(reldir, name), entries.get(name) if entries else None, trusted_before, stats)
+            self.dirs[reldir] = (st.st_mtime_ns, gitignore_sig, file_names, dir_names)
+            for name in reversed(dir_names):
+                child = _join(reldir, name)
+                if full or child not in self.dirs or forced:
+                    stack.append((child, forced))
+
+    def _list(self, reldir, abspath, stats):
+        stats['dirs_listed'] += 1
+        rule_sets = self._rule_sets(reldir)
+        file_names, dir_names, entries = [], [], {}
+        try:
+            with os.scandir(abspath) as it:
+                for entry in it:
+                    name = entry.name
+                    if name in ALWAYS_IGNORED:
+                        continue
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                        if not is_dir and not entry.is_file():
+                            continue # Sockets, fifos, dangling links.
+                    except OSError:
+                        continue
+                    if rule_sets and is_ignored(rule_sets, _join(reldir, name), is_dir):
+                        continue
+                    if is_dir:
+                        dir_names.append(name)
+                    else:
+                        file_names.append(name)
+                        entries[name] = entry
+        except OSError:
+            return None
+        file_names.sort()
+        dir_names.sort()
+        return tuple(file_names), tuple(dir_names), entries
+
+    @staticmethod
+    def _signature(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_size, st.st_mtime_ns)
+
+    def _update_file(self, relpath, entry, trusted_before, stats):
+        stats['files_stated'] += 1
+        try:
+            st = entry.stat() if entry is not None else os.stat(os.path.join(self.root, relpath))
+        except OSError:
+            self._drop_file(relpath, stats)
+            return
+        previous = self.files.get(relpath)
+        if (previous is not None and previous[0] == st.st_size and previous[1] == st.st_mtime_ns
+                and st.st_mtime_ns < trusted_before):
+            return
+        digest = None
+        if self.hash_files:
+            stats['files_hashed'] += 1
+            digest = hash_file(os.path.join(self.root, relpath))
+        if previous is None:
+            stats['added'] += 1
+        elif previous[2] != digest or previous[0] != st.st_size:
+            stats['changed'] += 1
+        self.files[relpath] = (st.st_size, st.st_mtime_ns, digest)
+
+    def _drop_file(self, relpath, stats):
+        if self.files.pop(relpath, None) is not None:
+            stats['removed'] += 1
+
+    def _drop_dir(self, reldir, stats):
+        """Removes a dir and everything the manifest knows below it."""
+        stack = [reldir]
+        while stack:
+            current = stack.pop()
+            entry = self.dirs.pop(current, None)
+            self.rules.pop(current, None)
+            if self.watcher is not None:
+                self.watcher.remove(current)
+            if entry is None:
+                continue
+            for name in entry[2]:
+                self._drop_file(_join(current, name), stats)
+            stack.extend(_join(current, name) for name in entry[3])
+
+    def list(self, cursor=None, limit=None, directory=None, pattern=None, extensions=None):
+        """
+        Files in path order: up to `limit` of them after the path `cursor`, optionally only
+        below `directory`, matching the glob `pattern` (against the whole relative path) or
+        ending in one of `extensions`. Returns ([{"path", "size", "mtime", "sha1"}], next cursor
+        or None, number of matching files). The cursor is a path, so pages stay consistent
+        while files come and go.
+        """
+        paths, files = self.view
+        prefix = directory.strip('/') + '/' if directory and directory.strip('/') else ''
+        lo = bisect.bisect_left(paths, prefix) if prefix else 0
+        hi = bisect.bisect_left(paths, prefix[:-1] + '0') if prefix else len(paths) # '0' sorts right after '/'
+        after = max(bisect.bisect_right(paths, cursor), lo) if cursor else lo
+        limit = hi if limit is None else limit
+        matcher = re.compile(fnmatch.translate(pattern)).match if pattern else None
+        suffixes = tuple('.' + ext.lstrip('.') for ext in extensions) if extensions else None
+        if matcher is None and suffixes is None:
+            selected = paths[after:min(after + limit, hi)]
+            more, total = after + limit < hi, hi - lo
+        else:
+            selected, more, total = [], False, 0
+            for i in range(lo, hi):
+                path = paths[i]
+                if (matcher and not matcher(path)) or (suffixes and not path.endswith(suffixes)):
+                    continue
+                total += 1
+                if i >= after:
+                    if len(selected) < limit:
+                        selected.append(path)
+                    else:
+                        more = True
+        page = []
+        for path in selected:
+            size, mtime, digest = files[path]
+            page.append({"path": path, "size": size, "mtime": mtime / 1e9, "sha1": digest})
+        return page, (selected[-1] if more and selected else None), total
+
+    def close(self):
+        with self.lock:
+            if self.watcher is not None:
+                self.watcher.close()
+                self.watcher = None
+
+
+_indexes = {}
+_indexes_guard = threading.Lock()
+
+
+def get_index(data_dir, root, **options):
+    """Returns the shared file index of a data dir, replacing it when the project's root moved."""
+    index_dir = os.path.join(data_dir, FILES_DIRNAME)
+    with _indexes_guard:
+        index = _indexes.get(index_dir)
+        if index is None or index.root != os.path.abspath(root):
+            if index is not None:
+                index.close()
+            index = _indexes[index_dir] = FileIndex(root, index_dir, **options)
+        return index
+
+
+def close_all():
+    """Stops the inotify watches of every index (at shutdown)."""
+    with _indexes_guard:
+        for index in _indexes.values():
+            index.close()
+        _indexes.clear()
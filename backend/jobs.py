@@ -0,0 +1,308 @@
+import os
+import sys
+import json
+import time
+import signal
+import logging
+from collections import deque
+from log_writer import _native_threading
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+WORKER_SCRIPT = os.path.join(BACKEND_DIR, 'agent_worker.py')
+# agents.py lives at the repository root, next to the backend directory.
+REPO_DIR = os.path.dirname(BACKEND_DIR)
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, KILLED = 'queued', 'running', 'succeeded', 'failed', 'killed'
+FINISHED_STATES = (SUCCEEDED, FAILED, KILLED)
+
+
+class Job:
+    """One agent run and the worker process executing it."""
+
+    def __init__(self, project_id, task, context, data_dir=None):
+        self.id = os.urandom(16).hex()
+        self.project_id = project_id
+        self.task = task
+        self.context = context
+        self.data_dir = data_dir
+        self.state = QUEUED
+        self.pid = None
+        self.process = None
+        self.result = None
+        self.error = None
+        self.cost = 0.0 # LLM spend the worker reported for this job
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "project_id": self.project_id,
+            "task": self.task,
+            "state": self.state,
+            "pid": self.pid,
+            "result": self.result,
+            "error": self.error,
+            "cost": self.cost,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """
+    Runs agent jobs in a bounded pool of worker processes (see agent_worker.py).
+
+    submit() returns immediately; at most `max_workers` jobs run at once and the rest wait
+    in a FIFO queue. Workers are started on demand and kept after a job finishes, so the next
+    job finds the heavy imports done and the agents already built. Every worker is waited on by its own OS thread (never a greenlet), so agent
+    work never blocks the gevent hub. Workers run in their own process group, which kill()
+    SIGKILLs as a whole, so tools the agent spawned die with it. `runner` is a "module:function"
+    called as function(task, context) inside the worker; `on_finish(job)` is called from the
+    waiting thread once a job reaches a final state (or from the call that killed or failed to
+    start it), never with the manager's lock held, so it may submit more jobs. Other lines a
+    worker writes while a job runs (see agent_worker.notify_backend) go to `on_message(job,
+    message)`, from the same thread and as they arrive; a {"charge": cost} message also adds
+    to job.cost. Questions (agent_worker.ask_backend, "reply": true) are answered on a thread
+    of their own, which writes back what on_message returns, so waiting for an answer (an LLM
+    call slot) never holds up the job's other messages. `env` adds environment variables for
+    the workers.
+    """
+
+    def __init__(self, runner, max_workers=2, python_path=(), on_finish=None, keep_finished=100, env=None,
+                 on_message=None):
+        self.runner = runner
+        self.max_workers = max_workers
+        self.python_path = list(python_path)
+        self.on_finish = on_finish
+        self.on_message = on_message
+        self.keep_finished = keep_finished
+        self.env = dict(env or {})
+        Thread, Lock, _, _ = _native_threading()
+        self._thread_class = Thread
+        self.lock = Lock()
+        self.jobs = {}
+        self.queue = deque()
+        self.running = {}
+        self.idle = []
+        self.waiters = {}
+        self.finished = deque()
+        self.finished_unnotified = [] # Jobs whose on_finish is due once the lock is released.
+        self.version = 0 # Bumped on every job state change.
+
+    def submit(self, project_id, task, context='', data_dir=None):
+        job = Job(project_id, task, context, data_dir)
+        with self.lock:
+            self.jobs[job.id] = job
+            self.queue.append(job)
+            self.version += 1
+            self._start_queued()
+        self._notify_finished()
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def stats(self):
+        """Job counts by state, and how many worker processes are busy or idle."""
+        with self.lock:
+            states = {}
+            for job in self.jobs.values():
+                states[job.state] = states.get(job.state, 0) + 1
+            return {'jobs': states, 'busy_workers': len(self.running), 'idle_workers': len(self.idle)}
+
+    def jobs_for(self, project_id):
+        with self.lock:
+            return [job for job in self.jobs.values() if job.project_id == project_id]
+
+    def kill(self, job_id):
+        """Kills a job; returns True if it was still queued or running."""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            killed = job is not None and self._kill(job)
+        self._notify_finished()
+        return killed
+
+    def kill_where(self, predicate):
+        """Kills every unfinished job matching predicate(job); returns the killed jobs."""
+        with self.lock:
+            killed = [job for job in list(self.jobs.values()) if predicate(job) and self._kill(job)]
+        self._notify_finished()
+        return killed
+
+    def kill_project(self, project_id):
+        return self.kill_where(lambda job: job.project_id == project_id)
+
+    def shutdown(self):
+        """Kills every queued and running job, waits until they are reaped and stops the idle workers."""
+        killed = self.kill_where(lambda job: True)
+        with self.lock:
+            waiters = list(self.waiters.values())
+            idle, self.idle = self.idle, []
+        for waiter in waiters:
+            waiter.join()
+        for process in idle:
+            process.stdin.close() # The worker exits at end of input.
+            process.wait()
+        return killed
+
+    def _kill(self, job):
+        if job.state == QUEUED:
+            self.queue.remove(job)
+            self._finish(job, KILLED)
+            self.finished_unnotified.append(job)
+            return True
+        if job.state != RUNNING:
+            return False
+        job.state = KILLED
+        self.version += 1
+        if not hasattr(os, 'killpg'): # Windows: no process groups; kill() terminates the worker.
+            job.process.kill()
+            return True
+        try:
+            os.killpg(job.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass # Exited on its own in the meantime.
+        except OSError:
+            job.process.kill()
+        return True
+
+    def _start_queued(self):
+        while self.queue and len(self.running) < self.max_workers:
+            job = self.queue.popleft()
+            try:
+                job.process = self.idle.pop() if self.idle else self._spawn()
+            except OSError as e:
+                job.error = f"Could not start agent worker: {e}"
+                self._finish(job, FAILED)
+                self.finished_unnotified.append(job)
+                continue
+            job.pid = job.process.pid
+            job.state = RUNNING
+            job.started_at = time.time()
+            self.version += 1
+            self.running[job.id] = job
+            waiter = self.waiters[job.id] = self._thread_class(
+                target=self._wait, args=(job,), name=f'team-ready-job-{job.id[:8]}', daemon=True)
+            waiter.start()
+
+    def _spawn(self):
+        import subprocess # Deferred: the backend imports this module long before the first kickoff.
+        # stderr is inherited: agents are chatty, and an unread pipe would eventually block them.
+        return subprocess.Popen(
+            [sys.executable, WORKER_SCRIPT, self.runner],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            env=self._worker_env(), start_new_session=True,
+        )
+
+    def _worker_env(self):
+        env = dict(os.environ)
+        env.update(self.env)
+        paths = self.python_path + [BACKEND_DIR, REPO_DIR]
+        if env.get('PYTHONPATH'):
+            paths.append(env['PYTHONPATH'])
+        env['PYTHONPATH'] = os.pathsep.join(paths)
+        return env
+
+    def _wait(self, job):
+        process = job.process
+        request = json.dumps({"project_id": job.project_id, "task": job.task, "context": job.context})
+        try:
+            process.stdin.write(request.encode() + b'\n')
+            process.stdin.flush()
+            while True:
+                reply = process.stdout.readline()
+                message = self._message(reply)
+                if message is None:
+                    break
+                if message.get('reply'):
+                    self._thread_class(target=self._answer, args=(job, process, message),
+                                       name=f'team-ready-job-{job.id[:8]}-answer', daemon=True).start()
+                else:
+                    self._handle_message(job, message)
+        except OSError:
+            reply = b''
+        if not reply:
+            # The worker died (killed or crashed); reap it.
+            process.wait()
+        with self.lock:
+            self.running.pop(job.id, None)
+            if job.state == KILLED:
+                self._finish(job, KILLED)
+            elif not reply:
+                job.error = f"Agent worker exited with code {process.returncode}"
+                self._finish(job, FAILED)
+            else:
+                try:
+                    payload = json.loads(reply)
+                except ValueError:
+                    payload = {"error": f"Unreadable reply from agent worker: {reply[:200]!r}"}
+                if 'result' in payload:
+                    job.result = payload['result']
+                    self._finish(job, SUCCEEDED)
+                else:
+                    job.error = payload.get('error', "Agent worker sent no result")
+                    self._finish(job, FAILED)
+                # The worker is warm now; keep it for the next job.
+                self.idle.append(process)
+            self.finished_unnotified.append(job)
+            self._start_queued()
+        self._notify_finished()
+        with self.lock:
+            self.waiters.pop(job.id, None)
+
+    @staticmethod
+    def _message(reply):
+        """The message in a line the worker wrote, or None for its reply to the job (or no line at all)."""
+        try:
+            payload = json.loads(reply) if reply else None
+        except ValueError:
+            return None
+        if not isinstance(payload, dict) or 'result' in payload or 'error' in payload:
+            return None
+        return payload
+
+    def _handle_message(self, job, message):
+        cost = message.get('charge')
+        if isinstance(cost, (int, float)) and not isinstance(cost, bool):
+            job.cost += cost
+        if self.on_message is None:
+            return None
+        try:
+            return self.on_message(job, message)
+        except Exception as e:
+            logging.error(f"Job {job.id} message callback failed: {e}")
+            return None
+
+    def _answer(self, job, process, message):
+        answer = self._handle_message(job, message)
+        try:
+            process.stdin.write(json.dumps(answer or {}).encode() + b'\n')
+            process.stdin.flush()
+        except (OSError, ValueError):
+            pass # The worker is gone (killed) or was shut down.
+
+    def _finish(self, job, state):
+        job.state = state
+        self.version += 1
+        job.finished_at = time.time()
+        job.process = None
+        self.finished.append(job.id)
+        while len(self.finished) > self.keep_finished:
+            self.jobs.pop(self.finished.popleft(), None)
+
+    def _notify_finished(self):
+        with self.lock:
+            jobs, self.finished_unnotified = self.finished_unnotified, []
+        for job in jobs:
+            self._notify(job)
+
+    def _notify(self, job):
+        if self.on_finish is None:
+            return
+        try:
+            self.on_finish(job)
+        except Exception as e:
+            logging.error(f"Job {job.id} finish callback failed: {e}")
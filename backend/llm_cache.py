@@ -0,0 +1,250 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+CACHE_DIRNAME = 'llm_cache'
+
+# Call options that change how a completion is delivered or billed, not what it says.
+UNKEYED_PARAMS = frozenset(['api_key', 'api_base', 'base_url', 'timeout', 'metadata', 'num_retries', 'user'])
+
+
+def cache_key(model, messages, **params):
+    """Content address of a completion: sha256 of the canonical JSON of (model, messages, parameters)."""
+    keyed = {name: value for name, value in params.items() if name not in UNKEYED_PARAMS}
+    canonical = json.dumps([model, messages, keyed], sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def response_to_dict(response):
+    """Plain JSON-serializable form of a completion response (litellm ModelResponse or dict)."""
+    if hasattr(response, 'model_dump'):
+        return response.model_dump()
+    if hasattr(response, 'dict'):
+        return response.dict()
+    return response
+
+
+def litellm_completion_cost(response):
+    """Cost of a litellm response in dollars; 0.0 when litellm cannot price it."""
+    try:
+        import litellm
+        return float(litellm.completion_cost(completion_response=response))
+    except Exception as e:
+        logging.warning(f"Could not price LLM response, charging 0.0: {e}")
+        return 0.0
+
+
+class LLMCache:
+    """
+    Two-tier cache of LLM completions keyed by cache_key().
+
+    The memory tier is an LRU of at most `max_entries` responses. The disk tier keeps one JSON
+    file per key under `cache_dir` and evicts the least recently written files once they take
+    more than `max_disk_bytes`. Entries older than `ttl` seconds are misses in both tiers.
+    Every entry remembers what the original call cost, so hits can be counted as savings.
+    """
+
+    def __init__(self, cache_dir, max_entries=512, max_disk_bytes=64 * 1024 * 1024, ttl=7 * 24 * 3600):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.memory = OrderedDict()
+        self.disk = OrderedDict() # key -> size, least recently written first
+        self.disk_bytes = 0
+        self.stats = {'hits': 0, 'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'saved_cost': 0.0, 'evictions': 0}
+        os.makedirs(cache_dir, exist_ok=True)
+        self._scan_disk()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + '.json')
+
+    def _scan_disk(self):
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith('.json'):
+                    stat = os.stat(os.path.join(root, name))
+                    entries.append((stat.st_mtime, name[:-5], stat.st_size))
+        for _, key, size in sorted(entries):
+            self.disk[key] = size
+            self.disk_bytes += size
+
+    def is_valid(self):
+        return os.path.isdir(self.cache_dir)
+
+    def get(self, key):
+        """Returns the cached entry {"response", "cost", "created"} or None."""
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None and now - entry['created'] <= self.ttl:
+                self.memory.move_to_end(key)
+                self._hit(entry, 'memory_hits')
+                return entry
+            if entry is not None:
+                del self.memory[key]
+        entry = self._read_disk(key)
+        with self.lock:
+            if entry is None or now - entry['created'] > self.ttl:
+                self.stats['misses'] += 1
+                return None
+            self._remember(key, entry)
+            self._hit(entry, 'disk_hits')
+            return entry
+
+    def put(self, key, response, cost=0.0):
+        entry = {'response': response_to_dict(response), 'cost': cost, 'created': time.time()}
+        with self.lock:
+            self._remember(key, entry)
+        self._write_disk(key, entry)
+        return entry
+
+    def _hit(self, entry, tier):
+        self.stats['hits'] += 1
+        self.stats[tier] += 1
+        self.stats['saved_cost'] += entry['cost']
+
+    def _remember(self, key, entry):
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def _read_disk(self, key):
+        try:
+            with open(self._path(key), 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logging.error(f"Dropping unreadable LLM cache entry {key}: {e}")
+            self._remove_disk(key)
+            return None
+
+    def _write_disk(self, key, entry):
+        path = self._path(key)
+        data = json.dumps(entry, default=str)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.error(f"Could not write LLM cache entry {key}: {e}")
+            return
+        with self.lock:
+            self.disk_bytes += len(data) - self.disk.pop(key, 0)
+            self.disk[key] = len(data)
+            evicted = []
+            while self.disk_bytes > self.max_disk_bytes and len(self.disk) > 1:
+                old_key, size = self.disk.popitem(last=False)
+                self.disk_bytes -= size
+                self.memory.pop(old_key, None)
+                evicted.append(old_key)
+            self.stats['evictions'] += len(evicted)
+        for old_key in evicted:
+            self._remove_disk(old_key, forget=False)
+
+    def _remove_disk(self, key, forget=True):
+        if forget:
+            with self.lock:
+                self.disk_bytes -= self.disk.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        with self.lock:
+            keys = list(self.disk)
+            self.memory.clear()
+        for key in keys:
+            self._remove_disk(key)
+
+
+def litellm_usage_cost(model, usage):
+    """Cost in dollars of a call to `model` that used `usage` (a response's usage); 0.0 when litellm cannot price it."""
+    def tokens(name):
+        value = usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+        return value if isinstance(value, int) else 0
+
+    try:
+        import litellm
+        prompt_cost, completion_cost = litellm.cost_per_token(
+            model=model, prompt_tokens=tokens('prompt_tokens'), completion_tokens=tokens('completion_tokens'))
+        return float(prompt_cost + completion_cost)
+    except Exception as e:
+        logging.warning(f"Could not price LLM usage of {model}, charging 0.0: {e}")
+        return 0.0
+
+
+def metered_stream(chunks, model, charge, usage_cost_fn=litellm_usage_cost):
+    """
+    Yields the chunks of a streamed completion, then charges the cost of the usage the last
+    of them reported, also when the stream is abandoned early (with whatever usage was seen).
+    """
+    usage = None
+    try:
+        for chunk in chunks:
+            usage = (chunk.get('usage') if isinstance(chunk, dict) else getattr(chunk, 'usage', None)) or usage
+            yield chunk
+    finally:
+        if usage is None:
+            logging.warning(f"Streamed completion of {model} reported no usage, charging 0.0")
+        charge(usage_cost_fn(model, usage) if usage is not None else 0.0)
+
+
+def metered_completion(completion, model, messages, charge=None, cost_fn=litellm_completion_cost,
+                       usage_cost_fn=litellm_usage_cost, **params):
+    """
+    Returns (response, cost) of `completion(model=..., messages=..., **params)`, its cost computed
+    with cost_fn and passed to charge(cost). A streamed call asks for the usage in its last chunk
+    and is charged from it by usage_cost_fn(model, usage) once consumed; its cost is None here.
+    """
+    if params.get('stream'):
+        if charge is None:
+            return completion(model=model, messages=messages, **params), None
+        params.setdefault('stream_options', {'include_usage': True})
+        return metered_stream(completion(model=model, messages=messages, **params), model, charge, usage_cost_fn), None
+    response = completion(model=model, messages=messages, **params)
+    cost = cost_fn(response)
+    if charge is not None:
+        charge(cost)
+    return response, cost
+
+
+def cached_completion(cache, completion, model, messages, charge=None, cost_fn=litellm_completion_cost,
+                      usage_cost_fn=litellm_usage_cost, **params):
+    """
+    Returns (response, cached) for a completion call, going through the cache.
+    On a miss the call is made and charged by metered_completion(); hits make no call and
+    charge nothing. Streamed calls are never cached, but charged all the same.
+    """
+    if params.get('stream'):
+        return metered_completion(completion, model, messages, charge, cost_fn, usage_cost_fn, **params)[0], False
+    key = cache_key(model, messages, **params)
+    entry = cache.get(key)
+    if entry is not None:
+        return entry['response'], True
+    response, cost = metered_completion(completion, model, messages, charge, cost_fn, usage_cost_fn, **params)
+    return cache.put(key, response, cost)['response'], False
+
+
+_caches = {}
+_caches_guard = threading.Lock()
+
+
+def get_cache(cache_dir, **options):
+    """Returns the shared cache for a directory, replacing it if the directory was wiped."""
+    with _caches_guard:
+        cache = _caches.get(cache_dir)
+        if cache is None or not cache.is_valid():
+            cache = _caches[cache_dir] = LLMCache(cache_dir, **options)
+        return cache
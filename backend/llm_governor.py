@@ -0,0 +1,281 @@
+import time
+import logging
+import itertools
+import threading
+
+INTERACTIVE, BACKGROUND = 'interactive', 'background'
+LANES = (INTERACTIVE, BACKGROUND) # Earlier lanes go first.
+
+# Seconds a waiting call sleeps between checks when it is not waiting on a bucket refill.
+POLL_INTERVAL = 0.005
+# Completion tokens reserved for a call that sets no max_tokens.
+DEFAULT_COMPLETION_TOKENS = 512
+CHARS_PER_TOKEN = 4
+
+
+class CallRejected(Exception):
+    """
+    An LLM call the governor refused to run: 'budget' (its projected cost exceeds what is left
+    of the project's budget), 'queue_full' or 'timeout'. `retry_after` is in seconds.
+    """
+
+    def __init__(self, reason, message, retry_after=None):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Holds up to `per_minute` units and refills at per_minute / 60 a second. Taking more than
+    is left puts the bucket in debt, which later calls wait out; a take larger than the whole
+    capacity only needs a full bucket, so it is slowed down but never stuck.
+    """
+
+    def __init__(self, per_minute, now):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = now
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until `amount` can be taken."""
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.level
+        return missing / self.rate if missing > 0 else 0.0
+
+    def take(self, amount, now):
+        self._refill(now)
+        self.level -= amount
+
+    def give_back(self, amount, now):
+        """Returns (or, negative, takes) the difference between a reservation and what was used."""
+        self._refill(now)
+        self.level = min(self.capacity, self.level + amount)
+
+
+class Call:
+    """An LLM call waiting for or holding a slot of the governor."""
+
+    __slots__ = ('order', 'lane', 'model', 'project_id', 'tokens', 'cost', 'limits', 'keys', 'enqueued', 'queued_seconds')
+
+    def __init__(self, order, lane, model, project_id, tokens, cost, limits, enqueued):
+        self.order = order
+        self.lane = lane
+        self.model = model
+        self.project_id = project_id
+        self.tokens = tokens
+        self.cost = cost
+        self.limits = limits # [(bucket key, per minute, units this call takes)]
+        self.keys = frozenset(key for key, _, _ in limits)
+        self.enqueued = enqueued
+        self.queued_seconds = 0.0
+
+
+def estimate_tokens(messages, params):
+    """(prompt tokens, completion tokens) a call is expected to use, for reserving before it runs."""
+    chars = 0
+    for message in messages or []:
+        content = message.get('content') if isinstance(message, dict) else message
+        if isinstance(content, list): # Multi-part content
+            content = ' '.join(str(part.get('text', '')) if isinstance(part, dict) else str(part) for part in content)
+        chars += len(content or '')
+    completion = params.get('max_tokens') or params.get('max_completion_tokens') or DEFAULT_COMPLETION_TOKENS
+    return (chars + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN, int(completion)
+
+
+def response_tokens(response):
+    """Total tokens a completion response reports it used, or None."""
+    usage = response.get('usage') if isinstance(response, dict) else getattr(response, 'usage', None)
+    total = usage.get('total_tokens') if isinstance(usage, dict) else getattr(usage, 'total_tokens', None)
+    return total if isinstance(total, int) else None
+
+
+def released_stream(chunks, release):
+    """
+    Yields the chunks of a streamed completion, then release()s its slot with the tokens the
+    last usage reported (None if none did), once the stream is exhausted or closed.
+    """
+    tokens_used = None
+    try:
+        for chunk in chunks:
+            tokens_used = response_tokens(chunk) or tokens_used
+            yield chunk
+    finally:
+        release(tokens_used)
+
+
+def litellm_cost_estimate(model, prompt_tokens, completion_tokens):
+    """Dollar cost of a call of that size by litellm's price list; 0.0 when the model is not priced."""
+    try:
+        import litellm
+        prompt_cost, completion_cost = litellm.cost_per_token(
+            model=model, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        return float(prompt_cost + completion_cost)
+    except Exception as e:
+        logging.debug(f"Could not price a call to {model}: {e}")
+        return 0.0
+
+
+class LLMGovernor:
+    """
+    Admits LLM calls under token-bucket rate limits, before the provider's own limits (and its
+    retries) come into play.
+
+    Every model gets buckets of `requests_per_minute` calls and `tokens_per_minute` tokens
+    (`model_limits` overrides both per model name) and every project one of each of the
+    `project_*` limits; 0 is no limit. A call reserves its estimated tokens up front, and
+    release() settles the difference once the response reports what was used. At most
+    `max_in_flight` calls run at once. Waiting calls are served by lane, interactive before
+    background, then first come first served: a call never overtakes an earlier (or higher
+    lane) one waiting on a bucket it uses, and only takes a free slot if no call ahead of it
+    could. Waiting is polling with `sleep`, the caller's (socketio.sleep under gevent), so it
+    never blocks other requests. Calls whose estimated cost, on top of the project's calls
+    already admitted, exceeds its remaining budget are rejected before they run; so are
+    calls past `max_queued` waiting or `max_wait` seconds. `on_admit(call)` is called as each
+    call gets its slot, with call.queued_seconds set.
+    """
+
+    def __init__(self, requests_per_minute=0, tokens_per_minute=0, project_requests_per_minute=0,
+                 project_tokens_per_minute=0, model_limits=None, max_in_flight=8, max_queued=256, max_wait=30.0,
+                 on_admit=None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.project_requests_per_minute = project_requests_per_minute
+        self.project_tokens_per_minute = project_tokens_per_minute
+        self.model_limits = dict(model_limits or {})
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.max_wait = max_wait
+        self.on_admit = on_admit
+        self.lock = threading.Lock()
+        self.buckets = {} # (scope, name, unit) -> TokenBucket
+        self.waiting = [] # Calls waiting for a slot, in admission order
+        self.in_flight = 0
+        self.pending_cost = {} # project_id -> estimated cost of its admitted calls not yet charged
+        self.counter = itertools.count()
+        self.stats = {'admitted': 0, 'rejected_budget': 0, 'rejected_queue_full': 0, 'rejected_timeout': 0}
+
+    def _limits(self, model, project_id, tokens):
+        model_limits = self.model_limits.get(model, {})
+        limits = [
+            (('model', model, 'requests'), model_limits.get('requests_per_minute', self.requests_per_minute), 1),
+            (('model', model, 'tokens'), model_limits.get('tokens_per_minute', self.tokens_per_minute), tokens),
+            (('project', project_id, 'requests'), self.project_requests_per_minute, 1),
+            (('project', project_id, 'tokens'), self.project_tokens_per_minute, tokens),
+        ]
+        return [limit for limit in limits if limit[1]]
+
+    def _bucket(self, key, per_minute, now):
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(per_minute, now)
+        return bucket
+
+    def _wait_time(self, call, now):
+        return max((self._bucket(key, per_minute, now).wait_time(amount, now) for key, per_minute, amount in call.limits),
+                   default=0.0)
+
+    def acquire(self, model, project_id=None, tokens=0, cost=0.0, remaining=None, lane=BACKGROUND, sleep=time.sleep):
+        """
+        Waits for a slot for a call of about `tokens` tokens and `cost` dollars; returns the Call,
+        to be passed to release(). `remaining` is the project's budget left (None: no limit).
+        Raises CallRejected.
+        """
+        started = time.monotonic()
+        with self.lock:
+            pending = self.pending_cost.get(project_id, 0.0)
+            if remaining is not None and cost > 0 and pending + cost > remaining:
+                self.stats['rejected_budget'] += 1
+                raise CallRejected('budget', f"Projected spend {pending + cost:.6f} exceeds the {max(remaining, 0.0):.6f} "
+                                             f"left of the budget of project {project_id}")
+            if len(self.waiting) >= self.max_queued:
+                self.stats['rejected_queue_full'] += 1
+                raise CallRejected('queue_full', f"{len(self.waiting)} LLM calls are waiting already", retry_after=1.0)
+            call = Call((LANES.index(lane), next(self.counter)), lane, model, project_id, tokens, cost,
+                        self._limits(model, project_id, tokens), started)
+            self.waiting.append(call)
+            self.waiting.sort(key=lambda waiting: waiting.order)
+            self.pending_cost[project_id] = pending + cost
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                delay = self._admit(call, now)
+                if delay is None:
+                    break
+                if now - started >= self.max_wait:
+                    self.waiting.remove(call)
+                    self._settle_cost(call)
+                    self.stats['rejected_timeout'] += 1
+                    raise CallRejected('timeout', f"No LLM call slot for {model} within {self.max_wait}s",
+                                       retry_after=max(delay, 1.0))
+            sleep(min(max(delay, POLL_INTERVAL), max(self.max_wait - (now - started), 0.0)))
+        if self.on_admit is not None:
+            self.on_admit(call)
+        return call
+
+    def _admit(self, call, now):
+        """Gives the call its slot and returns None, or returns about how long it still has to wait."""
+        index = self.waiting.index(call)
+        ahead = self.waiting[:index]
+        if any(other.keys & call.keys for other in ahead):
+            return POLL_INTERVAL
+        # Calls ahead that could start right now get the free slots first.
+        if self.in_flight + 1 + sum(1 for other in ahead if self._wait_time(other, now) == 0) > self.max_in_flight:
+            return POLL_INTERVAL
+        wait = self._wait_time(call, now)
+        if wait > 0:
+            return wait
+        for key, per_minute, amount in call.limits:
+            self._bucket(key, per_minute, now).take(amount, now)
+        del self.waiting[index]
+        self.in_flight += 1
+        self.stats['admitted'] += 1
+        call.queued_seconds = now - call.enqueued
+        return None
+
+    def _settle_cost(self, call):
+        pending = self.pending_cost.get(call.project_id, 0.0) - call.cost
+        if pending > 1e-12:
+            self.pending_cost[call.project_id] = pending
+        else:
+            self.pending_cost.pop(call.project_id, None)
+
+    def release(self, call, tokens_used=None):
+        """Frees the call's slot; `tokens_used` (from the response) settles its token reservation."""
+        with self.lock:
+            self.in_flight -= 1
+            self._settle_cost(call)
+            if tokens_used is not None and tokens_used != call.tokens:
+                now = time.monotonic()
+                for key, per_minute, amount in call.limits:
+                    if key[2] == 'tokens':
+                        self._bucket(key, per_minute, now).give_back(call.tokens - tokens_used, now)
+
+    def complete(self, completion, model, messages, project_id=None, estimate_cost=None, remaining=None,
+                 lane=BACKGROUND, sleep=time.sleep, **params):
+        """
+        Calls completion(model=..., messages=..., **params) once admitted and returns its response.
+        `estimate_cost(model, prompt_tokens, completion_tokens)` prices the call for the budget check.
+        A streamed response keeps its slot until the stream is exhausted or closed.
+        """
+        prompt_tokens, completion_tokens = estimate_tokens(messages, params)
+        cost = estimate_cost(model, prompt_tokens, completion_tokens) if estimate_cost is not None else 0.0
+        call = self.acquire(model, project_id, prompt_tokens + completion_tokens, cost, remaining, lane, sleep)
+        try:
+            response = completion(model=model, messages=messages, **params)
+        except BaseException:
+            self.release(call)
+            raise
+        if params.get('stream'):
+            return released_stream(response, lambda tokens_used: self.release(call, tokens_used))
+        self.release(call, response_tokens(response))
+        return response
+
+    def waiting_count(self):
+        with self.lock:
+            return len(self.waiting)
@@ -0,0 +1,75 @@
+import os
+import time
+import contextvars
+from filelock import FileLock as BaseFileLock, Timeout
+import metrics
+
+# Seconds spent waiting for file locks by the current request, or None outside of a timed request.
+_waited = contextvars.ContextVar('lock_wait', default=None)
+# Lock file path -> (wait series, hold series), so acquiring a lock does no label work.
+_series = {}
+
+
+def _lock_series(lock_file):
+    series = _series.get(lock_file)
+    if series is None:
+        # The document or log the lock guards, without its directory: projects share the series.
+        name = os.path.basename(lock_file)
+        name = name[:-5] if name.endswith('.lock') else name
+        series = _series[lock_file] = (metrics.lock_wait_seconds.labels(name), metrics.lock_hold_seconds.labels(name))
+    return series
+
+
+class FileLock(BaseFileLock):
+    """
+    A filelock.FileLock that records how long it was waited for (and, with
+    metrics.REGISTRY.lock_holds, held; see metrics.py), and adds the wait to the current
+    request's lock wait. Outside of a timed request, an acquire that succeeds at once is
+    recorded as no wait without reading the clock.
+    """
+
+    def acquire(self, *args, **kwargs):
+        waited = _waited.get()
+        if waited is None and not metrics.REGISTRY.enabled:
+            return super().acquire(*args, **kwargs)
+        if waited is None and not args and not kwargs:
+            try:
+                proxy = super().acquire(blocking=False)
+            except Timeout:
+                pass # Held elsewhere: time the wait below.
+            else:
+                self._acquired(0.0)
+                return proxy
+        start = time.perf_counter()
+        try:
+            return super().acquire(*args, **kwargs)
+        finally:
+            wait = time.perf_counter() - start
+            if waited is not None:
+                waited[0] += wait
+            self._acquired(wait)
+
+    def _acquired(self, wait):
+        if metrics.REGISTRY.enabled and self.lock_counter == 1:
+            _lock_series(self.lock_file)[0].observe(wait)
+            if metrics.REGISTRY.lock_holds:
+                self._acquired_at = time.perf_counter()
+
+    def release(self, force=False):
+        super().release(force)
+        acquired = getattr(self, '_acquired_at', None)
+        if acquired is not None and not self.is_locked:
+            self._acquired_at = None
+            _lock_series(self.lock_file)[1].observe(time.perf_counter() - acquired)
+
+
+def start():
+    """Starts counting lock waits for the current context (one request); returns a token for stop()."""
+    return _waited.set([0.0])
+
+
+def stop(token):
+    """Stops counting and returns the seconds spent waiting for locks since start()."""
+    waited = _waited.get()
+    _waited.reset(token)
+    return waited[0] if waited is not None else 0.0
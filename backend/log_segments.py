@@ -0,0 +1,348 @@
+import os
+import glob
+import gzip
+import time
+import zlib
+import bisect
+import logging
+import threading
+from collections import OrderedDict
+
+INDEX_SUFFIX = '.idx'
+# Rotated segments are written as a series of gzip members of about this many uncompressed bytes;
+# the index points at the member holding an entry, so a lookup decompresses one member only.
+MEMBER_BYTES = 64 * 1024
+ACTIVE = -1 # Member offset of entries still in the uncompressed active file.
+
+
+class RotationPolicy:
+    """When to rotate a log: at `max_bytes`, or once its oldest entry is `max_age` seconds old."""
+
+    def __init__(self, max_bytes=10 * 1024 * 1024, max_age=24 * 3600, max_segments=0):
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.max_segments = max_segments # 0 keeps every segment.
+
+
+class IndexEntry:
+    __slots__ = ('timestamp', 'member', 'offset', 'agent')
+
+    def __init__(self, timestamp, member, offset, agent):
+        self.timestamp = timestamp
+        self.member = member
+        self.offset = offset
+        self.agent = agent
+
+    def line(self):
+        return f"{self.timestamp:.6f}\t{self.member}\t{self.offset}\t{self.agent}\n"
+
+
+def index_path(path):
+    return path + INDEX_SUFFIX
+
+
+def segment_paths(filepath):
+    """Rotated segments of a log, oldest first: <log>.000001.gz, <log>.000002.gz, ..."""
+    return sorted(glob.glob(glob.escape(filepath) + '.[0-9][0-9][0-9][0-9][0-9][0-9].gz'))
+
+
+def _clean_agent(agent):
+    return (agent or '').replace('\t', ' ').replace('\n', ' ')
+
+
+def _parse_index(text, entries):
+    for line in text.splitlines():
+        fields = line.split('\t')
+        if len(fields) == 4:
+            entries.append(IndexEntry(float(fields[0]), int(fields[1]), int(fields[2]), fields[3]))
+    return entries
+
+
+def read_index(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return _parse_index(f.read(), [])
+    except FileNotFoundError:
+        return []
+
+
+def append_entries(filepath, entries, fsync_policy='none'):
+    """
+    Appends (message, timestamp, agent) entries to an active log and its index.
+    The caller holds the log's FileLock. fsync_policy is 'none', 'batch' or 'always'.
+    """
+    index_lines = []
+    with open(filepath, 'ab') as f:
+        offset = start = f.tell()
+        if fsync_policy == 'always':
+            for message, timestamp, agent in entries:
+                data = (message + '\n').encode('utf-8')
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+                index_lines.append(IndexEntry(timestamp, ACTIVE, offset, _clean_agent(agent)).line())
+                offset += len(data)
+        else:
+            chunks = []
+            for message, timestamp, agent in entries:
+                data = (message + '\n').encode('utf-8')
+                chunks.append(data)
+                index_lines.append(IndexEntry(timestamp, ACTIVE, offset, _clean_agent(agent)).line())
+                offset += len(data)
+            f.write(b''.join(chunks))
+            if fsync_policy == 'batch':
+                f.flush()
+                os.fsync(f.fileno())
+        size = offset
+    # An empty log means a fresh start (or someone truncated it): drop index entries for the old data.
+    with open(index_path(filepath), 'a' if start else 'w', encoding='utf-8') as f:
+        f.write(''.join(index_lines))
+    return size
+
+
+_first_timestamps = {} # index path -> (index size when read, timestamp of its first entry)
+
+
+def _first_timestamp(path):
+    try:
+        size = os.path.getsize(path)
+    except FileNotFoundError:
+        return None
+    cached = _first_timestamps.get(path)
+    if cached is not None and cached[0] <= size:
+        return cached[1]
+    with open(path, 'r', encoding='utf-8') as f:
+        fields = f.readline().split('\t')
+    try:
+        timestamp = float(fields[0])
+    except ValueError:
+        return None
+    _first_timestamps[path] = (size, timestamp)
+    return timestamp
+
+
+def rotate_if_needed(filepath, policy, size=None, now=None):
+    """Rotates the log if the policy says so; the caller holds the log's FileLock. Returns the new segment or None."""
+    if policy is None:
+        return None
+    if size is None:
+        size = os.path.getsize(filepath) if os.path.exists(filepath) else 0
+    if size == 0:
+        return None
+    due = policy.max_bytes and size >= policy.max_bytes
+    if not due and policy.max_age:
+        first = _first_timestamp(index_path(filepath))
+        due = first is not None and (now or time.time()) - first >= policy.max_age
+    return rotate(filepath, policy.max_segments) if due else None
+
+
+def rotate(filepath, max_segments=0):
+    """
+    Compresses the active log into the next segment and starts a new, empty one.
+    Entries are grouped into gzip members of about MEMBER_BYTES; the segment's index records
+    the member and the offset inside it of every entry. The caller holds the log's FileLock.
+    """
+    with open(filepath, 'rb') as f:
+        data = f.read()
+    if not data:
+        return None
+    entries = [entry for entry in read_index(index_path(filepath)) if entry.offset < len(data)]
+    if not entries or entries[0].offset > 0:
+        # Written before the log had an index: keep it as one entry of unknown time.
+        entries.insert(0, IndexEntry(0.0, ACTIVE, 0, ''))
+
+    existing = segment_paths(filepath)
+    seq = int(existing[-1].rsplit('.', 2)[-2]) + 1 if existing else 1
+    segment = f"{filepath}.{seq:06d}.gz"
+
+    compressed = bytearray()
+    index_lines = []
+    member_start = 0 # Offset in `data` where the current member starts.
+    for entry in entries:
+        if entry.offset - member_start >= MEMBER_BYTES:
+            compressed += gzip.compress(data[member_start:entry.offset], mtime=0)
+            member_start = entry.offset
+        index_lines.append(IndexEntry(entry.timestamp, len(compressed), entry.offset - member_start, entry.agent).line())
+    compressed += gzip.compress(data[member_start:], mtime=0)
+
+    for path, payload, mode in ((index_path(segment), ''.join(index_lines), 'w'), (segment, bytes(compressed), 'wb')):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, mode) as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+    # The segment is complete; start the active log over.
+    open(filepath, 'wb').close()
+    open(index_path(filepath), 'w').close()
+    _first_timestamps.pop(index_path(filepath), None)
+
+    if max_segments:
+        for old in (existing + [segment])[:-max_segments]:
+            for path in (old, index_path(old)):
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logging.error(f"Could not remove old log segment {path}: {e}")
+    return segment
+
+
+class _SegmentCache:
+    """Small LRU of parsed segment indexes and decompressed members (segments never change)."""
+
+    def __init__(self, capacity=64):
+        self.capacity = capacity
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, load):
+        with self.lock:
+            if key in self.items:
+                self.items.move_to_end(key)
+                return self.items[key]
+        value = load()
+        with self.lock:
+            self.items[key] = value
+            while len(self.items) > self.capacity:
+                self.items.popitem(last=False)
+        return value
+
+
+_cache = _SegmentCache()
+
+
+def _segment_key(segment):
+    stat = os.stat(segment)
+    return (segment, stat.st_ino, stat.st_size)
+
+
+class _Index:
+    """Parsed index of one log part, with the timestamps kept apart for bisection."""
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.timestamps = [entry.timestamp for entry in entries]
+
+    def extend(self, entries):
+        self.entries.extend(entries)
+        self.timestamps.extend(entry.timestamp for entry in entries)
+
+
+def _segment_index(segment):
+    return _cache.get(('index',) + _segment_key(segment), lambda: _Index(read_index(index_path(segment))))
+
+
+_active_indexes = {} # index path -> (inode, bytes parsed, first line, _Index)
+_active_indexes_guard = threading.Lock()
+
+
+def _active_index(filepath):
+    """Index of the active log, parsing only what was appended since the last call."""
+    path = index_path(filepath)
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return _Index([])
+    with f, _active_indexes_guard:
+        stat = os.fstat(f.fileno())
+        first_line = f.readline()
+        cached = _active_indexes.get(path)
+        if cached is not None and cached[0] == stat.st_ino and cached[1] <= stat.st_size and cached[2] == first_line:
+            _, parsed, _, index = cached
+        else:
+            parsed, index = 0, _Index([]) # New file, or rotated since.
+        f.seek(parsed)
+        data = f.read()
+        complete = data.rfind(b'\n') + 1 # A concurrent writer may have left a partial line.
+        index.extend(_parse_index(data[:complete].decode('utf-8'), []))
+        _active_indexes[path] = (stat.st_ino, parsed + complete, first_line, index)
+        return index
+
+
+def _member(segment, member):
+    def load():
+        with open(segment, 'rb') as f:
+            f.seek(member)
+            decompressor = zlib.decompressobj(wbits=31)
+            chunks = []
+            while not decompressor.eof:
+                block = f.read(MEMBER_BYTES)
+                if not block:
+                    break
+                chunks.append(decompressor.decompress(block))
+            return b''.join(chunks)
+    return _cache.get(('member', member) + _segment_key(segment), load)
+
+
+class _Source:
+    """One searchable part of a log: a rotated segment or the active file."""
+
+    def __init__(self, path, index, segment):
+        self.path = path
+        self.index = index.entries
+        self.timestamps = index.timestamps
+        self.segment = segment
+        self.file = None
+
+    def message(self, i):
+        entry = self.index[i]
+        following = self.index[i + 1] if i + 1 < len(self.index) else None
+        if self.segment:
+            data = _member(self.path, entry.member)
+            end = following.offset if following is not None and following.member == entry.member else len(data)
+            raw = data[entry.offset:end]
+        else:
+            if self.file is None:
+                self.file = open(self.path, 'rb')
+            self.file.seek(entry.offset)
+            raw = self.file.read(following.offset - entry.offset) if following is not None else self.file.read()
+        return raw.decode('utf-8', errors='replace').rstrip('\n')
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def _sources(filepath):
+    sources = [_Source(segment, _segment_index(segment), True) for segment in segment_paths(filepath)]
+    sources.append(_Source(filepath, _active_index(filepath), False))
+    return sources
+
+
+def query(filepath, start=None, end=None, agent=None, limit=None):
+    """
+    Returns log entries as {"timestamp", "agent", "message"} dicts in time order.
+    start/end bound the timestamps (inclusive); with `limit`, only the newest `limit` matches
+    are returned. Segments outside the time range are skipped without being decompressed,
+    and inside a segment the index is bisected, so only matching members are read.
+    """
+    matches = []
+    for source in reversed(_sources(filepath)):
+        index = source.index
+        if not index:
+            continue
+        if start is not None and index[-1].timestamp < start:
+            break # Everything older is before the range too.
+        first = bisect.bisect_left(source.timestamps, start) if start is not None else 0
+        last = bisect.bisect_right(source.timestamps, end) if end is not None else len(index)
+        try:
+            for i in range(last - 1, first - 1, -1):
+                if agent is not None and index[i].agent != agent:
+                    continue
+                matches.append({"timestamp": index[i].timestamp, "agent": index[i].agent or None, "message": source.message(i)})
+                if limit is not None and len(matches) >= limit:
+                    return matches[::-1]
+        finally:
+            source.close()
+    return matches[::-1]
+
+
+def segment_tail_lines(filepath, count):
+    """Returns the last `count` lines stored in the rotated segments of a log (newest segment last)."""
+    lines = []
+    for segment in reversed(segment_paths(filepath)):
+        members = sorted({entry.member for entry in _segment_index(segment).entries}) or [0]
+        for member in reversed(members):
+            lines[:0] = _member(segment, member).decode('utf-8', errors='replace').splitlines()
+            if len(lines) >= count:
+                return lines[-count:]
+    return lines[-count:] if count > 0 else []
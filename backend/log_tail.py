@@ -0,0 +1,107 @@
+import os
+import threading
+from collections import deque
+
+TAIL_BLOCK_SIZE = 8192
+RECENT_LINES_CAPACITY = 256
+
+
+def tail_lines(filepath, count, block_size=TAIL_BLOCK_SIZE):
+    """
+    Returns the last `count` lines of a file by seeking backward from EOF in blocks.
+    Only the blocks that contain those lines are read, so the cost does not grow with file size.
+    """
+    if count <= 0 or not os.path.exists(filepath):
+        return []
+    with open(filepath, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b''
+        # One extra newline is needed to know the first wanted line is complete.
+        while position > 0 and data.count(b'\n') <= count:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+    lines = data.decode('utf-8', errors='replace').splitlines()
+    return lines[-count:]
+
+
+def history_tail_lines(filepath, count):
+    """Like tail_lines, but continues into the log's rotated segments when the active file is short."""
+    lines = tail_lines(filepath, count)
+    if len(lines) < count:
+        from log_segments import segment_tail_lines # log_segments is the writer side; imported late to keep this module light.
+        lines = segment_tail_lines(filepath, count - len(lines)) + lines
+    return lines
+
+
+class RecentLines:
+    """
+    In-process ring buffer of the most recent lines appended to one log file.
+
+    The buffer remembers the identity and size the file had after our last write.
+    If the file no longer matches (another process wrote to it, or it was truncated),
+    the buffer is considered stale and is reloaded from the file tail.
+    """
+
+    def __init__(self, capacity=RECENT_LINES_CAPACITY):
+        self.lines = deque(maxlen=capacity)
+        self.signature = None
+        self.lock = threading.Lock()
+
+    def before_write(self, filepath):
+        """Drops the buffer if the file changed behind our back, so it is reloaded on the next read."""
+        with self.lock:
+            if self.signature != _file_signature(filepath):
+                self.lines.clear()
+                self.signature = None
+
+    def after_write(self, filepath, message):
+        """Records a message this process just appended to the file."""
+        self.add(message)
+        self.synced(filepath)
+
+    def add(self, message):
+        """Adds a message that was, or is about to be, appended to the file by this process."""
+        with self.lock:
+            if self.signature is not None:
+                self.lines.extend((message + '\n').splitlines())
+
+    def synced(self, filepath):
+        """Records the file's identity after this process finished writing to it."""
+        with self.lock:
+            if self.signature is not None:
+                self.signature = _file_signature(filepath)
+
+    def last(self, filepath, count):
+        """Returns the last `count` lines, re-reading the file tail if the buffer is stale."""
+        with self.lock:
+            if self.signature is None or self.signature != _file_signature(filepath):
+                self.lines.clear()
+                self.lines.extend(history_tail_lines(filepath, self.lines.maxlen))
+                self.signature = _file_signature(filepath)
+            if count <= 0:
+                return []
+            return list(self.lines)[-count:]
+
+
+def _file_signature(filepath):
+    try:
+        st = os.stat(filepath)
+    except FileNotFoundError:
+        return ('missing',)
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+_recent_lines = {}
+_recent_lines_guard = threading.Lock()
+
+
+def get_recent_lines(filepath):
+    """Returns the shared RecentLines buffer for a log file path."""
+    with _recent_lines_guard:
+        buffer = _recent_lines.get(filepath)
+        if buffer is None:
+            buffer = _recent_lines[filepath] = RecentLines()
+        return buffer
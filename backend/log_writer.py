@@ -0,0 +1,137 @@
+import time
+import logging
+import threading
+from lock_timing import FileLock
+from log_tail import get_recent_lines
+from log_segments import append_entries, rotate_if_needed
+
+FSYNC_POLICIES = ('none', 'batch', 'always')
+
+
+def _native_threading():
+    """
+    Returns the real threading module primitives even if gevent monkey-patched them,
+    so disk writes happen on an OS thread and never block the gevent hub.
+    """
+    try:
+        from gevent import monkey
+    except ImportError:
+        return threading.Thread, threading.Lock, threading.Condition, time.sleep
+    if not monkey.is_module_patched('threading'):
+        return threading.Thread, threading.Lock, threading.Condition, time.sleep
+    Thread, Lock, Condition = monkey.get_original('threading', ['Thread', 'Lock', 'Condition'])
+    return Thread, Lock, Condition, monkey.get_original('time', 'sleep')
+
+
+class LogWriter:
+    """
+    Background group-commit writer for append-only log files.
+
+    submit() only queues the record; a writer thread wakes up every `flush_interval`
+    seconds, takes everything queued per file and writes it with a single FileLock
+    acquisition and a single write call. `fsync_policy` is one of:
+    'none' (leave it to the OS), 'batch' (fsync once per batch) or 'always' (fsync per record).
+    Logs are rotated after a batch according to `rotation` (a log_segments.RotationPolicy).
+    `on_written(filepath, entries)` is called on the writer thread after each batch is written,
+    for work that should stay off the request path too (the full-text index, see app.py).
+    """
+
+    def __init__(self, flush_interval=0.05, fsync_policy='batch', rotation=None, on_written=None):
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync_policy}")
+        self.flush_interval = flush_interval
+        self.fsync_policy = fsync_policy
+        self.rotation = rotation
+        self.on_written = on_written
+        Thread, Lock, Condition, self._sleep = _native_threading()
+        self._thread_class = Thread
+        self.cond = Condition(Lock())
+        self.pending = {}
+        self.submitted = 0
+        self.written = 0
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        with self.cond:
+            if self.running:
+                return
+            self.running = True
+        self.thread = self._thread_class(target=self._run, name='team-ready-log-writer', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Writes everything still queued, then stops the writer thread."""
+        with self.cond:
+            if not self.running:
+                return
+            self.running = False
+            self.cond.notify_all()
+        self.thread.join()
+        self.thread = None
+        self._write_pending()
+
+    def submit(self, filepath, message, timestamp=None, agent=None):
+        """Queues a message for appending to filepath. Never touches the disk."""
+        get_recent_lines(filepath).add(message)
+        entry = (message, time.time() if timestamp is None else timestamp, agent)
+        with self.cond:
+            if not self.pending:
+                self.cond.notify()
+            self.pending.setdefault(filepath, []).append(entry)
+            self.submitted += 1
+
+    def flush(self, timeout=None):
+        """Blocks until every record submitted so far is written. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            target = self.submitted
+            self.cond.notify_all()
+            while self.written < target:
+                if not self.running:
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.cond.wait(remaining)
+        if self.written < target:
+            self._write_pending()
+        return True
+
+    def _run(self):
+        while True:
+            with self.cond:
+                if self.running and not self.pending:
+                    self.cond.wait()
+                if not self.running:
+                    return
+            # Let more records pile up so they share one lock and one write.
+            self._sleep(self.flush_interval)
+            self._write_pending()
+
+    def _write_pending(self):
+        with self.cond:
+            batches, self.pending = self.pending, {}
+        count = 0
+        for filepath, messages in batches.items():
+            try:
+                self._write_batch(filepath, messages)
+            except OSError as e:
+                logging.error(f"Could not write {len(messages)} log records to {filepath}: {e}")
+            if self.on_written is not None:
+                try:
+                    self.on_written(filepath, messages)
+                except Exception as e:
+                    logging.error(f"Log batch callback failed for {filepath}: {e}")
+            count += len(messages)
+        with self.cond:
+            self.written += count
+            self.cond.notify_all()
+
+    def _write_batch(self, filepath, entries):
+        recent_lines = get_recent_lines(filepath)
+        with FileLock(filepath + ".lock"):
+            recent_lines.before_write(filepath)
+            size = append_entries(filepath, entries, self.fsync_policy)
+            rotate_if_needed(filepath, self.rotation, size)
+            recent_lines.synced(filepath)
@@ -0,0 +1,172 @@
+import bisect
+import collections
+import logging
+import threading
+
+# Seconds; suits both sub-millisecond lock waits and multi-second requests.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            values = sorted(self.values.items()) or ([((), 0)] if not self.labelnames else [])
+        for labels, value in values:
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram; observe() is a bisect and three additions under a lock."""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.series = {} # labels -> [bucket counts..., +Inf count, sum]
+        self.children = [] # HistogramSeries handed out by labels(), flushed before rendering
+        self.lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    def labels(self, *labels):
+        """The series of some label values, resolved once for hot paths that observe it often."""
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            child = HistogramSeries(self, series)
+            self.children.append(child)
+        return child
+
+    def render(self):
+        for child in list(self.children):
+            child.flush()
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            series = sorted((labels, list(values)) for labels, values in self.series.items())
+        for labels, values in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), values):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, [le])} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {values[-1]}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class HistogramSeries:
+    """
+    One series of a Histogram, for hot paths: observe() skips the label lookup and only queues
+    the value, which is counted into the buckets in batches of FLUSH_EVERY (and before every
+    render). A request observing a few values then touches one deque instead of the buckets,
+    the bisection and the lock.
+    """
+
+    FLUSH_EVERY = 256
+
+    __slots__ = ('histogram', 'values', 'pending')
+
+    def __init__(self, histogram, values):
+        self.histogram, self.values = histogram, values
+        self.pending = collections.deque()
+
+    def observe(self, value):
+        self.pending.append(value)
+        if len(self.pending) >= self.FLUSH_EVERY:
+            self.flush()
+
+    def flush(self):
+        buckets, values, pending = self.histogram.buckets, self.values, self.pending
+        with self.histogram.lock:
+            for _ in range(len(pending)):
+                value = pending.popleft()
+                values[bisect.bisect_left(buckets, value)] += 1
+                values[-1] += value
+
+
+class Registry:
+    """
+    Metrics of this process, rendered in the Prometheus text format by /metrics.
+
+    Counters and histograms are updated where things happen. Numbers that components already
+    keep (cache and broadcaster stats, job states) are read only at scrape time by collectors:
+    functions returning (name, type, documentation, [(labels dict, value), ...]) families.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        # File lock hold times cost a timer on every acquire, so they are recorded on request.
+        self.lock_holds = False
+        self.metrics = []
+        self.collectors = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        self.collectors.append(collector)
+        return collector
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for collector in self.collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                logging.error(f"Metrics collector {collector.__name__} failed: {e}")
+                continue
+            for name, kind, documentation, samples in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_labels(labels.keys(), labels.values())} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+lock_wait_seconds = REGISTRY.histogram(
+    'team_ready_lock_wait_seconds', "Time spent waiting to acquire a file lock.", ['file'])
+lock_hold_seconds = REGISTRY.histogram(
+    'team_ready_lock_hold_seconds', "Time a file lock was held.", ['file'])
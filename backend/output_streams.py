@@ -0,0 +1,109 @@
+import os
+import time
+import hashlib
+import threading
+from redaction import StreamRedactor, STREAM_CARRY
+
+# Whole lines are logged once this much is buffered (one log append per few KB rather than per
+# line); a longer line is logged in pieces, so a stream never buffers more for the log.
+LOG_ENTRY_CHARS = 4096
+# The critic of a streamed output sees its beginning, up to this many characters.
+REVIEW_EXCERPT_CHARS = 32 * 1024
+
+
+class OutputStream:
+    """
+    One agent output arriving in chunks.
+
+    write() redacts each chunk across chunk boundaries (see redaction.StreamRedactor) and
+    returns the text that can be relayed right away, plus the log entries that are ready: the
+    whole lines buffered once there are LOG_ENTRY_CHARS of them (or LOG_ENTRY_CHARS of a long
+    line), the first one prefixed like the messages of /submit_agent_output. Apart from a hash of
+    the redacted output and its first REVIEW_EXCERPT_CHARS (for its review), nothing is kept.
+    """
+
+    def __init__(self, stream_id, agent_id, project_id=None, redactor=None, carry=STREAM_CARRY, owner=None):
+        self.id = stream_id
+        self.agent_id = agent_id
+        self.project_id = project_id
+        self.owner = owner # Socket.IO sid that opened the stream, if any.
+        self.redactor = StreamRedactor(redactor, carry)
+        self.lock = threading.Lock() # Held by the caller across write() and handling its result.
+        self.log_buffer = f"Agent {agent_id} submitted output: "
+        self.seq = 0
+        self.chars = 0
+        self.digest = hashlib.sha256()
+        self.excerpt = ''
+        self.closed = False
+        self.review = None # Set once the stream has ended and its review was requested.
+        self.started_at = time.time()
+        self.first_output_at = None
+
+    def write(self, chunk, final=False):
+        """Feeds a chunk; returns (redacted text to relay, log entries). final=True ends the stream."""
+        text = self.redactor.feed(chunk)
+        if final:
+            text += self.redactor.close()
+            self.closed = True
+        if text:
+            self.seq += 1
+            self.chars += len(text)
+            self.digest.update(text.encode('utf-8', 'surrogatepass'))
+            if len(self.excerpt) < REVIEW_EXCERPT_CHARS:
+                self.excerpt += text[:REVIEW_EXCERPT_CHARS - len(self.excerpt)]
+            if self.first_output_at is None:
+                self.first_output_at = time.time()
+        self.log_buffer += text
+        entries = []
+        if final:
+            entries.append(self.log_buffer)
+            self.log_buffer = ''
+        elif len(self.log_buffer) >= LOG_ENTRY_CHARS:
+            cut = self.log_buffer.rfind('\n')
+            if cut >= 0:
+                entries.append(self.log_buffer[:cut])
+                self.log_buffer = self.log_buffer[cut + 1:]
+            while len(self.log_buffer) >= LOG_ENTRY_CHARS:
+                entries.append(self.log_buffer[:LOG_ENTRY_CHARS])
+                self.log_buffer = self.log_buffer[LOG_ENTRY_CHARS:]
+        return text, entries
+
+    def to_dict(self):
+        return {
+            "stream_id": self.id,
+            "agent_id": self.agent_id,
+            "project_id": self.project_id,
+            "chars": self.chars,
+            "closed": self.closed,
+            "started_at": self.started_at,
+            "first_output_at": self.first_output_at,
+            "review_id": self.review.id if self.review is not None else None,
+        }
+
+
+class OutputStreams:
+    """The open output streams of this process, by stream id."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.streams = {}
+
+    def open(self, stream_id=None, **options):
+        """Returns the open stream with this id, or opens it (with a new id when none is given)."""
+        with self.lock:
+            stream_id = stream_id or os.urandom(16).hex()
+            stream = self.streams.get(stream_id)
+            if stream is None:
+                stream = self.streams[stream_id] = OutputStream(stream_id, **options)
+            return stream
+
+    def get(self, stream_id):
+        return self.streams.get(stream_id)
+
+    def discard(self, stream_id):
+        with self.lock:
+            return self.streams.pop(stream_id, None)
+
+    def owned_by(self, owner):
+        with self.lock:
+            return [stream for stream in self.streams.values() if stream.owner == owner]
@@ -0,0 +1,326 @@
+import re
+import json
+import logging
+
+REDACTED = "[REDACTED]"
+
+# Keyword names are masked wherever they appear (case-sensitive, as before); a keyword used as
+# the key of an assignment such as `api_key=...` or `"password": ...` also has its value masked.
+DEFAULT_KEYWORDS = ["API_KEY", "SECRET", "PASSWORD", "TOKEN"]
+
+# Provider credential shapes that are masked even without a keyword next to them.
+# "triggers" are literals every match starts with; when a pattern has a capturing group,
+# only the first group is masked.
+DEFAULT_PATTERNS = {
+    "bearer_token": {"regex": r"Bearer\s+([A-Za-z0-9\-._~+/]+=*)", "triggers": ["Bearer"]},
+    "openai_api_key": {"regex": r"sk-(?:proj-|ant-)?[A-Za-z0-9_\-]{20,}", "triggers": ["sk-"]},
+    "aws_access_key_id": {"regex": r"(?:AKIA|ASIA)[0-9A-Z]{16}\b", "triggers": ["AKIA", "ASIA"]},
+    "github_token": {"regex": r"gh[pousr]_[A-Za-z0-9]{36,}", "triggers": ["ghp_", "gho_", "ghu_", "ghs_", "ghr_"]},
+    "slack_token": {"regex": r"xox[abprs]-[A-Za-z0-9\-]{10,}", "triggers": ["xox"]},
+    "google_api_key": {"regex": r"AIza[0-9A-Za-z_\-]{35}", "triggers": ["AIza"]},
+}
+
+# Longest key suffix after a keyword that still counts as an assignment, e.g. `TOKEN_FOR_CI=...`.
+MAX_KEY_SUFFIX = 64
+
+# Most characters a streamed message holds back, so a secret split across chunks is still masked whole.
+STREAM_CARRY = 1024
+
+
+def _supports_possessive():
+    try:
+        re.compile(r"a*+")
+        return True
+    except re.error:
+        return False
+
+
+# Possessive quantifiers (Python 3.11+) stop the assignment rule from backtracking into the key.
+_PLUS = '+' if _supports_possessive() else ''
+
+_REGEX_SPECIAL = set('.^$*+?{}[]|()')
+
+
+def literal_trie_pattern(words):
+    """
+    Builds a regex alternation for literal words with common prefixes factored out,
+    e.g. ["PASSWD", "PASSWORD"] -> "PASSW(?:D|ORD)", so matching cost does not grow with the word count.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        if list(node) == ['']:
+            return ''
+        alternatives = []
+        optional = '' in node
+        for char in sorted(c for c in node if c):
+            alternatives.append(re.escape(char) + build(node[char]))
+        if len(alternatives) == 1 and not optional:
+            return alternatives[0]
+        group = '(?:' + '|'.join(alternatives) + ')'
+        return group + '?' if optional else group
+
+    return build(trie)
+
+
+def literal_prefix(pattern):
+    """Returns the literal text every match of a simple pattern starts with, or '' if there is none."""
+    depth, in_class, escaped = 0, False, False
+    for char in pattern:
+        if escaped:
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif in_class:
+            in_class = char != ']'
+        elif char == '[':
+            in_class = True
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == '|' and depth == 0:
+            return '' # Top-level alternation: no common prefix.
+    prefix = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\':
+            if i + 1 >= len(pattern) or pattern[i + 1].isalnum():
+                break
+            char, step = pattern[i + 1], 2
+        elif char in _REGEX_SPECIAL:
+            break
+        else:
+            step = 1
+        following = pattern[i + step:i + step + 1]
+        if following and following in '*?{':
+            break # The character is optional or repeated.
+        prefix.append(char)
+        i += step
+    return ''.join(prefix)
+
+
+def _case_variants(word):
+    return {word, word.lower(), word.upper(), word.capitalize(), word.title()}
+
+
+class _Rule:
+    def __init__(self, name, regex, replace):
+        self.name = name
+        self.regex = re.compile(regex)
+        self.replace = replace
+
+
+class Redactor:
+    """
+    Masks secrets in log messages in a single scan.
+
+    Every rule declares the literals its matches start with. One trie-shaped regex over all of
+    those literals finds candidate positions (the regex engine skips ahead on literals, so this
+    runs at C speed), and only the rules registered for the literal found there are tried,
+    anchored at that position. The cost is linear in the message length no matter how many
+    keywords and patterns are configured. Custom patterns without a usable literal prefix
+    are collected into one extra fallback pass.
+    """
+
+    def __init__(self, keywords=None, patterns=None, replacement=REDACTED):
+        self.keywords = list(DEFAULT_KEYWORDS if keywords is None else keywords)
+        self.patterns = dict(DEFAULT_PATTERNS if patterns is None else patterns)
+        self.replacement = replacement
+        rules_by_trigger = {}
+        fallback = []
+
+        def register(trigger, rule):
+            rules_by_trigger.setdefault(trigger, []).append(rule)
+
+        for name, spec in self.patterns.items():
+            if isinstance(spec, str):
+                spec = {"regex": spec}
+            rule = _Rule(name, spec["regex"], self._mask_pattern)
+            triggers = spec.get("triggers") or [literal_prefix(spec["regex"])]
+            if all(triggers):
+                for trigger in triggers:
+                    register(trigger, rule)
+            else:
+                fallback.append(rule)
+
+        if self.keywords:
+            keyword = literal_trie_pattern(self.keywords)
+            self.keyword_regex = re.compile(keyword)
+            assignment = _Rule(
+                'assignment',
+                rf"(?P<key>(?i:{keyword})[\w\-]{{0,{MAX_KEY_SUFFIX}}}{_PLUS}[\"']?)"
+                rf"(?P<sep>\s*{_PLUS}[=:]\s*)"
+                rf"(?:Bearer\s+)?(?:\"[^\"]*\"|'[^']*'|[^\s,;]+)",
+                self._mask_assignment,
+            )
+            name_rule = _Rule('keyword', keyword, self._mask_all)
+            for word in self.keywords:
+                for variant in _case_variants(word):
+                    register(variant, assignment)
+                register(word, name_rule)
+        else:
+            self.keyword_regex = None
+
+        # At a given position the trie regex reports the longest trigger; every shorter trigger
+        # that also matches there is a prefix of it, so its rules are candidates too.
+        self.candidates = {}
+        for trigger in rules_by_trigger:
+            rules = []
+            for other, other_rules in rules_by_trigger.items():
+                if trigger.startswith(other):
+                    rules.extend(rule for rule in other_rules if rule not in rules)
+            self.candidates[trigger] = sorted(rules, key=self._priority)
+        self.trigger_regex = re.compile(literal_trie_pattern(self.candidates)) if self.candidates else None
+        self.longest_trigger = max(map(len, self.candidates), default=0)
+        self.fallback_rules = fallback
+        self.fallback_regex = (re.compile('|'.join(f"(?:{rule.regex.pattern})" for rule in fallback))
+                               if fallback else None)
+
+    def _priority(self, rule):
+        # Provider shapes first, then keyword assignments, then bare keyword names.
+        return {'assignment': 1, 'keyword': 2}.get(rule.name, 0)
+
+    def redact(self, message):
+        if self.trigger_regex is not None:
+            message = self._scan(message)
+        if self.fallback_regex is not None:
+            message = self.fallback_regex.sub(self._replace_fallback, message)
+        return message
+
+    def spans(self, message):
+        """(start, end) of the text redact() masks in a message, by start."""
+        spans = []
+        if self.trigger_regex is not None:
+            spans.extend((match.start(), match.end()) for _, match in self._matches(message))
+        if self.fallback_regex is not None:
+            spans.extend(match.span() for match in self.fallback_regex.finditer(message) if match.end() > match.start())
+        return sorted(spans)
+
+    def _matches(self, message):
+        """Yields (rule, match) for every rule match of the single scan, left to right."""
+        position = 0
+        search = self.trigger_regex.search
+        while True:
+            hit = search(message, position)
+            if hit is None:
+                return
+            start = hit.start()
+            for rule in self.candidates[hit.group()]:
+                match = rule.regex.match(message, start)
+                if match is not None and match.end() > start:
+                    yield rule, match
+                    position = match.end()
+                    break
+            else:
+                position = start + 1
+
+    def _scan(self, message):
+        pieces = []
+        emitted = 0
+        for rule, match in self._matches(message):
+            pieces.append(message[emitted:match.start()])
+            pieces.append(rule.replace(match))
+            emitted = match.end()
+        if not pieces:
+            return message
+        pieces.append(message[emitted:])
+        return ''.join(pieces)
+
+    def _replace_fallback(self, match):
+        for rule in self.fallback_rules:
+            inner = rule.regex.fullmatch(match.group(0))
+            if inner is not None:
+                return self._mask_pattern(inner)
+        return self.replacement
+
+    def _mask_all(self, match):
+        return self.replacement
+
+    def _mask_pattern(self, match):
+        if match.re.groups and match.start(1) >= 0:
+            start, end = match.start(1) - match.start(), match.end(1) - match.start()
+            text = match.group(0)
+            return text[:start] + self.replacement + text[end:]
+        return self.replacement
+
+    def _mask_assignment(self, match):
+        key = self.keyword_regex.sub(self.replacement, match.group('key'))
+        return key + match.group('sep') + self.replacement
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Loads rules from a JSON file:
+        {"keywords": [...], "patterns": {"name": "regex" or {"regex": ..., "triggers": [...]}},
+         "replacement": "[REDACTED]"}.
+        Keys that are missing fall back to the defaults.
+        """
+        with open(path, 'r') as f:
+            config = json.load(f)
+        return cls(config.get('keywords'), config.get('patterns'), config.get('replacement', REDACTED))
+
+
+class StreamRedactor:
+    """
+    Redacts a message that arrives in chunks, with the same result as redacting it whole.
+
+    feed() returns the redacted text that is final and holds back the rest: the tail that
+    could be the start of a trigger literal, and everything from the first trigger found in
+    the last `carry` characters (with custom patterns that have no literal prefix, the whole
+    `carry`), plus any match reaching into what is held. A secret split across chunks is thus
+    masked once all of it arrived, while text without triggers is passed on at once. close()
+    redacts what is left. Work and memory per chunk are the chunk plus at most the carry, so
+    they do not grow with the message; secrets longer than `carry` are not guaranteed to be
+    masked whole.
+    """
+
+    def __init__(self, redactor, carry=STREAM_CARRY):
+        self.redactor = redactor
+        self.carry = carry
+        self.pending = ''
+
+    def feed(self, chunk):
+        text = self.pending + chunk
+        boundary = self._boundary(text)
+        if boundary <= 0:
+            self.pending = text
+            return ''
+        self.pending = text[boundary:]
+        return self.redactor.redact(text[:boundary])
+
+    def _boundary(self, text):
+        """Length of the prefix of text that no more input can change the redaction of."""
+        redactor = self.redactor
+        window = max(len(text) - self.carry, 0)
+        if redactor.fallback_regex is not None:
+            boundary = window
+        else:
+            boundary = len(text) - max(redactor.longest_trigger - 1, 0)
+            hit = redactor.trigger_regex.search(text, window) if redactor.trigger_regex is not None else None
+            if hit is not None:
+                boundary = min(boundary, hit.start())
+        for start, end in reversed(redactor.spans(text)):
+            if start < boundary < end:
+                boundary = start
+        return boundary
+
+    def close(self):
+        text, self.pending = self.pending, ''
+        return self.redactor.redact(text)
+
+
+def load_redactor(path=None):
+    """Builds the redactor from a config file if one is given, falling back to the defaults on errors."""
+    if path:
+        try:
+            return Redactor.from_file(path)
+        except (OSError, ValueError, KeyError, re.error) as e:
+            logging.error(f"Could not load redaction config {path}, using defaults: {e}")
+    return Redactor()
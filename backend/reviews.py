@@ -0,0 +1,167 @@
+import os
+import time
+import hashlib
+import logging
+from collections import deque, OrderedDict
+from log_writer import _native_threading
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+
+def output_key(project_id, agent_id, output, digest=None):
+    """
+    Identity of a submission: the same output of the same agent in the same project is reviewed
+    once. `digest` is the output's sha256 when only an excerpt of it is passed (streamed outputs).
+    """
+    digest = digest or hashlib.sha256(output.encode('utf-8', 'surrogatepass')).hexdigest()
+    return (project_id, agent_id, digest)
+
+
+class Review:
+    """One critique of a submitted agent output, shared by identical submissions."""
+
+    def __init__(self, key, project_id, agent_id, output):
+        self.id = os.urandom(8).hex()
+        self.key = key
+        self.project_id = project_id
+        self.agent_id = agent_id
+        self.output = output
+        self.state = QUEUED
+        self.critique = None
+        self.error = None
+        self.submissions = 1
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self):
+        return {
+            "review_id": self.id,
+            "project_id": self.project_id,
+            "agent_id": self.agent_id,
+            "state": self.state,
+            "critique": self.critique,
+            "error": self.error,
+            "submissions": self.submissions,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class ReviewPipeline:
+    """
+    Critiques submitted agent outputs on a pool of critic threads.
+
+    submit() queues the output and returns its Review right away; `workers` threads take
+    reviews off the FIFO queue and call critic(agent_id, output, project_id), so up to `workers` critiques
+    (LLM calls, mostly waiting on the network) run at once. An output that is already queued,
+    being reviewed or among the last `keep_finished` finished reviews gets that review back
+    instead of a new one. `on_finish(review)` is called from the critic thread as each review
+    ends, so critiques are announced in the order they finish. Until start() is called (as
+    in the test client), submit() reviews inline.
+    """
+
+    def __init__(self, critic, workers=4, on_finish=None, keep_finished=1000):
+        self.critic = critic
+        self.workers = workers
+        self.on_finish = on_finish
+        self.keep_finished = keep_finished
+        Thread, Lock, Condition, _ = _native_threading()
+        self._thread_class = Thread
+        self.cond = Condition(Lock())
+        self.queue = deque()
+        self.reviews = {} # id -> Review, for lookups
+        self.active = {} # key -> Review still queued or running
+        self.finished = OrderedDict() # key -> finished Review, oldest first
+        self.threads = []
+        self.running = False
+        self.stats = {'submitted': 0, 'deduplicated': 0, 'reviewed': 0, 'failed': 0}
+
+    def start(self):
+        with self.cond:
+            if self.running:
+                return
+            self.running = True
+        self.threads = [self._thread_class(target=self._run, name=f'team-ready-critic-{i}', daemon=True)
+                        for i in range(self.workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        """Lets the critic threads finish what is queued, then ends them."""
+        with self.cond:
+            if not self.running:
+                return
+            self.running = False
+            self.cond.notify_all()
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+    def submit(self, project_id, agent_id, output, digest=None):
+        """Returns (review, deduplicated)."""
+        key = output_key(project_id, agent_id, output, digest)
+        with self.cond:
+            self.stats['submitted'] += 1
+            review = self.active.get(key) or self.finished.get(key)
+            if review is not None and review.state != FAILED:
+                review.submissions += 1
+                self.stats['deduplicated'] += 1
+                return review, True
+            review = Review(key, project_id, agent_id, output)
+            self.reviews[review.id] = review
+            self.active[key] = review
+            if self.running:
+                self.queue.append(review)
+                self.cond.notify()
+                return review, False
+        self._review(review)
+        return review, False
+
+    def get(self, review_id):
+        return self.reviews.get(review_id)
+
+    def pending(self):
+        """Reviews queued or running."""
+        with self.cond:
+            return len(self.active)
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while self.running and not self.queue:
+                    self.cond.wait()
+                if not self.queue:
+                    return
+                review = self.queue.popleft()
+            self._review(review)
+
+    def _review(self, review):
+        with self.cond:
+            review.state = RUNNING
+            review.started_at = time.time()
+        try:
+            critique, error = self.critic(review.agent_id, review.output, review.project_id), None
+        except Exception as e:
+            logging.exception(f"Critic failed on review {review.id}")
+            critique, error = None, f"{type(e).__name__}: {e}"
+        with self.cond:
+            review.critique, review.error = critique, error
+            review.state = DONE if error is None else FAILED
+            review.finished_at = time.time()
+            review.output = None # Only needed by the critic.
+            self.stats['reviewed' if error is None else 'failed'] += 1
+            self.active.pop(review.key, None)
+            replaced = self.finished.pop(review.key, None) # A failed review of the same output.
+            if replaced is not None:
+                self.reviews.pop(replaced.id, None)
+            self.finished[review.key] = review
+            while len(self.finished) > self.keep_finished:
+                _, old = self.finished.popitem(last=False)
+                self.reviews.pop(old.id, None)
+        if self.on_finish is not None:
+            try:
+                self.on_finish(review)
+            except Exception as e:
+                logging.error(f"Review {review.id} finish callback failed: {e}")
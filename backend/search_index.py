@@ -0,0 +1,454 @@
+import os
+import re
+import json
+import math
+import heapq
+import itertools
+import bisect
+import pickle
+import logging
+import threading
+from array import array
+from contextlib import contextmanager
+from log_writer import _native_threading
+
+SEARCH_DIRNAME = 'search'
+DOCS_FILENAME = 'docs.jsonl'
+JOURNAL_FILENAME = 'terms.journal'
+# The journal being covered by a snapshot still being written.
+OLD_JOURNAL_FILENAME = 'terms.journal.old'
+SNAPSHOT_FILENAME = 'index.snapshot'
+
+TOKEN_PATTERN = re.compile(r"\w+")
+SNIPPET_CHARS = 300
+# Ranking looks at no more than this many candidates (the newest ones) for very common terms.
+MAX_CANDIDATES = 10000
+MAX_PREFIX_EXPANSIONS = 64
+SOURCE_BOOST = {'todo': 1.0, 'decisions.log': 0.5}
+
+QUERY_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def tokenize(text):
+    """Lower-cased words; tabs and spaces never end up in a term, which the journal format relies on."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def index_terms(tokens):
+    """Terms indexed for a document: its words, plus word pairs ("a b") that answer phrase queries."""
+    terms = set(tokens)
+    terms.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    return terms
+
+
+def _contains(postings, doc_id):
+    i = bisect.bisect_left(postings, doc_id)
+    return i < len(postings) and postings[i] == doc_id
+
+
+class SearchIndex:
+    """
+    Incremental inverted index over log entries and todos of one data dir.
+
+    Documents get increasing ids, so every posting list is a sorted array of ids and appending
+    a document is an append per term. Phrases are answered from word-pair postings (a phrase of
+    n words must contain all of its n-1 consecutive pairs); a trailing `*` or the `prefix_last`
+    option expands a word through the sorted vocabulary. Results are ranked by idf of the matched
+    terms and a per-source boost, newest first on ties.
+
+    Document metadata (source, ref, time and a snippet) lives in docs.jsonl and is only read
+    for the returned hits. Postings are kept in memory, journaled per document to terms.journal
+    and snapshotted every `checkpoint_every` documents, so a restart loads the snapshot and
+    replays the short journal instead of re-reading the logs. The snapshot is written by a
+    thread of its own: adding documents only copies the postings and starts a new journal,
+    and the old one is removed once the snapshot covering it is on disk.
+    """
+
+    def __init__(self, index_dir, checkpoint_every=50000):
+        self.index_dir = index_dir
+        self.checkpoint_every = checkpoint_every
+        self.lock = threading.Lock()
+        self.postings = {}
+        self.vocabulary = [] # Sorted single words, for prefix expansion.
+        self.new_words = [] # Words added since the vocabulary was last sorted.
+        self.offsets = array('Q') # doc id -> offset of its line in docs.jsonl
+        self.sources = [] # Source names; doc_sources holds an index into it per document.
+        self.doc_sources = array('B')
+        self.deleted = set()
+        self.todos = {} # (todo key) -> (hash, doc id)
+        self.docs_size = 0
+        self.journaled = 0
+        self.docs_file = None
+        self.journal = None
+        self.loaded = False
+        self.checkpoint_thread = None
+        self._thread_class = _native_threading()[0]
+
+    def path(self, filename):
+        return os.path.join(self.index_dir, filename)
+
+    def is_valid(self):
+        """False once the data dir was wiped from under a loaded index."""
+        return not self.loaded or os.path.exists(self.path(DOCS_FILENAME))
+
+    def _load(self):
+        if self.loaded:
+            return
+        os.makedirs(self.index_dir, exist_ok=True)
+        snapshot_path = self.path(SNAPSHOT_FILENAME)
+        if os.path.exists(snapshot_path):
+            try:
+                with open(snapshot_path, 'rb') as f:
+                    snapshot = pickle.load(f)
+                self.postings = {term: array('I', data) for term, data in snapshot['postings'].items()}
+                self.offsets = array('Q', snapshot['offsets'])
+                self.sources = snapshot['sources']
+                self.doc_sources = array('B', snapshot['doc_sources'])
+                self.deleted = set(snapshot['deleted'])
+                self.todos = snapshot['todos']
+            except (OSError, ValueError, KeyError, pickle.UnpicklingError, EOFError) as e:
+                logging.error(f"Could not load search snapshot, starting over: {e}")
+                self.postings, self.offsets, self.deleted, self.todos = {}, array('Q'), set(), {}
+                self.sources, self.doc_sources = [], array('B')
+        docs_path = self.path(DOCS_FILENAME)
+        self.docs_file = open(docs_path, 'ab')
+        self.docs_size = self.docs_file.tell()
+        replayed = self._replay_journal()
+        if replayed:
+            logging.info(f"Replayed {replayed} search journal entries.")
+        self.vocabulary = sorted(term for term in self.postings if ' ' not in term)
+        self.journal = open(self.path(JOURNAL_FILENAME), 'a', encoding='utf-8')
+        self.loaded = True
+
+    def _replay_journal(self):
+        """
+        Journal lines are "<id>\t<offset>\t<source>\t<term>\t<term>..." for added documents,
+        "-\t<id>" for deleted ones and "todo\t<json [key, hash, id]>" for todo mappings.
+        An old journal left by a snapshot that was never written is replayed first.
+        """
+        replayed = 0
+        for filename in (OLD_JOURNAL_FILENAME, JOURNAL_FILENAME):
+            replayed += self._replay_journal_file(self.path(filename))
+        self.journaled = replayed
+        return replayed
+
+    def _replay_journal_file(self, path):
+        replayed = 0
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.endswith('\n'):
+                        break # Torn write at the end of the journal.
+                    fields = line[:-1].split('\t')
+                    replayed += 1
+                    if fields[0] == '-':
+                        self.deleted.add(int(fields[1]))
+                        continue
+                    if fields[0] == 'todo':
+                        key, digest, doc_id = json.loads(fields[1])
+                        if doc_id < len(self.offsets):
+                            self.todos[key] = (digest, doc_id)
+                        continue
+                    doc_id, offset = int(fields[0]), int(fields[1])
+                    if doc_id != len(self.offsets):
+                        continue # Already in the snapshot.
+                    if offset >= self.docs_size:
+                        break # The document itself never made it to docs.jsonl.
+                    self.offsets.append(offset)
+                    self.doc_sources.append(self._source_code(fields[2]))
+                    for term in fields[3:]:
+                        self.postings.setdefault(term, array('I')).append(doc_id)
+        except FileNotFoundError:
+            pass
+        return replayed
+
+    def _source_code(self, source):
+        try:
+            return self.sources.index(source)
+        except ValueError:
+            self.sources.append(source)
+            return len(self.sources) - 1
+
+    def add(self, source, text, ref=None, timestamp=None, todo_key=None, todo_hash=None):
+        """Indexes one document; returns its id."""
+        terms = index_terms(tokenize(text))
+        meta = json.dumps({"source": source, "ref": ref, "timestamp": timestamp, "text": text[:SNIPPET_CHARS]})
+        line = (meta + '\n').encode('utf-8')
+        with self.lock:
+            self._load()
+            doc_id = len(self.offsets)
+            self.offsets.append(self.docs_size)
+            self.doc_sources.append(self._source_code(source))
+            self.docs_file.write(line)
+            self.docs_size += len(line)
+            for term in terms:
+                postings = self.postings.get(term)
+                if postings is None:
+                    postings = self.postings[term] = array('I')
+                    if ' ' not in term:
+                        self.new_words.append(term)
+                postings.append(doc_id)
+            record = f"{doc_id}\t{self.offsets[doc_id]}\t{source}\t" + '\t'.join(terms) + '\n'
+            if todo_key is not None:
+                self.todos[todo_key] = (todo_hash, doc_id)
+                record += f"todo\t{json.dumps([todo_key, todo_hash, doc_id])}\n"
+            self.journal.write(record)
+            self._journaled()
+            return doc_id
+
+    def delete(self, doc_id):
+        with self.lock:
+            self._load()
+            self.deleted.add(doc_id)
+            self.journal.write(f"-\t{doc_id}\n")
+            self._journaled()
+
+    def _journaled(self):
+        self.journaled += 1
+        if self.journaled >= self.checkpoint_every and self.checkpoint_thread is None:
+            snapshot = self._rotate_journal()
+            self.checkpoint_thread = self._thread_class(
+                target=self._checkpoint_in_background, args=(snapshot,), name='team-ready-search-checkpoint', daemon=True)
+            self.checkpoint_thread.start()
+
+    def update_todos(self, items):
+        """Re-indexes the todos that changed since the last call and drops the removed ones."""
+        from todo_versions import item_keys, item_hash
+        current = {}
+        for key, item in zip(item_keys(items), items):
+            current[str(key)] = (item_hash(item), item)
+        with self.lock:
+            self._load()
+            known = dict(self.todos)
+        for key, (digest, doc_id) in known.items():
+            if key not in current or current[key][0] != digest:
+                self.delete(doc_id)
+                with self.lock:
+                    self.todos.pop(key, None)
+        for key, (digest, item) in current.items():
+            if key not in known or known[key][0] != digest:
+                text = item if isinstance(item, str) else ' '.join(str(value) for value in _values(item))
+                self.add('todo', text, ref=key, todo_key=key, todo_hash=digest)
+
+    def flush(self):
+        with self.lock:
+            if self.loaded:
+                self.docs_file.flush()
+                self.journal.flush()
+
+    def checkpoint(self):
+        """Writes a snapshot now, after the one being written in the background (if any)."""
+        with self._no_checkpoint_running():
+            if self.loaded and self.journaled:
+                self._checkpoint()
+
+    @contextmanager
+    def _no_checkpoint_running(self):
+        """Holds the lock once no snapshot is being written in the background."""
+        while True:
+            thread = self.checkpoint_thread
+            if thread is not None:
+                thread.join()
+            with self.lock:
+                if self.checkpoint_thread is None:
+                    yield
+                    return
+
+    def _rotate_journal(self):
+        """
+        Copies what the snapshot needs and starts a new journal; everything in the old one is
+        covered by the copy. Returns the copy, for _write_snapshot(). Called with the lock held.
+        """
+        self.docs_file.flush()
+        snapshot = {
+            'postings': {term: postings.tobytes() for term, postings in self.postings.items()},
+            'offsets': self.offsets.tobytes(),
+            'sources': list(self.sources),
+            'doc_sources': self.doc_sources.tobytes(),
+            'deleted': sorted(self.deleted),
+            'todos': dict(self.todos),
+        }
+        self.journal.close()
+        journal_path, old_path = self.path(JOURNAL_FILENAME), self.path(OLD_JOURNAL_FILENAME)
+        if os.path.exists(old_path):
+            # The last snapshot was never written: the new one has to cover both journals.
+            with open(journal_path, 'rb') as src, open(old_path, 'ab') as dst:
+                dst.write(src.read())
+            os.remove(journal_path)
+        else:
+            os.replace(journal_path, old_path)
+        self.journal = open(journal_path, 'a', encoding='utf-8')
+        self.journaled = 0
+        return snapshot
+
+    def _write_snapshot(self, snapshot):
+        tmp_path = self.path(SNAPSHOT_FILENAME) + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path(SNAPSHOT_FILENAME))
+        # Everything in the old journal is now covered by the snapshot.
+        try:
+            os.remove(self.path(OLD_JOURNAL_FILENAME))
+        except FileNotFoundError:
+            pass
+
+    def _checkpoint_in_background(self, snapshot):
+        try:
+            self._write_snapshot(snapshot)
+        except OSError as e:
+            # The old journal stays, so nothing is lost; the next checkpoint covers it.
+            logging.error(f"Could not write search snapshot of {self.index_dir}: {e}")
+        finally:
+            with self.lock:
+                self.checkpoint_thread = None
+
+    def _checkpoint(self):
+        self._write_snapshot(self._rotate_journal())
+
+    def search(self, query, limit=20, source=None, prefix_last=False):
+        """
+        Returns up to `limit` hits as {"id", "score", "source", "ref", "timestamp", "text"}, best first.
+        Quoted parts of the query are phrases; `word*` (or the last word with prefix_last) is a prefix.
+        """
+        groups = self._parse(query, prefix_last)
+        if not groups:
+            return []
+        with self.lock:
+            self._load()
+            doc_count = max(len(self.offsets), 1)
+            clauses = []
+            for group in groups:
+                postings = [self.postings.get(term) for term in group]
+                postings = [p for p in postings if p]
+                if not postings:
+                    return [] # Every clause must match.
+                idf = max(math.log(1 + doc_count / len(p)) for p in postings)
+                clauses.append((postings, idf))
+            # Walk the rarest clause and check the others by bisection.
+            clauses.sort(key=lambda clause: sum(len(p) for p in clause[0]))
+            boosts = [SOURCE_BOOST.get(name, 0.0) for name in self.sources]
+            wanted = self.sources.index(source) if source in self.sources else -1
+            ranked = []
+            for doc_id in self._candidates(clauses[0][0]):
+                if doc_id in self.deleted:
+                    continue
+                code = self.doc_sources[doc_id]
+                if source is not None and code != wanted:
+                    continue
+                score = clauses[0][1] + boosts[code]
+                for postings, idf in clauses[1:]:
+                    if not any(_contains(p, doc_id) for p in postings):
+                        break
+                    score += idf
+                else:
+                    ranked.append((score, doc_id))
+            # Equal scores rank the newest document first.
+            top = heapq.nlargest(limit, ranked)
+            offsets = [self.offsets[doc_id] for _, doc_id in top]
+            self.docs_file.flush()
+        results = []
+        with open(self.path(DOCS_FILENAME), 'rb') as f:
+            for (score, doc_id), offset in zip(top, offsets):
+                f.seek(offset)
+                results.append(dict(json.loads(f.readline()), id=doc_id, score=round(score, 4)))
+        return results
+
+    def _candidates(self, postings):
+        """Union of a clause's posting lists, newest first, capped at MAX_CANDIDATES."""
+        if len(postings) == 1:
+            return reversed(postings[0][-MAX_CANDIDATES:])
+        merged = set()
+        for p in postings:
+            merged.update(p[-MAX_CANDIDATES:])
+        return sorted(merged, reverse=True)[:MAX_CANDIDATES]
+
+    def _parse(self, query, prefix_last):
+        """Turns a query into clauses; each clause is a list of alternative terms (all must-match)."""
+        groups = []
+        parts = QUERY_PATTERN.findall(query)
+        for i, (phrase, word) in enumerate(parts):
+            if phrase:
+                tokens = tokenize(phrase)
+                if len(tokens) == 1:
+                    groups.append([tokens[0]])
+                groups.extend([[f"{a} {b}"] for a, b in zip(tokens, tokens[1:])])
+                continue
+            is_prefix = word.endswith('*') or (prefix_last and i == len(parts) - 1)
+            tokens = tokenize(word)
+            if not tokens:
+                continue
+            for token in tokens[:-1]:
+                groups.append([token])
+            last = tokens[-1]
+            groups.append(self._expand(last) if is_prefix else [last])
+        return groups
+
+    def _expand(self, prefix):
+        with self.lock:
+            self._load()
+            if self.new_words:
+                self.vocabulary = sorted(self.vocabulary + self.new_words)
+                self.new_words = []
+            start = bisect.bisect_left(self.vocabulary, prefix)
+            expansions = []
+            for term in itertools.islice(self.vocabulary, start, None):
+                if not term.startswith(prefix):
+                    break
+                expansions.append(term)
+            if len(expansions) > MAX_PREFIX_EXPANSIONS:
+                # Keep the most frequent completions.
+                expansions.sort(key=lambda term: len(self.postings[term]), reverse=True)
+                expansions = expansions[:MAX_PREFIX_EXPANSIONS]
+        return expansions or [prefix]
+
+    def close(self, checkpoint=True):
+        """Closes the index files, snapshotting first unless the data dir is already gone."""
+        with self._no_checkpoint_running():
+            if self.loaded:
+                if checkpoint and self.journaled:
+                    self._checkpoint()
+                for f in (self.docs_file, self.journal):
+                    try:
+                        f.close()
+                    except OSError:
+                        pass
+                self.docs_file = self.journal = None
+                self.loaded = False
+
+
+def _values(item):
+    if isinstance(item, dict):
+        for value in item.values():
+            yield from _values(value)
+    elif isinstance(item, (list, tuple)):
+        for value in item:
+            yield from _values(value)
+    elif item is not None:
+        yield item
+
+
+_indexes = {}
+_indexes_guard = threading.Lock()
+
+
+def get_index(data_dir, **options):
+    """Returns the shared search index of a data dir, replacing it if the data dir was wiped."""
+    index_dir = os.path.join(data_dir, SEARCH_DIRNAME)
+    with _indexes_guard:
+        index = _indexes.get(index_dir)
+        if index is None or not index.is_valid():
+            if index is not None:
+                index.close(checkpoint=False)
+            index = _indexes[index_dir] = SearchIndex(index_dir, **options)
+        return index
+
+
+def close_all():
+    """Snapshots and closes every open index (at shutdown)."""
+    with _indexes_guard:
+        for index in _indexes.values():
+            try:
+                index.close(checkpoint=index.is_valid())
+            except OSError as e:
+                logging.error(f"Could not close search index {index.index_dir}: {e}")
+        _indexes.clear()
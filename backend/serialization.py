@@ -0,0 +1,122 @@
+import json
+import math
+
+try:
+    import orjson # Optional: several times faster than the json module at both ends.
+except ImportError:
+    orjson = None
+
+# Binary documents start with this, so decode() can tell them from JSON text.
+MSGPACK_MAGIC = b'\x00TRMP1'
+
+
+def dumps(data):
+    """Compact JSON text, with orjson when it is installed."""
+    return dump_bytes(data).decode('utf-8')
+
+
+def dump_bytes(data):
+    if orjson is not None:
+        try:
+            encoded = orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass # Types orjson does not know (or ints beyond 64 bits): let the json module decide.
+        else:
+            # orjson writes NaN and infinities as null; the json module keeps them (as NaN, Infinity).
+            if b'null' not in encoded or not has_non_finite(data):
+                return encoded
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def has_non_finite(data):
+    """Whether a float NaN or infinity is anywhere in the document (walked without recursion, for speed)."""
+    pending = [data]
+    while pending:
+        value = pending.pop()
+        if isinstance(value, str):
+            continue
+        if isinstance(value, float):
+            if not math.isfinite(value):
+                return True
+        elif isinstance(value, dict):
+            pending.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            pending.extend(value)
+    return False
+
+
+def loads(text):
+    if orjson is not None:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            pass # NaN and Infinity, which orjson rejects, or malformed: the json module decides.
+    return json.loads(text)
+
+
+class JsonCodec:
+    """Compact JSON."""
+
+    name = 'json'
+
+    def encode(self, data):
+        return dump_bytes(data)
+
+
+class PrettyJsonCodec:
+    """JSON indented by four spaces: the original, hand-editable layout of the data dir."""
+
+    name = 'json-pretty'
+
+    def encode(self, data):
+        return json.dumps(data, indent=4).encode('utf-8')
+
+
+class MsgpackCodec:
+    """MessagePack behind a magic prefix; needs the msgpack package."""
+
+    name = 'msgpack'
+
+    def __init__(self):
+        import msgpack
+        self.msgpack = msgpack
+
+    def encode(self, data):
+        return MSGPACK_MAGIC + self.msgpack.packb(data, use_bin_type=True)
+
+
+CODECS = {codec.name: codec for codec in (JsonCodec, PrettyJsonCodec, MsgpackCodec)}
+_codecs = {}
+
+
+def get_codec(name):
+    """Returns the codec used to write documents; raises ValueError for unknown or unavailable ones."""
+    codec = _codecs.get(name)
+    if codec is None:
+        if name not in CODECS:
+            raise ValueError(f"Unknown codec: {name}")
+        try:
+            codec = _codecs[name] = CODECS[name]()
+        except ImportError as e:
+            raise ValueError(f"Codec {name} is not available: {e}")
+    return codec
+
+
+def decode(data):
+    """Decodes a document written by any codec, telling binary ones by their prefix."""
+    if data.startswith(MSGPACK_MAGIC):
+        import msgpack
+        return msgpack.unpackb(data[len(MSGPACK_MAGIC):], raw=False, strict_map_key=False)
+    return loads(data)
+
+
+class SocketJSON:
+    """The `json` module handed to Socket.IO: the same compact (orjson) encoding for emitted packets."""
+
+    @staticmethod
+    def dumps(data, *args, **kwargs):
+        return dumps(data)
+
+    @staticmethod
+    def loads(text, *args, **kwargs):
+        return loads(text)
@@ -0,0 +1,164 @@
+import os
+import time
+import logging
+import threading
+
+CONFIG_FILE = 'config.json'
+JOURNAL_FILENAME = 'spend.journal'
+
+# Spend is kept in integer micro-units so concurrent additions are exact and order-independent.
+MICROS = 1_000_000
+
+
+def to_micros(amount):
+    return int(round(float(amount) * MICROS))
+
+
+def from_micros(micros):
+    return micros / MICROS
+
+
+class SpendLedger:
+    """
+    In-memory project spend counter backed by an append-only cost journal.
+
+    Every charge bumps the counter and appends "<seq> <micros>" to the journal under a short
+    in-process lock, so the hard-limit check is O(1) and no increment can be lost. The total is
+    checkpointed into config.json every `checkpoint_every` charges, after `checkpoint_interval`
+    seconds, when the limit is reached, or on demand. On restart, journal entries newer than
+    the checkpoint (config['spend_checkpoint_seq']) are replayed on top of config['project_spend'].
+    """
+
+    def __init__(self, storage, journal_path, checkpoint_every=50, checkpoint_interval=5.0, fsync=False):
+        self.storage = storage
+        self.journal_path = journal_path
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_interval = checkpoint_interval
+        self.fsync = fsync
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.spend_micros = 0
+        self.limit_micros = None
+        self.seq = 0
+        self.checkpointed_seq = 0
+        self.last_checkpoint = time.monotonic()
+        self.journal = None
+
+    def is_valid(self):
+        """False once the data dir was wiped from under a loaded ledger."""
+        return not self.loaded or os.path.exists(self.journal_path)
+
+    def load(self):
+        """Loads the checkpoint from config.json and replays newer journal entries. Returns False without a config."""
+        with self.lock:
+            return self._load()
+
+    def _load(self):
+        if self.loaded:
+            return True
+        config = self.storage.read(CONFIG_FILE)
+        if config is None:
+            return False
+        self.spend_micros = to_micros(config.get('project_spend', 0.0))
+        self.limit_micros = to_micros(config['hard_limit']) if config.get('hard_limit') is not None else None
+        self.seq = self.checkpointed_seq = config.get('spend_checkpoint_seq', 0)
+        replayed = 0
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, 'r') as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) != 2:
+                        continue # Torn write at the end of the journal.
+                    seq, micros = int(parts[0]), int(parts[1])
+                    if seq > self.checkpointed_seq:
+                        self.spend_micros += micros
+                        self.seq = max(self.seq, seq)
+                        replayed += 1
+        if replayed:
+            logging.info(f"Replayed {replayed} spend journal entries.")
+        self.journal = open(self.journal_path, 'a')
+        self.loaded = True
+        self.last_checkpoint = time.monotonic()
+        return True
+
+    def charge(self, cost):
+        """
+        Adds a cost to the project spend.
+        Returns (project_spend, limit_reached), or None when there is no config.json yet.
+        """
+        micros = to_micros(cost)
+        with self.lock:
+            if not self._load():
+                return None
+            self.seq += 1
+            self.spend_micros += micros
+            self.journal.write(f"{self.seq} {micros}\n")
+            self.journal.flush()
+            if self.fsync:
+                os.fsync(self.journal.fileno())
+            limit_reached = self.limit_micros is not None and self.spend_micros >= self.limit_micros
+            if (limit_reached or self.seq - self.checkpointed_seq >= self.checkpoint_every
+                    or time.monotonic() - self.last_checkpoint >= self.checkpoint_interval):
+                self._checkpoint()
+            return from_micros(self.spend_micros), limit_reached
+
+    def spend(self):
+        with self.lock:
+            return from_micros(self.spend_micros) if self._load() else None
+
+    def remaining(self):
+        """Budget left before the hard limit, or None when unknown."""
+        with self.lock:
+            if not self._load() or self.limit_micros is None:
+                return None
+            return from_micros(self.limit_micros - self.spend_micros)
+
+    def checkpoint(self):
+        """Writes the current total into config.json if charges happened since the last checkpoint."""
+        with self.lock:
+            if self.loaded and self.seq != self.checkpointed_seq:
+                self._checkpoint()
+
+    def _checkpoint(self):
+        self.storage.set_keys(CONFIG_FILE, {
+            'project_spend': from_micros(self.spend_micros),
+            'spend_checkpoint_seq': self.seq,
+        })
+        self.checkpointed_seq = self.seq
+        self.last_checkpoint = time.monotonic()
+        # Everything in the journal is now covered by the checkpoint.
+        self.journal.truncate(0)
+
+    def adopt(self, config):
+        """Takes config.json as written by someone else (e.g. /init or an edited hard_limit) as the new truth."""
+        with self.lock:
+            if self.journal is None:
+                self.journal = open(self.journal_path, 'a')
+            self.spend_micros = to_micros(config.get('project_spend', 0.0))
+            self.limit_micros = to_micros(config['hard_limit']) if config.get('hard_limit') is not None else None
+            self.seq = self.checkpointed_seq = config.get('spend_checkpoint_seq', 0)
+            self.journal.truncate(0)
+            self.loaded = True
+            self.last_checkpoint = time.monotonic()
+
+    def close(self):
+        with self.lock:
+            if self.journal is not None:
+                self.journal.close()
+                self.journal = None
+            self.loaded = False
+
+
+_ledgers = {}
+_ledgers_guard = threading.Lock()
+
+
+def get_ledger(storage, journal_path, **options):
+    """Returns the shared ledger for a journal path, replacing it if its data dir was wiped."""
+    with _ledgers_guard:
+        ledger = _ledgers.get(journal_path)
+        if ledger is None or ledger.storage is not storage or not ledger.is_valid():
+            if ledger is not None:
+                ledger.close()
+            ledger = _ledgers[journal_path] = SpendLedger(storage, journal_path, **options)
+        return ledger
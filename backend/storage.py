@@ -0,0 +1,341 @@
+import os
+import json
+import glob
+import logging
+import threading
+from lock_timing import FileLock
+import serialization
+
+
+class JsonFileStorage:
+    """
+    Stores each document as a JSON file in the data dir (the original layout).
+
+    File contents are cached in memory together with the signature of the file they came
+    from. A read of an unchanged file costs one stat() and a decode of the cached contents,
+    and takes neither the file lock nor the disk; a changed inode, size or mtime (an outside
+    edit) makes the next read load the file again, and our own writes drop the cached copy.
+    Every read returns a document of its own, which the caller may change: decoding the cached
+    contents again is faster than copy.deepcopy of a parsed document.
+
+    Documents are written with `codec` (see serialization.py) and read whatever codec wrote them.
+    """
+
+    name = 'json'
+
+    def __init__(self, data_dir, codec='json'):
+        self.data_dir = data_dir
+        self.codec = serialization.get_codec(codec)
+        self.cache = {} # filename -> (signature, file contents)
+        self.stats = {'hits': 0, 'parses': 0}
+
+    def path(self, filename):
+        return os.path.join(self.data_dir, filename)
+
+    def is_valid(self):
+        return True
+
+    def signature(self, filename):
+        """Cheap fingerprint of a document that changes whenever it is rewritten; None if it does not exist."""
+        try:
+            stat = os.stat(self.path(filename))
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def read(self, filename, default_value=None):
+        """Reads a JSON file, from the cache if it did not change since it was last loaded."""
+        cached = self.cache.get(filename)
+        if cached is not None and cached[0] == self.signature(filename):
+            self.stats['hits'] += 1
+            return serialization.decode(cached[1])
+        filepath = self.path(filename)
+        with FileLock(filepath + ".lock"):
+            signature = self.signature(filename)
+            if signature is None:
+                self.cache.pop(filename, None)
+                return default_value
+            with open(filepath, 'rb') as f:
+                contents = f.read()
+            self.stats['parses'] += 1
+            self.cache[filename] = (signature, contents)
+            return serialization.decode(contents)
+
+    def write(self, filename, data):
+        """Writes data to a JSON file with a file lock."""
+        filepath = self.path(filename)
+        with FileLock(filepath + ".lock"):
+            self._dump(filepath, data)
+
+    def append_item(self, filename, item):
+        """Appends an item to a list document and returns its index."""
+        filepath = self.path(filename)
+        with FileLock(filepath + ".lock"):
+            items = self._load(filepath, [])
+            items.append(item)
+            self._dump(filepath, items)
+        return len(items) - 1
+
+    def update_item(self, filename, index, item):
+        """Replaces one item of a list document."""
+        filepath = self.path(filename)
+        with FileLock(filepath + ".lock"):
+            items = self._load(filepath, [])
+            items[index] = item
+            self._dump(filepath, items)
+
+    def set_key(self, filename, key, value):
+        """Sets one key of an object document."""
+        self.set_keys(filename, {key: value})
+
+    def set_keys(self, filename, values):
+        """Sets several keys of an object document at once."""
+        filepath = self.path(filename)
+        with FileLock(filepath + ".lock"):
+            data = self._load(filepath, {})
+            data.update(values)
+            self._dump(filepath, data)
+
+    def _load(self, filepath, default_value):
+        if os.path.exists(filepath):
+            with open(filepath, 'rb') as f:
+                return serialization.decode(f.read())
+        return default_value
+
+    def _dump(self, filepath, data):
+        self.cache.pop(os.path.basename(filepath), None)
+        encoded = self.codec.encode(data)
+        with open(filepath, 'wb') as f:
+            f.write(encoded)
+
+
+class SQLiteStorage:
+    """
+    Stores documents in a SQLite database in WAL mode, one row per list item or object key.
+
+    Writes only touch the rows that changed, readers never block the writer, and existing
+    .json documents in the data dir are imported the first time the database is created.
+    """
+
+    name = 'sqlite'
+    DB_FILENAME = 'state.db'
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS documents (
+            name TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            value TEXT
+        );
+        CREATE TABLE IF NOT EXISTS object_entries (
+            name TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value TEXT NOT NULL,
+            PRIMARY KEY (name, key)
+        );
+        CREATE TABLE IF NOT EXISTS array_items (
+            name TEXT NOT NULL,
+            pos INTEGER NOT NULL,
+            value TEXT NOT NULL,
+            PRIMARY KEY (name, pos)
+        );
+    """
+
+    def __init__(self, data_dir, codec=None):
+        self.data_dir = data_dir # Rows are always JSON text; `codec` only matters for the JSON backend.
+        self.db_path = os.path.join(data_dir, self.DB_FILENAME)
+        self.local = threading.local()
+        os.makedirs(data_dir, exist_ok=True)
+        created = not os.path.exists(self.db_path)
+        conn = self.connection()
+        conn.executescript(self.SCHEMA)
+        if created:
+            self.import_json_files()
+
+    def connection(self):
+        """Returns this thread's connection; SQLite connections must not be shared across threads."""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            import sqlite3 # Only the sqlite backend needs it; keep it off the import path of app.py.
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def is_valid(self):
+        """False once the database file was removed from under us (e.g. the data dir was wiped)."""
+        return os.path.exists(self.db_path)
+
+    def signature(self, filename):
+        """Fingerprint of the whole database (any committed write changes the db or its WAL)."""
+        parts = []
+        for path in (self.db_path, self.db_path + '-wal'):
+            try:
+                stat = os.stat(path)
+                parts.append((stat.st_ino, stat.st_size, stat.st_mtime_ns))
+            except FileNotFoundError:
+                parts.append(None)
+        return tuple(parts)
+
+    def close(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self.local.conn = None
+
+    def import_json_files(self):
+        """Imports every *.json document found in the data dir."""
+        for filepath in sorted(glob.glob(os.path.join(self.data_dir, '*.json'))):
+            filename = os.path.basename(filepath)
+            try:
+                with open(filepath, 'rb') as f:
+                    data = serialization.decode(f.read())
+            except (OSError, ValueError) as e:
+                logging.error(f"Could not import {filename} into {self.DB_FILENAME}: {e}")
+                continue
+            self.write(filename, data)
+            logging.info(f"Imported {filename} into {self.DB_FILENAME}.")
+
+    def read(self, filename, default_value=None):
+        """Reads a whole document from one consistent snapshot."""
+        conn = self.connection()
+        conn.execute("BEGIN")
+        try:
+            return self._read(conn, filename, default_value)
+        finally:
+            conn.execute("COMMIT")
+
+    def _read(self, conn, filename, default_value):
+        row = conn.execute("SELECT kind, value FROM documents WHERE name = ?", (filename,)).fetchone()
+        if row is None:
+            return default_value
+        kind, value = row
+        if kind == 'object':
+            rows = conn.execute("SELECT key, value FROM object_entries WHERE name = ? ORDER BY rowid", (filename,))
+            return {key: json.loads(value) for key, value in rows}
+        if kind == 'array':
+            rows = conn.execute("SELECT value FROM array_items WHERE name = ? ORDER BY pos", (filename,))
+            return [json.loads(value) for (value,) in rows]
+        return json.loads(value)
+
+    def write(self, filename, data):
+        """Writes a whole document, updating only the rows whose value changed."""
+        with self.transaction() as conn:
+            kind = self._set_kind(conn, filename, data)
+            if kind == 'object':
+                existing = dict(conn.execute("SELECT key, value FROM object_entries WHERE name = ?", (filename,)))
+                for key, value in data.items():
+                    encoded = json.dumps(value)
+                    if existing.pop(key, None) != encoded:
+                        conn.execute("INSERT INTO object_entries (name, key, value) VALUES (?, ?, ?) "
+                                     "ON CONFLICT (name, key) DO UPDATE SET value = excluded.value",
+                                     (filename, key, encoded))
+                conn.executemany("DELETE FROM object_entries WHERE name = ? AND key = ?",
+                                 [(filename, key) for key in existing])
+            elif kind == 'array':
+                existing = dict(conn.execute("SELECT pos, value FROM array_items WHERE name = ?", (filename,)))
+                for pos, value in enumerate(data):
+                    encoded = json.dumps(value)
+                    if existing.pop(pos, None) != encoded:
+                        conn.execute("INSERT INTO array_items (name, pos, value) VALUES (?, ?, ?) "
+                                     "ON CONFLICT (name, pos) DO UPDATE SET value = excluded.value",
+                                     (filename, pos, encoded))
+                conn.execute("DELETE FROM array_items WHERE name = ? AND pos >= ?", (filename, len(data)))
+
+    def append_item(self, filename, item):
+        """Appends an item to a list document and returns its index."""
+        with self.transaction() as conn:
+            self._set_kind(conn, filename, [])
+            (count,) = conn.execute("SELECT COUNT(*) FROM array_items WHERE name = ?", (filename,)).fetchone()
+            conn.execute("INSERT INTO array_items (name, pos, value) VALUES (?, ?, ?)",
+                         (filename, count, json.dumps(item)))
+        return count
+
+    def update_item(self, filename, index, item):
+        """Replaces one item of a list document."""
+        with self.transaction() as conn:
+            cursor = conn.execute("UPDATE array_items SET value = ? WHERE name = ? AND pos = ?",
+                                  (json.dumps(item), filename, index))
+            if cursor.rowcount == 0:
+                raise IndexError(f"{filename} has no item at index {index}")
+
+    def set_key(self, filename, key, value):
+        """Sets one key of an object document."""
+        self.set_keys(filename, {key: value})
+
+    def set_keys(self, filename, values):
+        """Sets several keys of an object document in one transaction."""
+        with self.transaction() as conn:
+            self._set_kind(conn, filename, {})
+            conn.executemany("INSERT INTO object_entries (name, key, value) VALUES (?, ?, ?) "
+                             "ON CONFLICT (name, key) DO UPDATE SET value = excluded.value",
+                             [(filename, key, json.dumps(value)) for key, value in values.items()])
+
+    def transaction(self):
+        return _Transaction(self.connection())
+
+    def _set_kind(self, conn, filename, data):
+        if isinstance(data, dict):
+            kind, value = 'object', None
+        elif isinstance(data, list):
+            kind, value = 'array', None
+        else:
+            kind, value = 'scalar', json.dumps(data)
+        row = conn.execute("SELECT kind FROM documents WHERE name = ?", (filename,)).fetchone()
+        if row is None or row[0] != kind or kind == 'scalar':
+            conn.execute("DELETE FROM object_entries WHERE name = ?", (filename,))
+            conn.execute("DELETE FROM array_items WHERE name = ?", (filename,))
+            conn.execute("INSERT OR REPLACE INTO documents (name, kind, value) VALUES (?, ?, ?)",
+                         (filename, kind, value))
+        return kind
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT, rolled back on error."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+STORAGE_BACKENDS = {
+    JsonFileStorage.name: JsonFileStorage,
+    SQLiteStorage.name: SQLiteStorage,
+}
+
+_storages = {}
+_storages_guard = threading.Lock()
+
+
+def get_storage(backend, data_dir, codec='json'):
+    """Returns the shared storage instance for a backend name, data dir and codec."""
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown storage backend: {backend}")
+    with _storages_guard:
+        storage = _storages.get((backend, data_dir, codec))
+        if storage is None or not storage.is_valid():
+            storage = _storages[(backend, data_dir, codec)] = STORAGE_BACKENDS[backend](data_dir, codec)
+        return storage
+
+
+def json_cache_stats():
+    """Reads answered from the cache (hits) and from the file (parses), summed over the open JSON file storages."""
+    with _storages_guard:
+        storages = [storage for storage in _storages.values() if isinstance(storage, JsonFileStorage)]
+    return {key: sum(storage.stats[key] for storage in storages) for key in ('hits', 'parses')}
+
+
+def close_storages():
+    """Drops cached storage instances, e.g. after a data dir was removed."""
+    with _storages_guard:
+        for storage in _storages.values():
+            if hasattr(storage, 'close'):
+                storage.close()
+        _storages.clear()
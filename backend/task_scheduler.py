@@ -0,0 +1,283 @@
+import heapq
+import logging
+import threading
+from todo_versions import item_keys
+
+PENDING, RUNNING, DONE, FAILED = 'pending', 'running', 'done', 'failed'
+DEFAULT_COST = 1.0
+
+
+class Task:
+    """A todo as a node of the dependency graph."""
+
+    __slots__ = ('id', 'text', 'deps', 'dependents', 'priority', 'cost', 'status', 'waiting', 'order', 'job_id', 'error')
+
+    def __init__(self, task_id, text, deps, priority, cost, status, order):
+        self.id = task_id
+        self.text = text
+        self.deps = deps
+        self.dependents = []
+        self.priority = priority
+        self.cost = cost
+        self.status = status
+        self.waiting = 0 # Dependencies not done yet.
+        self.order = order # Position in todo.json, the tie-breaker between equal priorities.
+        self.job_id = None
+        self.error = None
+
+    def to_dict(self):
+        return {"id": self.id, "task": self.text, "status": self.status, "priority": self.priority,
+                "estimated_cost": self.cost, "depends_on": self.deps, "job_id": self.job_id, "error": self.error}
+
+
+def _number(value, default):
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else default
+
+
+def parse_todos(items):
+    """
+    Tasks of a todo list, keyed like todo_versions.item_keys. A todo may carry "depends_on"
+    (ids of other todos), "priority" (higher runs first, default 0), "estimated_cost" (default 1)
+    and "status" (pending, running, done or failed). Plain strings are independent tasks.
+    Returns (tasks by id, problems): dependencies on unknown ids are dropped and reported.
+    """
+    tasks, problems = {}, []
+    for order, (key, item) in enumerate(zip(item_keys(items), items)):
+        if isinstance(item, dict):
+            text = item.get('task') or item.get('title') or item.get('description') or str(key)
+            deps = item.get('depends_on') or []
+            deps = [deps] if isinstance(deps, (str, int)) else list(deps)
+            status = item.get('status', PENDING)
+            priority = _number(item.get('priority'), 0)
+            cost = max(_number(item.get('estimated_cost'), DEFAULT_COST), 0.0)
+        else:
+            text, deps, status, priority, cost = str(item), [], PENDING, 0, DEFAULT_COST
+        # A task that was running when the scheduler went away is started again.
+        status = status if status in (DONE, FAILED) else PENDING
+        tasks[key] = Task(key, text, deps, priority, cost, status, order)
+    for task in tasks.values():
+        known = []
+        for dep in dict.fromkeys(task.deps):
+            if dep in tasks and dep != task.id:
+                known.append(dep)
+            else:
+                problems.append(f"Task {task.id} depends on unknown task {dep!r}")
+        task.deps = known
+        for dep in known:
+            tasks[dep].dependents.append(task.id)
+    return tasks, problems
+
+
+def _structure(items):
+    """What the graph is built from, minus the statuses the scheduler writes itself."""
+    return [{k: v for k, v in item.items() if k not in ('status', 'job_id')} if isinstance(item, dict) else item
+            for item in items]
+
+
+class TaskScheduler:
+    """
+    Runs a project's todo list as a dependency graph.
+
+    Tasks whose dependencies are all done wait in a ready heap ordered by priority (then
+    position in the list); up to `parallelism` of them are handed to `dispatch(task)` at once,
+    which starts the work and returns a job id. When finish() reports a task done, only its
+    dependents are looked at: each one's count of unfinished dependencies drops by one and
+    those reaching zero join the heap, so completing a task costs O(its out-degree + log n).
+    A failed task leaves its dependents blocked. `on_change(tasks)` gets the tasks whose status
+    changed, after the scheduler's lock is released (so it may write todo.json, which calls
+    sync()). With enough parallelism the project takes about as long as its critical path (the
+    costliest dependency chain) instead of the sum of its tasks.
+    """
+
+    def __init__(self, items, dispatch, parallelism=4, on_change=None):
+        self.dispatch = dispatch
+        self.parallelism = parallelism
+        self.on_change = on_change
+        self.lock = threading.RLock()
+        self.running = {} # task id -> Task
+        self.jobs = {} # job id -> task id
+        self.stopped = False
+        self.paused = False
+        self.changed = [] # Tasks for the next on_change call.
+        self.dispatching = False
+        self.finished_early = {} # job id -> (succeeded, error) of jobs that ended inside dispatch()
+        self.cyclic = []
+        self._load(items)
+
+    def _load(self, items):
+        self.tasks, self.problems = parse_todos(items)
+        self.structure = _structure(items)
+        self.ready = []
+        for task in self.tasks.values():
+            if task.id in self.running:
+                task.status, task.job_id = RUNNING, self.running[task.id].job_id
+                self.running[task.id] = task
+            task.waiting = sum(1 for dep in task.deps if self.tasks[dep].status != DONE)
+            if task.status == PENDING and task.waiting == 0:
+                heapq.heappush(self.ready, (-task.priority, task.order, task.id))
+        for task_id in [task_id for task_id in self.running if task_id not in self.tasks]:
+            del self.running[task_id] # Removed from the list; its job's result is ignored.
+        self._critical = None
+
+    def sync(self, items):
+        """
+        Takes in a todo list edited by someone else. Only a change to the tasks themselves (not
+        to the statuses this scheduler writes) rebuilds the graph; running tasks keep running.
+        """
+        with self.lock:
+            if _structure(items) != self.structure:
+                self._load(items)
+        return self.start()
+
+    def start(self):
+        """Dispatches ready tasks up to the parallelism limit; returns the tasks started."""
+        started = []
+        with self.lock:
+            while self.ready and len(self.running) < self.parallelism and not (self.stopped or self.paused):
+                _, _, task_id = heapq.heappop(self.ready)
+                task = self.tasks[task_id]
+                task.status = RUNNING
+                self.running[task_id] = task
+                self._critical = None
+                self.dispatching = True
+                try:
+                    task.job_id = self.dispatch(task)
+                except Exception as e:
+                    logging.error(f"Could not dispatch task {task_id}: {e}")
+                    self._finish(task, False, f"{type(e).__name__}: {e}")
+                    continue
+                finally:
+                    self.dispatching = False
+                    early, self.finished_early = self.finished_early.pop(task.job_id, None), {}
+                started.append(task)
+                self.changed.append(task)
+                if early is not None:
+                    self._finish(task, *early)
+                elif task.job_id is not None:
+                    self.jobs[task.job_id] = task_id
+        self._report_changes()
+        return started
+
+    def finish(self, task_id, succeeded, error=None):
+        """Records the end of a running task, unblocks its dependents and dispatches what became ready."""
+        with self.lock:
+            task = self.running.get(task_id)
+            if task is None:
+                return []
+            self._finish(task, succeeded, error)
+        return self.start()
+
+    def finish_job(self, job_id, succeeded, error=None):
+        """finish() for the task a job was dispatched for; a job of no task here is ignored."""
+        with self.lock:
+            task_id = self.jobs.pop(job_id, None)
+            if task_id is None and self.dispatching:
+                # Only the dispatching thread gets here (it holds the lock): its job ended before
+                # dispatch() returned the id, and start() finishes the task once it has it.
+                self.finished_early[job_id] = (succeeded, error)
+        if task_id is None:
+            return []
+        return self.finish(task_id, succeeded, error)
+
+    def _finish(self, task, succeeded, error):
+        del self.running[task.id]
+        task.status = DONE if succeeded else FAILED
+        task.error = error
+        self._critical = None
+        if succeeded:
+            for dependent_id in task.dependents:
+                dependent = self.tasks[dependent_id]
+                dependent.waiting -= 1
+                if dependent.waiting == 0 and dependent.status == PENDING:
+                    heapq.heappush(self.ready, (-dependent.priority, dependent.order, dependent_id))
+        self.changed.append(task)
+
+    def _report_changes(self):
+        with self.lock:
+            tasks, self.changed = self.changed, []
+        if tasks and self.on_change is not None:
+            try:
+                self.on_change(tasks)
+            except Exception as e:
+                logging.error(f"Task change callback failed: {e}")
+
+    def stop(self):
+        """Dispatches nothing more; running tasks are left to finish (or to be killed by the caller)."""
+        with self.lock:
+            self.stopped = True
+
+    def set_paused(self, paused):
+        with self.lock:
+            self.paused = paused
+        return [] if paused else self.start()
+
+    def critical_path(self):
+        """
+        (length, task ids) of the costliest chain of unfinished tasks, by estimated cost. Tasks
+        on a dependency cycle can never run and are left out (see status()['cyclic']).
+        """
+        with self.lock:
+            if self._critical is None:
+                self._critical = self._compute_critical_path()
+            return self._critical
+
+    def _compute_critical_path(self):
+        remaining = {task_id: task for task_id, task in self.tasks.items() if task.status != DONE}
+        indegree = {task_id: sum(1 for dep in task.deps if dep in remaining) for task_id, task in remaining.items()}
+        frontier = [task_id for task_id, degree in indegree.items() if degree == 0]
+        best, previous, visited = {}, {}, 0
+        while frontier:
+            task_id = frontier.pop()
+            visited += 1
+            task = remaining[task_id]
+            start = max(((best[dep], dep) for dep in task.deps if dep in remaining), default=(0.0, None))
+            best[task_id], previous[task_id] = start[0] + task.cost, start[1]
+            for dependent_id in task.dependents:
+                if dependent_id in indegree:
+                    indegree[dependent_id] -= 1
+                    if indegree[dependent_id] == 0:
+                        frontier.append(dependent_id)
+        self.cyclic = sorted((task_id for task_id in remaining if task_id not in best), key=str)
+        if not best:
+            return 0.0, []
+        end = max(best, key=best.get)
+        path = []
+        while end is not None:
+            path.append(end)
+            end = previous[end]
+        return best[path[0]], path[::-1]
+
+    def status(self):
+        with self.lock:
+            length, path = self.critical_path()
+            counts = {}
+            for task in self.tasks.values():
+                counts[task.status] = counts.get(task.status, 0) + 1
+            blocked = [task.id for task in self.tasks.values()
+                       if task.status == PENDING and task.waiting and any(self.tasks[dep].status == FAILED for dep in task.deps)]
+            remaining_cost = sum(task.cost for task in self.tasks.values() if task.status != DONE)
+            return {
+                "counts": counts,
+                "ready": [task_id for _, _, task_id in sorted(self.ready)],
+                "running": [task.to_dict() for task in self.running.values()],
+                "blocked_by_failure": blocked,
+                "cyclic": self.cyclic,
+                "critical_path": path,
+                "critical_path_length": length,
+                "remaining_cost": remaining_cost,
+                # How many tasks could usefully run at once, on average, for the rest of the project.
+                "average_width": remaining_cost / length if length else 0.0,
+                "parallelism": self.parallelism,
+                "paused": self.paused,
+                "stopped": self.stopped,
+                "problems": self.problems,
+            }
+
+    def snapshot(self):
+        """{task id: (status, job id)} of every task."""
+        with self.lock:
+            return {task_id: (task.status, task.job_id) for task_id, task in self.tasks.items()}
+
+    def is_finished(self):
+        with self.lock:
+            return not self.running and not self.ready
@@ -0,0 +1,19 @@
+import time
+
+import pytest
+
+
+def poll(condition, timeout=10.0, interval=0.005):
+    """Calls condition() until it is true or `timeout` seconds passed; returns whether it became true."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(interval)
+    return False
+
+
+@pytest.fixture
+def wait_for():
+    """poll(), for tests waiting on work done by threads or worker processes."""
+    return poll
@@ -0,0 +1,56 @@
+"""
+Stand-in for the Crew runner in job engine tests and for the critic in review pipeline tests:
+no LLM, just deterministic behaviour driven by the task text. Used as
+TEAM_READY_AGENT_RUNNER=fake_agent:run and TEAM_READY_CRITIC=fake_agent:critique.
+"""
+import time
+
+REVIEW_SECONDS = 0.05
+
+
+def stub_completion(model, messages, stream=False, **params):
+    """Local stand-in for litellm.completion; a stream ends with a usage chunk, as with stream_options include_usage."""
+    choices = [{"message": {"role": "assistant", "content": f"answer to {messages[-1]['content']}"}}]
+    if stream:
+        return iter([{"choices": choices}, {"choices": [], "usage": {"prompt_tokens": 3, "completion_tokens": 4}}])
+    return {"model": model, "choices": choices}
+
+
+def call_llm(task):
+    """`llm <cost> [stream]`: asks the same prompt twice through the worker's LLM hooks, each call costing `cost`."""
+    from agent_runner import metered_llm, governed_llm
+    _, cost, *mode = task.split()
+    completion = metered_llm(governed_llm(stub_completion), cost_fn=lambda response: float(cost),
+                             usage_cost_fn=lambda model, usage: float(cost))
+    for _ in range(2):
+        response = completion('gpt-4', [{"role": "user", "content": task}], stream=mode == ['stream'])
+        if mode == ['stream']:
+            list(response)
+
+
+def run(task, context):
+    if task.startswith('llm'):
+        call_llm(task)
+    if task.startswith('sleep'):
+        time.sleep(float(task.split()[1]))
+    if task.startswith('fail'):
+        raise RuntimeError(f"fake agent failed on: {task}")
+    print("fake agent chatter that must not corrupt the result")
+    return f"done: {task} ({len(context)} chars of context)"
+
+
+def critique(agent_id, output, llm=None):
+    """Fake critic: takes `REVIEW_SECONDS` like a model call would, then a critique derived from the output."""
+    time.sleep(REVIEW_SECONDS)
+    if output.startswith('fail'):
+        raise RuntimeError(f"fake critic failed on: {output}")
+    return f"Fake critique of {agent_id}'s output ({len(output)} chars)."
+
+
+def llm_critique(agent_id, output, llm=None):
+    """Fake critic that asks litellm.completion, as crewai does for the CriticAgent."""
+    from agent_runner import critic_llm_calls
+    import litellm
+    with critic_llm_calls(llm):
+        response = litellm.completion(model='gpt-4', messages=[{"role": "user", "content": f"Review: {output}"}])
+    return response['choices'][0]['message']['content']
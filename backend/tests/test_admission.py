@@ -0,0 +1,221 @@
+import pytest
+import os
+import time
+import json
+import shutil
+import socket
+import threading
+import subprocess
+import http.client
+
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import app, get_file_path
+import app as backend_app
+from admission import SingleFlight, AdmissionControl, Overloaded, IdempotencyKeyReused
+
+TEST_ADMISSION_DIR = '.team-ready-admission-test'
+
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    original_data_dir = app.config.get('DATA_DIR')
+    test_dir_path = os.path.join(os.getcwd(), TEST_ADMISSION_DIR)
+    app.config['DATA_DIR'] = test_dir_path
+    if os.path.exists(test_dir_path):
+        shutil.rmtree(test_dir_path)
+    os.makedirs(test_dir_path)
+
+    with app.test_client() as client:
+        yield client
+
+    backend_app.project_admission.max_pending = app.config['PROJECT_MAX_PENDING']
+    shutil.rmtree(test_dir_path)
+    if original_data_dir is not None:
+        app.config['DATA_DIR'] = original_data_dir
+
+
+def in_parallel(count, fn):
+    results = [None] * count
+
+    def run(i):
+        results[i] = fn(i)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_duplicates_share_one_call():
+    flights = SingleFlight()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.1)
+        return len(calls)
+
+    results = in_parallel(8, lambda i: flights.run(('kickoff', 'alpha', 'ship it'), slow))
+    assert calls == [1]
+    assert sorted(shared for _, shared in results) == [False] + [True] * 7
+    assert {result for result, _ in results} == {1}
+    # Nothing is remembered without an idempotency key.
+    assert flights.run(('kickoff', 'alpha', 'ship it'), slow) == (2, False)
+    assert flights.stats == {'executed': 2, 'coalesced': 7, 'replayed': 0}
+
+
+def test_idempotency_keys_replay_successes_only():
+    flights = SingleFlight(keep_seconds=60)
+    key = ('kickoff', 'alpha', 'idempotency_key', 'k1')
+    assert flights.run(key, lambda: 'first', 'body', remember=True) == ('first', False)
+    assert flights.run(key, lambda: 'second', 'body', remember=True) == ('first', True)
+    with pytest.raises(IdempotencyKeyReused):
+        flights.run(key, lambda: 'other', 'other body', remember=True)
+
+    def fail():
+        raise RuntimeError("disk full")
+
+    failing = ('kickoff', 'alpha', 'idempotency_key', 'k2')
+    with pytest.raises(RuntimeError):
+        flights.run(failing, fail, 'body', remember=True)
+    assert flights.run(failing, lambda: 'retried', 'body', remember=True) == ('retried', False)
+
+    # Results remember() turns down (error responses) run again too.
+    refused = ('kickoff', 'alpha', 'idempotency_key', 'k3')
+    is_success = lambda result: result[1] == 200
+    assert flights.run(refused, lambda: ('paused', 403), 'body', remember=is_success) == (('paused', 403), False)
+    assert flights.run(refused, lambda: ('started', 200), 'body', remember=is_success) == (('started', 200), False)
+    assert flights.run(refused, lambda: ('again', 200), 'body', remember=is_success) == (('started', 200), True)
+
+    flights.keep_seconds = 0
+    assert flights.run(key, lambda: 'expired', 'body', remember=True) == ('expired', False)
+
+
+def test_admission_bounds_pending_requests_per_project():
+    control = AdmissionControl(max_pending=2)
+    control.admit('alpha')
+    control.admit('alpha')
+    with pytest.raises(Overloaded) as overloaded:
+        control.admit('alpha')
+    assert overloaded.value.retry_after >= 1
+    control.admit('beta')
+    control.release('alpha', 3.0)
+    control.admit('alpha')
+    assert control.stats == {'admitted': 4, 'shed': 1}
+    # A refused call starts no flight.
+    flights = SingleFlight()
+    with pytest.raises(Overloaded):
+        flights.run(('init', 'alpha'), lambda: 'never', admit=lambda: control.admit('alpha'))
+    assert flights.flights == {}
+
+
+def kickoff_lines(project_id):
+    with open(get_file_path('decisions.log', project_id)) as f:
+        return [line for line in f if "Agent kickoff for project" in line]
+
+
+def test_duplicate_kickoffs_run_once(client, monkeypatch):
+    client.post('/init', json={'project_id': 'alpha'})
+    build_kickoff_context = backend_app.build_kickoff_context
+
+    def slow_context(task, project_id=None):
+        time.sleep(0.2)
+        return build_kickoff_context(task, project_id)
+
+    monkeypatch.setattr(backend_app, 'build_kickoff_context', slow_context)
+    payload = {'project_id': 'alpha', 'task': 'ship it'}
+    responses = in_parallel(5, lambda i: app.test_client().post('/kickoff', json=payload))
+    assert [rv.status_code for rv in responses] == [200] * 5
+    assert sorted(rv.json['deduplicated'] for rv in responses) == [False] + [True] * 4
+    assert len(kickoff_lines('alpha')) == 1
+
+    headers = {'Idempotency-Key': 'click-1'}
+    first = client.post('/kickoff', json={'project_id': 'alpha', 'task': 'deploy'}, headers=headers)
+    retry = client.post('/kickoff', json={'project_id': 'alpha', 'task': 'deploy'}, headers=headers)
+    assert not first.json['deduplicated'] and retry.json['deduplicated']
+    assert len(kickoff_lines('alpha')) == 2
+    rv = client.post('/kickoff', json={'project_id': 'alpha', 'task': 'something else'}, headers=headers)
+    assert rv.status_code == 422
+
+    # A retry after /approve starts the run instead of replaying the "paused" refusal.
+    client.post('/pause_agent', json={'project_id': 'alpha'})
+    headers = {'Idempotency-Key': 'click-2'}
+    assert client.post('/kickoff', json={'project_id': 'alpha', 'task': 'review'}, headers=headers).status_code == 403
+    client.post('/approve', json={'project_id': 'alpha'})
+    rv = client.post('/kickoff', json={'project_id': 'alpha', 'task': 'review'}, headers=headers)
+    assert rv.status_code == 200 and not rv.json['deduplicated']
+    assert len(kickoff_lines('alpha')) == 3
+
+
+def test_kickoff_storms_are_shed_with_retry_after(client, monkeypatch):
+    client.post('/init', json={'project_id': 'alpha'})
+    client.post('/init', json={'project_id': 'beta'})
+    backend_app.project_admission.max_pending = 2
+    build_kickoff_context = backend_app.build_kickoff_context
+    monkeypatch.setattr(backend_app, 'build_kickoff_context',
+                        lambda task, project_id=None: time.sleep(0.2) or build_kickoff_context(task, project_id))
+
+    responses = in_parallel(6, lambda i: app.test_client().post('/kickoff', json={'project_id': 'alpha', 'task': f"task {i}"}))
+    statuses = sorted(rv.status_code for rv in responses)
+    assert statuses == [200, 200, 429, 429, 429, 429]
+    shed = next(rv for rv in responses if rv.status_code == 429)
+    assert int(shed.headers['Retry-After']) >= 1
+    # Other projects are not held up, and alpha takes kickoffs again once its pending ones are done.
+    assert client.post('/kickoff', json={'project_id': 'beta', 'task': 'task 0'}).status_code == 200
+    assert client.post('/kickoff', json={'project_id': 'alpha', 'task': 'task 9'}).status_code == 200
+
+
+# The bundled gevent server (socketio.run, no monkey-patching), with kickoff context that blocks
+# like file work does, to check requests still overlap there.
+SERVER = """
+import sys, time, logging
+import app
+logging.disable(logging.WARNING)
+app.app.config['DATA_DIR'] = sys.argv[1]
+app.app.config['AGENT_RUNNER'] = ''
+build_kickoff_context = app.build_kickoff_context
+app.build_kickoff_context = lambda task, project_id=None: time.sleep(0.3) or build_kickoff_context(task, project_id)
+app.start_background_services()
+app.socketio.run(app.app, host='127.0.0.1', port=int(sys.argv[2]), log_output=False)
+"""
+
+
+@pytest.fixture
+def server(tmp_path, wait_for):
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    process = subprocess.Popen([sys.executable, '-c', SERVER, str(tmp_path), str(port)], cwd=tmp_path,
+                               stdout=subprocess.DEVNULL,
+                               env=dict(os.environ, PYTHONPATH=backend_dir, TEAM_READY_PROJECT_MAX_PENDING='2'))
+
+    def post(endpoint, payload):
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        connection.request('POST', endpoint, json.dumps(payload), {'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+
+    def started():
+        try:
+            return post('/init', {'project_id': 'alpha'})[0] == 200
+        except OSError:
+            return False
+
+    assert wait_for(started, timeout=30)
+    yield post
+    process.kill()
+    process.wait()
+
+
+def test_gevent_server_coalesces_and_sheds_overlapping_kickoffs(server):
+    responses = in_parallel(3, lambda i: server('/kickoff', {'project_id': 'alpha', 'task': 'ship it'}))
+    assert [status for status, _ in responses] == [200] * 3
+    assert sorted(body['deduplicated'] for _, body in responses) == [False, True, True]
+
+    responses = in_parallel(4, lambda i: server('/kickoff', {'project_id': 'alpha', 'task': f"task {i}"}))
+    assert sorted(status for status, _ in responses) == [200, 200, 429, 429]
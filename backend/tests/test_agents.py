@@ -0,0 +1,33 @@
+import os
+import sys
+import subprocess
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, REPO_DIR)
+import agents
+from agents import AgentPool
+
+
+class FakeAgent:
+    built = 0
+
+    def __init__(self):
+        FakeAgent.built += 1
+        self.agent = object()
+
+
+def test_importing_agents_does_not_import_crewai():
+    out = subprocess.run([sys.executable, '-c', "import sys, agents; print('crewai' in sys.modules)"],
+                         cwd=REPO_DIR, capture_output=True, text=True, check=True).stdout
+    assert out.strip() == 'False'
+    assert set(agents.AGENT_CLASSES) == {'orchestrator', 'coder', 'critic'}
+
+
+def test_pool_builds_each_agent_once():
+    FakeAgent.built = 0
+    pool = AgentPool({'coder': FakeAgent, 'critic': FakeAgent})
+    assert FakeAgent.built == 0
+    coder = pool.get('coder')
+    assert pool.get('coder') is coder
+    assert FakeAgent.built == 1
+    pool.warm()
+    assert FakeAgent.built == 2
@@ -0,0 +1,146 @@
+import pytest
+import os
+
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import app, socketio, broadcaster, emit_internal_chat, emit_client_chat
+
+
+@pytest.fixture
+def connect():
+    clients = []
+
+    def factory(project_id=None):
+        query = f"project_id={project_id}" if project_id else None
+        client = socketio.test_client(app, query_string=query)
+        client.get_received() # Drop the 'my response' greeting.
+        clients.append(client)
+        return client
+
+    yield factory
+
+    for client in clients:
+        if client.is_connected():
+            client.disconnect()
+    broadcaster.running = False
+
+
+def frames(client, event):
+    """Returns the frames received for one event; anything else received is discarded."""
+    return [message['args'][0] for message in client.get_received() if message['name'] == event]
+
+
+def test_project_messages_only_reach_the_project_room(connect):
+    alpha, beta = connect('alpha'), connect('beta')
+    emit_internal_chat("alpha is working", 'alpha')
+    emit_client_chat("hello everyone")
+
+    received = beta.get_received()
+    assert [f['data'] for f in frames(alpha, 'internal_chat')] == ["alpha is working"]
+    assert [(m['name'], m['args'][0]['data']) for m in received] == [('client_chat', "hello everyone")]
+
+
+def test_bursts_are_coalesced_into_one_frame(connect):
+    client = connect('alpha')
+    broadcaster.running = True # Pretend the flusher runs; flush by hand.
+    for i in range(5):
+        emit_internal_chat(f"step {i}", 'alpha')
+    assert frames(client, 'internal_chat') == []
+
+    broadcaster.flush()
+    (frame,) = frames(client, 'internal_chat')
+    assert frame['messages'] == [f"step {i}" for i in range(5)]
+    assert frame['data'] == "\n".join(frame['messages'])
+
+
+def test_slow_client_is_bounded_and_told_what_it_missed(connect, monkeypatch):
+    monkeypatch.setattr(broadcaster, 'max_in_flight', 2)
+    monkeypatch.setattr(broadcaster, 'queue_limit', 3)
+    slow, fast = connect('alpha'), connect('alpha')
+
+    for i in range(10):
+        emit_internal_chat(f"message {i}", 'alpha')
+        fast.emit('chat_ack', {'seq': broadcaster.seq})
+
+    # The fast client acks everything and sees every message.
+    assert [f['data'] for f in frames(fast, 'internal_chat')] == [f"message {i}" for i in range(10)]
+    # The slow client never acked: two frames in flight, three queued, the rest dropped.
+    received = frames(slow, 'internal_chat')
+    assert [f['data'] for f in received] == ["message 0", "message 1"]
+
+    slow.emit('chat_ack', {'seq': received[-1]['seq']})
+    caught_up = frames(slow, 'internal_chat')
+    assert caught_up[0]['skipped'] == 5
+    assert caught_up[1]['data'] == "message 7"
+
+
+def test_clients_that_never_ack_get_every_frame_by_default(connect):
+    assert broadcaster.max_in_flight == 0
+    client = connect('alpha')
+    for i in range(20):
+        emit_internal_chat(f"message {i}", 'alpha')
+    assert [f['data'] for f in frames(client, 'internal_chat')] == [f"message {i}" for i in range(20)]
+    assert all(not channel.in_flight for channel in broadcaster.clients.values())
+
+
+class StalledTransport:
+    """Stands in for the Engine.IO socket of a client that stopped reading: packets pile up."""
+
+    def __init__(self, pending):
+        self.queue = self
+        self.pending = pending
+
+    def qsize(self):
+        return self.pending
+
+
+def test_default_config_bounds_a_client_whose_transport_backs_up(connect, monkeypatch):
+    assert broadcaster.max_in_flight == 0 and broadcaster.max_backlog > 0
+    stalled, healthy = connect('alpha'), connect('alpha')
+    transport = StalledTransport(broadcaster.max_backlog)
+    monkeypatch.setitem(socketio.server.eio.sockets, stalled.eio_sid, transport)
+    dropped = broadcaster.stats['dropped']
+
+    for i in range(broadcaster.queue_limit + 10):
+        emit_internal_chat(f"message {i}", 'alpha')
+
+    assert frames(stalled, 'internal_chat') == []
+    assert len(frames(healthy, 'internal_chat')) == broadcaster.queue_limit + 10
+    assert broadcaster.stats['dropped'] - dropped == 10
+
+    transport.pending = 0 # The client reads again.
+    broadcaster.flush()
+    caught_up = frames(stalled, 'internal_chat')
+    assert caught_up[0]['skipped'] == 10
+    assert [f['data'] for f in caught_up[1:]] == [f"message {i}" for i in range(10, broadcaster.queue_limit + 10)]
+
+
+def test_malformed_acks_are_ignored(connect, monkeypatch):
+    monkeypatch.setattr(broadcaster, 'max_in_flight', 1)
+    client = connect('alpha')
+    for data in ({}, {'seq': 'x'}, [1], None):
+        client.emit('chat_ack', data)
+    emit_internal_chat("still served", 'alpha')
+    assert [f['data'] for f in frames(client, 'internal_chat')] == ["still served"]
+
+
+def test_join_project_checks_the_project(connect, monkeypatch, tmp_path):
+    monkeypatch.setitem(app.config, 'DATA_DIR', str(tmp_path))
+    os.makedirs(os.path.join(tmp_path, 'projects', 'beta'))
+    client = connect()
+
+    for data in ({}, {'project_id': 7}, {'project_id': '../etc'}, ['beta'], None):
+        assert client.emit('join_project', data, callback=True)['status'] == 'error'
+    assert client.emit('join_project', {'project_id': 'nope'}, callback=True)['status'] == 'error'
+    assert 'project:nope' not in broadcaster.rooms
+
+    assert client.emit('join_project', {'project_id': 'beta'}, callback=True)['status'] == 'success'
+    emit_internal_chat("beta is working", 'beta')
+    assert [f['data'] for f in frames(client, 'internal_chat')] == ["beta is working"]
+
+
+def test_disconnect_leaves_rooms(connect):
+    client = connect('gamma')
+    assert 'project:gamma' in broadcaster.rooms
+    client.disconnect()
+    assert 'project:gamma' not in broadcaster.rooms
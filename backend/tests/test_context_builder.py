@@ -0,0 +1,92 @@
+import pytest
+import os
+import shutil
+
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import app, append_to_log_file, get_file_path, get_precis
+import metrics
+from context_builder import ContextBuilder, EMPTY_CONTEXT, estimate_tokens
+
+TEST_CONTEXT_DIR = '.team-ready-context-test'
+
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    original_data_dir = app.config.get('DATA_DIR')
+    test_dir_path = os.path.join(os.getcwd(), TEST_CONTEXT_DIR)
+    app.config['DATA_DIR'] = test_dir_path
+    if os.path.exists(test_dir_path):
+        shutil.rmtree(test_dir_path)
+    os.makedirs(test_dir_path)
+
+    with app.test_client() as client:
+        yield client
+
+    shutil.rmtree(test_dir_path)
+    if original_data_dir is not None:
+        app.config['DATA_DIR'] = original_data_dir
+
+
+@pytest.fixture
+def log_path(tmp_path):
+    return str(tmp_path / 'agents_internal.log')
+
+
+def test_context_stays_within_budget_and_prefers_relevant_entries(log_path):
+    builder = ContextBuilder(log_path, budget=200, recent_entries=32)
+    assert builder.build('anything').text == EMPTY_CONTEXT
+    builder.add("Coder fixed the database migration for the billing tables", 'Coder')
+    for i in range(30):
+        builder.add(f"Reviewer looked at style nit number {i} " + "x" * 400, 'Reviewer')
+
+    context = builder.build('retry the billing migration')
+    assert context.tokens <= 200
+    assert "billing tables" in context.text
+    # Without a matching task the newest entries win, each cut to a quarter of the budget.
+    context = builder.build('')
+    assert "style nit number 20 " not in context.text
+    assert "style nit number 29" in context.text and "..." in context.text
+
+
+def test_old_entries_are_summarized_and_echoes_dropped(log_path):
+    builder = ContextBuilder(log_path, budget=400, recent_entries=4)
+    for i in range(10):
+        builder.add(f"thought {i}", 'Coder' if i % 2 else None)
+    builder.add("thought 9") # Repeated
+    builder.add("Agent kickoff for project p: ship it\nContext:\nthought 1\nthought 2")
+
+    context = builder.build('')
+    assert context.summarized == 7 and context.entries == 4
+    assert context.text.startswith("Summary of 7 earlier agent thoughts (unattributed: 4, Coder: 3):\nthought 0\n")
+    assert context.text.endswith("thought 7\nthought 8\nthought 9\nAgent kickoff for project p: ship it")
+
+
+def test_contexts_are_cached_until_the_log_advances(log_path):
+    builder = ContextBuilder(log_path)
+    builder.add("first")
+    context = builder.build('task')
+    assert builder.build('task') is context
+    assert builder.build('task', budget=10) is not context
+    builder.add("second")
+    assert builder.build('task') is not context
+    assert builder.stats == {'builds': 4, 'hits': 1}
+
+
+def test_kickoff_uses_the_builder_and_records_savings(client):
+    for i in range(20):
+        append_to_log_file('agents_internal.log', f"Agent Coder submitted output: step {i} " + "y" * 1000, agent='Coder')
+    append_to_log_file('agents_internal.log', "Agent Tester submitted output: the login form rejects unicode", agent='Tester')
+
+    assert client.post('/kickoff', json={'task': 'fix the login form'}).status_code == 200
+    with open(get_file_path('agents_internal.log')) as f:
+        content = f.read()
+    context = content.split("Agent kickoff for project None: fix the login form\nContext:\n", 1)[1]
+    assert "rejects unicode" in context
+    assert estimate_tokens(context) <= app.config['CONTEXT_TOKEN_BUDGET'] < estimate_tokens(get_precis())
+
+    samples = {line.split(' ')[0]: float(line.split(' ')[1]) for line in metrics.REGISTRY.render().splitlines()
+               if line.startswith('team_ready_kickoff_context_tokens_sum')}
+    built = samples['team_ready_kickoff_context_tokens_sum{context="built"}']
+    assert built < samples['team_ready_kickoff_context_tokens_sum{context="precis"}']
@@ -0,0 +1,74 @@
+import pytest
+import os
+import time
+import shutil
+import threading
+
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import app as backend_app
+from app import app, dashboard_changes
+
+TEST_DASHBOARD_DIR = '.team-ready-dashboard-test'
+
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    original_data_dir = app.config.get('DATA_DIR')
+    test_dir_path = os.path.join(os.getcwd(), TEST_DASHBOARD_DIR)
+    app.config['DATA_DIR'] = test_dir_path
+    if os.path.exists(test_dir_path):
+        shutil.rmtree(test_dir_path)
+    os.makedirs(test_dir_path)
+
+    with app.test_client() as client:
+        yield client
+
+    backend_app.paused_projects.clear()
+    shutil.rmtree(test_dir_path)
+    if original_data_dir is not None:
+        app.config['DATA_DIR'] = original_data_dir
+
+
+def known(versions):
+    return ','.join(f"{name}:{version}" for name, version in versions.items())
+
+
+def test_snapshot_has_every_panel_and_then_only_changes(client):
+    client.post('/init', json={'project_id': 'alpha'})
+    rv = client.get('/dashboard?id=alpha')
+    snapshot = rv.json
+    assert set(snapshot['panels']) == set(snapshot['versions']) == {'employees', 'projects', 'files', 'system'}
+    assert [p['project_id'] for p in snapshot['panels']['projects']] == [None, 'alpha']
+    assert snapshot['panels']['projects'][1] == {"project_id": 'alpha', "spend": 0.0, "remaining": 10.0,
+                                                 "paused": False, "selected": True}
+    assert {'config.json', 'todo.json', 'agents_internal.log'} <= set(snapshot['panels']['files'])
+    assert {e['role']: e['status'] for e in snapshot['panels']['employees']} == {'Orchestrator': 'idle', 'Coder': 'idle', 'Critic': 'idle'}
+
+    versions = known(snapshot['versions'])
+    assert client.get(f'/dashboard?id=alpha&versions={versions}').json['panels'] == {}
+
+    client.post('/pause_agent', json={'project_id': 'alpha'})
+    diff = client.get(f'/dashboard?id=alpha&versions={versions}').json
+    assert set(diff['panels']) == {'employees', 'projects', 'system'}
+    assert diff['panels']['system']['paused_projects'] == ['alpha']
+    assert diff['versions']['files'] == snapshot['versions']['files']
+
+
+def test_long_poll_waits_for_a_change(client):
+    versions = known(client.get('/dashboard').json['versions'])
+
+    start = time.monotonic()
+    assert client.get(f'/dashboard?versions={versions}&wait=0.3').json['panels'] == {}
+    assert time.monotonic() - start >= 0.3
+
+    def pause():
+        backend_app.paused_projects.add('beta')
+        dashboard_changes.changed()
+
+    threading.Timer(0.2, pause).start()
+    start = time.monotonic()
+    diff = client.get(f'/dashboard?versions={versions}&wait=5').json
+    assert time.monotonic() - start < 2
+    assert diff['panels']['system']['paused_projects'] == ['beta']
@@ -0,0 +1,226 @@
+import pytest
+import os
+import time
+import shutil
+import threading
+
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import app
+import file_index
+from file_index import FileIndex, InotifyWatcher, parse_gitignore, is_ignored, hash_file
+
+TEST_FILES_DIR = '.team-ready-files-test'
+
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    original_data_dir = app.config.get('DATA_DIR')
+    test_dir_path = os.path.join(os.getcwd(), TEST_FILES_DIR)
+    app.config['DATA_DIR'] = test_dir_path
+    if os.path.exists(test_dir_path):
+        shutil.rmtree(test_dir_path)
+    os.makedirs(test_dir_path)
+
+    with app.test_client() as client:
+        yield client
+
+    file_index.close_all()
+    shutil.rmtree(test_dir_path)
+    if original_data_dir is not None:
+        app.config['DATA_DIR'] = original_data_dir
+
+
+def write(root, relpath, text):
+    path = os.path.join(root, relpath)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(text)
+    return path
+
+
+def age(path, seconds=60):
+    """Backdates a file or dir, so its mtime is trusted by the next refresh (see RACY_NS)."""
+    then = time.time() - seconds
+    os.utime(path, (then, then))
+
+
+def make_repo(root):
+    write(root, '.gitignore', "*.pyc\nbuild/\n/secret.txt\n")
+    write(root, 'README.md', "readme")
+    write(root, 'secret.txt', "s")
+    write(root, 'src/app.py', "print('app')")
+    write(root, 'src/app.pyc', "bytecode")
+    write(root, 'src/util/helpers.py', "def helper(): pass")
+    write(root, 'src/util/secret.txt', "not the root one")
+    write(root, 'build/out.js', "built")
+    write(root, '.git/HEAD', "ref: refs/heads/main")
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in dirnames + filenames:
+            age(os.path.join(dirpath, name))
+    age(root)
+
+
+def inotify_available():
+    watcher = InotifyWatcher.create()
+    if watcher is None:
+        return False
+    watcher.close()
+    return True
+
+
+def paths(index, **options):
+    return [item['path'] for item in index.list(**options)[0]]
+
+
+def get_built(client, url, wait_for):
+    """GETs a /files page once no background refresh is running."""
+    assert wait_for(lambda: not client.get(url).json.get('building'))
+    return client.get(url)
+
+
+def test_gitignore_rules():
+    rules = [('', parse_gitignore("*.log\n!keep.log\n/only-root\ndocs/**/draft?.md\ncache/\n# comment\n"))]
+    assert is_ignored(rules, 'a/b/debug.log', False)
+    assert not is_ignored(rules, 'a/keep.log', False)
+    assert is_ignored(rules, 'only-root', False)
+    assert not is_ignored(rules, 'sub/only-root', False)
+    assert is_ignored(rules, 'docs/x/y/draft1.md', False)
+    assert is_ignored(rules, 'docs/draft2.md', False)
+    assert is_ignored(rules, 'src/cache', True)
+    assert not is_ignored(rules, 'src/cache', False)
+
+
+def test_cold_index_honors_gitignore(tmp_path):
+    root = str(tmp_path / 'repo')
+    make_repo(root)
+    index = FileIndex(root, str(tmp_path / 'index'))
+    stats = index.refresh()
+    assert stats['added'] == 5
+    assert paths(index) == ['.gitignore', 'README.md', 'src/app.py', 'src/util/helpers.py', 'src/util/secret.txt']
+    item = index.list(limit=1, cursor='README.md')[0][0]
+    assert item['size'] == len("print('app')")
+    assert item['sha1'] == hash_file(os.path.join(root, 'src/app.py'))
+
+
+def test_warm_refresh_prunes_unchanged_dirs(tmp_path):
+    root = str(tmp_path / 'repo')
+    make_repo(root)
+    index = FileIndex(root, str(tmp_path / 'index'))
+    index.refresh()
+    stats = index.refresh()
+    assert stats['dirs_listed'] == 0 and stats['files_hashed'] == 0
+    assert stats['dirs_pruned'] == 3
+
+    write(root, 'src/app.py', "print('changed')")
+    os.remove(os.path.join(root, 'src/util/helpers.py'))
+    write(root, 'src/new.py', "new")
+    stats = index.refresh()
+    assert (stats['added'], stats['changed'], stats['removed']) == (1, 1, 1)
+    assert stats['files_hashed'] == 2
+    assert paths(index, directory='src') == ['src/app.py', 'src/new.py', 'src/util/secret.txt']
+
+
+def test_manifest_survives_restart(tmp_path):
+    root = str(tmp_path / 'repo')
+    make_repo(root)
+    FileIndex(root, str(tmp_path / 'index')).refresh()
+    index = FileIndex(root, str(tmp_path / 'index'))
+    stats = index.refresh()
+    assert stats['files_hashed'] == 0 and stats['dirs_listed'] == 0
+    assert len(paths(index)) == 5
+
+
+def test_background_refresh_serves_the_last_list_meanwhile(tmp_path, monkeypatch, wait_for):
+    root = str(tmp_path / 'repo')
+    make_repo(root)
+    FileIndex(root, str(tmp_path / 'index')).refresh()
+    write(root, 'docs/guide.md', "guide")
+    index = FileIndex(root, str(tmp_path / 'index'))
+    release = threading.Event()
+    scan = index._scan
+    monkeypatch.setattr(index, '_scan', lambda *args, **kwargs: release.wait(10) and scan(*args, **kwargs))
+
+    assert index.start_refresh() and index.building()
+    assert index.start_refresh() # Joins the running one.
+    assert wait_for(lambda: len(paths(index)) == 5)
+    assert 'docs/guide.md' not in paths(index) # The snapshot, listed while the scan waits.
+    release.set()
+    assert wait_for(lambda: not index.building())
+    assert 'docs/guide.md' in paths(index) and index.last_stats['added'] == 1
+    assert not index.start_refresh(max_age=60)
+
+
+def test_gitignore_change_rescans(tmp_path):
+    root = str(tmp_path / 'repo')
+    make_repo(root)
+    index = FileIndex(root, str(tmp_path / 'index'))
+    index.refresh()
+    write(root, '.gitignore', "*.pyc\n")
+    index.refresh()
+    assert 'build/out.js' in paths(index) and 'secret.txt' in paths(index)
+
+
+def test_pagination_and_filters(tmp_path):
+    root = str(tmp_path / 'repo')
+    for i in range(25):
+        write(root, f"pkg/m{i:02}.py", str(i))
+        write(root, f"pkg/m{i:02}.txt", str(i))
+    write(root, 'pkg-other/z.py', 'z')
+    index = FileIndex(root, str(tmp_path / 'index'), hash_files=False)
+    index.refresh()
+
+    page, cursor, total = index.list(limit=20, directory='pkg', extensions=['py'])
+    assert total == 25 and len(page) == 20 and page[0]['sha1'] is None
+    rest, next_cursor, _ = index.list(limit=20, cursor=cursor, directory='pkg', extensions=['py'])
+    assert [item['path'] for item in rest] == [f"pkg/m{i:02}.py" for i in range(20, 25)]
+    assert next_cursor is None
+    assert paths(index, pattern='*/m1?.txt') == [f"pkg/m1{i}.txt" for i in range(10)]
+    assert index.list(limit=10)[2] == 51
+
+
+@pytest.mark.skipif(not inotify_available(), reason="inotify is not available")
+def test_watched_refresh_touches_changed_dirs_only(tmp_path):
+    root = str(tmp_path / 'repo')
+    make_repo(root)
+    index = FileIndex(root, str(tmp_path / 'index'), watch=True)
+    index.refresh()
+    assert index.refresh()['dirs_listed'] == 0
+
+    write(root, 'src/util/deep/new.py', "new")
+    stats = index.refresh()
+    assert stats['watched'] and stats['dirs_pruned'] == 0
+    assert 'src/util/deep/new.py' in paths(index)
+    shutil.rmtree(os.path.join(root, 'src'))
+    index.refresh()
+    assert paths(index) == ['.gitignore', 'README.md']
+    index.close()
+
+
+def test_files_route(client, tmp_path, wait_for):
+    root = str(tmp_path / 'repo')
+    make_repo(root)
+    rv = client.get('/files?id=alpha')
+    assert rv.status_code == 404
+
+    assert client.post('/init', json={'project_id': 'alpha', 'path': 42}).status_code == 400
+    assert client.post('/init', json={'project_id': 'alpha', 'path': '/'}).status_code == 200
+    assert client.get('/files?id=alpha').status_code == 404 # The filesystem root is never walked.
+
+    client.post('/init', json={'project_id': 'alpha', 'path': os.path.join(root, 'src', '..')})
+    rv = get_built(client, '/files?id=alpha&limit=2', wait_for)
+    assert rv.status_code == 200 and rv.json['root'] == os.path.realpath(root)
+    assert [item['path'] for item in rv.json['files']] == ['.gitignore', 'README.md']
+    assert rv.json['total'] == 5
+    rv = client.get(f"/files?id=alpha&limit=10&cursor={rv.json['next_cursor']}&ext=py")
+    assert [item['path'] for item in rv.json['files']] == ['src/app.py', 'src/util/helpers.py']
+
+    write(root, 'docs/guide.md', "guide")
+    assert client.get('/files?id=alpha&dir=docs').json['files'] == [] # Within FILE_INDEX_MAX_AGE
+    client.get('/files?id=alpha&dir=docs&refresh=1')
+    rv = get_built(client, '/files?id=alpha&dir=docs', wait_for)
+    assert [item['path'] for item in rv.json['files']] == ['docs/guide.md']
+
+    panel = client.get('/dashboard?id=alpha').json['panels']['files']
+    assert panel[:2] == ['.gitignore', 'README.md']
@@ -0,0 +1,185 @@
+import pytest
+import os
+import json
+import time
+import shutil
+
+import sys
+TESTS_DIR = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(TESTS_DIR, '..')))
+from app import app, read_json_file, get_file_path
+import app as backend_app
+from jobs import JobManager
+
+TEST_JOBS_DIR = '.team-ready-jobs-test'
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # A killed child stays a zombie until its waiting thread reaps it.
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            return f.read().split(')')[-1].split()[0] != 'Z'
+    except OSError:
+        return True
+
+
+def read_log(project_id):
+    with open(get_file_path('agents_internal.log', project_id)) as f:
+        return f.read()
+
+
+@pytest.fixture
+def manager():
+    manager = JobManager('fake_agent:run', max_workers=2, python_path=[TESTS_DIR])
+    yield manager
+    manager.shutdown()
+
+
+@pytest.fixture
+def client():
+    original_data_dir = app.config.get('DATA_DIR', None)
+    app.config['DATA_DIR'] = os.path.join(os.getcwd(), TEST_JOBS_DIR)
+    if os.path.exists(app.config['DATA_DIR']):
+        shutil.rmtree(app.config['DATA_DIR'])
+    os.makedirs(app.config['DATA_DIR'])
+    backend_app.job_manager = JobManager('fake_agent:run', max_workers=2, python_path=[TESTS_DIR],
+                                         on_finish=backend_app.agent_job_finished,
+                                         on_message=backend_app.agent_job_message, env=backend_app.worker_env())
+
+    with app.test_client() as client:
+        client.post('/init', json={'repo_url': 'a', 'path': 'b', 'project_id': 'alpha'})
+        yield client
+
+    backend_app.job_manager.shutdown()
+    backend_app.job_manager = None
+    shutil.rmtree(app.config['DATA_DIR'])
+    if original_data_dir is not None:
+        app.config['DATA_DIR'] = original_data_dir
+
+
+def test_job_result_and_failure(manager, wait_for):
+    ok = manager.submit('p', 'write tests', 'context')
+    bad = manager.submit('p', 'fail loudly')
+    assert wait_for(lambda: ok.state == 'succeeded' and bad.state == 'failed')
+    assert ok.result == "done: write tests (7 chars of context)"
+    assert "fake agent failed on: fail loudly" in bad.error
+
+
+def test_pool_is_bounded(manager, wait_for):
+    jobs = [manager.submit('p', 'sleep 0.3') for _ in range(3)]
+    assert [job.state for job in jobs] == ['running', 'running', 'queued']
+    assert wait_for(lambda: all(job.state == 'succeeded' for job in jobs))
+
+
+def test_workers_stay_warm_between_jobs(manager, wait_for):
+    first = manager.submit('p', 'one')
+    assert wait_for(lambda: first.state == 'succeeded')
+    second = manager.submit('p', 'two')
+    assert wait_for(lambda: second.state == 'succeeded')
+    assert second.pid == first.pid
+
+
+def test_kill_sigkills_running_and_cancels_queued(manager, wait_for):
+    jobs = [manager.submit('p', 'sleep 30') for _ in range(3)]
+    pids = [job.pid for job in jobs[:2]]
+    started = time.monotonic()
+    assert len(manager.kill_project('p')) == 3
+    assert wait_for(lambda: all(job.state == 'killed' and job.finished_at for job in jobs))
+    assert time.monotonic() - started < 5
+    assert not any(pid_alive(pid) for pid in pids)
+    assert jobs[2].pid is None # Never started.
+
+
+def test_kill_without_process_groups(manager, wait_for, monkeypatch):
+    monkeypatch.delattr(os, 'killpg') # As on Windows.
+    job = manager.submit('p', 'sleep 30')
+    assert manager.kill_project('p') == [job]
+    assert wait_for(lambda: job.state == 'killed' and job.finished_at)
+    assert not pid_alive(job.pid)
+
+
+def test_kickoff_status_and_stop(client, wait_for):
+    rv = client.post('/kickoff', json={'project_id': 'alpha', 'task': 'sleep 30'})
+    assert rv.status_code == 200
+    assert rv.json['message'] == "Agent kickoff request received."
+    job_id = rv.json['job_id']
+
+    jobs = client.get('/status?id=alpha').json['jobs']
+    assert [(job['job_id'], job['state']) for job in jobs] == [(job_id, 'running')]
+
+    rv = client.post('/stop', json={'project_id': 'alpha'})
+    assert rv.json['killed_jobs'] == [job_id]
+    assert wait_for(lambda: client.get('/status?id=alpha').json['jobs'][0]['state'] == 'killed')
+    assert wait_for(lambda: f"Agent job {job_id} for project alpha was killed." in read_log('alpha'))
+
+
+def test_kickoff_of_a_running_task_gets_its_job(client, wait_for):
+    first = client.post('/kickoff', json={'project_id': 'alpha', 'task': 'sleep 30'}).json
+    again = client.post('/kickoff', json={'project_id': 'alpha', 'task': 'sleep 30'}).json
+    assert again['job_id'] == first['job_id'] and again['deduplicated'] and not first['deduplicated']
+    assert read_log('alpha').count("Agent kickoff for project alpha: sleep 30") == 1
+
+    client.post('/stop', json={'project_id': 'alpha'})
+    assert wait_for(lambda: backend_app.job_manager.get(first['job_id']).state == 'killed')
+    rv = client.post('/kickoff', json={'project_id': 'alpha', 'task': 'sleep 30'})
+    assert rv.json['job_id'] != first['job_id']
+
+
+def test_budget_exhaustion_kills_jobs(client, wait_for):
+    config = read_json_file('config.json', project_id='alpha')
+    config['hard_limit'] = 1.0
+    backend_app.write_json_file('config.json', config, 'alpha')
+    job_id = client.post('/kickoff', json={'project_id': 'alpha', 'task': 'sleep 30'}).json['job_id']
+
+    rv = client.post('/simulate_llm_call', json={'project_id': 'alpha', 'cost': 1.5})
+    assert rv.status_code == 403
+    assert wait_for(lambda: backend_app.job_manager.get(job_id).state == 'killed')
+
+
+def test_agent_llm_calls_are_charged_to_the_project(client, wait_for):
+    options = json.loads(backend_app.worker_env()['TEAM_READY_LLM_CACHE_OPTIONS'])
+    assert options['max_entries'] == app.config['LLM_CACHE_MAX_ENTRIES'] and options['ttl'] == app.config['LLM_CACHE_TTL']
+    ledger = backend_app.get_spend_ledger('alpha')
+    job = backend_app.job_manager.get(client.post('/kickoff', json={'project_id': 'alpha', 'task': 'llm 0.25'}).json['job_id'])
+    assert wait_for(lambda: job.state == 'succeeded')
+    # The prompt asked again was answered by the cache: charged once.
+    assert job.cost == 0.25 and ledger.spend() == 0.25
+    job = backend_app.job_manager.get(client.post('/kickoff', json={'project_id': 'alpha', 'task': 'llm 0.25 stream'}).json['job_id'])
+    assert wait_for(lambda: job.state == 'succeeded')
+    # Streams are not cached, and are charged from their final usage.
+    assert job.cost == 0.5 and ledger.spend() == 0.75
+
+
+def test_agent_llm_calls_wait_for_the_backend_governor(client, monkeypatch, wait_for):
+    governor = backend_app.governor
+    admitted = governor.stats['admitted']
+    job = backend_app.job_manager.get(client.post('/kickoff', json={'project_id': 'alpha', 'task': 'llm 0.25'}).json['job_id'])
+    assert wait_for(lambda: job.state == 'succeeded')
+    # One slot for the miss; the cache hit never asked for one.
+    assert governor.stats['admitted'] == admitted + 1 and governor.in_flight == 0
+    assert job.id not in backend_app.job_llm_calls
+
+    # Priced over what is left of the budget: rejected before the call is made.
+    monkeypatch.setattr(backend_app.llm_governor, 'litellm_cost_estimate', lambda model, prompt, completion: 100.0)
+    job = backend_app.job_manager.get(client.post('/kickoff', json={'project_id': 'alpha', 'task': 'llm 0.5'}).json['job_id'])
+    assert wait_for(lambda: job.state == 'failed')
+    assert "CallRejected" in job.error and "exceeds" in job.error
+    assert job.cost == 0.0 and governor.pending_cost.get('alpha') is None
+
+
+def test_agent_llm_spend_trips_the_hard_limit(client, wait_for):
+    config = read_json_file('config.json', project_id='alpha')
+    backend_app.write_json_file('config.json', dict(config, hard_limit=1.0), 'alpha')
+    job = backend_app.job_manager.get(client.post('/kickoff', json={'project_id': 'alpha', 'task': 'llm 0.75 stream'}).json['job_id'])
+    assert wait_for(lambda: job.state in ('succeeded', 'killed'))
+    assert job.state == 'killed'
+    assert backend_app.get_spend_ledger('alpha').spend() == 1.5
+
+
+def test_finished_job_is_logged(client, wait_for):
+    job_id = client.post('/kickoff', json={'project_id': 'alpha', 'task': 'refactor'}).json['job_id']
+    assert wait_for(lambda: f"Agent job {job_id} for project alpha finished: done: refactor" in read_log('alpha'))
@@ -0,0 +1,119 @@
+import pytest
+import os
+import time
+import shutil
+
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from llm_cache import LLMCache, cache_key, cached_completion
+from app import app, read_json_file
+import app as backend_app
+
+TEST_LLM_CACHE_DIR = '.team-ready-llm-cache-test'
+MESSAGES = [{"role": "user", "content": "Review this diff"}]
+
+
+class StubModel:
+    """Local stand-in for litellm.completion that counts its calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, model, messages, **params):
+        self.calls += 1
+        return {"model": model, "choices": [{"message": {"content": f"answer {self.calls}"}}]}
+
+
+@pytest.fixture
+def cache_dir():
+    path = os.path.join(os.getcwd(), TEST_LLM_CACHE_DIR)
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    yield path
+    shutil.rmtree(path, ignore_errors=True)
+
+
+def test_cache_key_covers_model_messages_and_params():
+    key = cache_key('gpt-4', MESSAGES, temperature=0)
+    assert key == cache_key('gpt-4', [dict(MESSAGES[0])], temperature=0, api_key='secret', timeout=30)
+    assert key != cache_key('gpt-3.5', MESSAGES, temperature=0)
+    assert key != cache_key('gpt-4', MESSAGES, temperature=1)
+    assert key != cache_key('gpt-4', MESSAGES + [{"role": "user", "content": "again"}], temperature=0)
+
+
+def test_hits_skip_the_model_and_the_charge(cache_dir):
+    cache = LLMCache(cache_dir)
+    model = StubModel()
+    charges = []
+    first, cached = cached_completion(cache, model, 'gpt-4', MESSAGES, charge=charges.append, cost_fn=lambda r: 0.25)
+    assert not cached
+    second, cached = cached_completion(cache, model, 'gpt-4', MESSAGES, charge=charges.append, cost_fn=lambda r: 0.25)
+    assert cached and second == first
+    assert model.calls == 1 and charges == [0.25]
+    assert cache.stats['hits'] == 1 and cache.stats['misses'] == 1 and cache.stats['saved_cost'] == 0.25
+
+
+def test_disk_tier_survives_restart_and_ttl_expires(cache_dir):
+    model = StubModel()
+    cached_completion(LLMCache(cache_dir), model, 'gpt-4', MESSAGES, cost_fn=lambda r: 0.1)
+
+    reopened = LLMCache(cache_dir)
+    response, cached = cached_completion(reopened, model, 'gpt-4', MESSAGES, cost_fn=lambda r: 0.1)
+    assert cached and response['choices'][0]['message']['content'] == "answer 1"
+    assert reopened.stats['disk_hits'] == 1
+
+    expired = LLMCache(cache_dir, ttl=0.01)
+    time.sleep(0.02)
+    _, cached = cached_completion(expired, model, 'gpt-4', MESSAGES, cost_fn=lambda r: 0.1)
+    assert not cached and model.calls == 2
+
+
+def test_size_based_eviction(cache_dir):
+    cache = LLMCache(cache_dir, max_entries=2, max_disk_bytes=600)
+    model = StubModel()
+    for i in range(10):
+        cached_completion(cache, model, 'gpt-4', [{"role": "user", "content": f"prompt {i}"}], cost_fn=lambda r: 0.0)
+    assert len(cache.memory) == 2
+    assert cache.disk_bytes <= 600 and cache.stats['evictions'] > 0
+    assert sum(len(files) for _, _, files in os.walk(cache_dir)) == len(cache.disk)
+    # The newest prompt is still cached, the oldest was evicted from both tiers.
+    assert cached_completion(cache, model, 'gpt-4', [{"role": "user", "content": "prompt 9"}], cost_fn=lambda r: 0.0)[1]
+    assert not cached_completion(cache, model, 'gpt-4', [{"role": "user", "content": "prompt 0"}], cost_fn=lambda r: 0.0)[1]
+
+
+def test_streamed_calls_are_charged_from_their_final_usage(cache_dir):
+    cache = LLMCache(cache_dir)
+    seen = []
+
+    def streaming_model(model, messages, **params):
+        seen.append(params)
+        return iter([{"choices": [{"delta": {"content": "hi"}}]}, {"choices": [], "usage": {"total_tokens": 7}}])
+
+    charges = []
+    stream, cached = cached_completion(cache, streaming_model, 'gpt-4', MESSAGES, charge=charges.append, stream=True,
+                                       usage_cost_fn=lambda model, usage: usage['total_tokens'] / 100)
+    assert not cached and charges == [] # Charged once consumed.
+    assert len(list(stream)) == 2 and charges == [0.07]
+    assert seen[0]['stream_options'] == {'include_usage': True}
+    # An abandoned stream is charged for the usage seen, none here.
+    stream, _ = cached_completion(cache, streaming_model, 'gpt-4', MESSAGES, charge=charges.append, stream=True)
+    next(stream)
+    stream.close()
+    assert charges == [0.07, 0.0] and cache.stats['misses'] == 0
+
+
+def test_simulated_llm_calls_are_charged_once(cache_dir):
+    original_data_dir = app.config.get('DATA_DIR', None)
+    app.config['DATA_DIR'] = cache_dir
+    os.makedirs(cache_dir)
+    try:
+        with app.test_client() as client:
+            client.post('/init', json={'repo_url': 'a', 'path': 'b'})
+            payload = {'cost': 1.5, 'model': 'gpt-4', 'messages': MESSAGES}
+            assert client.post('/simulate_llm_call', json=payload).json['cached'] is False
+            assert client.post('/simulate_llm_call', json=payload).json['cached'] is True
+            assert read_json_file('config.json')['project_spend'] == 1.5
+            assert backend_app.get_llm_cache().stats['saved_cost'] == 1.5
+    finally:
+        if original_data_dir is not None:
+            app.config['DATA_DIR'] = original_data_dir
@@ -0,0 +1,155 @@
+import pytest
+import os
+import time
+import shutil
+import threading
+
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import app, read_json_file, write_json_file
+import app as backend_app
+from llm_governor import LLMGovernor, TokenBucket, CallRejected, estimate_tokens, INTERACTIVE, BACKGROUND
+
+TEST_GOVERNOR_DIR = '.team-ready-governor-test'
+
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    original_data_dir = app.config.get('DATA_DIR')
+    original_governor = backend_app.governor
+    test_dir_path = os.path.join(os.getcwd(), TEST_GOVERNOR_DIR)
+    app.config['DATA_DIR'] = test_dir_path
+    if os.path.exists(test_dir_path):
+        shutil.rmtree(test_dir_path)
+    os.makedirs(test_dir_path)
+
+    with app.test_client() as client:
+        yield client
+
+    backend_app.governor = original_governor
+    shutil.rmtree(test_dir_path)
+    if original_data_dir is not None:
+        app.config['DATA_DIR'] = original_data_dir
+
+
+def test_token_bucket_refills_and_lets_oversized_takes_through():
+    bucket = TokenBucket(600, now=0.0) # 10 a second
+    assert bucket.wait_time(600, 0.0) == 0.0
+    bucket.take(600, 0.0)
+    assert bucket.wait_time(5, 0.0) == pytest.approx(0.5)
+    assert bucket.wait_time(5, 0.5) == 0.0
+    # A take bigger than the bucket waits for a full bucket, then leaves it in debt.
+    assert bucket.wait_time(1000, 0.5) == pytest.approx(59.5)
+    bucket.take(1000, 60.0)
+    assert bucket.wait_time(1, 60.0) == pytest.approx(40.1)
+    bucket.give_back(500, 60.0) # The call used 500 less than it took.
+    assert bucket.level == pytest.approx(100.0) and bucket.wait_time(1, 60.0) == 0.0
+
+
+def test_token_limits_hold_back_calls_per_model_and_project():
+    governor = LLMGovernor(tokens_per_minute=60000, project_requests_per_minute=2) # 1000 tokens a second
+    governor.release(governor.acquire('gpt-4', 'alpha', tokens=60000))
+    started = time.monotonic()
+    governor.release(governor.acquire('gpt-4', 'beta', tokens=100))
+    assert time.monotonic() - started >= 0.08 # Waited for 100 tokens to refill
+    # Another model has its own bucket.
+    started = time.monotonic()
+    governor.release(governor.acquire('gpt-3.5', 'beta', tokens=60000))
+    assert time.monotonic() - started < 0.05
+    # beta made its 2 requests of the minute.
+    governor.max_wait = 0.05
+    with pytest.raises(CallRejected) as rejected:
+        governor.acquire('gpt-3.5', 'beta')
+    assert rejected.value.reason == 'timeout' and rejected.value.retry_after >= 1.0
+    assert governor.stats['admitted'] == 3 and governor.stats['rejected_timeout'] == 1
+
+
+def test_interactive_calls_go_ahead_of_background_ones(wait_for):
+    admitted = []
+    governor = LLMGovernor(max_in_flight=1, on_admit=lambda call: admitted.append((call.lane, call.project_id)))
+    holder = governor.acquire('gpt-4', 'hold')
+    threads = []
+
+    def call(lane, name):
+        governor.release(governor.acquire('gpt-4', name, lane=lane))
+
+    for lane, name in [(BACKGROUND, 'b1'), (BACKGROUND, 'b2'), (INTERACTIVE, 'i1')]:
+        threads.append(threading.Thread(target=call, args=(lane, name)))
+        threads[-1].start()
+        assert wait_for(lambda: governor.waiting_count() == len(threads))
+    governor.release(holder)
+    for thread in threads:
+        thread.join()
+    assert [name for _, name in admitted] == ['hold', 'i1', 'b1', 'b2']
+    assert governor.in_flight == 0
+
+
+def test_calls_over_the_remaining_budget_are_rejected_before_running():
+    governor = LLMGovernor()
+    first = governor.acquire('gpt-4', 'alpha', cost=0.6, remaining=1.0)
+    with pytest.raises(CallRejected) as rejected:
+        governor.acquire('gpt-4', 'alpha', cost=0.6, remaining=1.0) # 0.6 is in flight already
+    assert rejected.value.reason == 'budget'
+    governor.release(governor.acquire('gpt-4', 'beta', cost=0.6, remaining=1.0))
+    governor.release(first)
+    governor.release(governor.acquire('gpt-4', 'alpha', cost=0.6, remaining=1.0))
+    assert governor.stats['rejected_budget'] == 1 and governor.pending_cost == {}
+
+
+def test_complete_settles_the_token_reservation():
+    governor = LLMGovernor(tokens_per_minute=6000)
+    messages = [{"role": "user", "content": "x" * 400}]
+    assert estimate_tokens(messages, {'max_tokens': 200}) == (100, 200)
+
+    def model(model, messages, **params):
+        return {"choices": [], "usage": {"total_tokens": 120}}
+
+    governor.complete(model, 'gpt-4', messages, max_tokens=200)
+    bucket = governor.buckets[('model', 'gpt-4', 'tokens')]
+    assert bucket.level == pytest.approx(6000 - 120, abs=1)
+
+
+def test_streamed_calls_keep_their_slot_until_the_stream_ends():
+    governor = LLMGovernor(tokens_per_minute=6000)
+    messages = [{"role": "user", "content": "x" * 400}]
+
+    def model(model, messages, stream=False, **params):
+        yield {"choices": [{"delta": {"content": "partial"}}]}
+        yield {"choices": [], "usage": {"total_tokens": 120}}
+
+    stream = governor.complete(model, 'gpt-4', messages, max_tokens=200, stream=True)
+    bucket = governor.buckets[('model', 'gpt-4', 'tokens')]
+    assert governor.in_flight == 1
+    assert len(list(stream)) == 2
+    assert governor.in_flight == 0
+    assert bucket.level == pytest.approx(6000 - 120, abs=1) # Settled against the usage the stream reported.
+
+    stream = governor.complete(model, 'gpt-4', messages, max_tokens=200, stream=True)
+    next(stream)
+    assert governor.in_flight == 1
+    stream.close() # The caller stopped reading.
+    assert governor.in_flight == 0
+
+
+def test_simulated_calls_are_governed(client):
+    client.post('/init', json={'project_id': 'alpha'})
+    config = read_json_file('config.json', None, 'alpha')
+    write_json_file('config.json', dict(config, hard_limit=1.0), 'alpha')
+    payload = {'project_id': 'alpha', 'model': 'gpt-4', 'messages': [{"role": "user", "content": "hi"}]}
+
+    rv = client.post('/simulate_llm_call', json=dict(payload, cost=0.75, priority='interactive'))
+    assert rv.status_code == 200
+    # Rejected up front: 0.5 more would overrun the 0.25 left, so nothing is charged.
+    rv = client.post('/simulate_llm_call', json=dict(payload, cost=0.5, messages=[{"role": "user", "content": "more"}]))
+    assert rv.status_code == 403 and "exceeds" in rv.json['message']
+    assert backend_app.get_spend_ledger('alpha').spend() == 0.75
+    assert client.post('/simulate_llm_call', json=dict(payload, priority='urgent')).status_code == 400
+
+    backend_app.governor = LLMGovernor(max_in_flight=0, max_wait=0.01)
+    rv = client.post('/simulate_llm_call', json=dict(payload, cost=0.1, messages=[{"role": "user", "content": "busy"}]))
+    assert rv.status_code == 429 and rv.headers['Retry-After'] == '1'
+
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'team_ready_llm_queue_seconds_count{lane="interactive"} 1' in body
+    assert 'team_ready_llm_calls_rejected_timeout_total 1' in body
@@ -0,0 +1,68 @@
+import pytest
+import os
+import time
+import shutil
+import threading
+
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import app
+import lock_timing
+from lock_timing import FileLock
+
+TEST_LOCK_TIMING_DIR = '.team-ready-lock-timing-test'
+
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    original_data_dir = app.config.get('DATA_DIR')
+    test_dir_path = os.path.join(os.getcwd(), TEST_LOCK_TIMING_DIR)
+    app.config['DATA_DIR'] = test_dir_path
+    if os.path.exists(test_dir_path):
+        shutil.rmtree(test_dir_path)
+    os.makedirs(test_dir_path)
+
+    with app.test_client() as client:
+        yield client
+
+    shutil.rmtree(test_dir_path)
+    if original_data_dir is not None:
+        app.config['DATA_DIR'] = original_data_dir
+
+
+def test_lock_wait_is_counted_per_context(client):
+    lockpath = os.path.join(app.config['DATA_DIR'], 'todo.json.lock')
+    held = threading.Event()
+
+    def hold():
+        with FileLock(lockpath):
+            held.set()
+            time.sleep(0.2)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    held.wait()
+    token = lock_timing.start()
+    with FileLock(lockpath):
+        pass
+    waited = lock_timing.stop(token)
+    holder.join()
+    assert waited >= 0.1
+    # Outside of start()/stop() nothing is counted.
+    with FileLock(lockpath):
+        pass
+    assert lock_timing.stop(lock_timing.start()) == 0.0
+
+
+def test_responses_carry_server_timing(client):
+    response = client.post('/init', json={})
+    timings = dict(metric.strip().split(';dur=') for metric in response.headers['Server-Timing'].split(','))
+    assert set(timings) == {'app', 'lock'}
+    assert float(timings['app']) >= float(timings['lock']) > 0.0
+
+    app.config['SERVER_TIMING'] = False
+    try:
+        assert 'Server-Timing' not in client.get('/status').headers
+    finally:
+        app.config['SERVER_TIMING'] = True
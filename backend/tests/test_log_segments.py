@@ -0,0 +1,118 @@
+import pytest
+import os
+import gzip
+import shutil
+
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import app, append_to_log_file, get_file_path, get_precis
+import log_tail
+import log_segments
+from log_segments import RotationPolicy, append_entries, rotate, rotate_if_needed, query, segment_paths
+
+TEST_SEGMENTS_DIR = '.team-ready-segments-test'
+
+
+@pytest.fixture
+def data_dir():
+    original = {key: app.config.get(key) for key in ('DATA_DIR', 'LOG_ROTATE_BYTES', 'LOG_ROTATE_SECONDS')}
+    test_dir_path = os.path.join(os.getcwd(), TEST_SEGMENTS_DIR)
+    app.config['DATA_DIR'] = test_dir_path
+    if os.path.exists(test_dir_path):
+        shutil.rmtree(test_dir_path)
+    os.makedirs(test_dir_path)
+
+    yield test_dir_path
+
+    shutil.rmtree(test_dir_path)
+    for key, value in original.items():
+        if value is not None:
+            app.config[key] = value
+
+
+def write(path, count, start=0, agent=lambda i: f"agent{i % 3}"):
+    append_entries(path, [(f"entry {i}\nsecond line {i}", 1000.0 + i, agent(i)) for i in range(start, start + count)])
+
+
+def test_rotation_by_size_and_age(data_dir):
+    path = os.path.join(data_dir, 'decisions.log')
+    write(path, 10)
+    assert rotate_if_needed(path, RotationPolicy(max_bytes=10**6, max_age=10**6), now=1005.0) is None
+    assert rotate_if_needed(path, RotationPolicy(max_bytes=10**6, max_age=60), now=1100.0) is not None
+    write(path, 10, start=10)
+    assert rotate_if_needed(path, RotationPolicy(max_bytes=100, max_age=0)) is not None
+
+    segments = segment_paths(path)
+    assert [os.path.basename(s) for s in segments] == ['decisions.log.000001.gz', 'decisions.log.000002.gz']
+    assert os.path.getsize(path) == 0
+    # Segments are ordinary (multi-member) gzip files.
+    with gzip.open(segments[0], 'rt') as f:
+        assert f.read().splitlines()[:2] == ["entry 0", "second line 0"]
+
+
+def test_query_by_time_and_agent_across_segments(data_dir, monkeypatch):
+    monkeypatch.setattr(log_segments, 'MEMBER_BYTES', 200) # Several members per segment.
+    path = os.path.join(data_dir, 'decisions.log')
+    for start in (0, 30, 60):
+        write(path, 30, start=start)
+        if start < 60:
+            rotate(path)
+
+    entries = query(path, start=1025.0, end=1034.0)
+    assert [e['timestamp'] for e in entries] == [1000.0 + i for i in range(25, 35)]
+    assert entries[0]['message'] == "entry 25\nsecond line 25"
+
+    entries = query(path, agent='agent1', limit=4)
+    assert [e['message'].split('\n')[0] for e in entries] == ["entry 79", "entry 82", "entry 85", "entry 88"]
+    assert all(e['agent'] == 'agent1' for e in entries)
+    assert len(query(path, agent='agent2')) == 30
+
+
+def test_max_segments(data_dir):
+    path = os.path.join(data_dir, 'decisions.log')
+    for start in range(0, 40, 10):
+        write(path, 10, start=start)
+        rotate(path, max_segments=2)
+    assert [os.path.basename(s) for s in segment_paths(path)] == ['decisions.log.000003.gz', 'decisions.log.000004.gz']
+    assert query(path)[0]['message'].startswith("entry 20")
+
+
+def test_precis_and_logs_route_across_rotation(data_dir):
+    app.config['LOG_ROTATE_BYTES'] = 30
+    for i in range(12):
+        append_to_log_file('agents_internal.log', f"thought {i}", agent='Coder' if i % 2 else None)
+    filepath = get_file_path('agents_internal.log')
+    assert len(segment_paths(filepath)) >= 3
+    assert os.path.getsize(filepath) < 30
+    assert get_precis().splitlines()[1:] == [f"thought {i}" for i in range(2, 12)]
+    # A fresh reader (e.g. another process) has to look into the segments for the precis.
+    log_tail._recent_lines.clear()
+    assert get_precis().splitlines()[1:] == [f"thought {i}" for i in range(2, 12)]
+
+    with app.test_client() as client:
+        rv = client.get('/logs?file=agents_internal.log&agent=Coder&limit=3')
+        assert [e['message'] for e in rv.json['entries']] == ["thought 7", "thought 9", "thought 11"]
+        assert client.get('/logs?file=config.json').status_code == 400
+
+
+def test_stale_buffer_reloads_from_segments(data_dir):
+    from log_tail import RecentLines
+    path = os.path.join(data_dir, 'agents_internal.log')
+    write(path, 5)
+    rotate(path)
+    write(path, 1, start=5)
+    assert RecentLines().last(path, 4) == ["entry 4", "second line 4", "entry 5", "second line 5"]
+
+
+def test_log_writer_rotates_batches(data_dir):
+    from log_writer import LogWriter
+    writer = LogWriter(flush_interval=0.01, rotation=RotationPolicy(max_bytes=200, max_age=0))
+    writer.start()
+    path = os.path.join(data_dir, 'decisions.log')
+    for i in range(50):
+        writer.submit(path, f"decision {i}", timestamp=2000.0 + i, agent='Orchestrator')
+        if i % 10 == 9:
+            assert writer.flush(timeout=5)
+    writer.stop()
+    assert len(segment_paths(path)) >= 2
+    assert [e['message'] for e in query(path, start=2020.0, end=2022.0)] == ["decision 20", "decision 21", "decision 22"]
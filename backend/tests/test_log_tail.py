@@ -0,0 +1,57 @@
+import pytest
+import os
+
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from log_tail import tail_lines, RecentLines
+
+
+@pytest.fixture
+def log_path(tmp_path):
+    return str(tmp_path / "agents_internal.log")
+
+
+def write_lines(path, lines, mode='w'):
+    with open(path, mode) as f:
+        for line in lines:
+            f.write(line + '\n')
+
+
+def test_tail_lines_missing_file(log_path):
+    assert tail_lines(log_path, 10) == []
+
+
+@pytest.mark.parametrize("block_size", [1, 7, 64, 8192])
+def test_tail_lines_matches_readlines(log_path, block_size):
+    lines = [f"Log line {i} " + "x" * (i % 13) for i in range(200)]
+    write_lines(log_path, lines)
+    assert tail_lines(log_path, 10, block_size=block_size) == lines[-10:]
+    assert tail_lines(log_path, 500, block_size=block_size) == lines
+
+
+def test_tail_lines_without_trailing_newline(log_path):
+    with open(log_path, 'w') as f:
+        f.write("first\nsecond\nthird")
+    assert tail_lines(log_path, 2) == ["second", "third"]
+
+
+def test_recent_lines_follows_own_writes(log_path):
+    recent = RecentLines(capacity=5)
+    write_lines(log_path, ["a", "b"])
+    assert recent.last(log_path, 10) == ["a", "b"]
+
+    for message in ["c", "d\ne"]:
+        recent.before_write(log_path)
+        write_lines(log_path, [message], mode='a')
+        recent.after_write(log_path, message)
+    assert recent.last(log_path, 3) == ["c", "d", "e"]
+
+
+def test_recent_lines_reloads_after_external_change(log_path):
+    recent = RecentLines()
+    write_lines(log_path, ["old 1", "old 2"])
+    assert recent.last(log_path, 10) == ["old 1", "old 2"]
+
+    # Truncated and rewritten by someone else.
+    write_lines(log_path, ["new"])
+    assert recent.last(log_path, 10) == ["new"]
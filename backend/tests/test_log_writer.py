@@ -0,0 +1,75 @@
+import pytest
+import os
+import shutil
+
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import app as backend_app
+from app import app, append_to_log_file, get_file_path, get_precis, start_background_services, stop_background_services
+from log_writer import LogWriter
+
+TEST_LOG_WRITER_DIR = '.team-ready-log-writer-test'
+
+
+@pytest.fixture
+def data_dir():
+    original_data_dir = app.config.get('DATA_DIR', None)
+    test_dir_path = os.path.join(os.getcwd(), TEST_LOG_WRITER_DIR)
+    app.config['DATA_DIR'] = test_dir_path
+    if os.path.exists(test_dir_path):
+        shutil.rmtree(test_dir_path)
+    os.makedirs(test_dir_path)
+
+    yield test_dir_path
+
+    stop_background_services()
+    shutil.rmtree(test_dir_path)
+    if original_data_dir is not None:
+        app.config['DATA_DIR'] = original_data_dir
+
+
+def read_lines(path):
+    with open(path, 'r') as f:
+        return f.read().splitlines()
+
+
+@pytest.mark.parametrize("fsync_policy", ['none', 'batch', 'always'])
+def test_records_are_written_in_order(data_dir, fsync_policy):
+    writer = LogWriter(flush_interval=0.01, fsync_policy=fsync_policy)
+    writer.start()
+    first, second = os.path.join(data_dir, 'a.log'), os.path.join(data_dir, 'b.log')
+    for i in range(100):
+        writer.submit(first if i % 2 else second, f"record {i}")
+    assert writer.flush(timeout=5)
+    assert read_lines(first) == [f"record {i}" for i in range(1, 100, 2)]
+    assert read_lines(second) == [f"record {i}" for i in range(0, 100, 2)]
+    writer.stop()
+
+
+def test_stop_flushes_queued_records(data_dir):
+    writer = LogWriter(flush_interval=60)
+    writer.start()
+    path = os.path.join(data_dir, 'a.log')
+    writer.submit(path, "queued")
+    writer.stop()
+    assert read_lines(path) == ["queued"]
+
+
+def test_unknown_fsync_policy():
+    with pytest.raises(ValueError):
+        LogWriter(fsync_policy='sometimes')
+
+
+def test_append_to_log_file_goes_through_writer(data_dir):
+    append_to_log_file('agents_internal.log', "written inline")
+    get_precis() # Prime the ring buffer.
+    start_background_services()
+    append_to_log_file('agents_internal.log', "queued with TOKEN")
+
+    # The precis sees the record before it reaches the disk.
+    assert get_precis().endswith("queued with [REDACTED]")
+
+    backend_app.log_writer.flush(timeout=5)
+    assert read_lines(get_file_path('agents_internal.log')) == ["written inline", "queued with [REDACTED]"]
+    # Indexed for search by the writer thread, after the write.
+    assert [hit['text'] for hit in backend_app.get_search_index().search("queued")] == ["queued with [REDACTED]"]
@@ -0,0 +1,99 @@
+import pytest
+import os
+import shutil
+
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import app
+import metrics
+from metrics import Registry
+
+TEST_METRICS_DIR = '.team-ready-metrics-test'
+
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    original_data_dir = app.config.get('DATA_DIR')
+    test_dir_path = os.path.join(os.getcwd(), TEST_METRICS_DIR)
+    app.config['DATA_DIR'] = test_dir_path
+    if os.path.exists(test_dir_path):
+        shutil.rmtree(test_dir_path)
+    os.makedirs(test_dir_path)
+
+    with app.test_client() as client:
+        yield client
+
+    shutil.rmtree(test_dir_path)
+    if original_data_dir is not None:
+        app.config['DATA_DIR'] = original_data_dir
+
+
+def sample(text, line_start):
+    """Value of the first sample line starting with `line_start`."""
+    for line in text.splitlines():
+        if line.startswith(line_start + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    return None
+
+
+def test_text_format():
+    registry = Registry()
+    counter = registry.counter('jobs_total', "Jobs.", ['state'])
+    histogram = registry.histogram('wait_seconds', "Waits.", ['file'], buckets=(0.1, 1.0))
+    registry.add_collector(lambda: [('workers', 'gauge', "Workers.", [({'state': 'idle'}, 2)])])
+    counter.inc('done')
+    counter.inc('done', amount=2)
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, 'todo.json')
+
+    text = registry.render()
+    assert '# TYPE jobs_total counter' in text
+    assert sample(text, 'jobs_total{state="done"}') == 3
+    assert sample(text, 'wait_seconds_bucket{file="todo.json",le="0.1"}') == 2
+    assert sample(text, 'wait_seconds_bucket{file="todo.json",le="1.0"}') == 3
+    assert sample(text, 'wait_seconds_bucket{file="todo.json",le="+Inf"}') == 4
+    assert sample(text, 'wait_seconds_count{file="todo.json"}') == 4
+    assert sample(text, 'wait_seconds_sum{file="todo.json"}') == pytest.approx(3.65)
+    assert sample(text, 'workers{state="idle"}') == 2
+
+
+def test_metrics_endpoint(client):
+    before = client.get('/metrics').get_data(as_text=True)
+    metrics.REGISTRY.lock_holds = True
+    try:
+        client.post('/init', json={})
+    finally:
+        metrics.REGISTRY.lock_holds = False
+    client.post('/simulate_llm_call', json={'cost': 2.5})
+    client.get('/status')
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+    text = response.get_data(as_text=True)
+    route = 'team_ready_request_duration_seconds_count{method="POST",route="/init",status="200"}'
+    assert sample(text, route) == (sample(before, route) or 0) + 1
+    assert sample(text, 'team_ready_lock_wait_seconds_count{file="decisions.log"}') > 0
+    assert sample(text, 'team_ready_lock_hold_seconds_count{file="decisions.log"}') > 0
+    charged = 'team_ready_spend_charged_dollars_total'
+    assert sample(text, charged) == sample(before, charged) + 2.5
+    assert sample(text, 'team_ready_socket_messages_total') > sample(before, 'team_ready_socket_messages_total')
+
+
+def test_lock_holds_are_recorded_on_request(client):
+    count = 'team_ready_lock_hold_seconds_count{file="decisions.log"}'
+    before = sample(metrics.REGISTRY.render(), count) or 0
+    client.post('/init', json={})
+    assert (sample(metrics.REGISTRY.render(), count) or 0) == before
+
+
+def test_disabled_registry_records_nothing(client):
+    count = 'team_ready_lock_wait_seconds_count{file="todo.json"}'
+    before = sample(metrics.REGISTRY.render(), count) or 0
+    metrics.REGISTRY.enabled = False
+    try:
+        client.post('/init', json={})
+    finally:
+        metrics.REGISTRY.enabled = True
+    assert (sample(metrics.REGISTRY.render(), count) or 0) == before
@@ -0,0 +1,109 @@
+import pytest
+import io
+import os
+import shutil
+
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import app, socketio, broadcaster, output_streams, get_file_path
+from output_streams import OutputStream, LOG_ENTRY_CHARS
+from redaction import Redactor
+
+TEST_STREAMS_DIR = '.team-ready-streams-test'
+
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    original_data_dir = app.config.get('DATA_DIR')
+    test_dir_path = os.path.join(os.getcwd(), TEST_STREAMS_DIR)
+    app.config['DATA_DIR'] = test_dir_path
+    if os.path.exists(test_dir_path):
+        shutil.rmtree(test_dir_path)
+    os.makedirs(test_dir_path)
+
+    with app.test_client() as client:
+        yield client
+
+    shutil.rmtree(test_dir_path)
+    if original_data_dir is not None:
+        app.config['DATA_DIR'] = original_data_dir
+
+
+@pytest.fixture
+def dashboard():
+    client = socketio.test_client(app, query_string='project_id=alpha')
+    client.get_received()
+    yield client
+    if client.is_connected():
+        client.disconnect()
+
+
+def relayed(client):
+    """(stream_id, text, done) of every agent_output message received."""
+    return [(message['stream_id'], message['text'], message['done'])
+            for received in client.get_received() if received['name'] == 'agent_output'
+            for message in received['args'][0]['messages']]
+
+
+def read_log(project_id):
+    with open(get_file_path('agents_internal.log', project_id)) as f:
+        return f.read()
+
+
+def test_stream_logs_whole_lines_and_bounds_long_ones():
+    stream = OutputStream('s1', 'Coder', redactor=Redactor())
+    text, entries = stream.write("first line\nsecond")
+    assert text == "first line" and entries == [] # "\nsecond" could end in the start of a trigger.
+    # Lines are logged once a few KB of them are buffered.
+    text, entries = stream.write("x" * LOG_ENTRY_CHARS)
+    assert entries == ["Agent Coder submitted output: first line"]
+    # A line that does not end is logged in pieces.
+    text, entries = stream.write("y" * 16)
+    assert entries == [("second" + "x" * LOG_ENTRY_CHARS)[:LOG_ENTRY_CHARS]]
+    text, entries = stream.write(" PASS")
+    assert "P" not in text # Held back: it may become a keyword.
+    text, entries = stream.write("WORD", final=True)
+    assert text.endswith("y [REDACTED]") and stream.closed
+    assert entries == [("second" + "x" * LOG_ENTRY_CHARS + "y" * 16)[LOG_ENTRY_CHARS:] + " [REDACTED]"]
+
+
+def test_chunked_http_output_is_relayed_and_logged_as_it_arrives(client, dashboard):
+    body = b"line one\nline two with API_KEY=abc123\n" + "café ".encode() * 600
+    rv = client.post('/submit_agent_output/stream?agent_id=Coder&project_id=alpha&stream_id=s1',
+                     input_stream=io.BytesIO(body), environ_overrides={'wsgi.input_terminated': True})
+    assert rv.status_code == 200
+    assert rv.json['stream_id'] == 's1' and rv.json['closed']
+
+    messages = relayed(dashboard)
+    assert len(messages) > 2 and messages[-1][2]
+    expected = Redactor().redact(body.decode())
+    assert ''.join(text for _, text, _ in messages) == expected
+    log = read_log('alpha')
+    assert "Agent Coder submitted output: line one\nline two with [REDACTED]=[REDACTED]\ncafé " in log
+    assert "Critique from Agent X for Coder's output" in log
+    assert output_streams.get('s1') is None
+
+
+def test_socket_chunks_stream_to_the_project_room(client, dashboard):
+    agent = socketio.test_client(app)
+    try:
+        ack = agent.emit('agent_output_chunk', {'stream_id': 's2', 'agent_id': 'Tester', 'project_id': 'alpha',
+                                                'chunk': "x" * 2000 + "\n"}, callback=True)
+        assert ack['status'] == 'success' and not ack['closed']
+        messages = relayed(dashboard)
+        assert messages == [('s2', "x" * (2001 - 7), False)]
+        # A client that goes away ends its streams.
+        agent.emit('agent_output_chunk', {'stream_id': 's2', 'chunk': "tail"}, callback=True)
+        agent.disconnect()
+        messages += relayed(dashboard)
+        assert messages[-1][2] and ''.join(text for _, text, _ in messages) == "x" * 2000 + "\ntail"
+        assert "Agent Tester submitted output: " + "x" * 2000 + "\ntail" in read_log('alpha')
+
+        agent = socketio.test_client(app)
+        ack = agent.emit('agent_output_chunk', {'project_id': '../etc', 'chunk': "x"}, callback=True)
+        assert ack['status'] == 'error'
+    finally:
+        if agent.is_connected():
+            agent.disconnect()
+        broadcaster.running = False
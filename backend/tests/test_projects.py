@@ -0,0 +1,85 @@
+import pytest
+import os
+import shutil
+
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import app, read_json_file, get_file_path, get_data_dir
+import app as backend_app
+
+TEST_PROJECTS_DIR = '.team-ready-projects-test'
+
+
+@pytest.fixture
+def client():
+    original_data_dir = app.config.get('DATA_DIR', None)
+    app.config['DATA_DIR'] = os.path.join(os.getcwd(), TEST_PROJECTS_DIR)
+    if os.path.exists(app.config['DATA_DIR']):
+        shutil.rmtree(app.config['DATA_DIR'])
+    os.makedirs(app.config['DATA_DIR'])
+
+    with app.test_client() as client:
+        for project_id in ('alpha', 'beta'):
+            client.post('/init', json={'repo_url': 'a', 'path': 'b', 'project_id': project_id})
+        yield client
+
+    shutil.rmtree(app.config['DATA_DIR'])
+    if original_data_dir is not None:
+        app.config['DATA_DIR'] = original_data_dir
+    backend_app.agent_paused = False
+    backend_app.paused_projects.clear()
+
+
+def read_log(project_id):
+    with open(get_file_path('agents_internal.log', project_id)) as f:
+        return f.read()
+
+
+def test_projects_get_their_own_namespace(client):
+    assert get_data_dir('alpha') == os.path.join(app.config['DATA_DIR'], 'projects', 'alpha')
+    assert os.path.exists(get_file_path('config.json', 'alpha'))
+    assert os.path.exists(get_file_path('todo.json', 'beta'))
+    # Projects that were never initialized on their own share the root directory.
+    assert get_data_dir('unknown') == app.config['DATA_DIR']
+
+
+def test_logs_and_precis_are_isolated(client):
+    client.post('/kickoff', json={'project_id': 'alpha', 'task': 'alpha task'})
+    client.post('/submit_agent_output', json={'project_id': 'beta', 'agent_id': 'Coder', 'output': 'beta output'})
+
+    assert "alpha task" in read_log('alpha') and "beta output" not in read_log('alpha')
+    assert "beta output" in read_log('beta') and "alpha task" not in read_log('beta')
+    assert "beta output" not in backend_app.get_precis('alpha')
+
+
+def test_budgets_are_isolated(client):
+    config = read_json_file('config.json', project_id='alpha')
+    config['hard_limit'] = 1.0
+    backend_app.write_json_file('config.json', config, 'alpha')
+
+    rv = client.post('/simulate_llm_call', json={'project_id': 'alpha', 'cost': 1.5})
+    assert rv.status_code == 403
+    rv = client.post('/simulate_llm_call', json={'project_id': 'beta', 'cost': 1.5})
+    assert rv.status_code == 200
+
+    assert read_json_file('config.json', project_id='alpha')['project_spend'] == 1.5
+    assert read_json_file('config.json', project_id='beta')['project_spend'] == 1.5
+
+
+def test_pause_is_per_project(client):
+    client.post('/pause_agent', json={'project_id': 'alpha'})
+    assert client.post('/kickoff', json={'project_id': 'alpha', 'task': 't'}).status_code == 403
+    assert client.post('/kickoff', json={'project_id': 'beta', 'task': 't'}).status_code == 200
+
+    client.post('/approve', json={'project_id': 'alpha'})
+    assert client.post('/kickoff', json={'project_id': 'alpha', 'task': 't'}).status_code == 200
+
+    # Pausing without a project pauses everything.
+    client.post('/pause_agent')
+    assert client.post('/kickoff', json={'project_id': 'beta', 'task': 't'}).status_code == 403
+
+
+@pytest.mark.parametrize("project_id", ["../escape", "a/b", ".hidden", ""])
+def test_invalid_project_ids_are_rejected(client, project_id):
+    rv = client.post('/init', json={'repo_url': 'a', 'path': 'b', 'project_id': project_id or '/'})
+    assert rv.status_code == 400
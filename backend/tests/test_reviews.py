@@ -0,0 +1,143 @@
+import pytest
+import os
+import time
+import shutil
+import types
+
+import sys
+TESTS_DIR = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(TESTS_DIR, '..')))
+sys.path.insert(0, TESTS_DIR)
+from app import app, get_file_path, get_spend_ledger, governor, review_pipeline
+import agent_runner
+import fake_agent
+from reviews import ReviewPipeline, DONE, FAILED
+
+TEST_REVIEWS_DIR = '.team-ready-reviews-test'
+
+
+@pytest.fixture
+def pipeline():
+    finished = []
+    pipeline = ReviewPipeline(fake_agent.critique, workers=8, on_finish=finished.append)
+    pipeline.finished_reviews = finished
+    pipeline.start()
+    yield pipeline
+    pipeline.stop()
+
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    original_data_dir = app.config.get('DATA_DIR')
+    original_critic = app.config['CRITIC']
+    test_dir_path = os.path.join(os.getcwd(), TEST_REVIEWS_DIR)
+    app.config['DATA_DIR'] = test_dir_path
+    app.config['CRITIC'] = 'fake_agent:critique'
+    if os.path.exists(test_dir_path):
+        shutil.rmtree(test_dir_path)
+    os.makedirs(test_dir_path)
+    review_pipeline.start()
+
+    with app.test_client() as client:
+        yield client
+
+    review_pipeline.stop()
+    app.config['CRITIC'] = original_critic
+    shutil.rmtree(test_dir_path)
+    if original_data_dir is not None:
+        app.config['DATA_DIR'] = original_data_dir
+
+
+def test_reviews_run_concurrently(pipeline, wait_for):
+    count = 40
+    started = time.perf_counter()
+    submitted = [pipeline.submit('alpha', 'Coder', f"output {i}")[0] for i in range(count)]
+    assert time.perf_counter() - started < fake_agent.REVIEW_SECONDS # submit() never waits for the critic.
+    assert wait_for(lambda: len(pipeline.finished_reviews) == count)
+    elapsed = time.perf_counter() - started
+
+    serial = count * fake_agent.REVIEW_SECONDS
+    assert elapsed < serial / 3, f"{count} reviews took {elapsed:.2f}s on 8 critics, {serial:.2f}s one at a time"
+    assert all(review.state == DONE for review in submitted)
+    assert submitted[7].critique == "Fake critique of Coder's output (8 chars)."
+
+
+def test_identical_outputs_are_reviewed_once(pipeline, wait_for):
+    first, deduplicated = pipeline.submit('alpha', 'Coder', "same output")
+    assert not deduplicated
+    second, deduplicated = pipeline.submit('alpha', 'Coder', "same output")
+    assert deduplicated and second is first
+    other, deduplicated = pipeline.submit('beta', 'Coder', "same output")
+    assert not deduplicated and other is not first
+
+    assert wait_for(lambda: len(pipeline.finished_reviews) == 2)
+    # Finished reviews are shared too.
+    assert pipeline.submit('alpha', 'Coder', "same output") == (first, True)
+    assert first.submissions == 3
+    assert pipeline.stats['deduplicated'] == 2 and pipeline.stats['reviewed'] == 2
+
+
+def test_failed_reviews_are_retried(pipeline, wait_for):
+    failed, _ = pipeline.submit('alpha', 'Coder', "fail please")
+    assert wait_for(lambda: failed.state == FAILED)
+    assert "fake critic failed" in failed.error
+    retried, deduplicated = pipeline.submit('alpha', 'Coder', "fail please")
+    assert not deduplicated and retried is not failed
+    assert wait_for(lambda: retried.state == FAILED)
+    assert pipeline.get(failed.id) is None and pipeline.get(retried.id) is retried
+
+
+def test_reviews_are_inline_until_started():
+    pipeline = ReviewPipeline(lambda agent_id, output, project_id: f"{agent_id}: ok")
+    review, _ = pipeline.submit(None, 'Coder', "output")
+    assert review.state == DONE and review.critique == "Coder: ok"
+
+
+def read_log(project_id):
+    with open(get_file_path('agents_internal.log', project_id)) as f:
+        return f.read()
+
+
+def test_submit_agent_output_returns_before_the_critique(client, wait_for):
+    client.post('/init', json={'project_id': 'alpha'})
+    rv = client.post('/submit_agent_output', json={'project_id': 'alpha', 'agent_id': 'Coder', 'output': 'sleepy code'})
+    assert rv.status_code == 200
+    assert rv.json['review_state'] in ('queued', 'running')
+
+    # The critique is logged (and sent to the chats) once the critic is done.
+    critique = "Fake critique of Coder's output (11 chars)."
+    assert wait_for(lambda: critique in read_log('alpha'))
+    review_id = rv.json['review_id']
+    review = client.get(f'/reviews/{review_id}').json
+    assert review['state'] == DONE and review['critique'] == critique
+
+    rv = client.post('/submit_agent_output', json={'project_id': 'alpha', 'agent_id': 'Coder', 'output': 'sleepy code'})
+    assert rv.json['review_id'] == review_id
+    assert client.get('/reviews/unknown').status_code == 404
+
+
+def test_critic_llm_calls_are_cached_and_charged_to_the_project(client, monkeypatch, wait_for):
+    calls = []
+    litellm = types.ModuleType('litellm')
+    litellm.completion = lambda model, messages, **params: calls.append(model) or fake_agent.stub_completion(model, messages)
+    litellm.completion_cost = lambda completion_response: 0.25
+    litellm.ModelResponse = dict
+    monkeypatch.setitem(sys.modules, 'litellm', litellm)
+    monkeypatch.setattr(agent_runner, '_critic_hooks_installed', False)
+    monkeypatch.setitem(app.config, 'CRITIC', 'fake_agent:llm_critique')
+    client.post('/init', json={'project_id': 'alpha'})
+
+    reviews = []
+    for agent_id in ('Coder', 'Tester'): # Different outputs, the same prompt.
+        rv = client.post('/submit_agent_output', json={'project_id': 'alpha', 'agent_id': agent_id, 'output': 'code'})
+        review = review_pipeline.get(rv.json['review_id'])
+        assert wait_for(lambda: review.state == DONE)
+        reviews.append(review)
+
+    assert [review.critique for review in reviews] == ["answer to Review: code"] * 2
+    assert calls == ['gpt-4'] # The second review was answered by the LLM cache.
+    assert get_spend_ledger('alpha').spend() == 0.25
+    assert governor.stats['admitted'] >= 1
+    assert litellm.completion(model='gpt-4', messages=[{"role": "user", "content": "elsewhere"}]) # Not a critic: not hooked.
+    assert get_spend_ledger('alpha').spend() == 0.25
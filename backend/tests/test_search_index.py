@@ -0,0 +1,146 @@
+import pytest
+import os
+import shutil
+
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import app, append_to_log_file, write_json_file
+import search_index
+from search_index import SearchIndex, tokenize
+
+TEST_SEARCH_DIR = '.team-ready-search-test'
+
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    original_data_dir = app.config.get('DATA_DIR')
+    test_dir_path = os.path.join(os.getcwd(), TEST_SEARCH_DIR)
+    app.config['DATA_DIR'] = test_dir_path
+    if os.path.exists(test_dir_path):
+        shutil.rmtree(test_dir_path)
+    os.makedirs(test_dir_path)
+
+    with app.test_client() as client:
+        yield client
+
+    shutil.rmtree(test_dir_path)
+    if original_data_dir is not None:
+        app.config['DATA_DIR'] = original_data_dir
+
+
+@pytest.fixture
+def index_dir(tmp_path):
+    return str(tmp_path / 'search')
+
+
+def texts(hits):
+    return [hit['text'] for hit in hits]
+
+
+def test_tokenize():
+    assert tokenize("Fix the Login-page, v2!") == ['fix', 'the', 'login', 'page', 'v2']
+
+
+def test_terms_phrases_and_prefixes(index_dir):
+    index = SearchIndex(index_dir)
+    index.add('decisions.log', "Use PostgreSQL for the user store", timestamp=1.0)
+    index.add('decisions.log', "The store for user sessions is Redis", timestamp=2.0)
+    index.add('agents_internal.log', "Coder started on the login page", timestamp=3.0)
+
+    assert texts(index.search("user store")) == ["The store for user sessions is Redis", "Use PostgreSQL for the user store"]
+    assert texts(index.search('"user store"')) == ["Use PostgreSQL for the user store"]
+    assert texts(index.search("postgres*")) == ["Use PostgreSQL for the user store"]
+    assert texts(index.search("log", prefix_last=True)) == ["Coder started on the login page"]
+    assert index.search("log") == []
+    assert index.search("store mongodb") == []
+    assert texts(index.search("store", source='agents_internal.log')) == []
+    assert index.search("") == []
+
+
+def test_ranking_prefers_rare_terms_and_todos(index_dir):
+    index = SearchIndex(index_dir)
+    for i in range(50):
+        index.add('agents_internal.log', f"agent heartbeat {i}")
+    index.add('agents_internal.log', "agent found a deadlock")
+    index.add('todo', "agent should fix the heartbeat")
+
+    hits = index.search("agent heartbeat", limit=3)
+    assert hits[0]['source'] == 'todo'
+    # Otherwise newest first among equal scores.
+    assert texts(hits[1:]) == ["agent heartbeat 49", "agent heartbeat 48"]
+    assert texts(index.search("agent deadlock")) == ["agent found a deadlock"]
+
+
+def test_survives_restart_from_snapshot_and_journal(index_dir):
+    index = SearchIndex(index_dir, checkpoint_every=3)
+    for i in range(5):
+        index.add('decisions.log', f"decision number {i}", ref=f"agent{i}")
+    index.flush()
+    # Three documents went into the snapshot, two are only in the journal.
+    reopened = SearchIndex(index_dir)
+    hits = reopened.search("decision")
+    assert texts(hits) == [f"decision number {i}" for i in range(4, -1, -1)]
+    assert hits[0]['ref'] == 'agent4'
+    reopened.add('decisions.log', "decision number 5")
+    assert reopened.search("5")[0]['id'] == 5
+    index.close()
+    reopened.close()
+
+
+def test_snapshots_are_written_in_the_background(index_dir, monkeypatch):
+    index = SearchIndex(index_dir, checkpoint_every=3)
+    written = []
+    monkeypatch.setattr(index, '_write_snapshot', lambda snapshot: written.append(snapshot) or failing())
+
+    def failing():
+        raise OSError("disk full")
+
+    for i in range(3):
+        index.add('decisions.log', f"decision number {i}")
+    index.checkpoint_thread.join()
+    # The snapshot failed: its journal is kept, and the next one covers both.
+    assert len(written) == 1 and os.path.exists(index.path(search_index.OLD_JOURNAL_FILENAME))
+    for i in range(3, 7):
+        index.add('decisions.log', f"decision number {i}")
+    index.flush()
+    assert len(texts(SearchIndex(index_dir).search("decision"))) == 7
+
+    monkeypatch.undo()
+    index.checkpoint()
+    assert not os.path.exists(index.path(search_index.OLD_JOURNAL_FILENAME))
+    assert os.path.getsize(index.path(search_index.JOURNAL_FILENAME)) == 0
+    assert len(texts(SearchIndex(index_dir).search("decision"))) == 7
+    index.close()
+
+
+def test_todo_updates_replace_old_entries(index_dir):
+    index = SearchIndex(index_dir)
+    index.update_todos([{"id": 1, "task": "Write the parser"}, {"id": 2, "task": "Review the parser"}])
+    assert len(index.search("parser")) == 2
+    index.update_todos([{"id": 1, "task": "Write the lexer"}])
+    assert texts(index.search("parser")) == []
+    assert [hit['ref'] for hit in index.search("lexer")] == ['1']
+    # Unchanged todos are not indexed again.
+    count = len(index.offsets)
+    index.update_todos([{"id": 1, "task": "Write the lexer"}])
+    assert len(index.offsets) == count
+
+
+def test_search_endpoint_covers_logs_and_todos(client):
+    append_to_log_file('decisions.log', "Decided to cache completions on disk", agent='Orchestrator')
+    append_to_log_file('agents_internal.log', "Coder is caching the token counts")
+    write_json_file('todo.json', [{"id": "t1", "task": "Invalidate the cache on deploy"}])
+
+    response = client.get('/search?q=cach')
+    assert response.status_code == 200
+    hits = response.get_json()['hits']
+    assert [hit['source'] for hit in hits] == ['todo', 'decisions.log', 'agents_internal.log']
+    assert hits[1]['ref'] == 'Orchestrator'
+
+    response = client.get('/search?q="on disk"&source=decisions.log')
+    assert texts(response.get_json()['hits']) == ["Decided to cache completions on disk"]
+
+    search_index.close_all()
+    response = client.get('/search?q=deploy')
+    assert texts(response.get_json()['hits']) == ["t1 Invalidate the cache on deploy"]
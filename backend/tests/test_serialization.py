@@ -0,0 +1,78 @@
+import pytest
+import os
+import json
+import math
+
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import serialization
+from serialization import get_codec, decode, SocketJSON
+from storage import JsonFileStorage
+
+TODOS = [{"id": f"t{i}", "task": f"Implement part {i} — with ünïcode", "done": i % 2 == 0, "cost": 0.25 * i}
+         for i in range(20)]
+
+
+@pytest.fixture(params=['orjson', 'stdlib'])
+def json_module(request, monkeypatch):
+    if request.param == 'stdlib':
+        monkeypatch.setattr(serialization, 'orjson', None)
+    elif serialization.orjson is None:
+        pytest.skip("orjson is not installed")
+    return request.param
+
+
+def test_json_codecs_round_trip(json_module):
+    for name in ('json', 'json-pretty'):
+        encoded = get_codec(name).encode({"todos": TODOS, 1: None})
+        assert decode(encoded) == {"todos": TODOS, "1": None}
+        assert json.loads(encoded) == decode(encoded) # Still plain JSON for other tools.
+    assert b'\n' not in get_codec('json').encode(TODOS)
+    assert get_codec('json-pretty').encode({"a": 1}) == b'{\n    "a": 1\n}'
+
+
+def test_non_finite_floats_round_trip_as_with_the_json_module(json_module, tmp_path):
+    document = {"cost": float('nan'), "limits": [float('inf'), -float('inf'), 1.5], "note": None}
+    encoded = get_codec('json').encode(document)
+    assert encoded == json.dumps(document, separators=(',', ':')).encode('utf-8')
+    decoded = decode(encoded)
+    assert math.isnan(decoded['cost']) and decoded['limits'] == [float('inf'), -float('inf'), 1.5]
+    assert decoded['note'] is None
+
+    storage = JsonFileStorage(str(tmp_path))
+    storage.write('config.json', document)
+    assert math.isnan(storage.read('config.json')['cost'])
+    assert math.isnan(SocketJSON.loads(SocketJSON.dumps([float('nan')]))[0])
+
+
+def test_socket_json_accepts_stdlib_arguments(json_module):
+    text = SocketJSON.dumps(["client_chat", {"data": "hi", "seq": 1}], separators=(',', ':'))
+    assert isinstance(text, str)
+    assert SocketJSON.loads(text) == ["client_chat", {"data": "hi", "seq": 1}]
+
+
+def test_storage_reads_whatever_codec_wrote(tmp_path):
+    JsonFileStorage(str(tmp_path), 'json-pretty').write('todo.json', TODOS)
+    compact = JsonFileStorage(str(tmp_path), 'json')
+    assert compact.read('todo.json') == TODOS
+    compact.write('todo.json', TODOS[:2])
+    assert os.path.getsize(tmp_path / 'todo.json') < len(json.dumps(TODOS[:2], indent=4))
+    assert JsonFileStorage(str(tmp_path), 'json-pretty').read('todo.json') == TODOS[:2]
+
+
+def test_msgpack_codec(tmp_path):
+    pytest.importorskip('msgpack')
+    JsonFileStorage(str(tmp_path), 'msgpack').write('todo.json', TODOS)
+    with open(tmp_path / 'todo.json', 'rb') as f:
+        assert f.read().startswith(serialization.MSGPACK_MAGIC)
+    assert JsonFileStorage(str(tmp_path), 'json').read('todo.json') == TODOS
+
+
+def test_unknown_or_unavailable_codec():
+    with pytest.raises(ValueError):
+        get_codec('yaml')
+    try:
+        import msgpack
+    except ImportError:
+        with pytest.raises(ValueError):
+            get_codec('msgpack')
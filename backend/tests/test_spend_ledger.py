@@ -0,0 +1,115 @@
+import pytest
+import os
+import shutil
+import threading
+import subprocess
+
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import app, read_json_file, write_json_file, update_project_spend
+from spend_ledger import SpendLedger
+from storage import JsonFileStorage
+
+TEST_LEDGER_DIR = '.team-ready-ledger-test'
+
+
+@pytest.fixture
+def data_dir():
+    original_data_dir = app.config.get('DATA_DIR', None)
+    test_dir_path = os.path.join(os.getcwd(), TEST_LEDGER_DIR)
+    app.config['DATA_DIR'] = test_dir_path
+    if os.path.exists(test_dir_path):
+        shutil.rmtree(test_dir_path)
+    os.makedirs(test_dir_path)
+    write_json_file('config.json', {"hard_limit": 1000.0, "project_spend": 0.0, "approval_level": "strict"})
+
+    yield test_dir_path
+
+    shutil.rmtree(test_dir_path)
+    if original_data_dir is not None:
+        app.config['DATA_DIR'] = original_data_dir
+
+
+def new_ledger(data_dir, **options):
+    return SpendLedger(JsonFileStorage(data_dir), os.path.join(data_dir, 'spend.journal'), **options)
+
+
+def test_charges_are_checkpointed_periodically(data_dir):
+    ledger = new_ledger(data_dir, checkpoint_every=3, checkpoint_interval=3600)
+    ledger.charge(0.1)
+    ledger.charge(0.2)
+    assert JsonFileStorage(data_dir).read('config.json')['project_spend'] == 0.0
+    assert ledger.charge(0.3) == (0.6, False)
+    assert JsonFileStorage(data_dir).read('config.json')['project_spend'] == 0.6
+    ledger.close()
+
+
+def test_journal_is_replayed_after_restart(data_dir):
+    ledger = new_ledger(data_dir, checkpoint_every=3, checkpoint_interval=3600)
+    for cost in [0.25, 0.25, 0.25, 0.5, 0.5]:
+        ledger.charge(cost)
+    ledger.close() # "Crash": the last two charges were never checkpointed.
+
+    restarted = new_ledger(data_dir)
+    assert restarted.spend() == 1.75
+    restarted.checkpoint()
+    assert JsonFileStorage(data_dir).read('config.json')['project_spend'] == 1.75
+    restarted.close()
+
+
+def test_limit_check_is_exact(data_dir):
+    write_json_file('config.json', {"hard_limit": 1.0, "project_spend": 0.0})
+    ledger = new_ledger(data_dir)
+    results = [ledger.charge(0.1) for _ in range(10)]
+    assert [limit_reached for _, limit_reached in results] == [False] * 9 + [True]
+    assert results[-1][0] == 1.0
+    ledger.close()
+
+
+# Charges from 500 greenlets in a monkey-patched process (so the ledger's lock is gevent's),
+# with every config.json read and write yielding to the other greenlets a few times, as file
+# lock waits do; without the lock, interleaved loads and checkpoints lose charges.
+GREENLET_CHARGES = """
+from gevent import monkey
+monkey.patch_all()
+import os, sys, random, logging, gevent
+import app, storage
+from spend_ledger import SpendLedger
+logging.disable(logging.WARNING)
+
+def yielding(method):
+    def wrapper(*args, **kwargs):
+        for _ in range(random.randint(0, 3)):
+            gevent.sleep(0)
+        return method(*args, **kwargs)
+    return wrapper
+
+random.seed(0)
+storage.JsonFileStorage.read = yielding(storage.JsonFileStorage.read)
+storage.JsonFileStorage.set_keys = yielding(storage.JsonFileStorage.set_keys)
+app.app.config['DATA_DIR'] = sys.argv[1]
+gevent.joinall([gevent.spawn(app.update_project_spend, 0.01) for _ in range(500)], raise_error=True)
+# What the process holds, and what a restart would find in config.json and the journal.
+restarted = SpendLedger(storage.JsonFileStorage(sys.argv[1]), os.path.join(sys.argv[1], 'spend.journal'))
+print(app.get_spend_ledger().spend(), restarted.spend())
+"""
+
+
+def test_no_spend_lost_across_concurrent_greenlets(data_dir):
+    backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    out = subprocess.run([sys.executable, '-c', GREENLET_CHARGES, data_dir], cwd=data_dir, check=True,
+                         capture_output=True, text=True, env=dict(os.environ, PYTHONPATH=backend_dir)).stdout
+    assert out.split() == ['5.0', '5.0']
+
+
+def test_no_spend_lost_across_threads(data_dir):
+    def worker():
+        for _ in range(50):
+            update_project_spend(0.01)
+
+    threads = [threading.Thread(target=worker) for _ in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert read_json_file('config.json')['project_spend'] == 8.0
@@ -0,0 +1,136 @@
+import pytest
+import os
+import shutil
+
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import app, write_json_file, get_file_path
+from storage import JsonFileStorage
+from todo_versions import TodoVersions
+
+TEST_STATUS_DIR = '.team-ready-status-test'
+
+
+@pytest.fixture
+def client():
+    original_data_dir = app.config.get('DATA_DIR', None)
+    app.config['DATA_DIR'] = os.path.join(os.getcwd(), TEST_STATUS_DIR)
+    if os.path.exists(app.config['DATA_DIR']):
+        shutil.rmtree(app.config['DATA_DIR'])
+    os.makedirs(app.config['DATA_DIR'])
+
+    with app.test_client() as client:
+        client.post('/init', json={'repo_url': 'a', 'path': 'b'})
+        yield client
+
+    shutil.rmtree(app.config['DATA_DIR'])
+    if original_data_dir is not None:
+        app.config['DATA_DIR'] = original_data_dir
+
+
+def todos(count, done=()):
+    return [{"id": f"t{i}", "title": f"task {i}", "done": i in done} for i in range(count)]
+
+
+def test_etag_and_not_modified(client):
+    write_json_file('todo.json', todos(3))
+    rv = client.get('/status?id=p')
+    assert rv.status_code == 200 and rv.json['todo_list'] == todos(3)
+    etag = rv.headers['ETag']
+
+    assert client.get('/status?id=p', headers={'If-None-Match': etag}).status_code == 304
+
+    write_json_file('todo.json', todos(3, done={1}))
+    rv = client.get('/status?id=p', headers={'If-None-Match': etag})
+    assert rv.status_code == 200 and rv.headers['ETag'] != etag
+
+
+def test_delta_returns_only_changes(client):
+    write_json_file('todo.json', todos(100))
+    version = client.get('/status?id=p').json['version']
+
+    write_json_file('todo.json', todos(99, done={42}))
+    rv = client.get(f'/status?id=p&since={version}').json
+    assert rv['delta'] is True and rv['version'] > version
+    assert [(c['key'], c['index'], c['item']['done']) for c in rv['changed']] == [('t42', 42, True)]
+    assert rv['removed'] == ['t99'] and rv['total'] == 99
+    assert 'todo_list' not in rv
+
+    # Nothing new since the latest version.
+    rv = client.get(f"/status?id=p&since={rv['version']}").json
+    assert rv['changed'] == [] and rv['removed'] == []
+
+
+def test_outside_writes_are_picked_up(client):
+    write_json_file('todo.json', todos(2))
+    version = client.get('/status?id=p').json['version']
+    # An agent process rewrites the file directly (a different size, so the signature changes).
+    with open(get_file_path('todo.json'), 'w') as f:
+        f.write('[{"id": "t0", "title": "task 0", "done": true}]')
+    rv = client.get(f'/status?id=p&since={version}').json
+    assert [c['key'] for c in rv['changed']] == ['t0'] and rv['removed'] == ['t1']
+
+
+def test_cursor_pagination(client):
+    write_json_file('todo.json', todos(5))
+    page = client.get('/status?id=p&limit=2').json
+    assert [t['id'] for t in page['todo_list']] == ['t0', 't1']
+    assert page['next_cursor'] == page['version'] - 3 # The sequence number t1 changed at.
+    # Changes between pages do not shift them: t0's removal skips nothing, t1 changed comes again.
+    items = todos(5, done={1})[1:]
+    write_json_file('todo.json', items)
+    page = client.get(f"/status?id=p&limit=2&cursor={page['next_cursor']}").json
+    assert [t['id'] for t in page['todo_list']] == ['t2', 't3']
+    page = client.get(f"/status?id=p&limit=2&cursor={page['next_cursor']}").json
+    assert [t['id'] for t in page['todo_list']] == ['t4', 't1'] and page['todo_list'][1]['done']
+    assert page['next_cursor'] is None
+
+
+def test_versions_survive_restart_and_old_deltas_fall_back(client):
+    storage = JsonFileStorage(app.config['DATA_DIR'])
+    versions = TodoVersions(storage, max_tombstones=2)
+    for items in (todos(5), todos(1)):
+        storage.write('todo.json', items)
+        versions.adopt(items)
+    # Each removal has its own sequence number; only the last two tombstones (t3, t4) are kept.
+    assert versions.changes_since(versions.horizon - 1) is None
+    assert versions.changes_since(versions.horizon) == ([], ['t3', 't4'])
+
+    restarted = TodoVersions(storage)
+    assert restarted.sync() == versions.version and restarted.horizon == versions.horizon
+    assert restarted.changes_since(versions.horizon) == ([], ['t3', 't4'])
+    assert restarted.changes_since(versions.version) == ([], [])
+    assert restarted.changes_since(versions.version + 5) is None
+
+
+def test_changes_are_journaled_and_compacted(client):
+    storage = JsonFileStorage(os.path.join(app.config['DATA_DIR'], 'journaled'))
+    versions = TodoVersions(storage)
+    items = todos(10)
+    storage.write('todo.json', items)
+    versions.adopt(items)
+    snapshot = storage.read('todo_versions.json')
+    for i in range(5):
+        items[i] = dict(items[i], done=True)
+        storage.write('todo.json', items)
+        versions.adopt(items)
+    # Small changes append to the journal and leave the snapshot alone.
+    assert storage.read('todo_versions.json') == snapshot
+    with open(versions.journal_path) as f:
+        assert len(f.readlines()) == 15
+
+    restarted = TodoVersions(storage)
+    assert restarted.sync() == versions.version == 15
+    assert restarted.changes_since(12) == versions.changes_since(12)
+    assert [change['key'] for change in restarted.changes_since(12)[0]] == ['t2', 't3', 't4']
+
+    for i in range(100):
+        items[i % 10] = dict(items[i % 10], title=f"rename {i}")
+        storage.write('todo.json', items)
+        versions.adopt(items)
+    # Once the journal outgrows the snapshot, it is folded into it.
+    assert storage.read('todo_versions.json')['version'] > 15
+    with open(versions.journal_path) as f:
+        assert len(f.readlines()) < 100
+    restarted = TodoVersions(storage)
+    assert restarted.version == versions.version and restarted.entries == versions.entries
@@ -0,0 +1,141 @@
+import pytest
+import os
+import json
+import threading
+
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from storage import JsonFileStorage, SQLiteStorage, get_storage, close_storages
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def storage(request, tmp_path):
+    yield get_storage(request.param, str(tmp_path))
+    close_storages()
+
+
+def test_round_trip_documents(storage):
+    config = {"hard_limit": 10.0, "project_spend": 0.0, "approval_level": "strict"}
+    todos = [{"task": "a", "status": "open"}, {"task": "b", "status": "done"}]
+
+    assert storage.read('config.json') is None
+    assert storage.read('todo.json', []) == []
+
+    storage.write('config.json', config)
+    storage.write('todo.json', todos)
+    assert storage.read('config.json') == config
+    assert list(storage.read('config.json')) == list(config)
+    assert storage.read('todo.json') == todos
+
+    storage.write('todo.json', todos[:1])
+    assert storage.read('todo.json') == todos[:1]
+
+
+def test_row_level_helpers(storage):
+    storage.write('todo.json', [])
+    assert storage.append_item('todo.json', {"task": "a"}) == 0
+    assert storage.append_item('todo.json', {"task": "b"}) == 1
+    storage.update_item('todo.json', 1, {"task": "b", "status": "done"})
+    assert storage.read('todo.json') == [{"task": "a"}, {"task": "b", "status": "done"}]
+
+    storage.write('config.json', {"project_spend": 0.0})
+    storage.set_key('config.json', 'project_spend', 1.5)
+    storage.set_key('config.json', 'hard_limit', 5.0)
+    assert storage.read('config.json') == {"project_spend": 1.5, "hard_limit": 5.0}
+
+
+def test_json_reads_are_cached_until_the_file_changes(tmp_path):
+    storage = JsonFileStorage(str(tmp_path))
+    storage.write('config.json', {"project_spend": 1.0})
+    assert storage.read('config.json') == {"project_spend": 1.0}
+    for _ in range(10):
+        assert storage.read('config.json') == {"project_spend": 1.0}
+    assert storage.stats == {'hits': 10, 'parses': 1}
+
+    # Our own writes drop the cached copy.
+    storage.set_key('config.json', 'project_spend', 2.0)
+    assert storage.read('config.json') == {"project_spend": 2.0}
+
+    # So do outside edits, even ones that keep the size.
+    path = tmp_path / 'config.json'
+    with open(path, 'w') as f:
+        json.dump({"project_spend": 3.0}, f)
+    assert storage.read('config.json') == {"project_spend": 3.0}
+    stat = os.stat(path)
+    with open(path, 'w') as f:
+        json.dump({"project_spend": 4.0}, f)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+    assert storage.read('config.json') == {"project_spend": 4.0}
+    assert storage.stats['parses'] == 4
+
+    os.remove(path)
+    assert storage.read('config.json', {}) == {}
+
+
+def test_json_reads_do_not_share_documents(tmp_path):
+    storage = JsonFileStorage(str(tmp_path))
+    storage.write('todo.json', [{"task": "a", "tags": ["x"]}])
+    first = storage.read('todo.json')
+    first[0]['tags'].append("changed")
+    first.append({"task": "b"})
+
+    second = storage.read('todo.json')
+    assert second == [{"task": "a", "tags": ["x"]}]
+    assert second is not first
+    assert storage.stats == {'hits': 1, 'parses': 1}
+
+
+def test_sqlite_imports_existing_json_files(tmp_path):
+    with open(tmp_path / 'config.json', 'w') as f:
+        json.dump({"hard_limit": 3.0, "project_spend": 1.0}, f)
+    with open(tmp_path / 'todo.json', 'w') as f:
+        json.dump([{"task": "imported"}], f)
+
+    storage = SQLiteStorage(str(tmp_path))
+    assert storage.read('config.json') == {"hard_limit": 3.0, "project_spend": 1.0}
+    assert storage.read('todo.json') == [{"task": "imported"}]
+    storage.close()
+
+
+def test_sqlite_write_only_touches_changed_rows(tmp_path):
+    storage = SQLiteStorage(str(tmp_path))
+    todos = [{"task": f"task {i}", "status": "open"} for i in range(100)]
+    storage.write('todo.json', todos)
+
+    conn = storage.connection()
+    before = conn.total_changes
+    todos[42]["status"] = "done"
+    storage.write('todo.json', todos)
+    assert conn.total_changes - before == 1
+    storage.close()
+
+
+def test_sqlite_readers_run_while_writing(tmp_path):
+    storage = SQLiteStorage(str(tmp_path))
+    storage.write('todo.json', [{"task": "a"}])
+    errors = []
+
+    def reader():
+        try:
+            for _ in range(50):
+                assert storage.read('todo.json')[0] == {"task": "a"}
+        except Exception as e:
+            errors.append(e)
+        finally:
+            storage.close()
+
+    threads = [threading.Thread(target=reader) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for i in range(50):
+        storage.append_item('todo.json', {"task": f"more {i}"})
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert len(storage.read('todo.json')) == 51
+    storage.close()
+
+
+def test_unknown_backend(tmp_path):
+    with pytest.raises(ValueError):
+        get_storage('yaml', str(tmp_path))
@@ -0,0 +1,172 @@
+import pytest
+import os
+import time
+import shutil
+import threading
+
+import sys
+TESTS_DIR = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(TESTS_DIR, '..')))
+from app import app, read_json_file, write_json_file
+import app as backend_app
+from jobs import JobManager
+from task_scheduler import TaskScheduler, parse_todos, DONE, FAILED, RUNNING
+
+TEST_SCHEDULER_DIR = '.team-ready-scheduler-test'
+
+
+def todo(task_id, *deps, priority=0, cost=1.0):
+    return {"id": task_id, "task": f"do {task_id}", "depends_on": list(deps), "priority": priority, "estimated_cost": cost}
+
+
+class RecordingDispatch:
+    def __init__(self):
+        self.started = []
+
+    def __call__(self, task):
+        self.started.append(task.id)
+        return f"job-{task.id}"
+
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    original_data_dir = app.config.get('DATA_DIR')
+    test_dir_path = os.path.join(os.getcwd(), TEST_SCHEDULER_DIR)
+    app.config['DATA_DIR'] = test_dir_path
+    if os.path.exists(test_dir_path):
+        shutil.rmtree(test_dir_path)
+    os.makedirs(test_dir_path)
+    backend_app.coder_jobs = JobManager('fake_agent:run', max_workers=4, python_path=[TESTS_DIR],
+                                        on_finish=backend_app.coder_job_finished)
+
+    with app.test_client() as client:
+        yield client
+
+    backend_app.stop_schedulers(lambda project_id: True)
+    backend_app.coder_jobs.shutdown()
+    backend_app.coder_jobs = None
+    shutil.rmtree(test_dir_path)
+    if original_data_dir is not None:
+        app.config['DATA_DIR'] = original_data_dir
+
+
+def test_ready_tasks_run_by_priority_within_the_limit():
+    dispatch = RecordingDispatch()
+    items = [todo('a'), todo('b', priority=5), todo('c', 'a'), todo('d', 'a', 'b'), "plain string task"]
+    scheduler = TaskScheduler(items, dispatch, parallelism=2)
+    assert scheduler.start() and dispatch.started == ['b', 'a']
+    assert scheduler.start() == [] # At the limit.
+
+    scheduler.finish_job('job-a', True)
+    # a unblocked c, which comes before the plain task in the list; d still waits for b.
+    assert dispatch.started == ['b', 'a', 'c']
+    scheduler.finish('b', True)
+    assert dispatch.started == ['b', 'a', 'c', 'd']
+    scheduler.finish('c', True)
+    assert dispatch.started[-1] == '#4'
+    scheduler.finish('d', True)
+    scheduler.finish('#4', True)
+    assert scheduler.is_finished() and scheduler.status()['counts'] == {DONE: 5}
+
+
+def test_failures_block_dependents_and_dispatch_errors_fail_tasks():
+    def dispatch(task):
+        if task.id == 'broken':
+            raise RuntimeError("no workers")
+        return None
+
+    scheduler = TaskScheduler([todo('a'), todo('b', 'a'), todo('broken'), todo('c', 'broken')], dispatch, parallelism=4)
+    scheduler.start()
+    scheduler.finish('a', False, "tests failed")
+    status = scheduler.status()
+    assert status['counts'] == {FAILED: 2, 'pending': 2}
+    assert sorted(status['blocked_by_failure']) == ['b', 'c']
+    assert scheduler.tasks['broken'].error == "RuntimeError: no workers"
+
+
+def test_jobs_that_end_during_dispatch_finish_their_task():
+    scheduler = None
+
+    def dispatch(task):
+        scheduler.finish_job(f"job-{task.id}", task.id != 'b', "crashed")
+        return f"job-{task.id}"
+
+    scheduler = TaskScheduler([todo('a'), todo('b', 'a')], dispatch, parallelism=1)
+    scheduler.start()
+    assert scheduler.is_finished()
+    assert scheduler.snapshot() == {'a': (DONE, 'job-a'), 'b': (FAILED, 'job-b')}
+    assert scheduler.tasks['b'].error == "crashed" and not scheduler.jobs
+
+
+def test_critical_path_cycles_and_unknown_dependencies():
+    items = [todo('design', cost=2), todo('api', 'design', cost=3), todo('ui', 'design', cost=1),
+             todo('ship', 'api', 'ui', cost=1), todo('x', 'y'), todo('y', 'x'), todo('z', 'missing')]
+    tasks, problems = parse_todos(items)
+    assert problems == ["Task z depends on unknown task 'missing'"] and tasks['z'].deps == []
+
+    scheduler = TaskScheduler(items, RecordingDispatch(), parallelism=1)
+    assert scheduler.critical_path() == (6.0, ['design', 'api', 'ship'])
+    assert scheduler.status()['cyclic'] == ['x', 'y']
+    scheduler.start()
+    scheduler.finish('design', True)
+    assert scheduler.critical_path() == (4.0, ['api', 'ship'])
+
+
+def test_edits_keep_running_tasks_and_statuses_do_not_rebuild():
+    dispatch = RecordingDispatch()
+    items = [todo('a'), todo('b', 'a')]
+    scheduler = TaskScheduler(items, dispatch, parallelism=4)
+    scheduler.start()
+    graph = scheduler.tasks
+    scheduler.sync([dict(items[0], status=RUNNING), items[1]])
+    assert scheduler.tasks is graph
+
+    scheduler.sync(items + [todo('c')])
+    assert scheduler.tasks is not graph and scheduler.tasks['a'].status == RUNNING
+    assert dispatch.started == ['a', 'c']
+    scheduler.finish('a', True)
+    assert dispatch.started == ['a', 'c', 'b']
+
+
+def test_wall_clock_scales_with_width_not_task_count():
+    """4 chains of 4 tasks, 0.05s each: with 4 at a time it takes about a chain, not 16 tasks."""
+    seconds = 0.05
+    items = [todo(f"{chain}{step}", *([f"{chain}{step - 1}"] if step else [])) for chain in 'abcd' for step in range(4)]
+    done = threading.Event()
+    scheduler = None
+
+    def dispatch(task):
+        def work():
+            time.sleep(seconds)
+            scheduler.finish(task.id, True)
+            if scheduler.is_finished():
+                done.set()
+        threading.Thread(target=work, daemon=True).start()
+        return None
+
+    scheduler = TaskScheduler(items, dispatch, parallelism=4)
+    assert scheduler.status()['average_width'] == 4.0
+    started = time.perf_counter()
+    scheduler.start()
+    assert done.wait(10)
+    elapsed = time.perf_counter() - started
+    assert elapsed < len(items) * seconds / 2, f"took {elapsed:.2f}s"
+
+
+def test_schedule_route_runs_todos_on_coder_jobs(client, wait_for):
+    client.post('/init', json={'project_id': 'alpha'})
+    write_json_file('todo.json', [todo('a'), todo('b', 'a'), todo('c')], 'alpha')
+    rv = client.post('/schedule', json={'project_id': 'alpha', 'parallelism': 2})
+    assert rv.status_code == 200
+    assert rv.json['schedule']['critical_path'] == ['a', 'b']
+
+    def statuses():
+        return [item.get('status') for item in read_json_file('todo.json', [], 'alpha')]
+
+    assert wait_for(lambda: statuses() == [DONE, DONE, DONE])
+    assert all(item['job_id'] for item in read_json_file('todo.json', [], 'alpha'))
+    rv = client.get('/schedule?id=alpha')
+    assert rv.json['schedule']['counts'] == {DONE: 3} and rv.json['schedule']['critical_path_length'] == 0
+    assert client.post('/schedule', json={'project_id': 'alpha', 'parallelism': 0}).status_code == 400
+    assert client.get('/schedule?id=beta').status_code == 404
@@ -0,0 +1,241 @@
+import os
+import json
+import bisect
+import logging
+import hashlib
+import threading
+
+TODO_FILE = 'todo.json'
+VERSIONS_FILE = 'todo_versions.json'
+# Changes made since todo_versions.json was written, one JSON record per line.
+JOURNAL_FILE = 'todo_versions.journal'
+
+
+def item_keys(items):
+    """
+    Todos with an "id" are tracked by it; anything else (and repeated ids) by its position
+    in the list, as "#<index>".
+    """
+    keys = []
+    seen = set()
+    for index, item in enumerate(items):
+        key = item.get('id') if isinstance(item, dict) else None
+        if not isinstance(key, (str, int)) or isinstance(key, bool) or key in seen:
+            key = f"#{index}"
+        seen.add(key)
+        keys.append(key)
+    return keys
+
+
+def item_hash(item):
+    return hashlib.blake2b(json.dumps(item, sort_keys=True, default=str).encode('utf-8'), digest_size=8).hexdigest()
+
+
+class TodoVersions:
+    """
+    Change tracking for the todo list behind GET /status.
+
+    Every change to a todo gets the next of a monotonically increasing sequence of numbers, the
+    list's version is the latest of them, and each todo remembers the number it last changed at
+    (removed todos leave a tombstone), so a poller can ask for only what changed since the version
+    it has, and page through the list by those numbers. The parsed list is kept in memory and only
+    re-read when the storage signature of todo.json changes, so an unchanged poll costs one stat()
+    call. Changes are appended to todo_versions.journal, which is folded into a snapshot
+    (todo_versions.json) once it holds more records than the snapshot would, so versions survive
+    restarts at a cost proportional to what changed.
+    """
+
+    def __init__(self, storage, max_tombstones=10000):
+        self.storage = storage
+        self.max_tombstones = max_tombstones
+        self.lock = threading.Lock()
+        meta = storage.read(VERSIONS_FILE, None) or {}
+        self.version = meta.get('version', 0)
+        # Deltas older than this version cannot be answered (tombstones were dropped).
+        self.horizon = meta.get('horizon', 0)
+        self.entries = {key: (digest, version) for key, digest, version in meta.get('entries', [])}
+        self.tombstones = {key: version for key, version in meta.get('tombstones', [])}
+        self.journal_path = os.path.join(storage.data_dir, JOURNAL_FILE)
+        self.journal_records = 0
+        self._replay()
+        self.items = None
+        self.index = {}
+        self.signature = False # Never synced.
+        self._rebuild_log()
+
+    def _replay(self):
+        """Applies the journal records the snapshot does not have yet."""
+        try:
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break # Torn by a crash mid-write; nothing after it was acknowledged.
+                    self.journal_records += 1
+                    if 'horizon' in record:
+                        self.horizon = max(self.horizon, record['horizon'])
+                        continue
+                    seq, key = record['seq'], record['key']
+                    if seq <= self.version:
+                        continue # Already in the snapshot.
+                    if 'digest' in record:
+                        self.entries[key] = (record['digest'], seq)
+                        self.tombstones.pop(key, None)
+                    else:
+                        self.entries.pop(key, None)
+                        self.tombstones[key] = seq
+                    self.version = seq
+        except FileNotFoundError:
+            pass
+        except (OSError, KeyError, TypeError) as e:
+            logging.error(f"Could not replay the todo versions journal: {e}")
+
+    def _rebuild_log(self):
+        # (version, key) of every change in version order, so deltas are found by bisection.
+        changes = sorted([(version, key) for key, (_, version) in self.entries.items()] +
+                         [(version, key) for key, version in self.tombstones.items()], key=lambda pair: pair[0])
+        self.log_versions = [version for version, _ in changes]
+        self.log_keys = [key for _, key in changes]
+
+    def is_valid(self):
+        return self.storage.is_valid()
+
+    def sync(self):
+        """Picks up changes made to todo.json behind our back; returns the current version."""
+        with self.lock:
+            signature = self.storage.signature(TODO_FILE)
+            if signature != self.signature or self.items is None:
+                items = self.storage.read(TODO_FILE, [])
+                self._apply(items if isinstance(items, list) else [])
+            return self.version
+
+    def adopt(self, items):
+        """Records a todo list we just wrote ourselves, without reading it back."""
+        with self.lock:
+            self._apply(list(items) if isinstance(items, list) else [])
+
+    def _apply(self, items):
+        keys = item_keys(items)
+        digests = [item_hash(item) for item in items]
+        records = []
+        entries = {}
+        for key, digest in zip(keys, digests):
+            old = self.entries.get(key)
+            if old is not None and old[0] == digest:
+                entries[key] = old
+            else:
+                self.version += 1
+                entries[key] = (digest, self.version)
+                self.tombstones.pop(key, None)
+                self._log(self.version, key)
+                records.append({"seq": self.version, "key": key, "digest": digest})
+        for key in self.entries:
+            if key not in entries:
+                self.version += 1
+                self.tombstones[key] = self.version
+                self._log(self.version, key)
+                records.append({"seq": self.version, "key": key})
+        self.items, self.entries = items, entries
+        self.index = {key: index for index, key in enumerate(keys)}
+        if len(self.tombstones) > self.max_tombstones:
+            oldest = sorted(self.tombstones.items(), key=lambda pair: pair[1])
+            for key, tombstone_version in oldest[:len(self.tombstones) - self.max_tombstones]:
+                del self.tombstones[key]
+                self.horizon = max(self.horizon, tombstone_version)
+            records.append({"horizon": self.horizon})
+            self._rebuild_log()
+        elif len(self.log_keys) > 2 * (len(self.entries) + len(self.tombstones)) + 64:
+            self._rebuild_log() # Drop log records superseded by later changes.
+        if records:
+            try:
+                self._persist(records)
+            except OSError as e:
+                # Only costs clients a full reload after a restart.
+                logging.error(f"Could not persist todo versions: {e}")
+        # Taken after our own writes, so they do not look like outside changes.
+        self.signature = self.storage.signature(TODO_FILE)
+
+    def _persist(self, records):
+        """Appends records to the journal, folding it into the snapshot once it outgrows it."""
+        self.journal_records += len(records)
+        if self.journal_records <= 2 * (len(self.entries) + len(self.tombstones)) + 64:
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                f.write(''.join(json.dumps(record) + '\n' for record in records))
+            return
+        self.storage.write(VERSIONS_FILE, {
+            'version': self.version,
+            'horizon': self.horizon,
+            'entries': [[key, digest, item_version] for key, (digest, item_version) in self.entries.items()],
+            'tombstones': [[key, item_version] for key, item_version in self.tombstones.items()],
+        })
+        # Records left behind by a crash here are older than the snapshot and skipped on replay.
+        open(self.journal_path, 'w').close()
+        self.journal_records = 0
+
+    def _log(self, version, key):
+        self.log_versions.append(version)
+        self.log_keys.append(key)
+
+    def page(self, cursor=0, limit=None):
+        """
+        Returns (items, next_cursor). Without a cursor or limit, that is the whole list in list
+        order. Otherwise it is up to `limit` todos that last changed after the sequence number
+        `cursor`, in the order they changed, and next_cursor is the number of the last one (None
+        on the last page). Pages stay consistent while the list changes: a todo changed in the
+        meantime comes again on a later page, and changes_since() tells what was removed.
+        """
+        with self.lock:
+            items = self.items or []
+            if not cursor and limit is None:
+                return items, None
+            page, last = [], None
+            for i in range(bisect.bisect_right(self.log_versions, cursor), len(self.log_versions)):
+                version, key = self.log_versions[i], self.log_keys[i]
+                entry = self.entries.get(key)
+                if entry is None or entry[1] != version:
+                    continue # Removed, or changed again later.
+                if limit is not None and len(page) == limit:
+                    return page, last
+                page.append(items[self.index[key]])
+                last = version
+            return page, None
+
+    def changes_since(self, since):
+        """
+        Returns (changed, removed) since a version: changed is a list of
+        {"key", "index", "version", "item"} in list order, removed a list of keys.
+        Returns None when the version is too old (or from the future) to answer with a delta.
+        """
+        with self.lock:
+            if since < self.horizon or since > self.version:
+                return None
+            changed, removed, seen = [], [], set()
+            start = bisect.bisect_right(self.log_versions, since)
+            for key in self.log_keys[start:]:
+                if key in seen:
+                    continue
+                seen.add(key)
+                if key in self.entries:
+                    index = self.index[key]
+                    changed.append({"key": key, "index": index, "version": self.entries[key][1], "item": self.items[index]})
+                elif key in self.tombstones:
+                    removed.append(key)
+            changed.sort(key=lambda change: change['index'])
+            return changed, removed
+
+    def __len__(self):
+        return len(self.items or [])
+
+
+_versions = {}
+_versions_guard = threading.Lock()
+
+
+def get_todo_versions(storage):
+    """Returns the shared change tracker for a storage's todo list."""
+    with _versions_guard:
+        versions = _versions.get(storage.data_dir)
+        if versions is None or versions.storage is not storage or not versions.is_valid():
+            versions = _versions[storage.data_dir] = TodoVersions(storage)
+        return versions
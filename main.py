@@ -1,77 +1,163 @@
-import eel
-import sys
-
-# Initialize Eel with the folder containing your web assets
-eel.init('web')
-
-@eel.expose
-def greet_from_python(name):
-    print(f"Greeting requested for: {name}")
-    return f"Hello, {name}! Message from Python."
-
-@eel.expose
-def auth_login(username, password):
-    raise NotImplementedError
-
-@eel.expose
-def auth_logout():
-    raise NotImplementedError
-
-@eel.expose
-def crewai_submit_prompt(prompt):
-    raise NotImplementedError
-
-@eel.expose
-def get_employee_overview():
-    raise NotImplementedError
-
-@eel.expose
-def assign_task(employee, description, due_date=None):
-    raise NotImplementedError
-
-@eel.expose
-def update_task_status(task_id, status):
-    raise NotImplementedError
-
-@eel.expose
-def send_chat_message(target, message):
-    raise NotImplementedError
-
-@eel.expose
-def list_projects():
-    raise NotImplementedError
-
-@eel.expose
-def select_project(project_id):
-    raise NotImplementedError
-
-@eel.expose
-def list_project_files(project_id):
-    raise NotImplementedError
-
-@eel.expose
-def get_system_status():
-    raise NotImplementedError
-
-def start_app():
-    try:
-        # Start the application
-        # mode='chrome' (default) tries to open Chrome. 
-        # mode='edge' or mode='default' uses the system default browser.
-        # size=(width, height) sets the initial window size
-        print("Starting Eel app...")
-        eel.start('main.html' , port=8080, host="localhost", size=(800, 600))
-    except (SystemExit, KeyboardInterrupt):
-        print("Closing app...")
-        sys.exit(0)
-    except Exception as e:
-        print(f"Error: {e}")
-        # Fallback: if browser fails to launch, you might see an error here.
-        # Often happens if Chrome/Edge isn't installed or found.
-        # You can try mode='default' to use the system default browser if chrome fails.
-        if "can't find" in str(e).lower():
-             print("Chrome not found, retrying with default browser...")
-             eel.start('main.html', mode='default', size=(800, 600))
-
-if __name__ == '__main__':
-    start_app()
+import eel
+import os
+import sys
+import json
+import urllib.parse
+import urllib.request
+
+# Flask backend (backend/app.py) that serves project data
+BACKEND_URL = os.getenv('TEAM_READY_BACKEND_URL', 'http://localhost:5000')
+# Seconds the backend holds a dashboard watch request when nothing changes
+DASHBOARD_WAIT = 25
+DASHBOARD_RETRY = 5
+
+# Project the dashboard shows (None: the unnamed project), and the current dashboard watch
+selected_project = None
+watch_generation = 0
+
+# Initialize Eel with the folder containing your web assets
+eel.init('web')
+
+@eel.expose
+def greet_from_python(name):
+    print(f"Greeting requested for: {name}")
+    return f"Hello, {name}! Message from Python."
+
+@eel.expose
+def auth_login(username, password):
+    raise NotImplementedError
+
+@eel.expose
+def auth_logout():
+    raise NotImplementedError
+
+@eel.expose
+def crewai_submit_prompt(prompt):
+    raise NotImplementedError
+
+def fetch_json(path, params=None, timeout=5):
+    """GETs a backend endpoint and returns its JSON body."""
+    query = f"?{urllib.parse.urlencode(params)}" if params else ''
+    with urllib.request.urlopen(f"{BACKEND_URL}{path}{query}", timeout=timeout) as response:
+        return json.load(response)
+
+def fetch_dashboard(project_id=None, versions=None, wait=0):
+    """All dashboard panels in one request; see /dashboard in backend/app.py."""
+    params = {}
+    if project_id:
+        params['id'] = project_id
+    if versions:
+        params['versions'] = ','.join(f"{name}:{version}" for name, version in versions.items())
+    if wait:
+        params['wait'] = wait
+    return fetch_json('/dashboard', params, timeout=wait + 5)
+
+@eel.expose
+def get_dashboard_snapshot(project_id=None, versions=None):
+    """
+    Every dashboard panel (employees, projects, files, system) with its version, in one round trip.
+    Panels whose version the page passes in `versions` are left out, so a refresh carries only changes.
+    """
+    return fetch_dashboard(project_id or selected_project, versions)
+
+@eel.expose
+def watch_dashboard(project_id=None):
+    """
+    Starts pushing dashboard changes to the page and returns the full snapshot to start from.
+    A greenlet long polls the backend with the versions it pushed last and calls the page's
+    on_dashboard_update(diff) when panels change; an idle dashboard causes no page traffic.
+    Watching another project (or calling this again) ends the previous watch.
+    """
+    global watch_generation
+    watch_generation += 1
+    snapshot = fetch_dashboard(project_id)
+    eel.spawn(_watch_dashboard, project_id, snapshot['versions'], watch_generation)
+    return snapshot
+
+def _watch_dashboard(project_id, versions, generation):
+    while generation == watch_generation:
+        try:
+            diff = fetch_dashboard(project_id, versions, wait=DASHBOARD_WAIT)
+        except (OSError, ValueError) as e:
+            print(f"Dashboard watch failed, retrying in {DASHBOARD_RETRY}s: {e}")
+            eel.sleep(DASHBOARD_RETRY)
+            continue
+        if generation == watch_generation and diff['panels']:
+            versions = diff['versions']
+            eel.on_dashboard_update(diff)
+
+@eel.expose
+def get_employee_overview():
+    return get_dashboard_snapshot()['panels']['employees']
+
+@eel.expose
+def assign_task(employee, description, due_date=None):
+    raise NotImplementedError
+
+@eel.expose
+def update_task_status(task_id, status):
+    raise NotImplementedError
+
+@eel.expose
+def send_chat_message(target, message):
+    raise NotImplementedError
+
+@eel.expose
+def list_projects():
+    return get_dashboard_snapshot()['panels']['projects']
+
+@eel.expose
+def select_project(project_id):
+    """Shows another project on the dashboard; returns its snapshot and pushes its changes from now on."""
+    global selected_project
+    selected_project = project_id or None
+    return watch_dashboard(selected_project)
+
+@eel.expose
+def list_project_files(project_id, cursor=None, limit=200, directory=None, pattern=None, extensions=None):
+    """
+    A page of the files of the project's repository (path, size, mtime, sha1), from the backend's
+    incremental file index; pass the returned next_cursor to get the next page. See /files in backend/app.py.
+    """
+    params = {'limit': limit}
+    for key, value in (('id', project_id), ('cursor', cursor), ('dir', directory), ('glob', pattern)):
+        if value:
+            params[key] = value
+    if extensions:
+        params['ext'] = ','.join(extensions)
+    return fetch_json('/files', params, timeout=60)
+
+@eel.expose
+def get_system_status():
+    return get_dashboard_snapshot()['panels']['system']
+
+@eel.expose
+def global_search(query, project_id=None, limit=20):
+    """Runs the global search box query against the backend's /search endpoint."""
+    params = {'q': query, 'limit': limit}
+    if project_id:
+        params['id'] = project_id
+    return fetch_json('/search', params)
+
+def start_app():
+    try:
+        # Start the application
+        # mode='chrome' (default) tries to open Chrome. 
+        # mode='edge' or mode='default' uses the system default browser.
+        # size=(width, height) sets the initial window size
+        print("Starting Eel app...")
+        eel.start('main.html' , port=8080, host="localhost", size=(800, 600))
+    except (SystemExit, KeyboardInterrupt):
+        print("Closing app...")
+        sys.exit(0)
+    except Exception as e:
+        print(f"Error: {e}")
+        # Fallback: if browser fails to launch, you might see an error here.
+        # Often happens if Chrome/Edge isn't installed or found.
+        # You can try mode='default' to use the system default browser if chrome fails.
+        if "can't find" in str(e).lower():
+             print("Chrome not found, retrying with default browser...")
+             eel.start('main.html', mode='default', size=(800, 600))
+
+if __name__ == '__main__':
+    start_app()
@@ -27,6 +27,44 @@ function createNewTask() {
     console.log('Action: New Task');
 }
 
+// Element each dashboard panel is rendered into.
+const DASHBOARD_PANELS = {
+    employees: 'employees-overview',
+    projects: 'projects-list',
+    files: 'files-list',
+    system: 'system-status',
+};
+// Versions of the panels on the page; refreshes and pushes only carry panels that changed.
+const dashboardVersions = {};
+let selectedProject = null;
+
+function renderDashboard(diff) {
+    Object.assign(dashboardVersions, diff.versions || {});
+    Object.entries(diff.panels || {}).forEach(([name, data]) => {
+        const el = document.getElementById(DASHBOARD_PANELS[name]);
+        if (el) {
+            el.textContent = JSON.stringify(data);
+        }
+        if (name === 'system') {
+            document.getElementById('crewai-status-content').textContent = JSON.stringify(data);
+        }
+    });
+}
+
+// Called by main.py whenever dashboard panels change.
+eel.expose(on_dashboard_update);
+function on_dashboard_update(diff) {
+    renderDashboard(diff);
+}
+
+function refreshDashboard() {
+    return eel.get_dashboard_snapshot(selectedProject, dashboardVersions)().then(renderDashboard);
+}
+
+window.addEventListener('load', () => {
+    eel.watch_dashboard(selectedProject)().then(renderDashboard).catch(() => {});
+});
+
 function toggleCrewAIStatus() {
     const dd = document.getElementById('crewai-status-dropdown');
     const open = dd.classList.contains('open');
@@ -34,18 +72,36 @@ function toggleCrewAIStatus() {
         dd.classList.remove('open');
         return;
     }
-    eel.get_system_status()().then(r => {
-        const el = document.getElementById('crewai-status-content');
-        el.textContent = typeof r === 'string' ? r : JSON.stringify(r);
-        dd.classList.add('open');
-    }).catch(() => {
+    refreshDashboard().finally(() => {
         dd.classList.add('open');
     });
 }
 
 function performSearch() {
-    const q = document.getElementById('global-search').value;
-    console.log(`Search: ${q}`);
+    const q = document.getElementById('global-search').value.trim();
+    const dd = document.getElementById('search-results-dropdown');
+    const el = document.getElementById('search-results');
+    if (!q) {
+        dd.classList.remove('open');
+        return;
+    }
+    eel.global_search(q, selectedProject)().then(r => {
+        el.replaceChildren();
+        const hits = (r && r.hits) || [];
+        if (hits.length === 0) {
+            el.textContent = `No results for "${q}"`;
+        }
+        hits.forEach(hit => {
+            const row = document.createElement('div');
+            const when = hit.timestamp ? new Date(hit.timestamp * 1000).toLocaleString() + ' ' : '';
+            row.textContent = `[${hit.source}] ${when}${hit.text}`;
+            el.appendChild(row);
+        });
+        dd.classList.add('open');
+    }).catch(() => {
+        el.textContent = 'Search is unavailable.';
+        dd.classList.add('open');
+    });
 }
 
 function openNotifications() {
@@ -78,9 +134,7 @@ function submitPrompt() {
 }
 
 function refreshEmployees() {
-    eel.get_employee_overview()().then(r => {
-        document.getElementById('employees-overview').textContent = JSON.stringify(r);
-    }).catch(() => {});
+    refreshDashboard().catch(() => {});
 }
 
 function assignTask() {
@@ -103,25 +157,20 @@ function sendChatMessage() {
 }
 
 function refreshProjects() {
-    eel.list_projects()().then(r => {
-        document.getElementById('projects-list').textContent = JSON.stringify(r);
-    }).catch(() => {});
+    refreshDashboard().catch(() => {});
 }
 
 function selectProject() {
     const id = document.getElementById('select-project-id').value;
-    eel.select_project(id)().catch(() => {});
+    selectedProject = id || null;
+    Object.keys(dashboardVersions).forEach(name => delete dashboardVersions[name]);
+    eel.select_project(id)().then(renderDashboard).catch(() => {});
 }
 
 function refreshFiles() {
-    const proj = document.getElementById('select-project-id').value;
-    eel.list_project_files(proj)().then(r => {
-        document.getElementById('files-list').textContent = JSON.stringify(r);
-    }).catch(() => {});
+    refreshDashboard().catch(() => {});
 }
 
 function refreshSystemStatus() {
-    eel.get_system_status()().then(r => {
-        document.getElementById('system-status').textContent = JSON.stringify(r);
-    }).catch(() => {});
+    refreshDashboard().catch(() => {});
 }